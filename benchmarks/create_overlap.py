@@ -0,0 +1,174 @@
+"""
+Measures the duration of a Create, and each of it's stages, with and without authentication overlapped with reading and
+translating the template (resource_driver.overlap_authentication).
+
+Creates are handled by the driver's ResourceDriverHandler, translating a TOSCA template, against a stub of Keystone and Heat
+served by this script which answers after a configurable latency. Tokens are not cached between creates, so each authenticates,
+as the first create for a deployment location (or the first after it's token expired) would.
+
+Usage:
+    python benchmarks/create_overlap.py [--runs 10] [--auth-latency 0.5] [--heat-latency 0.05] [--template path/to/tosca.yaml] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+TEMPLATE_PATH = os.path.join(REPO_ROOT, 'osvimdriver', 'tosca', 'definitions', 'warmup.yaml')
+STAGES = ['read_files', 'translate', 'filter_inputs', 'authenticate', 'await_authentication', 'find_duplicate', 'create']
+
+
+class StubOpenstackHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.startswith('/heat/v1/project/stacks'):
+            # No existing stacks, so every create is checked for duplicates then created
+            time.sleep(self.server.heat_latency)
+            self.__respond(200, {'stacks': []})
+        else:
+            self.__respond(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/identity/v3/auth/tokens':
+            time.sleep(self.server.auth_latency)
+            self.__respond(201, self.__token(), headers={'X-Subject-Token': uuid.uuid4().hex})
+        elif self.path == '/heat/v1/project/stacks':
+            time.sleep(self.server.heat_latency)
+            self.__respond(201, {'stack': {'id': str(uuid.uuid4()), 'links': []}})
+        else:
+            self.__respond(404, {'error': 'Not found'})
+
+    def __token(self):
+        now = datetime.now(timezone.utc)
+        domain = {'id': 'default', 'name': 'Default'}
+        return {'token': {
+            'methods': ['password'],
+            'issued_at': now.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+            'expires_at': (now + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+            'user': {'id': 'user', 'name': 'admin', 'domain': domain},
+            'project': {'id': 'project', 'name': 'admin', 'domain': domain},
+            'catalog': [{'type': 'orchestration', 'name': 'heat', 'id': 'heat', 'endpoints': [
+                {'id': 'heat-public', 'interface': 'public', 'region': 'RegionOne', 'region_id': 'RegionOne',
+                 'url': 'http://127.0.0.1:{0}/heat/v1/project'.format(self.server.server_port)}
+            ]}]
+        }}
+
+    def __respond(self, status, body, headers=None):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_openstack(auth_latency, heat_latency):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenstackHandler)
+    server.daemon_threads = True
+    server.auth_latency = auth_latency
+    server.heat_latency = heat_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def build_driver(overlap_authentication):
+    from osvimdriver.service.resourcedriver import ResourceDriverHandler, AdditionalResourceDriverProperties
+    from osvimdriver.service.tosca import ToscaParserService, ToscaHeatTranslatorService, ToscaTopologyDiscoveryService
+    from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator
+    config = AdditionalResourceDriverProperties()
+    config.keep_files = True
+    config.overlap_authentication = overlap_authentication
+    parser = ToscaParserService()
+    return ResourceDriverHandler(OpenstackDeploymentLocationTranslator(), resource_driver_config=config,
+                                 heat_translator_service=ToscaHeatTranslatorService(tosca_parser_service=parser),
+                                 tosca_discovery_service=ToscaTopologyDiscoveryService(tosca_parser_service=parser))
+
+def stage_snapshots():
+    import osvimdriver.service.metrics as metrics
+    return {stage: metrics.LIFECYCLE_STAGE_DURATION.labels(lifecycle='create', stage=stage).snapshot()[2] for stage in STAGES}
+
+def run(overlap_authentication, runs, port, driver_files):
+    from ignition.model.associated_topology import AssociatedTopology
+    from ignition.utils.propvaluemap import PropValueMap
+    driver = build_driver(overlap_authentication)
+    deployment_location = {'name': 'benchmark', 'properties': {
+        'os_api_url': 'http://127.0.0.1:{0}'.format(port),
+        'os_auth_api': 'identity/v3',
+        'os_auth_project_name': 'admin',
+        'os_auth_project_domain_name': 'default',
+        'os_auth_user_domain_name': 'Default',
+        'os_auth_username': 'admin',
+        'os_auth_password': 'password'
+    }}
+    request_properties = {'template-type': 'TOSCA'}
+    totals = []
+    stages = {stage: [] for stage in STAGES}
+    for _ in range(runs):
+        before = stage_snapshots()
+        start = time.perf_counter()
+        driver.execute_lifecycle('Create', driver_files, PropValueMap({}), PropValueMap({}), request_properties, AssociatedTopology(), deployment_location)
+        totals.append(time.perf_counter() - start)
+        after = stage_snapshots()
+        for stage in STAGES:
+            stages[stage].append(after[stage] - before[stage])
+    return {
+        'overlap_authentication': overlap_authentication,
+        'runs': runs,
+        'create_seconds': statistics.median(totals),
+        'stage_seconds': {stage: statistics.median(durations) for stage, durations in stages.items()}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Create with and without authentication overlapped with template translation')
+    parser.add_argument('--runs', type=int, default=10, help='Number of creates in each mode')
+    parser.add_argument('--auth-latency', type=float, default=0.5, help='Seconds the stub Keystone takes to issue a token')
+    parser.add_argument('--heat-latency', type=float, default=0.05, help='Seconds the stub Heat takes to accept a stack')
+    parser.add_argument('--template', default=TEMPLATE_PATH, help='TOSCA template to create with (the time to translate it is what authentication overlaps)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+    # The request and response of each Heat call are logged at info
+    logging.disable(logging.INFO)
+
+    from ignition.utils.file import DirectoryTree
+    from osvimdriver.service.tosca import load_tosca_modules
+    # Loaded up front, so neither mode includes the one off cost in it's first create
+    load_tosca_modules()
+    server = start_stub_openstack(args.auth_latency, args.heat_latency)
+    files_path = tempfile.mkdtemp()
+    try:
+        shutil.copyfile(args.template, os.path.join(files_path, 'tosca.yaml'))
+        driver_files = DirectoryTree(files_path)
+        # One of each first, so connections and imports made on first use are not counted in either mode
+        run(False, 1, server.server_port, driver_files)
+        results = [run(False, args.runs, server.server_port, driver_files), run(True, args.runs, server.server_port, driver_files)]
+    finally:
+        server.shutdown()
+        shutil.rmtree(files_path, ignore_errors=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print('{0:<24} {1:>12} {2:>12}'.format('median (seconds)', 'sequential', 'overlapped'))
+    print('{0:<24} {1:>12.3f} {2:>12.3f}'.format('total', results[0]['create_seconds'], results[1]['create_seconds']))
+    for stage in STAGES:
+        print('{0:<24} {1:>12.3f} {2:>12.3f}'.format(stage, results[0]['stage_seconds'][stage], results[1]['stage_seconds'][stage]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures the cold start cost of the driver: the time taken to import the osvimdriver package in a fresh interpreter,
+and the time taken to load the TOSCA parser and heat-translator on first use.
+
+Usage:
+    python benchmarks/import_time.py [--runs 10] [--top 15] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import osvimdriver
+import_seconds = time.perf_counter() - start
+tosca_loaded_at_import = any(m.startswith(('toscaparser', 'translator')) for m in sys.modules)
+import osvimdriver.service.tosca as tosca
+start = time.perf_counter()
+# Older revisions loaded the TOSCA stack at import, so have nothing left to load
+if hasattr(tosca, 'load_tosca_modules'):
+    tosca.load_tosca_modules()
+tosca_seconds = time.perf_counter() - start
+print(json.dumps({'import': import_seconds, 'tosca': tosca_seconds, 'tosca_loaded_at_import': tosca_loaded_at_import}))
+'''
+
+
+def run_once(cwd):
+    output = subprocess.check_output([sys.executable, '-c', MEASURE_SCRIPT], cwd=cwd, env=_env())
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def top_imports(cwd, top):
+    # -X importtime writes "import time: self [us] | cumulative | imported package" lines to stderr
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import osvimdriver'], cwd=cwd, env=_env(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    entries = []
+    for line in result.stderr.decode('utf-8').splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        entries.append((int(parts[1].strip()), parts[2].strip()))
+    entries.sort(reverse=True)
+    return entries[:top]
+
+def _env():
+    env = os.environ.copy()
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+def summarise(values):
+    return {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the osvimdriver package')
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh interpreters to measure')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports (by cumulative time) to list')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    # Run from an empty directory so nothing is picked up from (or written to) the working directory
+    cwd = os.path.join(REPO_ROOT, 'benchmarks')
+    results = [run_once(cwd) for _ in range(args.runs)]
+    summary = {
+        'runs': args.runs,
+        'python': sys.version.split()[0],
+        'import_seconds': summarise([r['import'] for r in results]),
+        'tosca_load_seconds': summarise([r['tosca'] for r in results]),
+        'tosca_loaded_at_import': any(r['tosca_loaded_at_import'] for r in results),
+        'top_imports_us': top_imports(cwd, args.top)
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print('Runs: {0} (Python {1})'.format(summary['runs'], summary['python']))
+    for key in ['import_seconds', 'tosca_load_seconds']:
+        values = summary[key]
+        print('{0:<20} median={1:.3f}s min={2:.3f}s max={3:.3f}s'.format(key, values['median'], values['min'], values['max']))
+    print('TOSCA stack loaded at import: {0}'.format(summary['tosca_loaded_at_import']))
+    print('Slowest imports (cumulative):')
+    for cumulative, name in summary['top_imports_us']:
+        print('  {0:>10.3f}s  {1}'.format(cumulative / 1e6, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Measures the start up of gunicorn workers with and without preload (PRELOAD_ENABLED):
+- time from launching gunicorn to the first successful response
+- latency of the first request handled by each worker
+- memory of each worker after handling a request: RSS and PSS (which divides pages shared with other processes between
+  them, so shows the saving from sharing preloaded state)
+
+Requests parse and translate a TOSCA template using benchmarks/startup_app.py, as the driver app needs Kafka to start.
+
+Usage:
+    python benchmarks/startup.py [--workers 4] [--json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def read_memory_kb(pid):
+    memory = {'rss_kb': None, 'pss_kb': None}
+    try:
+        with open('/proc/{0}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss_kb'] = int(line.split()[1])
+        with open('/proc/{0}/smaps_rollup'.format(pid)) as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except OSError:
+        # Only available on Linux
+        pass
+    return memory
+
+def request(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def run(workers, preload, timeout=120):
+    port = free_port()
+    url = 'http://127.0.0.1:{0}/'.format(port)
+    env = os.environ.copy()
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['PRELOAD_ENABLED'] = 'true' if preload else 'false'
+    cmd = [sys.executable, '-m', 'gunicorn', '--config', 'python:osvimdriver.gunicorn_conf', '--workers', str(workers),
+           '--bind', '127.0.0.1:{0}'.format(port), 'benchmarks.startup_app:app']
+    launched_at = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time_to_first_request = None
+        while time_to_first_request is None:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited with code {0}'.format(process.returncode))
+            if time.perf_counter() - launched_at > timeout:
+                raise RuntimeError('No response from gunicorn within {0} seconds'.format(timeout))
+            try:
+                first_response = request(url, timeout)
+                time_to_first_request = time.perf_counter() - launched_at
+            except OSError:
+                time.sleep(0.05)
+        # Keep sending requests until each worker has handled one, recording the latency of the first request per worker
+        first_request_seconds = {first_response['pid']: first_response['seconds']}
+        attempts = 0
+        while len(first_request_seconds) < workers and attempts < workers * 50:
+            attempts += 1
+            response = request(url, timeout)
+            first_request_seconds.setdefault(response['pid'], response['seconds'])
+        memory = {pid: read_memory_kb(pid) for pid in first_request_seconds}
+        return {
+            'preload': preload,
+            'workers': workers,
+            'time_to_first_request_seconds': time_to_first_request,
+            'first_request_seconds': list(first_request_seconds.values()),
+            'worker_rss_kb': [m['rss_kb'] for m in memory.values()],
+            'worker_pss_kb': [m['pss_kb'] for m in memory.values()]
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if len(values) > 0 else None
+
+def _format(value, pattern):
+    return pattern.format(value) if value is not None else 'n/a'
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure gunicorn worker start up with and without preload')
+    parser.add_argument('--workers', type=int, default=4, help='Number of gunicorn workers')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    results = [run(args.workers, preload=False), run(args.workers, preload=True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print('{0:<10} {1:>22} {2:>26} {3:>22} {4:>22}'.format('preload', 'time to first request', 'first request (median)', 'worker RSS (median)', 'worker PSS (median)'))
+    for result in results:
+        print('{0:<10} {1:>22} {2:>26} {3:>22} {4:>22}'.format(
+            str(result['preload']),
+            _format(result['time_to_first_request_seconds'], '{0:.3f}s'),
+            _format(_median(result['first_request_seconds']), '{0:.3f}s'),
+            _format(_median(result['worker_rss_kb']), '{0:.0f} kB'),
+            _format(_median(result['worker_pss_kb']), '{0:.0f} kB')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+WSGI app used by benchmarks/startup.py. Each request parses and translates a TOSCA template, as a create request would,
+without needing the Kafka and Openstack services the driver app requires.
+"""
+import json
+import os
+import time
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'osvimdriver', 'tosca', 'definitions', 'warmup.yaml')
+
+
+def app(environ, start_response):
+    # Imported here so, without preload, the cost is paid by the first request handled by each worker
+    from osvimdriver.service.tosca import ToscaParserService, ToscaHeatTranslatorService
+    start = time.perf_counter()
+    with open(TEMPLATE_PATH, 'r') as f:
+        template = f.read()
+    ToscaHeatTranslatorService(tosca_parser_service=ToscaParserService()).generate_heat_template(template)
+    body = json.dumps({'pid': os.getpid(), 'seconds': time.perf_counter() - start}).encode('utf-8')
+    start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
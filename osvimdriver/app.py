@@ -7,6 +7,23 @@ from osvimdriver.service.resourcedriver import ResourceDriverHandler, Additional
 from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator
 from osvimdriver.service.tosca import ToscaParserCapability, ToscaHeatTranslatorCapability, ToscaParserService, ToscaHeatTranslatorService, ToscaTopologyDiscoveryService, ToscaTopologyDiscoveryCapability
 from osvimdriver.service.osadmin import OpenstackAdminApiConfigurator, OpenstackAdminServiceConfigurator, OpenstackAdminProperties
+from osvimdriver.service.tracing import TracingProperties, TracingConfigurator
+from osvimdriver.service.profiling import ProfilingProperties, ProfilingConfigurator
+from osvimdriver.service.ratelimit import RateLimitProperties, RateLimitConfigurator
+from osvimdriver.service.retry import RetryProperties, RetryConfigurator
+from osvimdriver.service.circuitbreaker import CircuitBreakerProperties, CircuitBreakerConfigurator
+from osvimdriver.service.timeouts import TimeoutProperties, TimeoutConfigurator
+from osvimdriver.service.admission import AdmissionProperties, AdmissionConfigurator
+from osvimdriver.service.bulkhead import BulkheadProperties, BulkheadConfigurator
+from osvimdriver.service.cache import CacheProperties, CacheConfigurator
+from osvimdriver.service.statuscache import StatusCacheProperties, StatusCacheConfigurator
+from osvimdriver.service.asynccreate import AsyncCreateProperties, AsyncCreateConfigurator
+from osvimdriver.service.journal import JournalProperties, JournalConfigurator
+from osvimdriver.service.hedging import HedgingProperties, HedgingConfigurator
+from osvimdriver.service.endpoints import EndpointSelectionProperties, EndpointSelectionConfigurator
+from osvimdriver.service.authcache import AuthCacheProperties, AuthCacheConfigurator
+from osvimdriver.service.connections import ConnectionPoolProperties, ConnectionPoolConfigurator
+from osvimdriver.service.prewarm import PrewarmProperties, PrewarmConfigurator
 
 default_config_dir_path = str(pathlib.Path(osvimdriverconfig.__file__).parent.resolve())
 default_config_path = os.path.join(default_config_dir_path, 'ovd_config.yml')
@@ -21,6 +38,42 @@ def create_app():
     app_builder.include_environment_config_properties('OVD_CONFIG', required=False)
     app_builder.add_property_group(AdditionalResourceDriverProperties())
     app_builder.add_property_group(AdoptProperties())
+    app_builder.add_property_group(TracingProperties())
+    app_builder.add_service_configurator(TracingConfigurator())
+    app_builder.add_property_group(ProfilingProperties())
+    app_builder.add_service_configurator(ProfilingConfigurator())
+    app_builder.add_property_group(RateLimitProperties())
+    app_builder.add_service_configurator(RateLimitConfigurator())
+    app_builder.add_property_group(RetryProperties())
+    app_builder.add_service_configurator(RetryConfigurator())
+    app_builder.add_property_group(CircuitBreakerProperties())
+    app_builder.add_service_configurator(CircuitBreakerConfigurator())
+    app_builder.add_property_group(TimeoutProperties())
+    app_builder.add_service_configurator(TimeoutConfigurator())
+    app_builder.add_property_group(AdmissionProperties())
+    app_builder.add_service_configurator(AdmissionConfigurator())
+    app_builder.add_property_group(BulkheadProperties())
+    app_builder.add_service_configurator(BulkheadConfigurator())
+    # Before the services creating caches are configured
+    app_builder.add_property_group(CacheProperties())
+    app_builder.add_service_configurator(CacheConfigurator())
+    app_builder.add_property_group(StatusCacheProperties())
+    app_builder.add_service_configurator(StatusCacheConfigurator())
+    app_builder.add_property_group(AsyncCreateProperties())
+    app_builder.add_service_configurator(AsyncCreateConfigurator())
+    app_builder.add_property_group(JournalProperties())
+    app_builder.add_service_configurator(JournalConfigurator())
+    app_builder.add_property_group(HedgingProperties())
+    app_builder.add_service_configurator(HedgingConfigurator())
+    app_builder.add_property_group(EndpointSelectionProperties())
+    app_builder.add_service_configurator(EndpointSelectionConfigurator())
+    app_builder.add_property_group(AuthCacheProperties())
+    app_builder.add_service_configurator(AuthCacheConfigurator())
+    app_builder.add_property_group(ConnectionPoolProperties())
+    app_builder.add_service_configurator(ConnectionPoolConfigurator())
+    # After the caches and pools it fills are configured
+    app_builder.add_property_group(PrewarmProperties())
+    app_builder.add_service_configurator(PrewarmConfigurator())
     app_builder.add_service(ToscaParserService)
     app_builder.add_service(ToscaTopologyDiscoveryService, tosca_parser_service=ToscaParserCapability)
     app_builder.add_service(ToscaHeatTranslatorService, tosca_parser_service=ToscaParserCapability)
@@ -0,0 +1,28 @@
+# Gunicorn configuration, used with: gunicorn --config python:osvimdriver.gunicorn_conf "osvimdriver:create_wsgi_app()"
+# Settings passed on the command line (e.g. --workers) take precedence over this file
+import glob
+import os
+from osvimdriver.preload import preload_enabled, preload
+
+# Metrics of all workers are written here (see osvimdriver.service.metrics)
+MULTIPROCESS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+
+def on_starting(server):
+    # Runs once in the master process, before any workers are forked
+    metrics_dir = os.environ.get(MULTIPROCESS_DIR_ENV)
+    if metrics_dir:
+        # Values left by a previous run would otherwise be added to those of the new workers
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+    if preload_enabled():
+        server.log.info('Preload enabled, warming up before forking workers')
+        preload()
+
+
+def child_exit(server, worker):
+    if os.environ.get(MULTIPROCESS_DIR_ENV):
+        # So the live gauges (e.g. in flight requests) of a worker no longer running are dropped
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import ssl
+import time
+import aiohttp
+from osvimdriver.service.timeouts import current_timeout, timeout_policy
+
+logger = logging.getLogger(__name__)
+
+HEAT_SERVICE_TYPE = 'orchestration'
+NEUTRON_SERVICE_TYPE = 'network'
+
+DEFAULT_CONNECTION_LIMIT = 100
+
+
+class OpenstackHttpError(Exception):
+
+    def __init__(self, status_code, message):
+        super().__init__('{0}: {1}'.format(status_code, message))
+        self.status_code = status_code
+        self.message = message
+
+
+class AsyncOpenstackSession():
+    """
+    Makes requests to Openstack APIs with aiohttp, using the token, service catalog and TLS settings of a keystoneauth1 Session
+    (as created by OpenstackDeploymentLocation), so many requests can be in flight from a single event loop.
+
+    Must be created, used and closed within a running event loop.
+    """
+
+    def __init__(self, keystone_session, location_name=None, connection_limit=DEFAULT_CONNECTION_LIMIT, interface='public', endpoint_selector=None,
+                 ssl_context=None):
+        self.keystone_session = keystone_session
+        self.location_name = location_name
+        self.connection_limit = connection_limit
+        self.interface = interface
+        # Chooses between the API endpoints of a location with several (see osvimdriver.service.endpoints)
+        self.endpoint_selector = endpoint_selector
+        # SSLContext holding the certificates of the location (see osvimdriver.openstack.tls), otherwise built from the verify/cert of the session
+        self.ssl_context = ssl_context
+        self.__endpoints = {}
+        self.__http_session = None
+
+    def __get_http_session(self):
+        if self.__http_session is None:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, ssl=self.ssl_context or build_ssl_context(self.keystone_session))
+            self.__http_session = aiohttp.ClientSession(connector=connector)
+        return self.__http_session
+
+    async def get_token(self):
+        # keystoneauth1 is blocking but caches the token, so only the first call (or a refresh) leaves the event loop waiting on Keystone
+        if self.keystone_session.auth is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self.keystone_session.get_token)
+
+    async def get_endpoint(self, service_type):
+        endpoint = self.__endpoints.get(service_type, None)
+        if endpoint is None:
+            endpoint = await asyncio.get_running_loop().run_in_executor(None, self.__lookup_endpoint, service_type)
+            if endpoint is None:
+                raise ValueError('No \'{0}\' endpoint found in the service catalog'.format(service_type))
+            self.__endpoints[service_type] = endpoint.rstrip('/')
+        return self.__endpoints[service_type]
+
+    def __lookup_endpoint(self, service_type):
+        return self.keystone_session.get_endpoint(service_type=service_type, interface=self.interface)
+
+    async def request(self, service_type, method, path, json=None, params=None):
+        """
+        Returns a tuple of the status code and decoded JSON body (None if there is no body). Raises OpenstackHttpError for error responses
+        """
+        status, body = await self.__request(service_type, method, path, json=json, params=params)
+        if status == 401 and self.keystone_session.auth is not None:
+            # Token may have been revoked or expired early, re-authenticate once
+            await asyncio.get_running_loop().run_in_executor(None, self.keystone_session.invalidate)
+            status, body = await self.__request(service_type, method, path, json=json, params=params)
+        if status >= 400:
+            raise OpenstackHttpError(status, _error_message(body))
+        return status, body
+
+    async def __request(self, service_type, method, path, json=None, params=None):
+        url = await self.get_endpoint(service_type) + path
+        headers = {'Accept': 'application/json'}
+        token = await self.get_token()
+        if token is not None:
+            headers['X-Auth-Token'] = token
+        kwargs = {}
+        timeout = _client_timeout()
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        selector = self.endpoint_selector
+        if selector is None or not selector.manages(url):
+            return await self.__send(method, url, json, params, headers, kwargs)
+        host = selector.select()
+        start = time.perf_counter()
+        try:
+            status, body = await self.__send(method, selector.rewrite(url, host), json, params, headers, kwargs)
+        except Exception as e:
+            # Not sent to another endpoint here, the call is retried (if safe to) with this endpoint now avoided
+            selector.record_error(host, e, time.perf_counter() - start)
+            raise
+        selector.record_response(host, status, time.perf_counter() - start)
+        return status, body
+
+    async def __send(self, method, url, json, params, headers, kwargs):
+        async with self.__get_http_session().request(method, url, json=json, params=params, headers=headers, **kwargs) as response:
+            if response.content_type == 'application/json':
+                body = await response.json()
+            else:
+                text = await response.text()
+                body = text if len(text) > 0 else None
+            return response.status, body
+
+    async def close(self):
+        if self.__http_session is not None:
+            await self.__http_session.close()
+            self.__http_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def build_ssl_context(keystone_session):
+    # Mirrors the verify/cert settings the keystone Session passes to requests
+    verify = getattr(keystone_session, 'verify', True)
+    cert = getattr(keystone_session, 'cert', None)
+    if verify is False:
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str):
+        ssl_context = ssl.create_default_context(cafile=verify)
+    else:
+        ssl_context = ssl.create_default_context()
+    if cert is not None:
+        if isinstance(cert, (tuple, list)):
+            ssl_context.load_cert_chain(cert[0], cert[1])
+        else:
+            ssl_context.load_cert_chain(cert)
+    return ssl_context
+
+def _client_timeout():
+    # Same (connect, read) timeout as the keystone session would apply to a request of the current call
+    timeout = current_timeout() or timeout_policy.default_timeout()
+    if timeout is None:
+        return None
+    return aiohttp.ClientTimeout(total=None, sock_connect=timeout[0], sock_read=timeout[1])
+
+def _error_message(body):
+    # Heat returns {'error': {'message': ...}}, Neutron returns {'NeutronError': {'message': ...}}
+    if isinstance(body, dict):
+        for key in ['error', 'NeutronError']:
+            error = body.get(key, None)
+            if isinstance(error, dict) and 'message' in error:
+                return error['message']
+        if 'message' in body:
+            return body['message']
+    return str(body)
+
+async def gather_bounded(coros, limit):
+    """
+    Awaits all of the given coroutines with at most `limit` running at once. Returns the results in order, with any raised
+    exception in place of the result for that coroutine
+    """
+    semaphore = asyncio.Semaphore(limit)
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+    return await asyncio.gather(*[bounded(coro) for coro in coros], return_exceptions=True)
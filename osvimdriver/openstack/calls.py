@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.tracing import tracer, SPAN_KIND_CLIENT
+from osvimdriver.service.profiling import record_stage
+from osvimdriver.service.ratelimit import rate_limiters
+from osvimdriver.service.retry import retry_policy
+from osvimdriver.service.circuitbreaker import circuit_breakers
+from osvimdriver.service.timeouts import timeout_policy, current_deadline
+from osvimdriver.service.bulkhead import bulkheads
+from osvimdriver.service.hedging import hedging_policy
+
+logger = logging.getLogger(__name__)
+
+HEAT_SERVICE = 'heat'
+NEUTRON_SERVICE = 'neutron'
+KEYSTONE_SERVICE = 'keystone'
+
+
+class OpenstackCallHandler():
+    """
+    Every request made to an Openstack API by the drivers is executed through an instance of this class,
+    so per-call concerns (metrics, tracing, bulkheads, rate limiting, retries, hedging, timeouts etc.) are applied consistently to Heat, Neutron and Keystone
+    """
+
+    def __init__(self, service_name, location_name=None):
+        self.service_name = service_name
+        self.location_name = location_name
+
+    def call(self, operation, func, *args, **kwargs):
+        with tracer.start_span(self.__span_name(operation), kind=SPAN_KIND_CLIENT, attributes=self.__span_attributes(operation)):
+            return self.__guarded_call(operation, func, *args, **kwargs)
+
+    def call_idempotent(self, operation, func, *args, **kwargs):
+        # Same as call but retried on transient errors, so only for requests which are safe to repeat (e.g. retrieving a stack)
+        with tracer.start_span(self.__span_name(operation), kind=SPAN_KIND_CLIENT, attributes=self.__span_attributes(operation)):
+            attempt = 1
+            while True:
+                try:
+                    return self.__hedged_call(operation, func, *args, **kwargs)
+                except Exception as e:
+                    delay = self.__retry_delay(attempt, e)
+                    if delay is None:
+                        raise
+                    self.__record_retry(operation, attempt, e, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(self, operation, coro_func, *args, **kwargs):
+        # Equivalent of call for the async drivers, coro_func is awaited
+        with tracer.start_span(self.__span_name(operation), kind=SPAN_KIND_CLIENT, attributes=self.__span_attributes(operation)):
+            return await self.__guarded_acall(operation, coro_func, *args, **kwargs)
+
+    async def acall_idempotent(self, operation, coro_func, *args, **kwargs):
+        with tracer.start_span(self.__span_name(operation), kind=SPAN_KIND_CLIENT, attributes=self.__span_attributes(operation)):
+            attempt = 1
+            while True:
+                try:
+                    return await self.__guarded_acall(operation, coro_func, *args, **kwargs)
+                except Exception as e:
+                    delay = self.__retry_delay(attempt, e)
+                    if delay is None:
+                        raise
+                    self.__record_retry(operation, attempt, e, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def __span_name(self, operation):
+        return '{0}.{1}'.format(self.service_name, operation)
+
+    def __span_attributes(self, operation):
+        return {'openstack.service': self.service_name, 'openstack.operation': operation, 'openstack.location': self.location_name}
+
+    def __retry_delay(self, attempt, error):
+        delay = retry_policy.next_delay(attempt, error)
+        deadline = current_deadline()
+        if delay is not None and deadline is not None and delay >= deadline.remaining():
+            # No time left to retry before the request's deadline, so give up now
+            return None
+        return delay
+
+    def __max_wait(self, limiter, deadline):
+        if deadline is None:
+            return None
+        return min(limiter.max_wait, deadline.remaining())
+
+    def __hedged_call(self, operation, func, *args, **kwargs):
+        if not hedging_policy.applies_to(operation):
+            return self.__guarded_call(operation, func, *args, **kwargs)
+        # Each request (first and hedge) is guarded separately, as both are sent to the location
+        return hedging_policy.call(self.service_name, operation, self.location_name, lambda: self.__guarded_call(operation, func, *args, **kwargs))
+
+    def __guarded_call(self, operation, func, *args, **kwargs):
+        deadline = current_deadline()
+        timeout = timeout_policy.timeout_for(operation, deadline)
+        with bulkheads.compartment(self.location_name):
+            return self.__protected_call(operation, deadline, timeout, func, *args, **kwargs)
+
+    def __protected_call(self, operation, deadline, timeout, func, *args, **kwargs):
+        breaker = circuit_breakers.get_breaker(self.location_name)
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            limiter = rate_limiters.get_limiter(self.service_name, self.location_name)
+            with timeout_policy.operation_timeout(timeout):
+                if limiter is None:
+                    result = self.__timed_call(operation, func, *args, **kwargs)
+                else:
+                    with limiter.limit(max_wait=self.__max_wait(limiter, deadline)):
+                        result = self.__timed_call(operation, func, *args, **kwargs)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    async def __guarded_acall(self, operation, coro_func, *args, **kwargs):
+        deadline = current_deadline()
+        timeout = timeout_policy.timeout_for(operation, deadline)
+        async with bulkheads.async_compartment(self.location_name):
+            return await self.__protected_acall(operation, deadline, timeout, coro_func, *args, **kwargs)
+
+    async def __protected_acall(self, operation, deadline, timeout, coro_func, *args, **kwargs):
+        breaker = circuit_breakers.get_breaker(self.location_name)
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            limiter = rate_limiters.get_limiter(self.service_name, self.location_name)
+            with timeout_policy.operation_timeout(timeout):
+                if limiter is None:
+                    result = await self.__timed_acall(operation, coro_func, *args, **kwargs)
+                else:
+                    async with limiter.async_limit(max_wait=self.__max_wait(limiter, deadline)):
+                        result = await self.__timed_acall(operation, coro_func, *args, **kwargs)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    def __timed_call(self, operation, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self.__record_error(operation, e)
+            raise
+        finally:
+            self.__record_duration(operation, time.perf_counter() - start)
+
+    async def __timed_acall(self, operation, coro_func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await coro_func(*args, **kwargs)
+        except Exception as e:
+            self.__record_error(operation, e)
+            raise
+        finally:
+            self.__record_duration(operation, time.perf_counter() - start)
+
+    def __record_error(self, operation, error):
+        metrics.OPENSTACK_REQUEST_ERRORS.labels(service=self.service_name, operation=operation,
+                                                location=self.location_name, error=type(error).__name__).inc()
+
+    def __record_duration(self, operation, duration):
+        metrics.OPENSTACK_REQUEST_DURATION.labels(service=self.service_name, operation=operation,
+                                                  location=self.location_name).observe(duration)
+        record_stage(self.__span_name(operation), duration)
+
+    def __record_retry(self, operation, attempt, error, delay):
+        logger.warning('Retrying {0} on location \'{1}\' in {2:.2f} seconds after attempt {3} failed: {4}'.format(
+            self.__span_name(operation), self.location_name, delay, attempt, str(error)))
+        metrics.OPENSTACK_REQUEST_RETRIES.labels(service=self.service_name, operation=operation,
+                                                 location=self.location_name, error=type(error).__name__).inc()
+
+    def instrument_auth(self, auth):
+        # Keystone auth plugins authenticate lazily, the first time a token is required by the session,
+        # so the call is wrapped at the plugin rather than at a point in our code.
+        # Not retried here, a failure is retried by the idempotent request which needed the token
+        get_auth_ref = auth.get_auth_ref
+        def handled_get_auth_ref(*args, **kwargs):
+            return self.call('authenticate', get_auth_ref, *args, **kwargs)
+        auth.get_auth_ref = handled_get_auth_ref
+        return auth
@@ -1,21 +1,35 @@
-import tempfile
-import os
-import shutil
+import abc
+import threading
 from keystoneauth1.identity import v3 as keystonev3
 from keystoneauth1 import session as keystonesession
 from osvimdriver.openstack.heat.driver import HeatDriver
 from osvimdriver.openstack.heat.template import HeatInputUtil
 from osvimdriver.openstack.neutron.driver import NeutronDriver
+from osvimdriver.openstack.calls import OpenstackCallHandler, HEAT_SERVICE, NEUTRON_SERVICE, KEYSTONE_SERVICE
+from osvimdriver.openstack.aio import AsyncOpenstackSession, HEAT_SERVICE_TYPE
+from osvimdriver.openstack.tls import ssl_contexts, build_http_session
+from osvimdriver.service.timeouts import apply_timeouts
+from osvimdriver.service.endpoints import endpoint_selection, apply_endpoint_selection
+from osvimdriver.service.authcache import auth_state_cache
+from osvimdriver.service.connections import connection_pools
 
 AUTH_PROP_PREFIX = 'os_auth_'
 AUTH_ENABLED_PROP = 'os_auth_enabled'
 AUTH_API_PROP = 'os_auth_api'
+AUTH_TYPE_PROP = 'os_auth_type'
 OS_URL_PROP = 'os_api_url'
 OS_CACERT_PROP = 'os_cacert'
 OS_CERT_PROP = 'os_cert'
 OS_KEY_PROP = 'os_key'
 
-class OpenstackPasswordAuth():
+PASSWORD_AUTH_TYPE = 'password'
+APPLICATION_CREDENTIAL_AUTH_TYPE = 'application_credential'
+TOKEN_AUTH_TYPE = 'token'
+
+class OpenstackAuth(abc.ABC):
+    auth_type = None
+    # Auth properties (without the os_auth_ prefix) which must be set on the deployment location for this type of auth
+    required_properties = []
 
     def __init__(self, auth_api, auth_properties={}):
         if auth_api is None:
@@ -27,78 +41,148 @@ class OpenstackPasswordAuth():
         full_auth_url = api_url + '/' + self.auth_api
         full_auth_props = self.auth_properties.copy()
         full_auth_props['auth_url'] = full_auth_url
-        auth = keystonev3.Password(**full_auth_props)
-        return auth
+        return self._create_plugin(**full_auth_props)
+
+    @abc.abstractmethod
+    def _create_plugin(self, **kwargs):
+        pass
+
+
+class OpenstackPasswordAuth(OpenstackAuth):
+    auth_type = PASSWORD_AUTH_TYPE
+
+    def _create_plugin(self, **kwargs):
+        return keystonev3.Password(**kwargs)
+
+
+class OpenstackApplicationCredentialAuth(OpenstackAuth):
+    auth_type = APPLICATION_CREDENTIAL_AUTH_TYPE
+    required_properties = ['application_credential_secret']
+
+    def _create_plugin(self, **kwargs):
+        return keystonev3.ApplicationCredential(**kwargs)
+
+
+class OpenstackTokenAuth(OpenstackAuth):
+    auth_type = TOKEN_AUTH_TYPE
+    required_properties = ['token']
+
+    def _create_plugin(self, **kwargs):
+        return keystonev3.Token(**kwargs)
+
+
+AUTH_TYPES = {
+    PASSWORD_AUTH_TYPE: OpenstackPasswordAuth,
+    APPLICATION_CREDENTIAL_AUTH_TYPE: OpenstackApplicationCredentialAuth,
+    TOKEN_AUTH_TYPE: OpenstackTokenAuth
+}
 
 
 class OpenstackDeploymentLocation():
 
-    def __init__(self, name, api_url, auth, ca_cert=None, client_cert=None, client_key=None):
+    def __init__(self, name, api_url, auth, ca_cert=None, client_cert=None, client_key=None, api_urls=None):
         self.name = name
         self.__api_url = api_url
+        # All API endpoints of the location (including api_url), when it has several
+        self.__api_urls = api_urls if api_urls is not None else [api_url]
+        self.__endpoint_selector = None
+        self.__cached_auth = None
+        self.__auth_details = None
         self.__auth = auth
         self.__session = None
         self.__heat_driver = None
         self.__neutron_driver = None
-        self.__tmp_workspace = tempfile.mkdtemp()
         self.__ca_cert = ca_cert
         self.__client_cert = client_cert
         self.__client_key = client_key
-        self.__ca_cert_path = os.path.join(self.__tmp_workspace, 'ca.cert') if ca_cert is not None else None
-        self.__client_cert_path = os.path.join(self.__tmp_workspace, 'client.cert') if client_cert is not None else None
-        self.__client_key_path = os.path.join(self.__tmp_workspace, 'client.key') if client_key is not None else None
+        self.__ssl_context = None
+        # Guards the lazily created session and drivers, as the location may be used by several request threads at once
+        self.__lock = threading.RLock()
 
     def create_session(self):
+        with self.__lock:
+            return self.__create_session()
+
+    def __create_session(self):
         auth_details = self.__auth.build_os_auth(self.__api_url) if self.__auth is not None else None
-        self.__write_certs()
+        self.__cached_auth = auth_state_cache.get(self.name, self.__api_url, self.__auth)
+        if auth_details is not None:
+            if self.__cached_auth is not None:
+                # Token and catalog from an earlier request for this location, keystoneauth1 authenticates again if it's expired
+                self.__cached_auth.restore(auth_details)
+            OpenstackCallHandler(KEYSTONE_SERVICE, self.name).instrument_auth(auth_details)
+        self.__auth_details = auth_details
         kwargs = {}
         kwargs['auth'] = auth_details
-        if self.__ca_cert_path != None:
-            kwargs['verify'] = self.__ca_cert_path
-        if self.__client_cert_path != None:
-            if self.__client_key_path != None:
-                kwargs['cert'] = (self.__client_cert_path, self.__client_key_path)
-            else:
-                kwargs['cert'] = self.__client_cert_path
-        self.__session = keystonesession.Session(**kwargs)
+        if self.__cached_auth is not None:
+            kwargs['discovery_cache'] = self.__cached_auth.discovery
+        if self.__ca_cert is not None or self.__client_cert is not None:
+            # Certificates are loaded into an SSLContext shared by all sessions with the same certificates, rather than written to files
+            self.__ssl_context = ssl_contexts.get(ca_cert=self.__ca_cert, client_cert=self.__client_cert, client_key=self.__client_key)
+        http_session = connection_pools.get(self.name, ssl_context=self.__ssl_context)
+        if http_session is None and self.__ssl_context is not None:
+            http_session = build_http_session(ssl_context=self.__ssl_context)
+        if http_session is not None:
+            kwargs['session'] = http_session
+        session = apply_timeouts(keystonesession.Session(**kwargs))
+        self.__endpoint_selector = endpoint_selection.selector_for(self.name, self.__api_urls)
+        if self.__endpoint_selector is not None:
+            session = apply_endpoint_selection(session, self.__endpoint_selector)
+        self.__session = session
         return self.__session
 
     def get_session(self):
-        if self.__session is None:
-            self.create_session()
-        return self.__session
+        session = self.__session
+        if session is None:
+            with self.__lock:
+                if self.__session is None:
+                    self.__create_session()
+                session = self.__session
+        return session
+
+    def create_async_session(self, **kwargs):
+        # Shares the token and TLS settings of the (blocking) session. Must be called from within a running event loop and closed after use
+        session = self.get_session()
+        return AsyncOpenstackSession(session, location_name=self.name, endpoint_selector=self.__endpoint_selector, ssl_context=self.__ssl_context, **kwargs)
 
     @property
     def heat_driver(self):
-        if self.__heat_driver is None:
-            self.__heat_driver = HeatDriver(self.get_session())
-        return self.__heat_driver
+        heat_driver = self.__heat_driver
+        if heat_driver is None:
+            with self.__lock:
+                if self.__heat_driver is None:
+                    self.__heat_driver = HeatDriver(self.get_session(), call_handler=OpenstackCallHandler(HEAT_SERVICE, self.name))
+                heat_driver = self.__heat_driver
+        return heat_driver
+
+    def prepare_heat_driver(self):
+        """
+        Authenticates (unless the cached token is still valid) and finds the Heat endpoint in the service catalog, which are
+        otherwise done on the first call to Heat, then returns the Heat driver
+        """
+        session = self.get_session()
+        if session.auth is not None:
+            session.get_token()
+            session.get_endpoint(service_type=HEAT_SERVICE_TYPE, interface='public')
+        return self.heat_driver
 
     def get_heat_input_util(self):
         return HeatInputUtil()
 
     @property
     def neutron_driver(self):
-        if self.__neutron_driver is None:
-            self.__neutron_driver = NeutronDriver(self.get_session())
-        return self.__neutron_driver
+        neutron_driver = self.__neutron_driver
+        if neutron_driver is None:
+            with self.__lock:
+                if self.__neutron_driver is None:
+                    self.__neutron_driver = NeutronDriver(self.get_session(), call_handler=OpenstackCallHandler(NEUTRON_SERVICE, self.name))
+                neutron_driver = self.__neutron_driver
+        return neutron_driver
 
     def close(self):
-        if os.path.exists(self.__tmp_workspace):
-            shutil.rmtree(self.__tmp_workspace)
-
-    def __write_certs(self):
-        if self.__ca_cert_path != None:
-            self.__write_if_needed(self.__ca_cert_path, self.__ca_cert)
-        if self.__client_cert_path != None:
-            self.__write_if_needed(self.__client_cert_path, self.__client_cert)
-        if self.__client_key_path != None:
-            self.__write_if_needed(self.__client_key_path, self.__client_key)
-
-    def __write_if_needed(self, path, content):
-        if not os.path.exists(path):
-            with open(path, 'w') as f:
-                f.write(content)
+        with self.__lock:
+            if self.__cached_auth is not None and self.__auth_details is not None:
+                self.__cached_auth.save(self.__auth_details)
 
 
 class OpenstackDeploymentLocationTranslator():
@@ -108,13 +192,18 @@ class OpenstackDeploymentLocationTranslator():
         if dl_name is None:
             raise ValueError('Deployment Location managed by the Openstack VIM Driver must have a name')
         dl_properties = deployment_location.get('properties', {})
-        # Get Openstack URL
-        api_url = dl_properties.get(OS_URL_PROP, None)
-        if api_url is None:
+        # Get Openstack URL(s), given as a list or comma separated when the environment has several API endpoints
+        api_urls = dl_properties.get(OS_URL_PROP, None)
+        if isinstance(api_urls, str):
+            api_urls = [url.strip() for url in api_urls.split(',') if len(url.strip()) > 0]
+        if api_urls is None or len(api_urls) == 0:
             raise ValueError('Deployment Location managed by the Openstack VIM Driver must specify a property value for \'{0}\''.format(OS_URL_PROP))
+        # The first builds the auth URL, requests (including authenticating) may then be sent to any of them
+        api_url = api_urls[0]
         # Gather auth properties
         auth_enabled = True
         auth_api = None
+        auth_type = PASSWORD_AUTH_TYPE
         auth_properties = {}
         for key, value in dl_properties.items():
             if key == AUTH_ENABLED_PROP:
@@ -124,17 +213,30 @@ class OpenstackDeploymentLocationTranslator():
                     raise ValueError('Deployment Location should have a boolean value for property \'{0}\''.format(AUTH_ENABLED_PROP))
             elif key == AUTH_API_PROP:
                 auth_api = value
+            elif key == AUTH_TYPE_PROP:
+                auth_type = value
             elif key.startswith(AUTH_PROP_PREFIX):
                 auth_prop_key = key[len(AUTH_PROP_PREFIX):]
                 auth_properties[auth_prop_key] = value
         if auth_enabled:
             if auth_api is None:
                 raise ValueError('Deployment Location must specify a value for property \'{0}\' when auth is enabled'.format(AUTH_API_PROP))
-            configured_auth = OpenstackPasswordAuth(auth_api, auth_properties)
+            configured_auth = self.__build_auth(auth_type, auth_api, auth_properties)
         else:
             configured_auth = None
         ca_cert, client_cert, client_key = self.__gather_certs(dl_properties)
-        return OpenstackDeploymentLocation(dl_name, api_url, configured_auth, ca_cert=ca_cert, client_cert=client_cert, client_key=client_key)
+        return OpenstackDeploymentLocation(dl_name, api_url, configured_auth, ca_cert=ca_cert, client_cert=client_cert, client_key=client_key,
+                                           api_urls=api_urls)
+
+    def __build_auth(self, auth_type, auth_api, auth_properties):
+        auth_class = AUTH_TYPES.get(auth_type, None)
+        if auth_class is None:
+            raise ValueError('Deployment Location has an unsupported value for property \'{0}\', must be one of: {1}'.format(AUTH_TYPE_PROP, ', '.join(AUTH_TYPES.keys())))
+        for required_property in auth_class.required_properties:
+            if auth_properties.get(required_property, None) is None:
+                raise ValueError('Deployment Location must specify a value for property \'{0}{1}\' when \'{2}\' is \'{3}\''.format(AUTH_PROP_PREFIX, required_property,
+                                                                                                                           AUTH_TYPE_PROP, auth_type))
+        return auth_class(auth_api, auth_properties)
 
     def __gather_certs(self, dl_properties):
         ca_cert = dl_properties.get(OS_CACERT_PROP, None)
@@ -0,0 +1,43 @@
+import asyncio
+import aiohttp
+from keystoneauth1 import exceptions as keystoneexceptions
+from neutronclient.common import exceptions as neutronexceptions
+from ignition.api.exceptions import ApiException
+
+# Openstack is failing or unreachable
+SERVER_ERROR_STATUS_CODES = (500, 502, 503, 504)
+# Openstack is refusing requests as it is overloaded (Heat responds with 413 when over it's limits)
+OVERLOAD_STATUS_CODES = (413, 429)
+
+CONNECTION_ERRORS = (keystoneexceptions.ConnectionError, neutronexceptions.ConnectionFailed, aiohttp.ClientConnectionError,
+                     asyncio.TimeoutError, ConnectionError, TimeoutError)
+# Connection errors which will not be resolved by trying again
+PERMANENT_CONNECTION_ERRORS = (keystoneexceptions.SSLError, aiohttp.ClientSSLError)
+
+
+def status_code_of(error):
+    # heatclient uses code, neutronclient (and our async session) status_code and keystoneauth1 http_status
+    for attribute in ['status_code', 'http_status', 'code']:
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+def is_connection_error(error):
+    return isinstance(error, CONNECTION_ERRORS) and not isinstance(error, PERMANENT_CONNECTION_ERRORS)
+
+def is_server_error(error):
+    """
+    True if the error suggests the Openstack environment is unhealthy (rather than the request being invalid)
+    """
+    if isinstance(error, ApiException):
+        # Raised by this driver, such as when a rate limit is not available, so says nothing about Openstack
+        return False
+    if is_connection_error(error):
+        return True
+    return status_code_of(error) in SERVER_ERROR_STATUS_CODES
+
+def is_retryable_error(error):
+    if is_server_error(error):
+        return True
+    return not isinstance(error, ApiException) and status_code_of(error) in OVERLOAD_STATUS_CODES
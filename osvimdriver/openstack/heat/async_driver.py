@@ -0,0 +1,126 @@
+import logging
+from osvimdriver.openstack.aio import HEAT_SERVICE_TYPE, OpenstackHttpError, gather_bounded
+from osvimdriver.openstack.calls import OpenstackCallHandler, HEAT_SERVICE
+from osvimdriver.openstack.heat.driver import StackNotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncHeatDriver():
+    """
+    asyncio equivalent of HeatDriver, making requests to the Heat API with an AsyncOpenstackSession.
+    Stacks are returned as the dictionaries found in the Heat API responses (the same keys as HeatDriver.get_stack)
+    """
+
+    def __init__(self, async_session, call_handler=None):
+        self.__session = async_session
+        self.__call_handler = call_handler if call_handler is not None else OpenstackCallHandler(HEAT_SERVICE, async_session.location_name)
+
+    async def __request(self, operation, method, path, json=None, params=None):
+        if method == 'GET':
+            return await self.__call_handler.acall_idempotent(operation, self.__session.request, HEAT_SERVICE_TYPE, method, path, json=json, params=params)
+        return await self.__call_handler.acall(operation, self.__session.request, HEAT_SERVICE_TYPE, method, path, json=json, params=params)
+
+    async def create_stack(self, stack_name, heat_template, input_properties=None, files=None, tags=None):
+        if stack_name is None:
+            raise ValueError('stack_name must be provided')
+        if heat_template is None:
+            raise ValueError('heat_template must be provided')
+        body = {
+            'stack_name': stack_name,
+            'template': heat_template,
+            'parameters': input_properties if input_properties is not None else {},
+            'files': files if files is not None else {}
+        }
+        if tags:
+            body['tags'] = ','.join(tags)
+        logger.debug('Creating stack with name %s', stack_name)
+        _, result = await self.__request('create_stack', 'POST', '/stacks', json=body)
+        stack_id = result['stack']['id']
+        logger.debug('Stack with name %s created and assigned id %s', stack_name, stack_id)
+        return stack_id
+
+    async def update_stack(self, stack_id, heat_template=None, input_properties=None, files=None, tags=None, existing=False, stack_name=None):
+        """
+        Updates the stack with a PATCH when existing=True (keeping the current template if none is given, and merging the parameters)
+        otherwise a PUT replacing the template
+        """
+        if heat_template is None and not existing:
+            raise ValueError('heat_template must be provided, unless updating the existing stack')
+        stack_path = await self.__stack_path(stack_id, stack_name)
+        body = {'parameters': input_properties if input_properties is not None else {}}
+        if heat_template is not None:
+            body['template'] = heat_template
+            body['files'] = files if files is not None else {}
+        if tags:
+            body['tags'] = ','.join(tags)
+        logger.debug('Updating stack with id %s (existing=%s)', stack_id, existing)
+        try:
+            await self.__request('update_stack', 'PATCH' if existing else 'PUT', stack_path, json=body)
+        except OpenstackHttpError as e:
+            raise _stack_not_found_or(e)
+
+    async def delete_stack(self, stack_id):
+        if stack_id is None:
+            raise ValueError('stack_id must be provided')
+        logger.debug('Deleting stack with id %s', stack_id)
+        try:
+            await self.__request('delete_stack', 'DELETE', '/stacks/{0}'.format(stack_id))
+        except OpenstackHttpError as e:
+            raise _stack_not_found_or(e)
+
+    async def get_stack(self, stack_id):
+        if stack_id is None:
+            raise ValueError('stack_id must be provided')
+        logger.debug('Retrieving stack with id %s', stack_id)
+        try:
+            # Heat redirects /stacks/{id} to /stacks/{name}/{id}, which aiohttp follows
+            _, result = await self.__request('get_stack', 'GET', '/stacks/{0}'.format(stack_id))
+        except OpenstackHttpError as e:
+            raise _stack_not_found_or(e)
+        return result['stack']
+
+    async def get_many_stacks(self, stack_ids, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Retrieves many stacks concurrently, returning a dictionary of stack id to the stack (or the exception raised retrieving it)
+        """
+        results = await gather_bounded([self.get_stack(stack_id) for stack_id in stack_ids], max_concurrency)
+        return dict(zip(stack_ids, results))
+
+    async def get_stacks(self, limit=None, **filters):
+        params = dict(filters)
+        if limit is not None:
+            params['limit'] = limit
+        logger.debug('Retrieving stacks')
+        _, result = await self.__request('list_stacks', 'GET', '/stacks', params=params)
+        return result['stacks']
+
+    async def get_stack_events(self, stack_id, stack_name=None):
+        stack_path = await self.__stack_path(stack_id, stack_name)
+        logger.debug('Retrieving events for stack with id %s', stack_id)
+        try:
+            _, result = await self.__request('list_stack_events', 'GET', '{0}/events'.format(stack_path))
+        except OpenstackHttpError as e:
+            raise _stack_not_found_or(e)
+        return result['events']
+
+    async def get_stack_outputs(self, stack_id):
+        # Outputs are included when retrieving a stack, so it's used rather than the outputs API (which resolves each output separately)
+        stack = await self.get_stack(stack_id)
+        return stack.get('outputs', [])
+
+    async def __stack_path(self, stack_id, stack_name):
+        if stack_id is None:
+            raise ValueError('stack_id must be provided')
+        if stack_name is None:
+            stack = await self.get_stack(stack_id)
+            stack_name = stack['stack_name']
+        return '/stacks/{0}/{1}'.format(stack_name, stack_id)
+
+
+def _stack_not_found_or(error):
+    if error.status_code == 404:
+        return StackNotFoundError(str(error))
+    return error
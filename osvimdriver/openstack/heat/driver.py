@@ -4,6 +4,7 @@ from heatclient import client as heatclient
 from heatclient import exc as heatexc
 from ignition.service.logging import logging_context
 from osvimdriver.openstack.heat.template import HeatInputUtil
+from osvimdriver.openstack.calls import OpenstackCallHandler, HEAT_SERVICE
 import osvimdriver.service.common as common
 
 import osvimdriver.service.resourcedriver as rd
@@ -15,17 +16,20 @@ class StackNotFoundError(Exception):
     pass
 
 LOG_URI_PREFIX = '...'
+# Stacks requested at once when listing all stacks
+LIST_STACKS_PAGE_SIZE = 100
 
 class HeatDriver():
 
-    def __init__(self, session):
+    def __init__(self, session, call_handler=None):
         self.__session = session
         self.__heat_client = heatclient.Client('1', session=self.__session)
+        self.__call_handler = call_handler if call_handler is not None else OpenstackCallHandler(HEAT_SERVICE)
 
     def __get_heat_client(self):
         return self.__heat_client
 
-    def create_stack(self, stack_name, heat_template, input_properties=None,  files=None):
+    def create_stack(self, stack_name, heat_template, input_properties=None,  files=None, tags=None):
         if input_properties is None:
             input_properties = {}
         if files is None:
@@ -41,12 +45,16 @@ class HeatDriver():
         
         heat_template_log = HeatInputUtil.filter_password_from_dictionary(self,heat_template)
         reqbody_dict = {"stack_name" : stack_name, "template" : heat_template_log, "parameters" : input_properties, "files" : files}
+        create_kwargs = {}
+        if tags:
+            create_kwargs['tags'] = ','.join(tags)
+            reqbody_dict['tags'] = create_kwargs['tags']
         common._generate_additional_logs(reqbody_dict, 'sent', external_request_id, 'application/json',
                                        'request', 'http', {'method' : 'post', 'uri' : LOG_URI_PREFIX +'/stacks'}, None)
         
         
         try:  
-            create_result = heat_client.stacks.create(stack_name=stack_name, template=heat_template, parameters=input_properties, files=files)
+            create_result = self.__call_handler.call('create_stack', heat_client.stacks.create, stack_name=stack_name, template=heat_template, parameters=input_properties, files=files, **create_kwargs)
             stack_id = create_result['stack']['id']
             driver_request_id = rd.build_request_id(rd.CREATE_REQUEST_PREFIX, str(stack_id))
             common._generate_additional_logs(create_result, 'received', external_request_id, 'application/json',
@@ -63,6 +71,45 @@ class HeatDriver():
                                        'response', 'http', {'status_code' : e.code,'status_reason_phrase' : status_reason_phrase}, driver_request_id)
             raise e
 
+    def update_stack(self, stack_id, heat_template=None, input_properties=None, files=None, tags=None, existing=False, driver_request_id=None):
+        """
+        Updates the stack, which rebuilds only the resources changed. With existing=True the update is a PATCH, keeping the current template
+        (when none is given) and merging input_properties into the current parameters, otherwise the template must be given and replaces it
+        """
+        if stack_id is None:
+            raise ValueError('stack_id must be provided')
+        if heat_template is None and not existing:
+            raise ValueError('heat_template must be provided, unless updating the existing stack')
+        heat_client = self.__get_heat_client()
+        logger.debug('Updating stack with id %s (existing=%s)', stack_id, existing)
+        update_kwargs = {'parameters': input_properties if input_properties is not None else {}}
+        if heat_template is not None:
+            update_kwargs['template'] = heat_template
+            update_kwargs['files'] = files if files is not None else {}
+        if tags:
+            update_kwargs['tags'] = ','.join(tags)
+        external_request_id = str(uuid.uuid4())
+        reqbody_dict = dict(update_kwargs)
+        if heat_template is not None:
+            reqbody_dict['template'] = HeatInputUtil.filter_password_from_dictionary(self, heat_template)
+        common._generate_additional_logs(reqbody_dict, 'sent', external_request_id, 'application/json',
+                                       'request', 'http', {'method' : 'patch' if existing else 'put', 'uri' : LOG_URI_PREFIX + '/stacks/' + stack_id}, driver_request_id)
+        if existing:
+            update_kwargs['existing'] = True
+        try:
+            self.__call_handler.call('update_stack', heat_client.stacks.update, stack_id, **update_kwargs)
+            common._generate_additional_logs('', 'received', external_request_id, '',
+                                       'response', 'http', {'status_code' : 202, 'status_reason_phrase' : 'Accepted'}, driver_request_id)
+        except (heatexc.HTTPNotFound,heatexc.HTTPBadRequest) as e:
+            status_reason_phrase = 'Not Found'
+            if  e.code != 404:
+                status_reason_phrase = 'Bad Request'
+            common._generate_additional_logs(e, 'received', external_request_id, 'plain/text',
+                                       'response', 'http', {'status_code' : e.code,'status_reason_phrase' : status_reason_phrase}, driver_request_id)
+            if e.code == 404:
+                raise StackNotFoundError(str(e)) from e
+            raise e
+
     def delete_stack(self, stack_id, driver_request_id=None):
         if stack_id is None:
             raise ValueError('stack_id must be provided')
@@ -73,7 +120,7 @@ class HeatDriver():
            
             common._generate_additional_logs('', 'sent', external_request_id, '',
                                         'request', 'http', {'method':'delete', 'uri' : LOG_URI_PREFIX + '/stacks/' + stack_id}, driver_request_id)
-            delete_result = heat_client.stacks.delete(stack_id)
+            delete_result = self.__call_handler.call('delete_stack', heat_client.stacks.delete, stack_id)
             result = ''
             content_type =''
             if delete_result != None:   
@@ -98,7 +145,7 @@ class HeatDriver():
             external_request_id = str(uuid.uuid4())
             common._generate_additional_logs('', 'sent', external_request_id, '',
                                         'request', 'http', {'method':'get', 'uri' : LOG_URI_PREFIX + '/stacks/' + stack_id}, driver_request_id)
-            result = heat_client.stacks.get(stack_id)
+            result = self.__call_handler.call_idempotent('get_stack', heat_client.stacks.get, stack_id)
            
             common._generate_additional_logs(str(result).removeprefix('<Stack').removesuffix('>'), 'received', external_request_id, 'application/json',
                                        'response', 'http', {'status_code' : 200, 'status_reason_phrase' : 'ok'}, driver_request_id)  
@@ -117,14 +164,56 @@ class HeatDriver():
         heat_client = self.__get_heat_client()
         logger.debug('Checking stack with id %s', stack_id)
         try:
-            heat_client.actions.check(stack_id)
+            self.__call_handler.call('check_stack', heat_client.actions.check, stack_id)
         except heatexc.HTTPNotFound as e:
             raise StackNotFoundError(str(e)) from e
                       
-    def get_stacks(self):
+    def get_stacks(self, limit=None):
         heat_client = self.__get_heat_client()
         logger.debug('Retrieving stacks %s')
-        result = heat_client.stacks.list()
-        return result
+        if limit is None:
+            # Lazy, so pages are only requested as the caller iterates (and stops)
+            return self.__page_stacks(heat_client)
+        return self.__call_handler.call_idempotent('list_stacks', self.__list_stacks, heat_client, limit=limit)
+
+    def find_stacks(self, stack_name=None, tags=None):
+        """
+        Returns the stacks (as dicts) with the given name and/or all of the given tags
+        """
+        if stack_name is None and not tags:
+            raise ValueError('stack_name or tags must be provided')
+        heat_client = self.__get_heat_client()
+        kwargs = {}
+        if stack_name is not None:
+            kwargs['filters'] = {'name': stack_name}
+        if tags:
+            kwargs['tags'] = ','.join(tags)
+        logger.debug('Finding stacks with name %s and tags %s', stack_name, tags)
+        result = self.__call_handler.call_idempotent('list_stacks', self.__list_stacks, heat_client, **kwargs)
+        return [stack.to_dict() for stack in result]
+
+    def __page_stacks(self, heat_client):
+        # Each page is requested through the call handler, so is recorded and protected like any other call
+        marker = None
+        while True:
+            kwargs = {'limit': LIST_STACKS_PAGE_SIZE}
+            if marker is not None:
+                kwargs['marker'] = marker
+            page = self.__call_handler.call_idempotent('list_stacks', self.__list_stacks, heat_client, **kwargs)
+            for stack in page:
+                yield stack
+            if len(page) < LIST_STACKS_PAGE_SIZE:
+                return
+            marker = page[-1].id
+
+    def __list_stacks(self, heat_client, **kwargs):
+        # The client returns a generator which makes the request(s) when iterated, so iterate within the call to include them.
+        # Only used with a limit or filters, so the result is bounded
+        return list(heat_client.stacks.list(**kwargs))
+
+    def get_build_info(self):
+        heat_client = self.__get_heat_client()
+        logger.debug('Retrieving build info')
+        return self.__call_handler.call_idempotent('build_info', heat_client.build_info.build_info)
 
    
\ No newline at end of file
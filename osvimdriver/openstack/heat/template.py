@@ -19,6 +19,14 @@ class HeatInputUtil:
                 return self.__filter_from_dictionary(parameters, original_properties)
         return used_properties
 
+    def filter_stack_parameters(self, stack_parameters, original_properties):
+        # Parameters of an existing stack, as returned by Heat, so includes it's pseudo parameters (e.g. OS::stack_id)
+        parameters = {name: value for name, value in stack_parameters.items() if not name.startswith('OS::')}
+        if isinstance(original_properties, PropValueMap):
+            return self.__filter_from_propvaluemap(parameters, original_properties)
+        else:
+            return self.__filter_from_dictionary(parameters, original_properties)
+
     def __filter_from_dictionary(self, parameters, properties_dict):
         used_properties = {}
         for k, v in parameters.items():
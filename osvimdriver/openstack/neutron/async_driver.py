@@ -0,0 +1,56 @@
+import logging
+from neutronclient.common import exceptions as neutronexceptions
+from osvimdriver.openstack.aio import NEUTRON_SERVICE_TYPE, OpenstackHttpError
+from osvimdriver.openstack.calls import OpenstackCallHandler, NEUTRON_SERVICE
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/v2.0'
+
+
+class AsyncNeutronDriver():
+    """
+    asyncio equivalent of NeutronDriver, making requests to the Neutron API with an AsyncOpenstackSession.
+    Raises the same neutronclient exceptions as NeutronDriver when a network or subnet cannot be found
+    """
+
+    def __init__(self, async_session, call_handler=None):
+        self.__session = async_session
+        self.__call_handler = call_handler if call_handler is not None else OpenstackCallHandler(NEUTRON_SERVICE, async_session.location_name)
+
+    async def __request(self, operation, path, params=None):
+        try:
+            _, result = await self.__call_handler.acall_idempotent(operation, self.__session.request, NEUTRON_SERVICE_TYPE, 'GET', API_PREFIX + path, params=params)
+            return result
+        except OpenstackHttpError as e:
+            if e.status_code == 404:
+                raise neutronexceptions.NotFound(message=e.message) from e
+            raise
+
+    async def get_network_by_id(self, network_id):
+        if network_id is None:
+            raise ValueError('network_id must be provided')
+        logger.debug('Retrieving network with id %s', network_id)
+        result = await self.__request('show_network', '/networks/{0}'.format(network_id))
+        return result['network']
+
+    async def get_network_by_name(self, network_name):
+        if network_name is None:
+            raise ValueError('network_name must be provided')
+        logger.debug('Retrieving network with name %s', network_name)
+        # Filtered by Neutron, rather than listing every network
+        result = await self.__request('list_networks', '/networks', params={'name': network_name})
+        matches = [network for network in result['networks'] if network['name'] == network_name]
+        if len(matches) > 1:
+            raise neutronexceptions.NeutronClientNoUniqueMatch(resource='Network', name=network_name)
+        elif len(matches) == 1:
+            return matches[0]
+        else:
+            raise neutronexceptions.NotFound(message='Unable to find network with name \'{0}\''.format(network_name))
+
+    async def get_subnet_by_id(self, subnet_id):
+        if subnet_id is None:
+            raise ValueError('subnet_id must be provided')
+        logger.debug('Retrieving subnet with id %s', subnet_id)
+        result = await self.__request('show_subnet', '/subnets/{0}'.format(subnet_id))
+        return result['subnet']
@@ -3,6 +3,7 @@ import uuid
 from neutronclient.v2_0 import client as neutronclient
 from neutronclient.common import exceptions as neutronexceptions
 from ignition.service.logging import logging_context
+from osvimdriver.openstack.calls import OpenstackCallHandler, NEUTRON_SERVICE
 import osvimdriver.service.common as common
 
 logger = logging.getLogger(__name__)
@@ -11,9 +12,10 @@ LOG_URI_PREFIX = '...'
 
 class NeutronDriver():
 
-    def __init__(self, session):
+    def __init__(self, session, call_handler=None):
         self.__session = session
         self.__neutron_client = neutronclient.Client(session=self.__session)
+        self.__call_handler = call_handler if call_handler is not None else OpenstackCallHandler(NEUTRON_SERVICE)
 
     def __get_neutron_client(self):
         return self.__neutron_client
@@ -27,7 +29,7 @@ class NeutronDriver():
             external_request_id = str(uuid.uuid4())
             common._generate_additional_logs('', 'sent', external_request_id, '',
                                        'request', 'http', {'method' : 'get', 'uri' : LOG_URI_PREFIX +'/networks/' + network_id }, driver_request_id)
-            result = neutron_client.show_network(network_id)
+            result = self.__call_handler.call_idempotent('show_network', neutron_client.show_network, network_id)
             common._generate_additional_logs(str(result), 'received', external_request_id, 'application/json',
                                        'response', 'http', {'status_code' : 200, 'status_reason_phrase' : 'ok'}, driver_request_id)  
             return result['network']
@@ -46,7 +48,7 @@ class NeutronDriver():
         common._generate_additional_logs('', 'sent', external_request_id, '',
                                        'request', 'http', {'method' : 'get', 'uri' : LOG_URI_PREFIX +'/networks' }, driver_request_id)
         try:
-            result = neutron_client.list_networks()
+            result = self.__call_handler.call_idempotent('list_networks', neutron_client.list_networks)
             common._generate_additional_logs(str(result), 'received', external_request_id, 'application/json',
                                        'response', 'http', {'status_code' : 200, 'status_reason_phrase' : 'ok'}, driver_request_id)
         except Exception as e:
@@ -74,7 +76,7 @@ class NeutronDriver():
             external_request_id = str(uuid.uuid4())
             common._generate_additional_logs('', 'sent', external_request_id, '',
                                        'request', 'http', {'method' : 'get', 'uri' : LOG_URI_PREFIX +'/subnets/' + subnet_id}, driver_request_id)
-            result = neutron_client.show_subnet(subnet_id)
+            result = self.__call_handler.call_idempotent('show_subnet', neutron_client.show_subnet, subnet_id)
             common._generate_additional_logs(str(result), 'received', external_request_id, 'application/json',
                                        'response', 'http', {'status_code' : 200, 'status_reason_phrase' : 'ok'}, driver_request_id)
             return result['subnet']
@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import os
+import shutil
+import ssl
+import tempfile
+import threading
+import requests
+from keystoneauth1.session import TCPKeepAliveAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+import osvimdriver.service.metrics as metrics
+
+# Settings requests would otherwise derive from the verify/cert of each request, replacing those of the SSLContext
+REQUESTS_TLS_POOL_KWARGS = ['ca_certs', 'ca_cert_dir', 'cert_reqs', 'cert_file', 'key_file']
+
+logger = logging.getLogger(__name__)
+
+# Not available on all platforms (e.g. macOS, or Linux before 3.17)
+_memfd_create = getattr(os, 'memfd_create', None)
+_disk_fallback_warned = False
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+
+    def close(self):
+        # With TLS 1.3 the session ticket is only received after the handshake, so the session is saved again before closing
+        self.context.save_session(self.server_hostname, self.session)
+        super().close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Client SSLContext which offers the TLS session of the last connection to a server when opening a new one,
+    so the server may resume it rather than doing a full handshake
+    """
+    sslsocket_class = ResumingSSLSocket
+
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        return super().__new__(cls, protocol, *args, **kwargs)
+
+    def __init__(self, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        super().__init__()
+        self.__lock = threading.Lock()
+        self.__sessions = {}
+
+    def wrap_socket(self, sock, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname is not None:
+            with self.__lock:
+                session = self.__sessions.get(server_hostname, None)
+        ssl_sock = super().wrap_socket(sock, server_hostname=server_hostname, session=session, **kwargs)
+        metrics.OPENSTACK_TLS_HANDSHAKES.labels(handshake='resumed' if ssl_sock.session_reused else 'full').inc()
+        self.save_session(server_hostname, ssl_sock.session)
+        return ssl_sock
+
+    def save_session(self, server_hostname, session):
+        if server_hostname is None or session is None:
+            return
+        with self.__lock:
+            # A TLS 1.3 session without it's ticket can't be resumed, so doesn't replace one that can
+            if session.has_ticket or server_hostname not in self.__sessions:
+                self.__sessions[server_hostname] = session
+
+
+def build_ssl_context(ca_cert=None, client_cert=None, client_key=None):
+    """
+    Creates an SSLContext from the PEM contents of the certificates of a deployment location, without writing them to disk
+    """
+    ssl_context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if ca_cert is not None:
+        ssl_context.load_verify_locations(cadata=ca_cert)
+    else:
+        # Same trusted CAs as requests
+        ssl_context.load_verify_locations(cafile=DEFAULT_CA_BUNDLE_PATH)
+    if client_cert is not None:
+        chain = client_cert if client_key is None else client_cert.rstrip('\n') + '\n' + client_key
+        _load_cert_chain(ssl_context, chain)
+    return ssl_context
+
+def _load_cert_chain(ssl_context, chain):
+    # ssl can only load a certificate and key from a file, so it's given one held in memory where the platform allows
+    if _memfd_create is not None:
+        fd = _memfd_create('ovd-client-cert')
+        try:
+            os.write(fd, chain.encode('utf-8'))
+            ssl_context.load_cert_chain('/proc/self/fd/{0}'.format(fd))
+        finally:
+            os.close(fd)
+    else:
+        _load_cert_chain_from_disk(ssl_context, chain)
+
+def _load_cert_chain_from_disk(ssl_context, chain):
+    # Only reached when the SSLContext is first built (they are cached by SSLContextCache), never for each request.
+    # The file is only readable by this user, in a directory only it can list, and removed as soon as it's loaded
+    global _disk_fallback_warned
+    if not _disk_fallback_warned:
+        logger.warning('Client certificates can\'t be loaded from memory on this platform, so are briefly written to a private temporary file')
+        _disk_fallback_warned = True
+    directory = tempfile.mkdtemp(prefix='ovd-client-cert-')
+    try:
+        path = os.path.join(directory, 'chain.pem')
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(chain)
+        ssl_context.load_cert_chain(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+class SSLContextCache():
+    """
+    SSLContexts keyed by a digest of the certificate contents, so every session of deployment locations with the same certificates
+    shares one context (and it's TLS sessions) and the certificates are only parsed once per worker process
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__contexts = {}
+
+    def get(self, ca_cert=None, client_cert=None, client_key=None):
+        digest = hashlib.sha256()
+        for content in [ca_cert, client_cert, client_key]:
+            digest.update(b'\0' if content is None else b'\1' + content.encode('utf-8'))
+        key = digest.hexdigest()
+        with self.__lock:
+            ssl_context = self.__contexts.get(key, None)
+            if ssl_context is None:
+                ssl_context = build_ssl_context(ca_cert=ca_cert, client_cert=client_cert, client_key=client_key)
+                self.__contexts[key] = ssl_context
+            return ssl_context
+
+    def clear(self):
+        with self.__lock:
+            self.__contexts.clear()
+
+
+ssl_contexts = SSLContextCache()
+
+
+class SSLContextAdapter(TCPKeepAliveAdapter):
+    """
+    Transport adapter for requests which makes all HTTPS connections with the given SSLContext, instead of loading
+    the CA bundle and client certificate from files named by each request
+    """
+
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs['ssl_context'] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        for key in REQUESTS_TLS_POOL_KWARGS:
+            pool_kwargs.pop(key, None)
+        pool_kwargs['ssl_context'] = self.ssl_context
+        pool_kwargs['cert_reqs'] = self.__cert_reqs()
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        # Used by versions of requests before build_connection_pool_key_attributes
+        conn.cert_reqs = self.__cert_reqs()
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+
+    def __cert_reqs(self):
+        # urllib3 sets the verify mode of the context from cert_reqs, so it must agree with the context
+        return 'CERT_REQUIRED' if self.ssl_context.verify_mode == ssl.CERT_REQUIRED else 'CERT_NONE'
+
+
+def build_http_session(ssl_context=None, **adapter_kwargs):
+    """
+    Creates a requests Session for keystoneauth1 sessions, with HTTPS connections made with the given SSLContext (if any)
+    and pools sized by adapter_kwargs (pool_connections, pool_maxsize)
+    """
+    http_session = requests.Session()
+    if ssl_context is not None:
+        http_session.mount('https://', SSLContextAdapter(ssl_context, **adapter_kwargs))
+    else:
+        http_session.mount('https://', TCPKeepAliveAdapter(**adapter_kwargs))
+    http_session.mount('http://', TCPKeepAliveAdapter(**adapter_kwargs))
+    return http_session
@@ -0,0 +1,33 @@
+import gc
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_ENABLED_ENV = 'PRELOAD_ENABLED'
+
+
+def preload_enabled():
+    return os.environ.get(PRELOAD_ENABLED_ENV, 'false').lower() == 'true'
+
+def preload():
+    """
+    Warms the TOSCA parser and translator in the current process, intended to be called in the gunicorn master before
+    workers are forked so they start with this state already loaded and share the memory holding it (copy-on-write).
+
+    The ignition app itself is not preloaded, as it starts Kafka threads which would not survive the fork, so each worker
+    still builds it's own app with create_wsgi_app()
+    """
+    import osvimdriver.service.tosca as tosca
+    start = time.perf_counter()
+    try:
+        tosca.warm_up()
+    except Exception as e:
+        # Not fatal, workers will load what they need on first use
+        logger.exception('Failed to preload TOSCA parser and translator: {0}'.format(str(e)))
+    # Moves everything loaded so far out of the reach of the garbage collector, otherwise a collection in a worker
+    # touches (and so copies) the memory pages shared with the master
+    gc.collect()
+    gc.freeze()
+    logger.info('Preloaded TOSCA parser and translator in {0:.3f}s'.format(time.perf_counter() - start))
@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+from osvimdriver.service.timeouts import current_deadline
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_POOL = 'translation'
+# Threads of each worker process, passed to gunicorn --threads by the docker image
+NUM_THREADS_ENV = 'NUM_THREADS'
+
+
+def worker_threads():
+    try:
+        return max(1, int(os.environ.get(NUM_THREADS_ENV, '1')))
+    except ValueError:
+        return 1
+
+
+class AdmissionProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('admission')
+        self.enabled = True
+        # Maximum number of TOSCA templates translated at once by each worker process. Together with max_queued_translations this
+        # should be lower than the number of threads of a worker (NUM_THREADS), so polls, deletes and pings always have threads to run on.
+        # When not set, both are sized from NUM_THREADS (see translation_limits)
+        self.max_concurrent_translations = None
+        # Number of translations which may wait for a slot, any more are rejected immediately
+        self.max_queued_translations = None
+        # Seconds a translation waits for a slot before it is rejected
+        self.max_wait = 5
+
+
+def translation_limits(properties, threads):
+    """
+    Returns the (max_concurrent_translations, max_queued_translations) of a worker process with the given number of threads. Limits which
+    are not configured are sized so translations running or waiting take at most half the threads. Returns None, so nothing is limited,
+    when neither is configured and the worker has a single thread, as there are no other threads to leave free
+    """
+    max_concurrent = properties.max_concurrent_translations
+    max_queued = properties.max_queued_translations
+    if max_concurrent is None and max_queued is None and threads <= 1:
+        return None
+    translation_threads = max(1, threads // 2)
+    if max_concurrent is None:
+        max_concurrent = max(1, translation_threads - (max_queued if max_queued is not None else translation_threads // 2))
+    if max_queued is None:
+        max_queued = max(0, translation_threads - max_concurrent)
+    return max_concurrent, max_queued
+
+
+class AdmissionRejectedError(TemporaryResourceDriverError):
+    pass
+
+
+class AdmissionPool():
+    """
+    Caps the number of requests doing a particular kind of work at once. Requests which can't start wait in a short queue
+    for up to max_wait seconds, or are rejected straight away if the queue is full
+    """
+
+    def __init__(self, name, max_concurrency, max_queued=0, max_wait=0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__waiting = 0
+        self.__in_flight_gauge = metrics.ADMISSION_IN_FLIGHT.labels(pool=name)
+        self.__queue_depth_gauge = metrics.ADMISSION_QUEUE_DEPTH.labels(pool=name)
+        self.__rejected_counter = metrics.ADMISSION_REJECTED.labels(pool=name)
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+    @property
+    def waiting(self):
+        return self.__waiting
+
+    @contextmanager
+    def admit(self):
+        self.__acquire()
+        try:
+            yield
+        finally:
+            self.__release()
+
+    def __acquire(self):
+        max_wait = self.max_wait
+        deadline = current_deadline()
+        if deadline is not None:
+            # No point waiting for a slot the request won't have time to use
+            max_wait = min(max_wait, deadline.remaining())
+        with self.__condition:
+            if self.__in_flight < self.max_concurrency:
+                self.__take()
+                return
+            if self.__waiting >= self.max_queued or max_wait <= 0:
+                self.__reject('{0} already in progress and {1} waiting'.format(self.__in_flight, self.__waiting))
+            self.__waiting += 1
+            self.__queue_depth_gauge.inc()
+            try:
+                expires_at = time.monotonic() + max_wait
+                while self.__in_flight >= self.max_concurrency:
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        self.__reject('no slot available after waiting {0:.2f} seconds'.format(max_wait))
+                    self.__condition.wait(remaining)
+                self.__take()
+            finally:
+                self.__waiting -= 1
+                self.__queue_depth_gauge.dec()
+
+    def __take(self):
+        self.__in_flight += 1
+        self.__in_flight_gauge.inc()
+
+    def __release(self):
+        with self.__condition:
+            self.__in_flight -= 1
+            self.__in_flight_gauge.dec()
+            self.__condition.notify()
+
+    def __reject(self, reason):
+        self.__rejected_counter.inc()
+        raise AdmissionRejectedError('Driver is busy, {0} request rejected: {1}'.format(self.name, reason))
+
+
+class AdmissionController():
+    """
+    Holds the admission pools of the CPU heavy work done by lifecycle requests. Other requests (polls, deletes, pings etc.)
+    are not admitted through a pool, so are never queued behind that work
+    """
+
+    def __init__(self):
+        self.__translation_pool = None
+
+    def configure(self, properties, threads=1):
+        limits = None
+        if properties is not None and properties.enabled is True:
+            limits = translation_limits(properties, threads)
+        if limits is None:
+            self.__translation_pool = None
+        else:
+            max_concurrent, max_queued = limits
+            self.__translation_pool = AdmissionPool(TRANSLATION_POOL, max_concurrent, max_queued=max_queued, max_wait=properties.max_wait)
+
+    @property
+    def translation_pool(self):
+        return self.__translation_pool
+
+    @contextmanager
+    def translation(self):
+        pool = self.__translation_pool
+        if pool is None:
+            yield
+        else:
+            with pool.admit():
+                yield
+
+
+admission_control = AdmissionController()
+
+
+class AdmissionConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        admission_properties = configuration.property_groups.get_property_group(AdmissionProperties)
+        threads = worker_threads()
+        admission_control.configure(admission_properties, threads=threads)
+        pool = admission_control.translation_pool
+        if pool is not None:
+            logger.debug('Translating at most {0} TOSCA templates at once, with {1} waiting'.format(pool.max_concurrency, pool.max_queued))
+            if pool.max_concurrency + pool.max_queued >= threads:
+                logger.warning('Admission control allows {0} TOSCA translations to run or wait at once, which leaves none of the {1} threads '
+                               'of the worker free for other requests'.format(pool.max_concurrency + pool.max_queued, threads))
+        elif admission_properties.enabled is True:
+            logger.debug('Disabled: admission control of TOSCA translations, as workers have a single thread')
+        else:
+            logger.debug('Disabled: admission control of TOSCA translations')
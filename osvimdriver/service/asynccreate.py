@@ -0,0 +1,160 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+from osvimdriver.service.cache import caches
+from osvimdriver.service.common import with_logging_context
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = 'pending'
+JOB_CREATED = 'created'
+JOB_FAILED = 'failed'
+
+# Offset between the UUID epoch (15 October 1582) and the Unix epoch, in 100ns intervals
+UUID_EPOCH_OFFSET = 0x01b21dd213814000
+
+
+class AsyncCreateProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('async_create')
+        self.enabled = False
+        # Number of threads (in each worker process) translating templates and creating stacks. This also caps the number of
+        # translations done at once by background creates, as they are not admitted through the translation pool of admission control
+        self.workers = 2
+        # Number of creates accepted but not yet finished, any more are rejected until one finishes
+        self.max_queued = 50
+        # Seconds a create may take to reach Heat before polls answered by another worker process report it as failed
+        self.max_pending = 600
+        # Seconds the outcome of a create is remembered by the worker process which ran it
+        self.max_age = 3600
+        self.max_size = 10000
+
+
+class AsyncCreateRejectedError(TemporaryResourceDriverError):
+    pass
+
+
+def new_operation_id():
+    # A time based UUID, so any worker process can tell when the create was accepted from the request ID alone
+    return str(uuid.uuid1())
+
+
+def accepted_at(operation_id):
+    """
+    Returns the time (seconds since the epoch) the create with the given operation ID was accepted, or None if it can't be told
+    """
+    try:
+        parsed = uuid.UUID(operation_id)
+    except ValueError:
+        return None
+    if parsed.version != 1:
+        return None
+    return (parsed.time - UUID_EPOCH_OFFSET) / 1e7
+
+
+class CreateJob():
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.state = JOB_PENDING
+        self.stack_id = None
+        self.error = None
+
+
+class CreateJobs():
+    """
+    Runs the translation and stack creation of accepted Create requests on a pool of background threads and remembers
+    the outcome of each, by request ID, for the polls of it's status
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__executor = None
+        self.__jobs = None
+        self.__max_queued = 0
+        self.__in_progress = 0
+        self.max_pending = 0
+
+    def configure(self, properties):
+        with self.__lock:
+            executor = self.__executor
+            # Kept when disabled, for polls of creates accepted before
+            self.max_pending = properties.max_pending if properties is not None else 0
+            if properties is None or properties.enabled is not True:
+                self.__executor = None
+                self.__jobs = None
+            else:
+                self.__executor = ThreadPoolExecutor(max_workers=properties.workers, thread_name_prefix='ovd-create')
+                # Jobs are live objects (with futures) of this worker process, so always kept in memory
+                self.__jobs = caches.create('async_create', properties.max_age, max_size=properties.max_size)
+                self.__max_queued = properties.max_queued
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @property
+    def enabled(self):
+        return self.__executor is not None
+
+    def submit(self, request_id, create_func):
+        """
+        Runs create_func in the background, which should create the stack and return it's ID. Raises AsyncCreateRejectedError
+        if too many creates are already in progress, in which case create_func is never called
+        """
+        with self.__lock:
+            executor = self.__executor
+            jobs = self.__jobs
+            if executor is None:
+                raise ValueError('Asynchronous create is not enabled')
+            if self.__in_progress >= self.__max_queued:
+                metrics.ASYNC_CREATES.labels(result='rejected').inc()
+                raise AsyncCreateRejectedError('Driver is busy, create rejected: {0} creates already in progress'.format(self.__in_progress))
+            self.__in_progress += 1
+            metrics.ASYNC_CREATES_IN_PROGRESS.inc()
+        job = CreateJob(request_id)
+        jobs.put(request_id, job)
+        executor.submit(with_logging_context(self.__run), job, create_func)
+        metrics.ASYNC_CREATES.labels(result='accepted').inc()
+        return job
+
+    def get(self, request_id):
+        jobs = self.__jobs
+        if jobs is None:
+            return None
+        return jobs.get(request_id)
+
+    def __run(self, job, create_func):
+        try:
+            job.stack_id = create_func()
+            job.state = JOB_CREATED
+            metrics.ASYNC_CREATES.labels(result='created').inc()
+        except Exception as e:
+            logger.exception('Background create for request {0} failed: {1}'.format(job.request_id, str(e)))
+            job.error = e
+            job.state = JOB_FAILED
+            metrics.ASYNC_CREATES.labels(result='failed').inc()
+        finally:
+            with self.__lock:
+                self.__in_progress -= 1
+            metrics.ASYNC_CREATES_IN_PROGRESS.dec()
+
+
+create_jobs = CreateJobs()
+
+
+class AsyncCreateConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        async_create_properties = configuration.property_groups.get_property_group(AsyncCreateProperties)
+        if async_create_properties.enabled is True:
+            logger.debug('Creating stacks in the background with {0} threads'.format(async_create_properties.workers))
+        else:
+            logger.debug('Disabled: asynchronous create')
+        create_jobs.configure(async_create_properties)
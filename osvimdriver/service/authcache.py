@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import threading
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.service.cache import caches
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AuthCacheProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('auth_cache')
+        self.enabled = True
+        # Seconds the token, service catalog and discovered API versions of a deployment location are kept for. Tokens due to expire
+        # are renewed by keystoneauth1 regardless, so this only bounds how long a location no longer in use is remembered
+        self.max_age = 3600
+        # Number of deployment locations remembered
+        self.max_size = 100
+
+
+class CachedAuth():
+    """
+    Authentication state of a deployment location: the token and service catalog of the auth plugin and the API versions
+    discovered by the session. Shared by each OpenstackDeploymentLocation created for the location
+    """
+
+    def __init__(self):
+        self.state = None
+        # Given to keystoneauth1 sessions as their discovery_cache, which they read and update themselves
+        self.discovery = {}
+
+    def restore(self, auth_plugin):
+        state = self.state
+        if state is None:
+            return False
+        auth_plugin.set_auth_state(state)
+        return True
+
+    def save(self, auth_plugin):
+        state = auth_plugin.get_auth_state()
+        if state is not None:
+            self.state = state
+
+
+def auth_fingerprint(api_url, auth):
+    # Secrets are part of the key (so a changed password or token isn't served the old state) but only as a digest
+    content = json.dumps({'api_url': api_url, 'auth_type': auth.auth_type, 'auth_api': auth.auth_api, 'properties': auth.auth_properties},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class AuthStateCache():
+    """
+    Keeps the authentication state of each deployment location between requests, so a session created for a new request
+    reuses the token and catalog of the last rather than authenticating with Keystone again
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__cache = None
+
+    def configure(self, properties):
+        with self.__lock:
+            if properties is None or properties.enabled is not True:
+                self.__cache = None
+            else:
+                # The discovery of each CachedAuth is updated in place by sessions, so these are always kept in memory
+                self.__cache = caches.create('auth', properties.max_age, max_size=properties.max_size)
+
+    def get(self, location_name, api_url, auth):
+        """
+        Returns the CachedAuth of the location (created if not yet known) or None if caching is disabled
+        """
+        cache = self.__cache
+        if cache is None or auth is None:
+            return None
+        key = (location_name, auth_fingerprint(api_url, auth))
+        with self.__lock:
+            cached_auth = cache.get(key)
+            if cached_auth is None:
+                cached_auth = CachedAuth()
+                cache.put(key, cached_auth)
+        metrics.AUTH_CACHE_REQUESTS.labels(result='hit' if cached_auth.state is not None else 'miss').inc()
+        return cached_auth
+
+
+auth_state_cache = AuthStateCache()
+
+
+class AuthCacheConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        auth_cache_properties = configuration.property_groups.get_property_group(AuthCacheProperties)
+        if auth_cache_properties.enabled is True:
+            logger.debug('Caching the Keystone tokens of up to {0} deployment locations'.format(auth_cache_properties.max_size))
+        else:
+            logger.debug('Disabled: caching of Keystone tokens between requests')
+        auth_state_cache.configure(auth_cache_properties)
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('bulkhead')
+        self.enabled = True
+        # Maximum number of calls in flight to a single deployment location from each worker process. Calls beyond this fail immediately
+        self.max_concurrent_calls = 8
+        # Overrides for a particular deployment location, e.g. {'slow-cloud': 2}
+        self.locations = {}
+
+
+class BulkheadFullError(TemporaryResourceDriverError):
+    pass
+
+
+class Bulkhead():
+    """
+    Compartment holding the calls in flight to a deployment location. Calls which don't fit are rejected rather than queued,
+    so threads are not tied up waiting on a slow location while other locations could be served.
+
+    Async calls, which one thread makes many of at once, have slots of their own on each event loop (also max_concurrent_calls)
+    and wait for one rather than being rejected, as a waiting coroutine ties up no thread
+    """
+
+    def __init__(self, location_name, max_concurrent_calls):
+        self.location_name = location_name
+        self.max_concurrent_calls = max_concurrent_calls
+        self.__lock = threading.Lock()
+        self.__in_flight = 0
+        self.__async_slots = weakref.WeakKeyDictionary()
+        self.__in_flight_gauge = metrics.OPENSTACK_BULKHEAD_IN_FLIGHT.labels(location=location_name)
+        self.__rejected_counter = metrics.OPENSTACK_BULKHEAD_REJECTED.labels(location=location_name)
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+    def enter(self):
+        with self.__lock:
+            if self.__in_flight >= self.max_concurrent_calls:
+                self.__rejected_counter.inc()
+                raise BulkheadFullError('Deployment location \'{0}\' is saturated, {1} calls already in flight'.format(self.location_name, self.__in_flight))
+            self.__in_flight += 1
+            self.__in_flight_gauge.inc()
+
+    def exit(self):
+        with self.__lock:
+            self.__in_flight -= 1
+            self.__in_flight_gauge.dec()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        async with self.__async_semaphore():
+            self.__in_flight_gauge.inc()
+            try:
+                yield
+            finally:
+                self.__in_flight_gauge.dec()
+
+    def __async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            semaphore = self.__async_slots.get(loop, None)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrent_calls)
+                self.__async_slots[loop] = semaphore
+            return semaphore
+
+
+# Locations whose bulkhead is held by the current call, so calls made within it (e.g. authenticating) don't take a second slot
+_held_locations = contextvars.ContextVar('ovd_bulkhead_locations', default=frozenset())
+
+
+class BulkheadRegistry():
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__bulkheads = {}
+        self.properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            self.properties = properties
+            self.__bulkheads = {}
+
+    def get_bulkhead(self, location_name):
+        properties = self.properties
+        if location_name is None or properties is None or properties.enabled is not True:
+            return None
+        with self.__lock:
+            bulkhead = self.__bulkheads.get(location_name, None)
+            if bulkhead is None:
+                max_concurrent_calls = (properties.locations or {}).get(location_name, properties.max_concurrent_calls)
+                bulkhead = Bulkhead(location_name, max_concurrent_calls)
+                self.__bulkheads[location_name] = bulkhead
+            return bulkhead
+
+    @contextmanager
+    def compartment(self, location_name):
+        held = _held_locations.get()
+        bulkhead = self.get_bulkhead(location_name)
+        if bulkhead is None or location_name in held:
+            yield
+            return
+        bulkhead.enter()
+        token = _held_locations.set(held | {location_name})
+        try:
+            yield
+        finally:
+            _held_locations.reset(token)
+            bulkhead.exit()
+
+    @asynccontextmanager
+    async def async_compartment(self, location_name):
+        held = _held_locations.get()
+        bulkhead = self.get_bulkhead(location_name)
+        if bulkhead is None or location_name in held:
+            yield
+            return
+        async with bulkhead.async_slot():
+            token = _held_locations.set(held | {location_name})
+            try:
+                yield
+            finally:
+                _held_locations.reset(token)
+
+
+bulkheads = BulkheadRegistry()
+
+
+class BulkheadConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        bulkhead_properties = configuration.property_groups.get_property_group(BulkheadProperties)
+        if bulkhead_properties.enabled is True:
+            logger.debug('Limiting calls to each deployment location to {0} at once'.format(bulkhead_properties.max_concurrent_calls))
+        else:
+            logger.debug('Disabled: bulkheads between deployment locations')
+        bulkheads.configure(bulkhead_properties)
@@ -0,0 +1,373 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.service.resp import RespConnection, RespError
+from osvimdriver.service.sqlite import ThreadLocalConnections
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BACKEND = 'memory'
+SQLITE_BACKEND = 'sqlite'
+REDIS_BACKEND = 'redis'
+BACKENDS = [MEMORY_BACKEND, SQLITE_BACKEND, REDIS_BACKEND]
+
+EVICTED_EXPIRED = 'expired'
+EVICTED_SIZE = 'size'
+EVICTED_FLUSHED = 'flushed'
+
+SQLITE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS cache_entries (
+        cache TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (cache, key)
+    )''',
+    'CREATE INDEX IF NOT EXISTS cache_entries_expires_at ON cache_entries (cache, expires_at)'
+]
+
+
+class CacheProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('cache')
+        # Where caches which can be shared keep their entries: memory (each worker process), sqlite (the worker processes of a pod)
+        # or redis (every pod)
+        self.backend = MEMORY_BACKEND
+        # Backend of particular caches, by name, overriding the above
+        self.backends = {}
+        self.sqlite_path = './ovd_cache.sqlite3'
+        self.sqlite_busy_timeout = 5
+        self.redis_url = 'redis://localhost:6379/0'
+        # Seconds to wait connecting to or for a reply from Redis, after which the cache is treated as a miss
+        self.redis_timeout = 1
+        # Prefix of the keys of the driver in Redis, so one Redis may be shared by several drivers
+        self.redis_key_prefix = 'ovd'
+
+
+class CacheCodec():
+    """
+    Converts the values of a cache to and from JSON compatible values, so they can be kept outside of the worker process
+    """
+
+    def __init__(self, encode, decode):
+        self.encode = encode
+        self.decode = decode
+
+
+# For values which are already JSON compatible (strings, numbers, lists and dicts of them)
+JSON_CODEC = CacheCodec(lambda value: value, lambda value: value)
+
+
+def _key_string(key):
+    return json.dumps(key, default=str, separators=(',', ':'))
+
+
+class TTLCache():
+    """
+    Thread safe, size bounded cache where each entry expires a fixed number of seconds after it was added. Held in the memory
+    of the worker process, so may hold any value. When full, the least recently used entry is evicted
+    """
+    backend = MEMORY_BACKEND
+
+    def __init__(self, ttl, max_size=1000, name=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.name = name
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self.__entries[key]
+                _evicted(self, EVICTED_EXPIRED, 1)
+                return default
+            self.__entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.ttl is None or self.ttl <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                _evicted(self, EVICTED_SIZE, 1)
+
+    def remove(self, key):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            count = len(self.__entries)
+            self.__entries.clear()
+        _evicted(self, EVICTED_FLUSHED, count)
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+class SqliteCache():
+    """
+    Cache kept in a SQLite database file, shared by the worker processes of a pod. When full, the entries closest to
+    expiring are evicted. Errors using the database are logged and the cache treated as empty
+    """
+    backend = SQLITE_BACKEND
+
+    def __init__(self, name, ttl, path, max_size=1000, codec=JSON_CODEC, busy_timeout=5):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.codec = codec
+        self.__connections = ThreadLocalConnections(path, busy_timeout=busy_timeout)
+        self.__connections.execute_script(SQLITE_SCHEMA)
+
+    def get(self, key, default=None):
+        try:
+            connection = self.__connections.get()
+            row = connection.execute('SELECT value, expires_at FROM cache_entries WHERE cache = ? AND key = ?', (self.name, _key_string(key))).fetchone()
+            if row is None:
+                return default
+            value, expires_at = row
+            if time.time() >= expires_at:
+                self.__delete_expired(connection)
+                return default
+            return self.codec.decode(json.loads(value))
+        except (sqlite3.Error, ValueError) as e:
+            _cache_error(self, 'get', e)
+            return default
+
+    def put(self, key, value):
+        if self.ttl is None or self.ttl <= 0:
+            return
+        try:
+            connection = self.__connections.get()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO cache_entries (cache, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                                   (self.name, _key_string(key), json.dumps(self.codec.encode(value)), time.time() + self.ttl))
+            self.__delete_expired(connection)
+            with connection:
+                cursor = connection.execute('''DELETE FROM cache_entries WHERE cache = ? AND key IN
+                                               (SELECT key FROM cache_entries WHERE cache = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)''',
+                                            (self.name, self.name, self.max_size))
+            _evicted(self, EVICTED_SIZE, cursor.rowcount)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            _cache_error(self, 'put', e)
+
+    def remove(self, key):
+        try:
+            connection = self.__connections.get()
+            with connection:
+                connection.execute('DELETE FROM cache_entries WHERE cache = ? AND key = ?', (self.name, _key_string(key)))
+        except sqlite3.Error as e:
+            _cache_error(self, 'remove', e)
+
+    def clear(self):
+        try:
+            connection = self.__connections.get()
+            with connection:
+                cursor = connection.execute('DELETE FROM cache_entries WHERE cache = ?', (self.name,))
+            _evicted(self, EVICTED_FLUSHED, cursor.rowcount)
+        except sqlite3.Error as e:
+            _cache_error(self, 'clear', e)
+
+    def __delete_expired(self, connection):
+        with connection:
+            cursor = connection.execute('DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?', (self.name, time.time()))
+        _evicted(self, EVICTED_EXPIRED, cursor.rowcount)
+
+    def __len__(self):
+        try:
+            return self.__connections.get().execute('SELECT COUNT(*) FROM cache_entries WHERE cache = ? AND expires_at > ?', (self.name, time.time())).fetchone()[0]
+        except sqlite3.Error as e:
+            _cache_error(self, 'len', e)
+            return 0
+
+
+class RedisCache():
+    """
+    Cache kept in Redis (or a server speaking it's protocol), shared by every pod of the driver. Entries are expired by Redis,
+    and the memory used bounded by it's maxmemory policy rather than a number of entries. Errors talking to Redis are logged
+    and the cache treated as empty
+    """
+    backend = REDIS_BACKEND
+
+    def __init__(self, name, ttl, url, codec=JSON_CODEC, timeout=1, key_prefix='ovd'):
+        self.name = name
+        self.ttl = ttl
+        self.codec = codec
+        self.url = url
+        self.timeout = timeout
+        self.key_prefix = '{0}:{1}:'.format(key_prefix, name)
+        # Checked up front so a bad URL is reported when the driver starts
+        RespConnection.from_url(url, timeout=timeout)
+        self.__local = threading.local()
+
+    def get(self, key, default=None):
+        try:
+            value = self.__execute('GET', self.key_prefix + _key_string(key))
+            if value is None:
+                return default
+            return self.codec.decode(json.loads(value.decode('utf-8')))
+        except (RespError, ValueError) as e:
+            _cache_error(self, 'get', e)
+            return default
+
+    def put(self, key, value):
+        if self.ttl is None or self.ttl <= 0:
+            return
+        try:
+            self.__execute('SET', self.key_prefix + _key_string(key), json.dumps(self.codec.encode(value)), 'PX', int(self.ttl * 1000))
+        except (RespError, TypeError, ValueError) as e:
+            _cache_error(self, 'put', e)
+
+    def remove(self, key):
+        try:
+            self.__execute('DEL', self.key_prefix + _key_string(key))
+        except RespError as e:
+            _cache_error(self, 'remove', e)
+
+    def clear(self):
+        try:
+            keys = self.__keys()
+            removed = 0
+            for start in range(0, len(keys), 500):
+                removed += self.__execute('DEL', *keys[start:start + 500])
+            _evicted(self, EVICTED_FLUSHED, removed)
+        except RespError as e:
+            _cache_error(self, 'clear', e)
+
+    def __keys(self):
+        keys = []
+        cursor = b'0'
+        while True:
+            cursor, batch = self.__execute('SCAN', cursor, 'MATCH', self.key_prefix + '*', 'COUNT', 500)
+            keys.extend(batch)
+            if cursor == b'0':
+                return keys
+
+    def __execute(self, *args):
+        # One connection per thread, replaced in forked worker processes
+        local = self.__local
+        connection = getattr(local, 'connection', None)
+        if connection is None or local.pid != os.getpid():
+            connection = RespConnection.from_url(self.url, timeout=self.timeout)
+            local.connection = connection
+            local.pid = os.getpid()
+        return connection.execute(*args)
+
+    def __len__(self):
+        try:
+            return len(self.__keys())
+        except RespError as e:
+            _cache_error(self, 'len', e)
+            return 0
+
+
+def _evicted(cache, reason, count):
+    # Caches used without the registry are unnamed, so not measured
+    if cache.name is not None and count > 0:
+        metrics.CACHE_EVICTIONS.labels(cache=cache.name, backend=cache.backend, reason=reason).inc(count)
+
+
+def _cache_error(cache, operation, error):
+    logger.warning('Failed to {0} {1} cache entry in {2}: {3}'.format(operation, cache.name, cache.backend, str(error)))
+    metrics.CACHE_ERRORS.labels(cache=cache.name, backend=cache.backend).inc()
+
+
+class CacheRegistry():
+    """
+    Creates the caches of the driver with the configured backend, and keeps them by name so they can be listed and flushed
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__caches = {}
+        self.__properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            self.__properties = properties
+
+    def backend_for(self, name):
+        properties = self.__properties
+        if properties is None:
+            return MEMORY_BACKEND
+        return (properties.backends or {}).get(name, properties.backend)
+
+    def create(self, name, ttl, max_size=1000, codec=None):
+        """
+        Creates (and registers) a cache. Only caches given a codec (to convert their values to JSON) may use a backend outside
+        of the worker process, others are always kept in memory
+        """
+        backend = self.backend_for(name) if codec is not None else MEMORY_BACKEND
+        cache = None
+        if backend != MEMORY_BACKEND:
+            try:
+                cache = self.__create_shared(backend, name, ttl, max_size, codec)
+            except (sqlite3.Error, ValueError) as e:
+                logger.error('Keeping {0} cache in memory, could not use {1} backend: {2}'.format(name, backend, str(e)))
+        if cache is None:
+            cache = TTLCache(ttl, max_size=max_size, name=name)
+        with self.__lock:
+            self.__caches[name] = cache
+        return cache
+
+    def __create_shared(self, backend, name, ttl, max_size, codec):
+        properties = self.__properties
+        if backend == SQLITE_BACKEND:
+            return SqliteCache(name, ttl, properties.sqlite_path, max_size=max_size, codec=codec, busy_timeout=properties.sqlite_busy_timeout)
+        elif backend == REDIS_BACKEND:
+            return RedisCache(name, ttl, properties.redis_url, codec=codec, timeout=properties.redis_timeout, key_prefix=properties.redis_key_prefix)
+        raise ValueError('Cache backend must be one of {0}, not \'{1}\''.format(BACKENDS, backend))
+
+    def get(self, name):
+        with self.__lock:
+            return self.__caches.get(name, None)
+
+    def get_caches(self):
+        with self.__lock:
+            return list(self.__caches.values())
+
+    def refresh_metrics(self):
+        for cache in self.get_caches():
+            metrics.CACHE_ENTRIES.labels(cache=cache.name, backend=cache.backend).set(len(cache))
+
+    def flush(self, name=None):
+        """
+        Removes every entry of the named cache (or all caches), returning the names of those flushed
+        """
+        caches = self.get_caches() if name is None else [self.get(name)]
+        if None in caches:
+            raise KeyError(name)
+        for cache in caches:
+            cache.clear()
+        return [cache.name for cache in caches]
+
+
+caches = CacheRegistry()
+metrics.registry.add_refresher(caches.refresh_metrics)
+
+
+class CacheConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        cache_properties = configuration.property_groups.get_property_group(CacheProperties)
+        logger.debug('Keeping shareable caches in {0} ({1} overridden)'.format(cache_properties.backend, cache_properties.backends or {}))
+        caches.configure(cache_properties)
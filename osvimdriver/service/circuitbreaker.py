@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.api.exceptions import ApiException
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+from osvimdriver.openstack.errors import is_server_error
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'CLOSED'
+STATE_OPEN = 'OPEN'
+STATE_HALF_OPEN = 'HALF_OPEN'
+
+# Value of the ovd_openstack_circuit_breaker_state gauge for each state
+STATE_GAUGE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitBreakerProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('circuit_breaker')
+        self.enabled = True
+        # Number of consecutive server or connection errors from a deployment location which open it's breaker
+        self.failure_threshold = 5
+        # Seconds an open breaker fails requests before letting one through to probe for recovery
+        self.reset_timeout = 30
+
+
+class CircuitOpenError(TemporaryResourceDriverError):
+    pass
+
+
+class CircuitBreaker():
+    """
+    Tracks the health of a deployment location from the outcome of requests made to it.
+
+    - CLOSED: requests are made as normal. Consecutive server/connection errors are counted and the breaker opens when failure_threshold is reached
+    - OPEN: requests fail immediately with CircuitOpenError until reset_timeout has passed
+    - HALF_OPEN: a single request is let through (requests it makes, such as authenticating, are included) as a probe. The breaker
+    closes if it succeeds and opens again if it fails
+    """
+
+    def __init__(self, location_name, failure_threshold=5, reset_timeout=30):
+        self.location_name = location_name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.__lock = threading.Lock()
+        self.__state = STATE_CLOSED
+        self.__consecutive_failures = 0
+        self.__opened_at = None
+        self.__last_error = None
+        self.__probe_thread = None
+        self.__state_gauge = metrics.OPENSTACK_CIRCUIT_BREAKER_STATE.labels(location=location_name)
+        self.__rejected_counter = metrics.OPENSTACK_CIRCUIT_BREAKER_REJECTED.labels(location=location_name)
+        self.__state_gauge.set(STATE_GAUGE_VALUES[STATE_CLOSED])
+
+    @property
+    def state(self):
+        return self.__state
+
+    def before_call(self):
+        with self.__lock:
+            if self.__state == STATE_CLOSED:
+                return
+            current_thread = threading.get_ident()
+            if self.__state == STATE_OPEN:
+                if time.monotonic() - self.__opened_at >= self.reset_timeout:
+                    logger.info('Circuit breaker for deployment location \'{0}\' is half open, probing for recovery'.format(self.location_name))
+                    self.__set_state(STATE_HALF_OPEN)
+                    self.__probe_thread = current_thread
+                    return
+            elif self.__probe_thread is None or self.__probe_thread == current_thread:
+                self.__probe_thread = current_thread
+                return
+            self.__rejected_counter.inc()
+            raise CircuitOpenError('Deployment location \'{0}\' is unavailable, circuit breaker is {1} after {2} consecutive failures (last error: {3})'.format(
+                self.location_name, self.__state, self.__consecutive_failures, self.__last_error))
+
+    def record_success(self):
+        with self.__lock:
+            if self.__state != STATE_CLOSED:
+                logger.info('Circuit breaker for deployment location \'{0}\' closed'.format(self.location_name))
+            self.__set_state(STATE_CLOSED)
+            self.__consecutive_failures = 0
+            self.__probe_thread = None
+
+    def record_error(self, error):
+        if isinstance(error, ApiException):
+            # Raised by this driver (e.g. rate limit not available) rather than Openstack, so tells us nothing
+            self.__release_probe()
+            return
+        if not is_server_error(error):
+            # Openstack responded (e.g. not found), so is reachable
+            self.record_success()
+            return
+        with self.__lock:
+            self.__consecutive_failures += 1
+            self.__last_error = '{0}: {1}'.format(type(error).__name__, str(error))
+            self.__probe_thread = None
+            if self.__state == STATE_HALF_OPEN or (self.__state == STATE_CLOSED and self.__consecutive_failures >= self.failure_threshold):
+                logger.warning('Circuit breaker for deployment location \'{0}\' opened after {1} consecutive failures, last error: {2}'.format(
+                    self.location_name, self.__consecutive_failures, self.__last_error))
+                self.__set_state(STATE_OPEN)
+                self.__opened_at = time.monotonic()
+
+    def __release_probe(self):
+        with self.__lock:
+            if self.__probe_thread == threading.get_ident():
+                self.__probe_thread = None
+
+    def __set_state(self, state):
+        self.__state = state
+        self.__state_gauge.set(STATE_GAUGE_VALUES[state])
+
+    def to_dict(self):
+        with self.__lock:
+            retry_in = None
+            if self.__state == STATE_OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.__opened_at))
+            return {
+                'deploymentLocation': self.location_name,
+                'state': self.__state,
+                'consecutiveFailures': self.__consecutive_failures,
+                'lastError': self.__last_error,
+                'retryInSeconds': retry_in
+            }
+
+
+class CircuitBreakerRegistry():
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__breakers = {}
+        self.properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            self.properties = properties
+            self.__breakers = {}
+
+    def get_breaker(self, location_name):
+        properties = self.properties
+        if location_name is None or properties is None or properties.enabled is not True:
+            return None
+        with self.__lock:
+            breaker = self.__breakers.get(location_name, None)
+            if breaker is None:
+                breaker = CircuitBreaker(location_name, failure_threshold=properties.failure_threshold, reset_timeout=properties.reset_timeout)
+                self.__breakers[location_name] = breaker
+            return breaker
+
+    def get_breakers(self):
+        with self.__lock:
+            return sorted(self.__breakers.values(), key=lambda breaker: breaker.location_name)
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+class CircuitBreakerConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        breaker_properties = configuration.property_groups.get_property_group(CircuitBreakerProperties)
+        if breaker_properties.enabled is True:
+            logger.debug('Circuit breakers open after {0} consecutive failures for {1} seconds'.format(breaker_properties.failure_threshold, breaker_properties.reset_timeout))
+        else:
+            logger.debug('Disabled: circuit breakers')
+        circuit_breakers.configure(breaker_properties)
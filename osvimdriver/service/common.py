@@ -1,40 +1,53 @@
-from venv import logger
+import functools
+import logging
 from ignition.service.logging import logging_context
 
+logger = logging.getLogger(__name__)
+
 
 def _generate_additional_logs(message_data, message_direction, external_request_id, content_type,
                                   message_type, protocol, protocol_metadata, driver_request_id):
-        try:   
-            logging_context_dict = {'message_direction' : message_direction, 'tracectx.externalrequestid' : external_request_id, 'content_type' : content_type,
-                                    'message_type' : message_type, 'protocol' : protocol, 'protocol_metadata' : str(protocol_metadata).replace("'", '\"'),'tracectx.driverrequestid' : driver_request_id }
-            if driver_request_id is None:
-                logging_context_dict.pop('tracectx.driverrequestid')
-            if message_direction is None:
-                logging_context_dict.pop('message_direction')
-            if external_request_id is None:
-                logging_context_dict.pop('tracectx.externalrequestid')
-            if content_type is None:
-                logging_context_dict.pop('content_type') 
-            if message_type is None:
-                logging_context_dict.pop('message_type')
-            if protocol is None:
-                logging_context_dict.pop('protocol')                  
-            if protocol_metadata is None:
-                logging_context_dict.pop('protocol_metadata')  
-            logging_context.set_from_dict(logging_context_dict)
+        logging_context_dict = {'message_direction' : message_direction, 'tracectx.externalrequestid' : external_request_id, 'content_type' : content_type,
+                                'message_type' : message_type, 'protocol' : protocol, 'protocol_metadata' : str(protocol_metadata).replace("'", '\"'),'tracectx.driverrequestid' : driver_request_id }
+        if driver_request_id is None:
+            logging_context_dict.pop('tracectx.driverrequestid')
+        if message_direction is None:
+            logging_context_dict.pop('message_direction')
+        if external_request_id is None:
+            logging_context_dict.pop('tracectx.externalrequestid')
+        if content_type is None:
+            logging_context_dict.pop('content_type')
+        if message_type is None:
+            logging_context_dict.pop('message_type')
+        if protocol is None:
+            logging_context_dict.pop('protocol')
+        if protocol_metadata is None:
+            logging_context_dict.pop('protocol_metadata')
+        # The logging context is per thread, but may already hold values for these keys set by the request being handled
+        # (e.g. the driver request id), so put those back afterwards rather than removing them
+        previous_values = {key: logging_context.data[key] for key in logging_context_dict if key in logging_context.data}
+        logging_context.set_from_dict(logging_context_dict)
+        try:
             logger.info(str(message_data).replace("'",'\"'))
         finally:
-            if('message_direction' in logging_context.data):
-                logging_context.data.pop("message_direction")
-            if('tracectx.externalrequestid' in logging_context.data):
-                logging_context.data.pop("tracectx.externalrequestid")
-            if('content_type' in logging_context.data):
-                logging_context.data.pop("content_type")
-            if('message_type' in logging_context.data):
-                logging_context.data.pop("message_type")
-            if('protocol' in logging_context.data):
-                logging_context.data.pop("protocol")
-            if('protocol_metadata' in logging_context.data):
-                logging_context.data.pop("protocol_metadata")
-            if('tracectx.driverrequestid' in logging_context.data):
-                logging_context.data.pop("tracectx.driverrequestid")
\ No newline at end of file
+            for key in logging_context_dict:
+                logging_context.data.pop(key, None)
+            logging_context.set_from_dict(previous_values)
+
+def with_logging_context(func):
+    """
+    Wraps func so it runs with a copy of the calling thread's logging context, for work handed off to another thread
+    (e.g. an executor), which would otherwise log without the tracing context of the request
+    """
+    context_data = dict(logging_context.get_all())
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous_data = dict(logging_context.get_all())
+        logging_context.clear()
+        logging_context.set_from_dict(context_data)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            logging_context.clear()
+            logging_context.set_from_dict(previous_data)
+    return wrapper
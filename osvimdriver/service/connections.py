@@ -0,0 +1,116 @@
+import logging
+import threading
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.openstack.tls import build_http_session
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPoolProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('connection_pool')
+        self.enabled = True
+        # Number of hosts of a deployment location (Keystone, Heat, Neutron etc.) with connections kept open
+        self.pool_connections = 10
+        # Connections kept open to each host, in each worker process. Should be at least the bulkhead max_concurrent_calls of the location
+        self.pool_maxsize = 10
+        # Overrides for a particular deployment location, e.g. {'busy-cloud': {'pool_maxsize': 20}}
+        self.locations = {}
+
+
+class ConnectionPools():
+    """
+    Holds the HTTP connection pool (a requests Session) of each deployment location, shared by every keystoneauth1 session created for it,
+    so connections opened while handling one request are reused by the next
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__sessions = {}
+        self.__measured_locations = set()
+        self.properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            sessions = self.__sessions
+            self.properties = properties
+            self.__sessions = {}
+        for http_session, _ in sessions.values():
+            http_session.close()
+
+    def usage(self):
+        """
+        Returns the size of the pool of each location (connections which may be kept open to it's hosts) and the number of those connections in use
+        """
+        with self.__lock:
+            sessions = {location_name: entry[0] for location_name, entry in self.__sessions.items()}
+        usage = {}
+        for location_name, http_session in sessions.items():
+            size = 0
+            in_use = 0
+            for adapter in http_session.adapters.values():
+                host_pools = adapter.poolmanager.pools
+                for key in host_pools.keys():
+                    host_pool = host_pools.get(key)
+                    # Connections waiting to be reused (or placeholders for those not yet opened) are held in a queue, those in use are not
+                    queue = host_pool.pool if host_pool is not None else None
+                    if queue is None:
+                        continue
+                    size += queue.maxsize
+                    in_use += max(0, queue.maxsize - queue.qsize())
+            usage[location_name] = (size, in_use)
+        return usage
+
+    def refresh_metrics(self):
+        usage = self.usage()
+        # Locations no longer pooled (e.g. after the pools were configured again) are reported empty
+        for location_name in self.__measured_locations - set(usage.keys()):
+            usage[location_name] = (0, 0)
+        for location_name, (size, in_use) in usage.items():
+            metrics.OPENSTACK_CONNECTION_POOL_SIZE.labels(location=location_name).set(size)
+            metrics.OPENSTACK_CONNECTION_POOL_IN_USE.labels(location=location_name).set(in_use)
+        self.__measured_locations = set(usage.keys())
+
+    def pool_settings(self, location_name):
+        properties = self.properties
+        settings = {'pool_connections': properties.pool_connections, 'pool_maxsize': properties.pool_maxsize}
+        settings.update((properties.locations or {}).get(location_name, None) or {})
+        return settings
+
+    def get(self, location_name, ssl_context=None):
+        """
+        Returns the requests Session of the location, or None if pools are not shared
+        """
+        properties = self.properties
+        if properties is None or properties.enabled is not True:
+            return None
+        with self.__lock:
+            entry = self.__sessions.get(location_name, None)
+            if entry is not None and entry[1] is ssl_context:
+                return entry[0]
+            # New location, or it's certificates have changed
+            http_session = build_http_session(ssl_context=ssl_context, **self.pool_settings(location_name))
+            self.__sessions[location_name] = (http_session, ssl_context)
+        if entry is not None:
+            entry[0].close()
+        return http_session
+
+
+connection_pools = ConnectionPools()
+metrics.registry.add_refresher(connection_pools.refresh_metrics)
+
+
+class ConnectionPoolConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        pool_properties = configuration.property_groups.get_property_group(ConnectionPoolProperties)
+        if pool_properties.enabled is True:
+            logger.debug('Keeping up to {0} connections open to each Openstack host'.format(pool_properties.pool_maxsize))
+        else:
+            logger.debug('Disabled: sharing connections to Openstack between requests')
+        connection_pools.configure(pool_properties)
@@ -0,0 +1,234 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.openstack.errors import is_connection_error, is_server_error, SERVER_ERROR_STATUS_CODES
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests which may be sent again to another endpoint after a connection failure, without risk of doing the work twice
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class EndpointSelectionProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('endpoint_selection')
+        self.enabled = True
+        # Weight of the latest duration in the moving average latency of each endpoint
+        self.ewma_alpha = 0.3
+        # Consecutive server errors before an endpoint is avoided. Connection failures have it avoided straight away
+        self.failure_threshold = 3
+        # Seconds an unhealthy endpoint is avoided before requests are sent to it again
+        self.recovery_time = 30
+        # Fraction of requests sent to an endpoint other than the fastest, so the latency of the others is kept up to date
+        self.explore_ratio = 0.05
+
+
+def host_of(url):
+    # Deployment locations often give an address without a scheme (e.g. 10.10.8.8:5000)
+    return urlsplit(url if '://' in url else '//' + url).hostname
+
+def hosts_of(api_urls):
+    hosts = []
+    for api_url in api_urls:
+        host = host_of(api_url)
+        if host is not None and host not in hosts:
+            hosts.append(host)
+    return hosts
+
+
+class EndpointStats():
+
+    def __init__(self, host):
+        self.host = host
+        self.latency = None
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.last_selected = 0.0
+
+    def is_healthy(self, now):
+        return now >= self.unhealthy_until
+
+
+class EndpointSelector():
+    """
+    Chooses which of the API endpoints (hosts) of a deployment location each request is sent to: the healthy endpoint with the
+    lowest moving average latency. Endpoints failing requests are avoided for a recovery time, then tried again
+    """
+
+    def __init__(self, location_name, api_urls, ewma_alpha=0.3, failure_threshold=3, recovery_time=30, explore_ratio=0.05, random_func=random.random):
+        self.location_name = location_name
+        self.hosts = hosts_of(api_urls)
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.explore_ratio = explore_ratio
+        self.random_func = random_func
+        self.__lock = threading.Lock()
+        self.__stats = {host: EndpointStats(host) for host in self.hosts}
+        for host in self.hosts:
+            metrics.OPENSTACK_ENDPOINT_HEALTHY.labels(location=location_name, endpoint=host).set(1)
+
+    def manages(self, url):
+        return host_of(url) in self.__stats
+
+    def stats(self, host):
+        return self.__stats[host]
+
+    def select(self, exclude=()):
+        """
+        Returns the host to send the next request to, or None if all hosts are excluded. When all hosts are unhealthy,
+        the one due to recover soonest is returned
+        """
+        now = time.monotonic()
+        with self.__lock:
+            candidates = [self.__stats[host] for host in self.hosts if host not in exclude]
+            if len(candidates) == 0:
+                return None
+            healthy = [stats for stats in candidates if stats.is_healthy(now)]
+            if len(healthy) == 0:
+                chosen = min(candidates, key=lambda stats: stats.unhealthy_until)
+            else:
+                unmeasured = [stats for stats in healthy if stats.latency is None]
+                if len(unmeasured) > 0:
+                    chosen = unmeasured[0]
+                else:
+                    chosen = min(healthy, key=lambda stats: stats.latency)
+                    if len(healthy) > 1 and self.random_func() < self.explore_ratio:
+                        chosen = min([stats for stats in healthy if stats is not chosen], key=lambda stats: stats.last_selected)
+            chosen.last_selected = now
+            return chosen.host
+
+    def rewrite(self, url, host):
+        # Keeps the scheme, port and path, as the endpoints of the catalog are on the same ports of each host
+        parts = urlsplit(url)
+        netloc = '[{0}]'.format(host) if ':' in host else host
+        if parts.port is not None:
+            netloc = '{0}:{1}'.format(netloc, parts.port)
+        return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+    def record_success(self, host, duration):
+        with self.__lock:
+            stats = self.__stats[host]
+            if stats.latency is None:
+                stats.latency = duration
+            else:
+                stats.latency = self.ewma_alpha * duration + (1 - self.ewma_alpha) * stats.latency
+            stats.consecutive_failures = 0
+            stats.unhealthy_until = 0.0
+            latency = stats.latency
+        metrics.OPENSTACK_ENDPOINT_LATENCY.labels(location=self.location_name, endpoint=host).set(latency)
+        metrics.OPENSTACK_ENDPOINT_HEALTHY.labels(location=self.location_name, endpoint=host).set(1)
+
+    def record_failure(self, host, connection_failed=False):
+        with self.__lock:
+            stats = self.__stats[host]
+            stats.consecutive_failures += 1
+            if not connection_failed and stats.consecutive_failures < self.failure_threshold:
+                return
+            stats.unhealthy_until = time.monotonic() + self.recovery_time
+        logger.warning('Avoiding endpoint {0} of deployment location \'{1}\' for {2} seconds'.format(host, self.location_name, self.recovery_time))
+        metrics.OPENSTACK_ENDPOINT_HEALTHY.labels(location=self.location_name, endpoint=host).set(0)
+
+    def record_response(self, host, status_code, duration):
+        if status_code in SERVER_ERROR_STATUS_CODES:
+            self.record_failure(host)
+        else:
+            self.record_success(host, duration)
+
+    def record_error(self, host, error, duration):
+        if is_connection_error(error):
+            self.record_failure(host, connection_failed=True)
+        elif is_server_error(error):
+            self.record_failure(host)
+        else:
+            # Request was rejected (e.g. 404) so the endpoint is answering
+            self.record_success(host, duration)
+
+
+class EndpointSelection():
+    """
+    Holds the selector of each deployment location with more than one API endpoint, so latency and health are remembered
+    between the requests using the location
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__selectors = {}
+        self.properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            self.properties = properties
+            self.__selectors = {}
+
+    def selector_for(self, location_name, api_urls):
+        properties = self.properties
+        if properties is None or properties.enabled is not True or api_urls is None:
+            return None
+        hosts = hosts_of(api_urls)
+        if len(hosts) < 2:
+            return None
+        with self.__lock:
+            selector = self.__selectors.get(location_name, None)
+            if selector is None or selector.hosts != hosts:
+                # New location, or it's endpoints have changed
+                selector = EndpointSelector(location_name, api_urls, ewma_alpha=properties.ewma_alpha, failure_threshold=properties.failure_threshold,
+                                            recovery_time=properties.recovery_time, explore_ratio=properties.explore_ratio)
+                self.__selectors[location_name] = selector
+            return selector
+
+
+endpoint_selection = EndpointSelection()
+
+
+def may_fail_over(error, method):
+    # A connection failure may still have left the request being handled, so only requests safe to repeat are sent again
+    return is_connection_error(error) and method.upper() in IDEMPOTENT_METHODS
+
+
+def apply_endpoint_selection(session, selector):
+    # Requests to any of the endpoints of the location (including those found in the service catalog) are sent to the selected
+    # endpoint instead. On a connection failure the request is sent to the next best endpoint, if it's safe to send again
+    request = session.request
+    def request_with_endpoint_selection(url, method, **kwargs):
+        if not selector.manages(url):
+            return request(url, method, **kwargs)
+        tried = []
+        host = selector.select()
+        while True:
+            start = time.perf_counter()
+            try:
+                response = request(selector.rewrite(url, host), method, **kwargs)
+            except Exception as e:
+                selector.record_error(host, e, time.perf_counter() - start)
+                tried.append(host)
+                next_host = selector.select(exclude=tried) if may_fail_over(e, method) else None
+                if next_host is None:
+                    raise
+                logger.warning('Request to endpoint {0} of deployment location \'{1}\' failed ({2}), trying {3}'.format(host, selector.location_name, e, next_host))
+                metrics.OPENSTACK_ENDPOINT_FAILOVERS.labels(location=selector.location_name, endpoint=host).inc()
+                host = next_host
+                continue
+            selector.record_response(host, getattr(response, 'status_code', None), time.perf_counter() - start)
+            return response
+    session.request = request_with_endpoint_selection
+    return session
+
+
+class EndpointSelectionConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        endpoint_properties = configuration.property_groups.get_property_group(EndpointSelectionProperties)
+        if endpoint_properties.enabled is True:
+            logger.debug('Sending requests to the fastest healthy API endpoint of deployment locations with several')
+        else:
+            logger.debug('Disabled: selection between the API endpoints of deployment locations')
+        endpoint_selection.configure(endpoint_properties)
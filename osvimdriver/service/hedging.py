@@ -0,0 +1,191 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.service.common import with_logging_context
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HedgingProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('hedging')
+        self.enabled = False
+        # Idempotent operations which may be hedged
+        self.operations = ['get_stack', 'show_network', 'show_subnet', 'list_networks']
+        # A hedge is sent when the first request has taken longer than this percentile of the recent durations of the operation
+        self.percentile = 95
+        # Lower bound on the delay before hedging, in seconds
+        self.min_delay = 0.05
+        # Number of recent durations kept for each operation (of each service and location), and the number needed before hedging starts
+        self.window = 100
+        self.min_samples = 20
+        # Hedges are limited to this fraction of requests, so a slow cloud isn't sent many extra requests
+        self.budget_ratio = 0.1
+        # Threads (in each worker process) making hedged requests
+        self.max_workers = 32
+
+
+class LatencyTracker():
+    """
+    Holds the recent durations of successful requests, for each key, to calculate percentiles from
+    """
+
+    def __init__(self, window=100):
+        self.window = window
+        self.__lock = threading.Lock()
+        self.__durations = {}
+
+    def record(self, key, duration):
+        with self.__lock:
+            durations = self.__durations.get(key, None)
+            if durations is None:
+                durations = deque(maxlen=self.window)
+                self.__durations[key] = durations
+            durations.append(duration)
+
+    def percentile(self, key, percentile, min_samples=1):
+        with self.__lock:
+            durations = self.__durations.get(key, None)
+            if durations is None or len(durations) < max(1, min_samples):
+                return None
+            ordered = sorted(durations)
+        index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * percentile / 100) - 1))
+        return ordered[index]
+
+
+class HedgeBudget():
+    """
+    Each request earns a fraction (ratio) of a hedge, up to max_tokens, so hedges can only be a fraction of all requests
+    """
+
+    def __init__(self, ratio, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.__lock = threading.Lock()
+        self.__tokens = 0.0
+
+    def earn(self):
+        with self.__lock:
+            self.__tokens = min(float(self.max_tokens), self.__tokens + self.ratio)
+
+    def spend(self):
+        with self.__lock:
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+
+class HedgingPolicy():
+    """
+    Sends a second (hedge) request when the first has not answered within a percentile of the recent durations of the operation,
+    returning the result of whichever succeeds first. The other request is left to finish in the background and it's result discarded
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.properties = None
+        self.__tracker = None
+        self.__budget = None
+        self.__executor = None
+
+    def configure(self, properties):
+        with self.__lock:
+            executor = self.__executor
+            if properties is None or properties.enabled is not True:
+                self.properties = None
+                self.__tracker = None
+                self.__budget = None
+                self.__executor = None
+            else:
+                self.properties = properties
+                self.__tracker = LatencyTracker(window=properties.window)
+                self.__budget = HedgeBudget(properties.budget_ratio)
+                self.__executor = ThreadPoolExecutor(max_workers=properties.max_workers, thread_name_prefix='ovd-hedge')
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def applies_to(self, operation):
+        properties = self.properties
+        return properties is not None and operation in (properties.operations or [])
+
+    def hedge_delay(self, key):
+        properties = self.properties
+        tracker = self.__tracker
+        if properties is None or tracker is None:
+            return None
+        duration = tracker.percentile(key, properties.percentile, min_samples=properties.min_samples)
+        if duration is None:
+            return None
+        return max(properties.min_delay, duration)
+
+    def call(self, service_name, operation, location_name, func):
+        key = (service_name, operation, location_name)
+        tracker = self.__tracker
+        budget = self.__budget
+        executor = self.__executor
+        if tracker is None or budget is None or executor is None:
+            return func()
+        budget.earn()
+        delay = self.hedge_delay(key)
+        if delay is None:
+            # Not enough is known about the operation yet
+            return self.__timed(tracker, key, func)
+        primary = self.__submit(executor, tracker, key, func)
+        done, _ = wait([primary], timeout=delay)
+        if len(done) > 0:
+            return primary.result()
+        labels = {'service': service_name, 'operation': operation, 'location': location_name}
+        if not budget.spend():
+            metrics.OPENSTACK_HEDGE_BUDGET_EXHAUSTED.labels(**labels).inc()
+            return primary.result()
+        logger.debug('Hedging {0}.{1} on location \'{2}\' after {3:.3f} seconds'.format(service_name, operation, location_name, delay))
+        metrics.OPENSTACK_HEDGED_REQUESTS.labels(**labels).inc()
+        hedge = self.__submit(executor, tracker, key, func)
+        pending = [primary, hedge]
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in [f for f in pending if f in done]:
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.OPENSTACK_HEDGE_WINS.labels(**labels).inc()
+                    return future.result()
+        # Both failed
+        return primary.result()
+
+    def __submit(self, executor, tracker, key, func):
+        # Each request runs in a copy of the caller's context, so it has the same deadline and profiling of the request being handled
+        context = contextvars.copy_context()
+        return executor.submit(context.run, with_logging_context(self.__timed), tracker, key, func)
+
+    def __timed(self, tracker, key, func):
+        start = time.perf_counter()
+        result = func()
+        tracker.record(key, time.perf_counter() - start)
+        return result
+
+
+hedging_policy = HedgingPolicy()
+
+
+class HedgingConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        hedging_properties = configuration.property_groups.get_property_group(HedgingProperties)
+        if hedging_properties.enabled is True:
+            logger.debug('Hedging {0} at the p{1} duration, up to {2} of requests'.format(hedging_properties.operations, hedging_properties.percentile,
+                                                                                          hedging_properties.budget_ratio))
+        else:
+            logger.debug('Disabled: hedging of Openstack requests')
+        hedging_policy.configure(hedging_properties)
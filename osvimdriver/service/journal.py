@@ -0,0 +1,237 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.model.associated_topology import AssociatedTopology
+from ignition.model.lifecycle import LifecycleExecution, STATUS_COMPLETE, STATUS_FAILED
+from ignition.model.failure import FailureDetails
+from osvimdriver.service.sqlite import ThreadLocalConnections
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = [STATUS_COMPLETE, STATUS_FAILED]
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS lifecycle_requests (
+        location TEXT NOT NULL,
+        request_id TEXT NOT NULL,
+        request_type TEXT,
+        stack_id TEXT,
+        submitted_at REAL,
+        accepted_at REAL,
+        last_status TEXT,
+        last_observed_at REAL,
+        completed_at REAL,
+        outcome TEXT,
+        failure_code TEXT,
+        failure_description TEXT,
+        outputs TEXT,
+        associated_topology TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (location, request_id)
+    )''',
+    'CREATE INDEX IF NOT EXISTS lifecycle_requests_updated_at ON lifecycle_requests (updated_at)'
+]
+
+
+class JournalProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('journal')
+        self.enabled = False
+        # SQLite database file, shared by the worker processes of the driver
+        self.path = './ovd_journal.sqlite3'
+        # Seconds a request is kept after it was last recorded
+        self.max_age = 604800
+        # Seconds between removals of requests older than max_age
+        self.purge_interval = 3600
+        # Seconds to wait for another worker process writing to the journal before giving up
+        self.busy_timeout = 5
+
+
+class RequestJournal():
+    """
+    Local record of each lifecycle request handled by the driver: it's type, stack, when it was submitted and accepted, the last status
+    observed and, once finished, it's outcome. Finished requests are answered from the journal without reading the stack from Heat again.
+
+    The journal only ever speeds up or adds to the handling of a request, so errors reading or writing it are logged and otherwise ignored
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__connections = None
+        self.max_age = 0
+        self.purge_interval = 0
+        self.__last_purge = 0
+
+    def configure(self, properties):
+        with self.__lock:
+            self.__connections = None
+            if properties is None or properties.enabled is not True:
+                return
+            self.max_age = properties.max_age
+            self.purge_interval = properties.purge_interval
+            connections = ThreadLocalConnections(properties.path, busy_timeout=properties.busy_timeout)
+            try:
+                connections.execute_script(SCHEMA)
+            except sqlite3.Error as e:
+                logger.error('Disabled: lifecycle request journal, could not open {0}: {1}'.format(properties.path, str(e)))
+                return
+            self.__connections = connections
+            self.__last_purge = 0
+
+    @property
+    def enabled(self):
+        return self.__connections is not None
+
+    def record_accepted(self, location, request_id, request_type, stack_id, submitted_at, accepted_at):
+        """
+        Records a request accepted by execute_lifecycle, submitted and accepted at the given times (seconds since the epoch)
+        """
+        if not self.enabled:
+            return
+        try:
+            with self.__connection() as connection:
+                connection.execute('''INSERT INTO lifecycle_requests (location, request_id, request_type, stack_id, submitted_at, accepted_at, updated_at)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?)
+                                      ON CONFLICT (location, request_id) DO UPDATE SET submitted_at = excluded.submitted_at, accepted_at = excluded.accepted_at, updated_at = excluded.updated_at''',
+                                   (self.__location(location), request_id, request_type, stack_id, submitted_at, accepted_at, time.time()))
+        except sqlite3.Error as e:
+            self.__error('record_accepted', request_id, e)
+            return
+        metrics.LIFECYCLE_TIME_TO_ACCEPT.labels(request_type=request_type).observe(accepted_at - submitted_at)
+        self.__purge_if_due()
+
+    def record_execution(self, location, request_id, request_type, stack_id, execution):
+        """
+        Records the status of a request observed by get_lifecycle_execution, and it's outcome if it has finished
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        location = self.__location(location)
+        submitted_at = None
+        first_completion = False
+        try:
+            with self.__connection() as connection:
+                connection.execute('''INSERT INTO lifecycle_requests (location, request_id, request_type, stack_id, last_status, last_observed_at, updated_at)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?)
+                                      ON CONFLICT (location, request_id) DO UPDATE SET last_status = excluded.last_status, last_observed_at = excluded.last_observed_at, updated_at = excluded.updated_at''',
+                                   (location, request_id, request_type, stack_id, execution.status, now, now))
+                if execution.status in TERMINAL_STATUSES:
+                    # Only the first observation of the outcome is kept, so the time to complete is measured once (by whichever worker process saw it)
+                    cursor = connection.execute('''UPDATE lifecycle_requests SET completed_at = ?, outcome = ?, failure_code = ?, failure_description = ?, outputs = ?, associated_topology = ?
+                                                   WHERE location = ? AND request_id = ? AND completed_at IS NULL''',
+                                                (now, execution.status, *self.__failure_details(execution), self.__dumps(execution.outputs),
+                                                 self.__dumps(execution.associated_topology.to_dict() if execution.associated_topology is not None else None),
+                                                 location, request_id))
+                    first_completion = cursor.rowcount == 1
+                    if first_completion:
+                        row = connection.execute('SELECT submitted_at FROM lifecycle_requests WHERE location = ? AND request_id = ?', (location, request_id)).fetchone()
+                        submitted_at = row[0] if row is not None else None
+        except sqlite3.Error as e:
+            self.__error('record_execution', request_id, e)
+            return
+        if first_completion and submitted_at is not None:
+            metrics.LIFECYCLE_TIME_TO_COMPLETE.labels(request_type=request_type, status=execution.status).observe(now - submitted_at)
+
+    def get_finished(self, location, request_id):
+        """
+        Returns the LifecycleExecution of the request if it has finished, otherwise None
+        """
+        if not self.enabled:
+            return None
+        try:
+            row = self.__connection().execute('''SELECT outcome, failure_code, failure_description, outputs, associated_topology FROM lifecycle_requests
+                                                 WHERE location = ? AND request_id = ? AND completed_at IS NOT NULL''', (self.__location(location), request_id)).fetchone()
+        except sqlite3.Error as e:
+            self.__error('get_finished', request_id, e)
+            return None
+        metrics.JOURNAL_REQUESTS.labels(result='hit' if row is not None else 'miss').inc()
+        if row is None:
+            return None
+        outcome, failure_code, failure_description, outputs, associated_topology = row
+        failure_details = FailureDetails(failure_code, failure_description) if failure_code is not None else None
+        associated_topology = AssociatedTopology.from_dict(json.loads(associated_topology)) if associated_topology is not None else None
+        return LifecycleExecution(request_id, outcome, failure_details=failure_details, outputs=json.loads(outputs) if outputs is not None else None,
+                                  associated_topology=associated_topology)
+
+    def get(self, location, request_id):
+        """
+        Returns everything recorded for the request as a dictionary, or None if it is not in the journal
+        """
+        if not self.enabled:
+            return None
+        try:
+            cursor = self.__connection().execute('SELECT * FROM lifecycle_requests WHERE location = ? AND request_id = ?', (self.__location(location), request_id))
+            row = cursor.fetchone()
+        except sqlite3.Error as e:
+            self.__error('get', request_id, e)
+            return None
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def purge(self):
+        if not self.enabled:
+            return 0
+        try:
+            with self.__connection() as connection:
+                cursor = connection.execute('DELETE FROM lifecycle_requests WHERE updated_at < ?', (time.time() - self.max_age,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            self.__error('purge', None, e)
+            return 0
+
+    def __purge_if_due(self):
+        now = time.monotonic()
+        with self.__lock:
+            if self.__last_purge != 0 and now - self.__last_purge < self.purge_interval:
+                return
+            self.__last_purge = now
+        removed = self.purge()
+        if removed > 0:
+            logger.debug('Removed {0} requests from the lifecycle request journal'.format(removed))
+
+    def __connection(self):
+        connections = self.__connections
+        if connections is None:
+            # Disabled since the caller checked
+            raise sqlite3.ProgrammingError('Lifecycle request journal is disabled')
+        return connections.get()
+
+    def __location(self, location):
+        # NULLs are never equal in SQLite, so would break the primary key
+        return location if location is not None else ''
+
+    def __failure_details(self, execution):
+        if execution.failure_details is None:
+            return None, None
+        return execution.failure_details.failure_code, execution.failure_details.description
+
+    def __dumps(self, value):
+        return json.dumps(value, default=str) if value is not None else None
+
+    def __error(self, operation, request_id, error):
+        logger.warning('Lifecycle request journal failed to {0} (request {1}): {2}'.format(operation, request_id, str(error)))
+        metrics.JOURNAL_ERRORS.labels(operation=operation).inc()
+
+
+request_journal = RequestJournal()
+
+
+class JournalConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        journal_properties = configuration.property_groups.get_property_group(JournalProperties)
+        request_journal.configure(journal_properties)
+        if request_journal.enabled:
+            logger.debug('Recording lifecycle requests in {0}'.format(journal_properties.path))
+        else:
+            logger.debug('Disabled: lifecycle request journal')
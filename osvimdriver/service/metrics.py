@@ -0,0 +1,330 @@
+import abc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import prometheus_client
+from prometheus_client import multiprocess
+from prometheus_client.utils import floatToGoString
+from osvimdriver.service.profiling import record_stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Stacks take from seconds to hours to create
+COMPLETION_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0, 7200.0, 14400.0)
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+# When set (before any metric is created), each process writes it's values to files in this directory and a scrape of any
+# process returns the values of all of them. Set by the Docker image, as the driver runs several gunicorn worker processes
+MULTIPROCESS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# The _created series add nothing to the metrics of the driver
+prometheus_client.disable_created_metrics()
+
+
+def multiprocess_dir():
+    return os.environ.get(MULTIPROCESS_DIR_ENV) or None
+
+
+class MetricsRegistry():
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__metrics = {}
+        self.__refreshers = []
+        self.__registry = prometheus_client.CollectorRegistry()
+
+    def register(self, metric):
+        with self.__lock:
+            if metric.name in self.__metrics:
+                raise ValueError('Metric with name \'{0}\' already registered'.format(metric.name))
+            self.__metrics[metric.name] = metric
+            self.__registry.register(metric._metric)
+        return metric
+
+    def get(self, name):
+        return self.__metrics.get(name, None)
+
+    def add_refresher(self, refresher):
+        """
+        Adds a function called before each render, to set gauges read from the state of a service (e.g. the size of a cache)
+        rather than kept up to date as it changes
+        """
+        with self.__lock:
+            self.__refreshers.append(refresher)
+
+    def refresh(self):
+        with self.__lock:
+            refreshers = list(self.__refreshers)
+        for refresher in refreshers:
+            try:
+                refresher()
+            except Exception as e:
+                logger.warning('Failed to refresh metrics with {0}: {1}'.format(getattr(refresher, '__qualname__', refresher), str(e)))
+
+    def render(self):
+        self.refresh()
+        path = multiprocess_dir()
+        if path is None:
+            return prometheus_client.generate_latest(self.__registry).decode('utf-8')
+        # Values of all processes (this one included) are read from the files they write
+        collector_registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry, path=path)
+        return prometheus_client.generate_latest(collector_registry).decode('utf-8')
+
+
+class _Metric(abc.ABC):
+
+    def __init__(self, name, description, label_names=None, registry=None):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names) if label_names is not None else ()
+        self._metric = self._create_metric()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels):
+        if set(labels.keys()) != set(self.label_names):
+            raise ValueError('Metric \'{0}\' expects labels {1} but was given {2}'.format(self.name, list(self.label_names), list(labels.keys())))
+        label_values = {name: _label_value(value) for name, value in labels.items()}
+        child = self._metric.labels(**label_values) if len(self.label_names) > 0 else self._metric
+        return self._new_child(child, label_values)
+
+    def _sample_value(self, sample_name, labels):
+        for metric_family in self._metric.collect():
+            for sample in metric_family.samples:
+                if sample.name == sample_name and sample.labels == labels:
+                    return sample.value
+        return 0.0
+
+    @abc.abstractmethod
+    def _create_metric(self):
+        pass
+
+    @abc.abstractmethod
+    def _new_child(self, child, labels):
+        pass
+
+
+class _CounterValue():
+
+    def __init__(self, counter, child, labels):
+        self.__counter = counter
+        self.__child = child
+        self.__labels = labels
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError('Counters can only be incremented by non-negative amounts')
+        self.__child.inc(amount)
+
+    def get(self):
+        # Value held by this process
+        name = self.__counter.name
+        return self.__counter._sample_value(name if name.endswith('_total') else name + '_total', self.__labels)
+
+
+class Counter(_Metric):
+
+    def _create_metric(self):
+        return prometheus_client.Counter(self.name, self.description, self.label_names, registry=None)
+
+    def _new_child(self, child, labels):
+        return _CounterValue(self, child, labels)
+
+
+class _GaugeValue():
+
+    def __init__(self, gauge, child, labels):
+        self.__gauge = gauge
+        self.__child = child
+        self.__labels = labels
+
+    def set(self, value):
+        self.__child.set(value)
+
+    def inc(self, amount=1):
+        self.__child.inc(amount)
+
+    def dec(self, amount=1):
+        self.__child.dec(amount)
+
+    @contextmanager
+    def track_in_progress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def get(self):
+        # Value held by this process
+        return self.__gauge._sample_value(self.__gauge.name, self.__labels)
+
+
+class Gauge(_Metric):
+
+    def __init__(self, name, description, label_names=None, registry=None, multiprocess_mode='livesum'):
+        # How the values of each process are combined when a scrape reads them from the multiprocess directory
+        self.multiprocess_mode = multiprocess_mode
+        super().__init__(name, description, label_names=label_names, registry=registry)
+
+    def _create_metric(self):
+        return prometheus_client.Gauge(self.name, self.description, self.label_names, registry=None, multiprocess_mode=self.multiprocess_mode)
+
+    def _new_child(self, child, labels):
+        return _GaugeValue(self, child, labels)
+
+
+class _HistogramValue():
+
+    def __init__(self, histogram, child, labels):
+        self.__histogram = histogram
+        self.__child = child
+        self.__labels = labels
+
+    def observe(self, value):
+        self.__child.observe(value)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns the cumulative count of each bucket (excluding +Inf), the count and the sum of the values observed by this process
+        """
+        histogram = self.__histogram
+        cumulative = []
+        for upper_bound in histogram.buckets:
+            bucket_labels = dict(self.__labels)
+            bucket_labels['le'] = floatToGoString(upper_bound)
+            cumulative.append(histogram._sample_value(histogram.name + '_bucket', bucket_labels))
+        count = histogram._sample_value(histogram.name + '_count', self.__labels)
+        total = histogram._sample_value(histogram.name + '_sum', self.__labels)
+        return cumulative, count, total
+
+
+class Histogram(_Metric):
+
+    def __init__(self, name, description, label_names=None, registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, description, label_names=label_names, registry=registry)
+
+    def _create_metric(self):
+        return prometheus_client.Histogram(self.name, self.description, self.label_names, registry=None, buckets=self.buckets)
+
+    def _new_child(self, child, labels):
+        return _HistogramValue(self, child, labels)
+
+
+def _label_value(value):
+    return '' if value is None else str(value)
+
+
+# Rendered by the /metrics endpoint of the Openstack Admin API
+registry = MetricsRegistry()
+
+OPENSTACK_REQUEST_DURATION = Histogram('ovd_openstack_request_duration_seconds', 'Duration of requests made to Openstack APIs',
+                                       ['service', 'operation', 'location'], registry=registry)
+OPENSTACK_REQUEST_ERRORS = Counter('ovd_openstack_request_errors_total', 'Number of requests made to Openstack APIs which raised an error',
+                                   ['service', 'operation', 'location', 'error'], registry=registry)
+OPENSTACK_RATE_LIMIT_QUEUE_DEPTH = Gauge('ovd_openstack_rate_limit_queue_depth', 'Number of requests waiting for the rate limit of an Openstack endpoint',
+                                         ['service', 'location'], registry=registry)
+OPENSTACK_RATE_LIMIT_IN_FLIGHT = Gauge('ovd_openstack_rate_limit_in_flight', 'Number of rate limited requests currently in flight to an Openstack endpoint',
+                                       ['service', 'location'], registry=registry)
+OPENSTACK_RATE_LIMIT_WAIT = Histogram('ovd_openstack_rate_limit_wait_seconds', 'Time requests waited for the rate limit of an Openstack endpoint',
+                                      ['service', 'location'], registry=registry)
+OPENSTACK_RATE_LIMIT_REJECTED = Counter('ovd_openstack_rate_limit_rejected_total', 'Number of requests which gave up waiting for the rate limit of an Openstack endpoint',
+                                        ['service', 'location'], registry=registry)
+OPENSTACK_REQUEST_RETRIES = Counter('ovd_openstack_request_retries_total', 'Number of times a failed request to an Openstack API was retried',
+                                    ['service', 'operation', 'location', 'error'], registry=registry)
+OPENSTACK_CIRCUIT_BREAKER_STATE = Gauge('ovd_openstack_circuit_breaker_state', 'State of the circuit breaker of a deployment location (0 closed, 1 half open, 2 open)',
+                                        ['location'], registry=registry, multiprocess_mode='livemax')
+OPENSTACK_CIRCUIT_BREAKER_REJECTED = Counter('ovd_openstack_circuit_breaker_rejected_total', 'Number of requests failed without being sent as the circuit breaker of a deployment location was open',
+                                             ['location'], registry=registry)
+OPENSTACK_HEDGED_REQUESTS = Counter('ovd_openstack_hedged_requests_total', 'Number of hedge requests sent as the first request to an Openstack API was slow to answer',
+                                    ['service', 'operation', 'location'], registry=registry)
+OPENSTACK_HEDGE_WINS = Counter('ovd_openstack_hedge_wins_total', 'Number of hedge requests which answered before the first request',
+                               ['service', 'operation', 'location'], registry=registry)
+OPENSTACK_HEDGE_BUDGET_EXHAUSTED = Counter('ovd_openstack_hedge_budget_exhausted_total', 'Number of slow requests not hedged as the hedge budget was used up',
+                                           ['service', 'operation', 'location'], registry=registry)
+OPENSTACK_BULKHEAD_IN_FLIGHT = Gauge('ovd_openstack_bulkhead_in_flight', 'Number of calls in flight within the bulkhead of a deployment location',
+                                     ['location'], registry=registry)
+OPENSTACK_BULKHEAD_REJECTED = Counter('ovd_openstack_bulkhead_rejected_total', 'Number of calls rejected as the bulkhead of a deployment location was full',
+                                      ['location'], registry=registry)
+OPENSTACK_CONNECTION_POOL_SIZE = Gauge('ovd_openstack_connection_pool_size', 'Number of connections which may be kept open to the hosts of a deployment location, read when metrics are rendered',
+                                       ['location'], registry=registry)
+OPENSTACK_CONNECTION_POOL_IN_USE = Gauge('ovd_openstack_connection_pool_in_use', 'Number of pooled connections to the hosts of a deployment location in use by a request, read when metrics are rendered',
+                                         ['location'], registry=registry)
+OPENSTACK_TLS_HANDSHAKES = Counter('ovd_openstack_tls_handshakes_total', 'Number of TLS connections to Openstack made with a full or resumed handshake (deployment locations with certificates only)',
+                                   ['handshake'], registry=registry)
+OPENSTACK_ENDPOINT_LATENCY = Gauge('ovd_openstack_endpoint_latency_seconds', 'Moving average duration of requests to an API endpoint of a deployment location',
+                                   ['location', 'endpoint'], registry=registry, multiprocess_mode='livemax')
+OPENSTACK_ENDPOINT_HEALTHY = Gauge('ovd_openstack_endpoint_healthy', '1 while requests are sent to an API endpoint of a deployment location, 0 while it is avoided as unhealthy',
+                                   ['location', 'endpoint'], registry=registry, multiprocess_mode='livemin')
+OPENSTACK_ENDPOINT_FAILOVERS = Counter('ovd_openstack_endpoint_failovers_total', 'Number of requests sent to another API endpoint after a connection failure on this endpoint',
+                                       ['location', 'endpoint'], registry=registry)
+ADMISSION_IN_FLIGHT = Gauge('ovd_admission_in_flight', 'Number of requests admitted to an admission pool (e.g. translating TOSCA templates)',
+                            ['pool'], registry=registry)
+ADMISSION_QUEUE_DEPTH = Gauge('ovd_admission_queue_depth', 'Number of requests waiting to be admitted to an admission pool',
+                              ['pool'], registry=registry)
+ADMISSION_REJECTED = Counter('ovd_admission_rejected_total', 'Number of requests rejected as an admission pool was full',
+                             ['pool'], registry=registry)
+PREWARM_RUNS = Counter('ovd_prewarm_total', 'Number of times a deployment location was warmed (connected to ahead of requests), successfully or not',
+                       ['location', 'result'], registry=registry)
+AUTH_CACHE_REQUESTS = Counter('ovd_auth_cache_total', 'Number of Openstack sessions which reused (hit) or did not find (miss) the cached token of their deployment location',
+                              ['result'], registry=registry)
+LIFECYCLE_STATUS_CACHE_REQUESTS = Counter('ovd_lifecycle_status_cache_total', 'Number of get lifecycle execution requests which found (hit) or did not find (miss) a cached status',
+                                          ['result'], registry=registry)
+LIFECYCLE_STATUS_REFRESHES = Counter('ovd_lifecycle_status_refresh_total', 'Number of cached lifecycle statuses refreshed in the background',
+                                     ['result'], registry=registry)
+ASYNC_CREATES = Counter('ovd_async_create_total', 'Number of creates accepted, rejected, created or failed in the background',
+                        ['result'], registry=registry)
+ASYNC_CREATES_IN_PROGRESS = Gauge('ovd_async_create_in_progress', 'Number of accepted creates yet to create their stack in the background',
+                                  registry=registry).labels()
+DUPLICATE_CREATES = Counter('ovd_duplicate_create_total', 'Number of creates answered with the stack of an earlier create of the same resource, found in Openstack (existing) or still being created by this process (coalesced)',
+                            ['source'], registry=registry)
+CACHE_EVICTIONS = Counter('ovd_cache_evictions_total', 'Number of entries removed from a cache as they expired, to make space (size) or by a flush',
+                          ['cache', 'backend', 'reason'], registry=registry)
+CACHE_ENTRIES = Gauge('ovd_cache_entries', 'Number of entries held by a cache, read when metrics are rendered',
+                      ['cache', 'backend'], registry=registry, multiprocess_mode='livemax')
+CACHE_ERRORS = Counter('ovd_cache_errors_total', 'Number of reads and writes of a cache backend which failed (and were treated as a miss)',
+                       ['cache', 'backend'], registry=registry)
+JOURNAL_REQUESTS = Counter('ovd_journal_total', 'Number of get lifecycle execution requests which found (hit) or did not find (miss) a finished request in the journal',
+                           ['result'], registry=registry)
+JOURNAL_ERRORS = Counter('ovd_journal_errors_total', 'Number of reads and writes of the lifecycle request journal which failed',
+                         ['operation'], registry=registry)
+LIFECYCLE_TIME_TO_ACCEPT = Histogram('ovd_lifecycle_time_to_accept_seconds', 'Time from a lifecycle request being submitted to it being accepted (recorded in the journal)',
+                                     ['request_type'], registry=registry)
+LIFECYCLE_TIME_TO_COMPLETE = Histogram('ovd_lifecycle_time_to_complete_seconds', 'Time from a lifecycle request being submitted to it first being observed complete or failed (recorded in the journal)',
+                                       ['request_type', 'status'], registry=registry, buckets=COMPLETION_BUCKETS)
+LIFECYCLE_REQUEST_DURATION = Histogram('ovd_lifecycle_request_duration_seconds', 'Duration of requests handled by the resource driver',
+                                       ['operation', 'lifecycle'], registry=registry)
+LIFECYCLE_STAGE_DURATION = Histogram('ovd_lifecycle_stage_duration_seconds', 'Duration of each stage of a lifecycle request',
+                                     ['lifecycle', 'stage'], registry=registry)
+LIFECYCLE_REQUESTS_IN_PROGRESS = Gauge('ovd_lifecycle_requests_in_progress', 'Number of resource driver requests currently being handled',
+                                       ['operation'], registry=registry)
+
+
+@contextmanager
+def track_lifecycle_request(operation, lifecycle=None):
+    with LIFECYCLE_REQUESTS_IN_PROGRESS.labels(operation=operation).track_in_progress():
+        with LIFECYCLE_REQUEST_DURATION.labels(operation=operation, lifecycle=lifecycle).time():
+            yield
+
+@contextmanager
+def lifecycle_stage(lifecycle, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        LIFECYCLE_STAGE_DURATION.labels(lifecycle=lifecycle, stage=stage).observe(duration)
+        # Included in the breakdown of the slow request log
+        record_stage(stage, duration)
@@ -2,11 +2,23 @@ import osvimdriver.api_specs as api_specs
 import os
 import logging
 import pathlib
+import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from heatclient import exc as heatexc
 from ignition.service.framework import Capability, Service, interface, ServiceRegistration
 from ignition.service.api import BaseController
+from ignition.api.exceptions import ApiException, BadRequest
 from ignition.boot.connexionutils import build_resolver_to_instance
 from ignition.service.config import ConfigurationPropertiesGroup
 from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.cache import caches, CacheCodec
+from osvimdriver.service.common import with_logging_context
+from osvimdriver.service.profiling import profiler, ProfilingError, SESSION_STATUS_COMPLETE
+from osvimdriver.service.circuitbreaker import circuit_breakers
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +31,12 @@ class OpenstackAdminProperties(ConfigurationPropertiesGroup):
     def __init__(self):
         super().__init__('openstack_admin')
         self.enabled = True
+        self.metrics_enabled = True
+        self.profiling_enabled = True
+        # Seconds the result of successfully pinging a deployment location is re-used for. Set to 0 to disable
+        self.ping_cache_ttl = 30
+        # Maximum number of deployment locations pinged concurrently by a batch ping
+        self.ping_batch_max_workers = 8
 
 
 class OpenstackAdminApiConfigurator():
@@ -41,6 +59,18 @@ class OpenstackAdminApiConfigurator():
             if api_service_instance is None:
                 raise ValueError('No instance of the OpenstackAdminApiCapability service has been built')
             api_register.register_api(api_spec, resolver=build_resolver_to_instance(api_service_instance))
+            if admin_properties.metrics_enabled is True:
+                logger.debug('Configuring Metrics API')
+                metrics_api_spec = os.path.join(api_spec_path, 'openstack_metrics.yaml')
+                api_register.register_api(metrics_api_spec, resolver=build_resolver_to_instance(api_service_instance))
+            else:
+                logger.debug('Disabled: Metrics API')
+            if admin_properties.profiling_enabled is True:
+                logger.debug('Configuring Profiling API')
+                profiling_api_spec = os.path.join(api_spec_path, 'openstack_profiling.yaml')
+                api_register.register_api(profiling_api_spec, resolver=build_resolver_to_instance(api_service_instance))
+            else:
+                logger.debug('Disabled: Profiling API')
         else:
             logger.debug('Disabled: Openstack Admin API')
 
@@ -55,7 +85,7 @@ class OpenstackAdminServiceConfigurator():
         if admin_properties.enabled is True:
             logger.debug('Configuring Openstack Admin Services')
             service_register.add_service(ServiceRegistration(OpenstackAdminApiService, service=OpenstackAdminCapability))
-            service_register.add_service(ServiceRegistration(OpenstackAdminService, OpenstackDeploymentLocationTranslator()))
+            service_register.add_service(ServiceRegistration(OpenstackAdminService, OpenstackDeploymentLocationTranslator(), admin_properties))
         else:
             logger.debug('Disabled: Openstack Admin Services')
 
@@ -66,6 +96,42 @@ class OpenstackAdminApiCapability(Capability):
     def ping(self, **kwarg):
         pass
 
+    @interface
+    def ping_batch(self, **kwarg):
+        pass
+
+    @interface
+    def metrics(self, **kwarg):
+        pass
+
+    @interface
+    def start_profiling(self, **kwarg):
+        pass
+
+    @interface
+    def list_profiling(self, **kwarg):
+        pass
+
+    @interface
+    def download_profile(self, **kwarg):
+        pass
+
+    @interface
+    def list_breakers(self, **kwarg):
+        pass
+
+    @interface
+    def list_caches(self, **kwarg):
+        pass
+
+    @interface
+    def flush_caches(self, **kwarg):
+        pass
+
+    @interface
+    def flush_cache(self, **kwarg):
+        pass
+
 
 class OpenstackAdminCapability(Capability):
 
@@ -73,6 +139,10 @@ class OpenstackAdminCapability(Capability):
     def ping(self, deployment_location):
         pass
 
+    @interface
+    def ping_many(self, deployment_locations):
+        pass
+
 
 class OpenstackAdminApiService(Service, OpenstackAdminApiCapability, BaseController):
 
@@ -85,30 +155,165 @@ class OpenstackAdminApiService(Service, OpenstackAdminApiCapability, BaseControl
         body = self.get_body(kwarg)
         deployment_location = self.get_body_required_field(body, 'deploymentLocation')
         ping_response = self.service.ping(deployment_location)
-        response = {'success': ping_response.success, 'description': ping_response.description}
-        return (response, 200)
+        return (ping_response.to_dict(), 200)
+
+    def ping_batch(self, **kwarg):
+        body = self.get_body(kwarg)
+        deployment_locations = self.get_body_required_field(body, 'deploymentLocations')
+        ping_responses = self.service.ping_many(deployment_locations)
+        results = []
+        for deployment_location, ping_response in zip(deployment_locations, ping_responses):
+            result = ping_response.to_dict()
+            result['name'] = deployment_location.get('name')
+            results.append(result)
+        return ({'results': results}, 200)
+
+    def metrics(self, **kwarg):
+        return (metrics.registry.render(), 200, {'Content-Type': metrics.CONTENT_TYPE})
+
+    def start_profiling(self, **kwarg):
+        body = self.get_body(kwarg)
+        mode = self.get_body_required_field(body, 'mode')
+        try:
+            session = profiler.start(mode, requests=self.get_body_field(body, 'requests'), seconds=self.get_body_field(body, 'seconds'))
+        except ValueError as e:
+            raise BadRequest(str(e)) from e
+        except ProfilingError as e:
+            raise ProfilingConflictError(str(e)) from e
+        return (session.to_dict(), 202)
+
+    def list_profiling(self, **kwarg):
+        return ([session.to_dict() for session in profiler.get_sessions()], 200)
+
+    def download_profile(self, **kwarg):
+        session_id = self.get_required_param(kwarg, 'id')
+        session = profiler.get_session(session_id)
+        if session is None:
+            raise ProfilingNotFoundError('No profiling session found with id \'{0}\''.format(session_id))
+        if session.status != SESSION_STATUS_COMPLETE:
+            raise ProfilingConflictError('Profiling session \'{0}\' is {1}'.format(session_id, session.status))
+        try:
+            with open(profiler.get_profile_path(session), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError as e:
+            # Removed (expired) since the session was read
+            raise ProfilingNotFoundError('No profile found for profiling session \'{0}\''.format(session_id)) from e
+        return (content, 200, {'Content-Type': 'application/octet-stream', 'Content-Disposition': 'attachment; filename="{0}"'.format(session.file_name)})
+
+    def list_breakers(self, **kwarg):
+        # Breakers are created on the first request to a deployment location, so only locations used by this worker are included
+        return ({'breakers': [breaker.to_dict() for breaker in circuit_breakers.get_breakers()]}, 200)
+
+    def list_caches(self, **kwarg):
+        return ({'caches': [{'name': cache.name, 'backend': cache.backend, 'size': len(cache), 'ttl': cache.ttl} for cache in caches.get_caches()]}, 200)
+
+    def flush_caches(self, **kwarg):
+        return ({'flushed': caches.flush()}, 200)
+
+    def flush_cache(self, **kwarg):
+        name = self.get_required_param(kwarg, 'name')
+        try:
+            flushed = caches.flush(name)
+        except KeyError as e:
+            raise CacheNotFoundError('No cache found with name \'{0}\''.format(name)) from e
+        return ({'flushed': flushed}, 200)
 
 
 class OpenstackAdminService(Service, OpenstackAdminCapability):
 
-    def __init__(self, location_translator):
+    def __init__(self, location_translator, admin_properties=None):
         self.location_translator = location_translator
+        self.admin_properties = admin_properties if admin_properties is not None else OpenstackAdminProperties()
+        self.ping_cache = caches.create('ping', self.admin_properties.ping_cache_ttl, codec=PING_RESPONSE_CODEC)
 
     def ping(self, deployment_location):
-        openstack_location = self.location_translator.from_deployment_location(deployment_location)
-        heat_driver = openstack_location.heat_driver
+        cache_key = self.__ping_cache_key(deployment_location)
+        cached_response = self.ping_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response.as_cached()
+        ping_response = self.__probe(deployment_location)
+        if ping_response.success:
+            # Failures are not cached, so a location which has recovered is reported as such by the next ping
+            self.ping_cache.put(cache_key, ping_response)
+        return ping_response
+
+    def ping_many(self, deployment_locations):
+        if len(deployment_locations) == 0:
+            return []
+        max_workers = max(1, min(self.admin_properties.ping_batch_max_workers, len(deployment_locations)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ovd-ping') as executor:
+            return list(executor.map(with_logging_context(self.ping), deployment_locations))
+
+    def __probe(self, deployment_location):
+        # Authenticates then makes the cheapest request Heat offers, rather than listing stacks, recording the time taken by each stage
+        stages = {}
+        openstack_location = None
         try:
-            list_of_stacks = heat_driver.get_stacks()
-            for stack in list_of_stacks:
-                # Yield first response to force connection
-                break
-            return PingResponse(True, 'Reached Heat client successfully')
+            openstack_location = self.location_translator.from_deployment_location(deployment_location)
+            session = openstack_location.get_session()
+            if session.auth is not None:
+                with _timed_stage(stages, 'authenticate'):
+                    session.get_token()
+            heat_driver = openstack_location.heat_driver
+            with _timed_stage(stages, 'heat'):
+                try:
+                    heat_driver.get_build_info()
+                except (heatexc.HTTPForbidden, heatexc.HTTPNotFound):
+                    # Build info may be disabled by policy, fallback to listing a single stack
+                    for stack in heat_driver.get_stacks(limit=1):
+                        break
+            return PingResponse(True, 'Reached Heat client successfully', stages=stages)
         except Exception as e:
-            return PingResponse(False, str(e))
+            return PingResponse(False, str(e), stages=stages)
+        finally:
+            if openstack_location is not None:
+                openstack_location.close()
+
+    def __ping_cache_key(self, deployment_location):
+        # Hashed so the cache does not hold the credentials of the location as keys
+        serialized = json.dumps(deployment_location, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+@contextmanager
+def _timed_stage(stages, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage] = time.perf_counter() - start
+
+
+class ProfilingNotFoundError(ApiException):
+    status_code = 404
+
+
+class ProfilingConflictError(ApiException):
+    status_code = 409
+
+
+class CacheNotFoundError(ApiException):
+    status_code = 404
 
 
 class PingResponse:
 
-    def __init__(self, success, description):
+    def __init__(self, success, description, stages=None, cached=False):
         self.success = success
         self.description = description
+        # Seconds taken by each stage of the ping
+        self.stages = stages if stages is not None else {}
+        self.cached = cached
+
+    def as_cached(self):
+        return PingResponse(self.success, self.description, stages=self.stages, cached=True)
+
+    def to_dict(self):
+        return {'success': self.success, 'description': self.description, 'stages': self.stages, 'cached': self.cached}
+
+    @staticmethod
+    def from_dict(data):
+        return PingResponse(data['success'], data['description'], stages=data.get('stages'), cached=data.get('cached', False))
+
+
+PING_RESPONSE_CODEC = CacheCodec(lambda ping_response: ping_response.to_dict(), PingResponse.from_dict)
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator
+from osvimdriver.openstack.aio import HEAT_SERVICE_TYPE, NEUTRON_SERVICE_TYPE
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+PREWARM_SERVICE_TYPES = [HEAT_SERVICE_TYPE, NEUTRON_SERVICE_TYPE]
+
+
+class PrewarmProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('prewarm')
+        self.enabled = False
+        # Deployment locations (name and properties, as sent on lifecycle requests) to connect to when each worker process starts
+        self.deployment_locations = []
+        # Seconds between visits to the locations keeping their connections open and token fresh, 0 to only connect at startup
+        self.keepalive_interval = 60
+
+
+class Prewarmer():
+    """
+    Connects to deployment locations ahead of the requests that use them: authenticating, resolving the Heat and Neutron endpoints
+    and opening a pooled connection to each, so the first request after a quiet period doesn't wait on all of these in turn
+    """
+
+    def __init__(self, location_translator=None):
+        self.location_translator = location_translator if location_translator is not None else OpenstackDeploymentLocationTranslator()
+        self.deployment_locations = []
+        self.keepalive_interval = 0
+        self.__thread = None
+        self.__stopped = threading.Event()
+
+    def configure(self, properties):
+        self.stop()
+        if properties is None or properties.enabled is not True:
+            self.deployment_locations = []
+            self.keepalive_interval = 0
+        else:
+            self.deployment_locations = properties.deployment_locations or []
+            self.keepalive_interval = properties.keepalive_interval or 0
+
+    def warm(self, deployment_location):
+        location_name = deployment_location.get('name', None)
+        start = time.perf_counter()
+        openstack_location = None
+        try:
+            openstack_location = self.location_translator.from_deployment_location(deployment_location)
+            session = openstack_location.get_session()
+            if session.auth is not None:
+                # Authenticates, or renews the token if it's due to expire
+                session.get_token()
+                for service_type in PREWARM_SERVICE_TYPES:
+                    endpoint = session.get_endpoint(service_type=service_type, interface='public')
+                    if endpoint is not None:
+                        # Any response will do, it's the connection left in the pool that's wanted
+                        session.request(endpoint, 'HEAD', raise_exc=False)
+            logger.debug('Warmed deployment location \'{0}\' in {1:.3f}s'.format(location_name, time.perf_counter() - start))
+            metrics.PREWARM_RUNS.labels(location=location_name, result='success').inc()
+            return True
+        except Exception as e:
+            logger.warning('Failed to warm deployment location \'{0}\': {1}'.format(location_name, str(e)))
+            metrics.PREWARM_RUNS.labels(location=location_name, result='failure').inc()
+            return False
+        finally:
+            if openstack_location is not None:
+                # Keeps the token for later requests (see osvimdriver.service.authcache)
+                openstack_location.close()
+
+    def warm_all(self):
+        for deployment_location in self.deployment_locations:
+            if self.__stopped.is_set():
+                return
+            self.warm(deployment_location)
+
+    def start(self):
+        if len(self.deployment_locations) == 0 or self.__thread is not None:
+            return
+        self.__stopped.clear()
+        # Runs in the background so startup isn't held up by an unreachable location
+        self.__thread = threading.Thread(target=self.__run, name='ovd-prewarm', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        thread = self.__thread
+        if thread is None:
+            return
+        self.__stopped.set()
+        thread.join(timeout=5)
+        self.__thread = None
+
+    def __run(self):
+        self.warm_all()
+        while self.keepalive_interval > 0 and not self.__stopped.wait(self.keepalive_interval):
+            self.warm_all()
+
+
+prewarmer = Prewarmer()
+
+
+class PrewarmConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        prewarm_properties = configuration.property_groups.get_property_group(PrewarmProperties)
+        prewarmer.configure(prewarm_properties)
+        if prewarm_properties.enabled is True:
+            logger.debug('Warming {0} deployment locations, every {1} seconds'.format(len(prewarmer.deployment_locations), prewarmer.keepalive_interval))
+            # Configured in each worker process after it's forked, so the thread runs in the worker
+            prewarmer.start()
+        else:
+            logger.debug('Disabled: prewarming of deployment locations')
@@ -0,0 +1,448 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+
+logger = logging.getLogger(__name__)
+
+MODE_CPROFILE = 'cprofile'
+MODE_SAMPLING = 'sampling'
+
+FORMAT_PSTATS = 'pstats'
+FORMAT_SPEEDSCOPE = 'speedscope'
+
+SESSION_STATUS_RUNNING = 'RUNNING'
+SESSION_STATUS_COMPLETE = 'COMPLETE'
+SESSION_STATUS_FAILED = 'FAILED'
+
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+SESSION_FILE_SUFFIX = '.session.json'
+
+
+class ProfilingProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('profiling')
+        # Directory the captured profiles are written to
+        self.output_dir = './profiles'
+        # Interval, in seconds, between stack samples in sampling mode
+        self.sampling_interval = 0.01
+        # Upper limits on the size of a capture requested through the API
+        self.max_requests = 1000
+        self.max_seconds = 600
+        # Finished sessions are listed (and their profiles kept) for this number of seconds, up to max_sessions of the most recent
+        self.session_retention = 86400
+        self.max_sessions = 20
+        # Lifecycle requests taking longer than this number of seconds are logged with a breakdown of the time spent in each stage. Set to 0 to disable
+        self.slow_request_threshold = 10
+
+
+class ProfilingError(Exception):
+    pass
+
+
+class RequestTimings():
+
+    def __init__(self, operation, description=None):
+        self.operation = operation
+        self.description = description
+        self.start = time.perf_counter()
+        self.duration = None
+        self.stages = []
+
+    def record(self, stage, duration):
+        self.stages.append((stage, duration))
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def breakdown(self):
+        # Openstack calls are recorded alongside the lifecycle stages they are made in, so the values may overlap
+        if len(self.stages) == 0:
+            return 'no stages recorded'
+        return ', '.join('{0}={1:.3f}s'.format(stage, duration) for stage, duration in self.stages)
+
+
+_current_request_timings = contextvars.ContextVar('ovd_request_timings', default=None)
+
+def record_stage(stage, duration):
+    # Adds the duration of a stage to the breakdown of the request currently being handled (if any)
+    request_timings = _current_request_timings.get()
+    if request_timings is not None:
+        request_timings.record(stage, duration)
+
+
+class ProfilingSession():
+
+    def __init__(self, mode, max_requests=None, max_seconds=None):
+        self.id = str(uuid.uuid4())
+        self.mode = mode
+        self.format = FORMAT_PSTATS if mode == MODE_CPROFILE else FORMAT_SPEEDSCOPE
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.status = SESSION_STATUS_RUNNING
+        self.started_at = time.time()
+        self.completed_at = None
+        self.requests_started = 0
+        self.requests_profiled = 0
+        self.file_path = None
+        self.error = None
+
+    def accepts_request(self):
+        if self.status != SESSION_STATUS_RUNNING:
+            return False
+        if self.max_requests is not None and self.requests_started >= self.max_requests:
+            return False
+        if self.max_seconds is not None and time.time() - self.started_at >= self.max_seconds:
+            return False
+        return True
+
+    def is_satisfied(self):
+        if self.max_requests is not None and self.requests_profiled >= self.max_requests:
+            return True
+        if self.max_seconds is not None and time.time() - self.started_at >= self.max_seconds:
+            return True
+        return False
+
+    @property
+    def file_name(self):
+        return '{0}.pstats'.format(self.id) if self.format == FORMAT_PSTATS else '{0}.speedscope.json'.format(self.id)
+
+    @property
+    def finished_at(self):
+        return self.completed_at if self.completed_at is not None else self.started_at
+
+    def to_dict(self):
+        session_dict = {
+            'id': self.id,
+            'mode': self.mode,
+            'format': self.format,
+            'status': self.status,
+            'startedAt': self.started_at,
+            'requestsProfiled': self.requests_profiled
+        }
+        if self.max_requests is not None:
+            session_dict['requests'] = self.max_requests
+        if self.max_seconds is not None:
+            session_dict['seconds'] = self.max_seconds
+        if self.completed_at is not None:
+            session_dict['completedAt'] = self.completed_at
+        if self.error is not None:
+            session_dict['error'] = self.error
+        return session_dict
+
+    @staticmethod
+    def from_dict(session_dict):
+        session = ProfilingSession(session_dict['mode'], max_requests=session_dict.get('requests'), max_seconds=session_dict.get('seconds'))
+        session.id = session_dict['id']
+        session.status = session_dict['status']
+        session.started_at = session_dict['startedAt']
+        session.completed_at = session_dict.get('completedAt')
+        session.requests_profiled = session_dict.get('requestsProfiled', 0)
+        session.error = session_dict.get('error')
+        return session
+
+
+class StackSampler():
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.__frames = []
+        self.__frame_index = {}
+        self.samples = []
+        self.weights = []
+
+    def sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.__frame_index.get(key, None)
+            if index is None:
+                index = len(self.__frames)
+                self.__frame_index[key] = index
+                self.__frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append(stack)
+        self.weights.append(self.interval)
+
+    def to_speedscope(self, name):
+        total = sum(self.weights)
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'name': name,
+            'exporter': 'os-vim-driver',
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.__frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': total,
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+
+class Profiler():
+    """
+    Profiles the requests handled by this process. Sessions are saved to the output_dir (next to their profiles) so any
+    worker process sharing the directory can list them and download their profiles
+    """
+
+    def __init__(self, properties=None):
+        self.properties = properties if properties is not None else ProfilingProperties()
+        self.__lock = threading.RLock()
+        self.__sessions = {}
+        self.__active_session = None
+        self.__stats = None
+        self.__sampler = None
+        self.__sampled_threads = set()
+
+    def start(self, mode, requests=None, seconds=None):
+        if mode not in [MODE_CPROFILE, MODE_SAMPLING]:
+            raise ValueError('mode must be one of: {0}'.format([MODE_CPROFILE, MODE_SAMPLING]))
+        if requests is None and seconds is None:
+            raise ValueError('One of requests or seconds must be set')
+        if requests is not None and (requests <= 0 or requests > self.properties.max_requests):
+            raise ValueError('requests must be between 1 and {0}'.format(self.properties.max_requests))
+        if seconds is not None and (seconds <= 0 or seconds > self.properties.max_seconds):
+            raise ValueError('seconds must be between 1 and {0}'.format(self.properties.max_seconds))
+        self.__expire_sessions()
+        with self.__lock:
+            if self.__active_session is not None:
+                raise ProfilingError('Profiling session {0} is already running'.format(self.__active_session.id))
+            session = ProfilingSession(mode, max_requests=requests, max_seconds=seconds)
+            self.__sessions[session.id] = session
+            self.__active_session = session
+            self.__save_session(session)
+            self.__stats = None
+            if mode == MODE_SAMPLING:
+                self.__sampler = StackSampler(self.properties.sampling_interval)
+                threading.Thread(target=self.__run_sampler, args=(session,), name='ovd-profiling-sampler', daemon=True).start()
+            # A session of a number of requests is also ended after max_seconds, in case this process doesn't handle that many
+            timer = threading.Timer(seconds if seconds is not None else self.properties.max_seconds, self.__complete_if_satisfied, args=(session, True))
+            timer.daemon = True
+            timer.start()
+        logger.info('Started {0} profiling session {1}'.format(mode, session.id))
+        return session
+
+    def get_session(self, session_id):
+        session = self.__sessions.get(session_id, None)
+        if session is None:
+            # Started by another worker process
+            session = self.__read_session(session_id)
+        return session
+
+    def get_sessions(self):
+        self.__expire_sessions()
+        return self.__all_sessions()
+
+    def get_profile_path(self, session):
+        return os.path.join(self.properties.output_dir, session.file_name)
+
+    def __all_sessions(self):
+        sessions = {session.id: session for session in self.__read_sessions()}
+        with self.__lock:
+            # Sessions of this process are more up to date than their files
+            sessions.update(self.__sessions)
+        return sorted(sessions.values(), key=lambda session: session.started_at)
+
+    def __expire_sessions(self):
+        now = time.time()
+        finished = []
+        for session in self.__all_sessions():
+            if session.status != SESSION_STATUS_RUNNING:
+                finished.append(session)
+            elif session is not self.__active_session and now - session.started_at > self.properties.session_retention:
+                # Left running by a worker process which has since exited
+                self.__remove_session(session)
+        finished.sort(key=lambda session: session.finished_at, reverse=True)
+        for index, session in enumerate(finished):
+            if index >= self.properties.max_sessions or now - session.finished_at > self.properties.session_retention:
+                self.__remove_session(session)
+
+    def __remove_session(self, session):
+        with self.__lock:
+            self.__sessions.pop(session.id, None)
+        for file_path in [self.__session_path(session.id), self.get_profile_path(session)]:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                # Already removed by another worker process
+                pass
+            except OSError as e:
+                logger.warning('Failed to remove {0}: {1}'.format(file_path, str(e)))
+
+    def __session_path(self, session_id):
+        return os.path.join(self.properties.output_dir, session_id + SESSION_FILE_SUFFIX)
+
+    def __save_session(self, session):
+        file_path = self.__session_path(session.id)
+        try:
+            os.makedirs(self.properties.output_dir, exist_ok=True)
+            # Replaced in one step, so other processes never read a partly written file
+            tmp_path = '{0}.{1}.tmp'.format(file_path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(session.to_dict(), f)
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            logger.warning('Failed to save profiling session {0}, it will only be listed by this worker process: {1}'.format(session.id, str(e)))
+
+    def __read_session(self, session_id):
+        try:
+            uuid.UUID(session_id)
+        except ValueError:
+            return None
+        return self.__load_session(self.__session_path(session_id))
+
+    def __read_sessions(self):
+        try:
+            file_names = os.listdir(self.properties.output_dir)
+        except OSError:
+            return []
+        sessions = []
+        for file_name in file_names:
+            if file_name.endswith(SESSION_FILE_SUFFIX):
+                session = self.__load_session(os.path.join(self.properties.output_dir, file_name))
+                if session is not None:
+                    sessions.append(session)
+        return sessions
+
+    def __load_session(self, file_path):
+        try:
+            with open(file_path, 'r') as f:
+                return ProfilingSession.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning('Failed to read profiling session from {0}: {1}'.format(file_path, str(e)))
+            return None
+
+    @contextmanager
+    def profile_request(self, operation, description=None):
+        request_timings = RequestTimings(operation, description=description)
+        token = _current_request_timings.set(request_timings)
+        session = self.__join_active_session()
+        profile = None
+        if session is not None and session.mode == MODE_CPROFILE:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Newer Python versions allow only one active profiler, so concurrent requests may not be profiled
+                logger.debug('Could not profile request: {0}'.format(str(e)))
+                profile = None
+        try:
+            yield request_timings
+        finally:
+            if profile is not None:
+                profile.disable()
+            if session is not None:
+                self.__leave_session(session, profile)
+            _current_request_timings.reset(token)
+            request_timings.finish()
+            self.__log_if_slow(request_timings)
+
+    def __join_active_session(self):
+        with self.__lock:
+            session = self.__active_session
+            if session is None or not session.accepts_request():
+                return None
+            session.requests_started += 1
+            if session.mode == MODE_SAMPLING:
+                self.__sampled_threads.add(threading.get_ident())
+            return session
+
+    def __leave_session(self, session, profile):
+        with self.__lock:
+            if session.mode == MODE_SAMPLING:
+                self.__sampled_threads.discard(threading.get_ident())
+            elif profile is not None and session.status == SESSION_STATUS_RUNNING:
+                if self.__stats is None:
+                    self.__stats = pstats.Stats(profile)
+                else:
+                    self.__stats.add(profile)
+            session.requests_profiled += 1
+        self.__complete_if_satisfied(session)
+
+    def __run_sampler(self, session):
+        while True:
+            with self.__lock:
+                if session.status != SESSION_STATUS_RUNNING:
+                    return
+                thread_ids = set(self.__sampled_threads)
+            if len(thread_ids) > 0:
+                frames = sys._current_frames()
+                with self.__lock:
+                    for thread_id in thread_ids:
+                        frame = frames.get(thread_id, None)
+                        if frame is not None:
+                            self.__sampler.sample(frame)
+            time.sleep(self.properties.sampling_interval)
+
+    def __complete_if_satisfied(self, session, timed_out=False):
+        with self.__lock:
+            if session.status != SESSION_STATUS_RUNNING or not (timed_out or session.is_satisfied()):
+                return
+            try:
+                session.file_path = self.__write_profile(session)
+                session.status = SESSION_STATUS_COMPLETE
+            except Exception as e:
+                logger.exception('Failed to write profile for session {0}: {1}'.format(session.id, str(e)))
+                session.status = SESSION_STATUS_FAILED
+                session.error = str(e)
+            session.completed_at = time.time()
+            self.__active_session = None
+            self.__sampled_threads = set()
+            self.__save_session(session)
+        logger.info('Profiling session {0} finished with status {1}'.format(session.id, session.status))
+
+    def __write_profile(self, session):
+        if session.requests_profiled == 0:
+            raise ProfilingError('No requests were handled during the profiling session')
+        os.makedirs(self.properties.output_dir, exist_ok=True)
+        file_path = self.get_profile_path(session)
+        if session.format == FORMAT_PSTATS:
+            if self.__stats is None:
+                raise ProfilingError('No requests were handled during the profiling session')
+            self.__stats.dump_stats(file_path)
+            self.__stats = None
+        else:
+            with open(file_path, 'w') as f:
+                json.dump(self.__sampler.to_speedscope('os-vim-driver ({0})'.format(session.id)), f)
+            self.__sampler = None
+        return file_path
+
+    def __log_if_slow(self, request_timings):
+        threshold = self.properties.slow_request_threshold
+        if threshold is None or threshold <= 0 or request_timings.duration < threshold:
+            return
+        logger.warning('Slow request: {0}{1} took {2:.3f}s ({3})'.format(request_timings.operation,
+            ' ({0})'.format(request_timings.description) if request_timings.description is not None else '',
+            request_timings.duration, request_timings.breakdown()))
+
+
+profiler = Profiler()
+
+
+class ProfilingConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        profiler.properties = configuration.property_groups.get_property_group(ProfilingProperties)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+# How often an async caller re-checks a limiter which is at it's concurrency cap
+ASYNC_POLL_INTERVAL = 0.05
+
+
+class RateLimitProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('rate_limit')
+        self.enabled = False
+        # Sustained number of requests per second sent to each Openstack endpoint (a service of a deployment location). 0 for no limit
+        self.requests_per_second = 10
+        # Number of requests which may be sent at once, above the sustained rate, after a quiet period
+        self.burst = 20
+        # Maximum number of requests in flight to each endpoint at once. 0 for no limit
+        self.max_concurrency = 10
+        # Seconds a request will wait for the limit before failing
+        self.max_wait = 30
+        # Overrides for a particular service, e.g. {'heat': {'requests_per_second': 5}}
+        self.services = {}
+
+
+class RateLimitExceededError(TemporaryResourceDriverError):
+    pass
+
+
+class EndpointRateLimiter():
+    """
+    Token bucket (requests_per_second, refilled up to burst) combined with a cap on the number of requests in flight.
+    Callers which can't proceed wait until they can or their deadline passes
+    """
+
+    def __init__(self, service_name, location_name, requests_per_second=0, burst=0, max_concurrency=0, max_wait=0):
+        self.service_name = service_name
+        self.location_name = location_name
+        self.requests_per_second = requests_per_second
+        self.burst = max(burst, 1)
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.__condition = threading.Condition()
+        self.__tokens = float(self.burst)
+        self.__last_refill = time.monotonic()
+        self.__in_flight = 0
+        self.__waiting = 0
+        labels = {'service': service_name, 'location': location_name}
+        self.__queue_depth_gauge = metrics.OPENSTACK_RATE_LIMIT_QUEUE_DEPTH.labels(**labels)
+        self.__in_flight_gauge = metrics.OPENSTACK_RATE_LIMIT_IN_FLIGHT.labels(**labels)
+        self.__wait_histogram = metrics.OPENSTACK_RATE_LIMIT_WAIT.labels(**labels)
+        self.__rejected_counter = metrics.OPENSTACK_RATE_LIMIT_REJECTED.labels(**labels)
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+    @property
+    def waiting(self):
+        return self.__waiting
+
+    @contextmanager
+    def limit(self, max_wait=None):
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        with self.__condition:
+            wait_time = self.__try_acquire()
+            if wait_time is not None:
+                self.__enqueue()
+                try:
+                    while wait_time is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.__reject(start)
+                        self.__condition.wait(min(wait_time, remaining))
+                        wait_time = self.__try_acquire()
+                finally:
+                    self.__dequeue()
+        self.__wait_histogram.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self.__release()
+
+    @asynccontextmanager
+    async def async_limit(self, max_wait=None):
+        # Must not block the event loop, so waits with asyncio.sleep rather than on the condition
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        with self.__condition:
+            wait_time = self.__try_acquire()
+            if wait_time is not None:
+                self.__enqueue()
+        if wait_time is not None:
+            try:
+                while wait_time is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.__reject(start)
+                    await asyncio.sleep(min(wait_time, remaining, ASYNC_POLL_INTERVAL))
+                    with self.__condition:
+                        wait_time = self.__try_acquire()
+            finally:
+                with self.__condition:
+                    self.__dequeue()
+        self.__wait_histogram.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self.__release()
+
+    def __try_acquire(self):
+        # Returns None when a slot and token have been taken, otherwise the number of seconds worth waiting before trying again
+        if self.max_concurrency > 0 and self.__in_flight >= self.max_concurrency:
+            # Woken when a request completes
+            return self.max_wait if self.max_wait > 0 else ASYNC_POLL_INTERVAL
+        if self.requests_per_second > 0:
+            now = time.monotonic()
+            self.__tokens = min(float(self.burst), self.__tokens + (now - self.__last_refill) * self.requests_per_second)
+            self.__last_refill = now
+            if self.__tokens < 1:
+                return (1 - self.__tokens) / self.requests_per_second
+            self.__tokens -= 1
+        self.__in_flight += 1
+        self.__in_flight_gauge.inc()
+        return None
+
+    def __release(self):
+        with self.__condition:
+            self.__in_flight -= 1
+            self.__in_flight_gauge.dec()
+            # Waiters may be waiting on a token rather than a slot, so wake them all to re-check
+            self.__condition.notify_all()
+
+    def __enqueue(self):
+        self.__waiting += 1
+        self.__queue_depth_gauge.inc()
+
+    def __dequeue(self):
+        self.__waiting -= 1
+        self.__queue_depth_gauge.dec()
+
+    def __reject(self, start):
+        waited = time.monotonic() - start
+        self.__wait_histogram.observe(waited)
+        self.__rejected_counter.inc()
+        raise RateLimitExceededError('Rate limit for {0} on location \'{1}\' not available after waiting {2:.2f} seconds'.format(self.service_name, self.location_name, waited))
+
+
+class RateLimiterRegistry():
+    """
+    Holds one limiter per Openstack endpoint, so every driver (and request thread) calling the same endpoint is limited together
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__limiters = {}
+        self.properties = None
+
+    def configure(self, properties):
+        with self.__lock:
+            self.properties = properties
+            self.__limiters = {}
+
+    def get_limiter(self, service_name, location_name):
+        properties = self.properties
+        if properties is None or properties.enabled is not True:
+            return None
+        key = (service_name, location_name)
+        with self.__lock:
+            limiter = self.__limiters.get(key, None)
+            if limiter is None:
+                settings = self.__settings_for(properties, service_name)
+                limiter = EndpointRateLimiter(service_name, location_name, **settings)
+                self.__limiters[key] = limiter
+            return limiter
+
+    def __settings_for(self, properties, service_name):
+        settings = {
+            'requests_per_second': properties.requests_per_second,
+            'burst': properties.burst,
+            'max_concurrency': properties.max_concurrency,
+            'max_wait': properties.max_wait
+        }
+        overrides = (properties.services or {}).get(service_name, None) or {}
+        for key, value in overrides.items():
+            if key not in settings:
+                raise ValueError('Unknown rate_limit setting \'{0}\' for service \'{1}\''.format(key, service_name))
+            settings[key] = value
+        return settings
+
+
+rate_limiters = RateLimiterRegistry()
+
+
+class RateLimitConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        rate_limit_properties = configuration.property_groups.get_property_group(RateLimitProperties)
+        if rate_limit_properties.enabled is True:
+            logger.debug('Rate limiting Openstack requests to {0}/s (burst {1}), {2} concurrent'.format(rate_limit_properties.requests_per_second,
+                                                                                                        rate_limit_properties.burst, rate_limit_properties.max_concurrency))
+        else:
+            logger.debug('Disabled: rate limiting of Openstack requests')
+        rate_limiters.configure(rate_limit_properties)
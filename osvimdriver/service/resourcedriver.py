@@ -1,7 +1,14 @@
 from uuid import uuid4
+import contextlib
+import contextvars
+import functools
+import hashlib
 import logging
 import re
 import os
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from ignition.service.framework import Service, Capability, interface
 from ignition.service.config import ConfigurationPropertiesGroup
 from ignition.service.resourcedriver import ResourceDriverHandlerCapability, InfrastructureNotFoundError, InvalidDriverFilesError, ResourceDriverError, InvalidRequestError
@@ -12,6 +19,16 @@ from ignition.model.failure import FailureDetails, FAILURE_CODE_INFRASTRUCTURE_E
 from osvimdriver.service.tosca import ToscaValidationError, NotDiscoveredError
 from osvimdriver.openstack.heat.driver import StackNotFoundError
 from ignition.utils.propvaluemap import PropValueMap
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.tracing import tracer, extract_request_context, SPAN_KIND_SERVER
+from osvimdriver.service.profiling import profiler
+from osvimdriver.service.timeouts import timeout_policy
+from osvimdriver.service.admission import admission_control
+from osvimdriver.service.statuscache import lifecycle_status_cache, StackStatusRead
+from osvimdriver.service.asynccreate import create_jobs, new_operation_id, accepted_at, JOB_PENDING, JOB_FAILED
+from osvimdriver.service.common import with_logging_context
+from osvimdriver.service.singleflight import SingleFlight
+from osvimdriver.service.journal import request_journal
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +46,12 @@ OS_STACK_STATUS_SUSPEND_IN_PROGRESS = 'SUSPEND_IN_PROGRESS'
 OS_STACK_STATUS_SUSPEND_COMPLETE = 'SUSPEND_COMPLETE'
 OS_STACK_STATUS_CHECK_IN_PROGRESS='CHECK_IN_PROGRESS'
 OS_STACK_STATUS_CHECK_FAILED='CHECK_FAILED'
+OS_STACK_STATUS_UPDATE_IN_PROGRESS = 'UPDATE_IN_PROGRESS'
+OS_STACK_STATUS_UPDATE_COMPLETE = 'UPDATE_COMPLETE'
+OS_STACK_STATUS_UPDATE_FAILED = 'UPDATE_FAILED'
+OS_STACK_STATUS_ROLLBACK_IN_PROGRESS = 'ROLLBACK_IN_PROGRESS'
+OS_STACK_STATUS_ROLLBACK_COMPLETE = 'ROLLBACK_COMPLETE'
+OS_STACK_STATUS_ROLLBACK_FAILED = 'ROLLBACK_FAILED'
 
 TOSCA_TEMPLATE_TYPE = 'TOSCA'
 HEAT_TEMPLATE_TYPE = 'HEAT'
@@ -37,16 +60,41 @@ REQUEST_ID_SEPARATOR = '::'
 CREATE_REQUEST_PREFIX = 'Create'
 DELETE_REQUEST_PREFIX = 'Delete'
 ADOPT_REQUEST_PREFIX = 'Adopt'
+# Creates running in the background, identified by the name of the stack as it's ID is not known when the request is accepted
+ASYNC_CREATE_REQUEST_PREFIX = 'AsyncCreate'
+# Upgrade and Reconfigure, both run as an update of the stack
+UPDATE_REQUEST_PREFIX = 'Update'
+UPDATE_LIFECYCLES = ['UPGRADE', 'RECONFIGURE']
+# Separates the operation ID of an update from the digest of the stack's updated_time before it
+UPDATE_OPERATION_SEPARATOR = '.'
+
+CREATE_LIFECYCLE = 'create'
+STAGE_READ_FILES = 'read_files'
+STAGE_TRANSLATE = 'translate'
+STAGE_FILTER_INPUTS = 'filter_inputs'
+STAGE_CREATE = 'create'
+# Run alongside read_files, translate and filter_inputs, when authentication is overlapped with them
+STAGE_AUTHENTICATE = 'authenticate'
+STAGE_AWAIT_AUTHENTICATION = 'await_authentication'
+STAGE_FIND_DUPLICATE = 'find_duplicate'
+UPDATE_LIFECYCLE = 'update'
+STAGE_UPDATE = 'update'
 
 STACK_RESOURCE_TYPE = 'Openstack'
 STACK_NAME = 'InfrastructureStack'
 
-def build_request_id(request_type, stack_id):
+# Tags added to created stacks, so a stack created for a Create that's redelivered is found and returned rather than created again
+RESOURCE_TAG_PREFIX = 'ovd-resource-'
+TEMPLATE_TAG_PREFIX = 'ovd-template-'
+# Heat limits tags to 80 characters
+MAX_TAG_LENGTH = 80
+
+def build_request_id(request_type, stack_id, operation_id=None):
         request_id = request_type
         request_id += REQUEST_ID_SEPARATOR
         request_id += stack_id
         request_id += REQUEST_ID_SEPARATOR
-        request_id += str(uuid4())
+        request_id += operation_id if operation_id is not None else str(uuid4())
         return request_id
 
 class AdditionalResourceDriverProperties(ConfigurationPropertiesGroup, Service, Capability):
@@ -54,6 +102,16 @@ class AdditionalResourceDriverProperties(ConfigurationPropertiesGroup, Service,
     def __init__(self):
         super().__init__('resource_driver')
         self.keep_files = False
+        # Authenticate with Openstack while a Create reads and translates it's template, rather than on the first call to Heat after it
+        self.overlap_authentication = True
+        # Number of threads (in each worker process) authenticating for Creates, any more Creates authenticate on their own thread as before
+        self.authentication_workers = 8
+        # Return the existing stack (found by name or resource tag) when a Create is repeated, rather than creating another
+        self.detect_duplicate_stacks = True
+        # Update a stack created from the same template with a PATCH of it's parameters, rather than sending the template again
+        self.patch_parameter_updates = True
+        # Seconds an update may take to be started by Heat, after which it's reported as failed
+        self.update_start_timeout = 60
 
 class AdoptProperties(ConfigurationPropertiesGroup, Service, Capability):
 
@@ -104,77 +162,269 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
         self.location_translator = location_translator
         self.stack_name_creator = StackNameCreator()
         self.props_merger = PropertiesMerger()
+        self.__creates_in_flight = SingleFlight()
+        self.__authentication_executor = None
+        if self.resource_driver_config.overlap_authentication is True:
+            self.__authentication_executor = ThreadPoolExecutor(max_workers=self.resource_driver_config.authentication_workers, thread_name_prefix='ovd-create-auth')
     
     def execute_lifecycle(self, lifecycle_name, driver_files, system_properties, resource_properties, request_properties, associated_topology, deployment_location):
+        span_attributes = {'lifecycle.name': lifecycle_name, 'deployment_location.name': self.__location_name(deployment_location)}
+        submitted_at = time.time()
+        with metrics.track_lifecycle_request('execute_lifecycle', lifecycle_name.lower()), \
+                profiler.profile_request('execute_lifecycle', description=lifecycle_name), \
+                tracer.start_span('execute_lifecycle', kind=SPAN_KIND_SERVER, attributes=span_attributes, parent_context=extract_request_context()), \
+                timeout_policy.request_deadline_for('execute_lifecycle ({0})'.format(lifecycle_name)):
+            response = self.__execute_lifecycle(lifecycle_name, driver_files, system_properties, resource_properties, request_properties, associated_topology, deployment_location)
+        self.__journal_accepted(deployment_location, response, submitted_at)
+        return response
+
+    def __journal_accepted(self, deployment_location, response, submitted_at):
+        # Creates of an existing stack (from the stack_id input) have no request to follow
+        if not request_journal.enabled or response.request_id is None:
+            return
+        request_type, stack_id, _ = self.__split_request_id(response.request_id)
+        request_journal.record_accepted(self.__location_name(deployment_location), response.request_id, request_type, stack_id, submitted_at, time.time())
+
+    def __execute_lifecycle(self, lifecycle_name, driver_files, system_properties, resource_properties, request_properties, associated_topology, deployment_location):
         openstack_location = None
+        handed_off = False
         try:
             openstack_location = self.location_translator.from_deployment_location(deployment_location)
             if lifecycle_name.upper() == 'CREATE':
+                if create_jobs.enabled and self.__input_stack_id(resource_properties) is None:
+                    response = self.__handle_async_create(driver_files, system_properties, resource_properties, request_properties, openstack_location)
+                    # The background create now owns the driver files and location, so cleans them up when it finishes
+                    handed_off = True
+                    return response
                 return self.__handle_create(driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location)
             elif lifecycle_name.upper() == 'ADOPT':
                 return self.__handle_adopt(driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location)
+            elif lifecycle_name.upper() in UPDATE_LIFECYCLES:
+                return self.__handle_update(lifecycle_name, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location)
             elif lifecycle_name.upper() == 'DELETE':
                 return self.__handle_delete(driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location)
             else:
-                raise InvalidRequestError(f'Openstack driver only supports Create, Adopt and Delete transitions, not {lifecycle_name}')
+                raise InvalidRequestError(f'Openstack driver only supports Create, Adopt, Upgrade, Reconfigure and Delete transitions, not {lifecycle_name}')
         finally:
-            if not self.resource_driver_config.keep_files:
-                try:
-                    logger.debug(f'Attempting to remove driver files at {driver_files.root_path}')
-                    driver_files.remove_all()
-                except Exception as e:
-                    logger.exception('Encountered an error whilst trying to clear out driver files directory {0}: {1}'.format(driver_files.root_path, str(e)))
-            if openstack_location != None:
-                openstack_location.close()
+            if not handed_off:
+                self.__clean_up(driver_files, openstack_location)
 
-    def __handle_create(self, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location):
-        heat_driver = openstack_location.heat_driver
-        stack_id = None
-        request_id =None
+    def __clean_up(self, driver_files, openstack_location):
+        if not self.resource_driver_config.keep_files:
+            try:
+                logger.debug(f'Attempting to remove driver files at {driver_files.root_path}')
+                driver_files.remove_all()
+            except Exception as e:
+                logger.exception('Encountered an error whilst trying to clear out driver files directory {0}: {1}'.format(driver_files.root_path, str(e)))
+        if openstack_location != None:
+            openstack_location.close()
+
+    def __input_stack_id(self, resource_properties):
         if 'stack_id' in resource_properties:
             input_stack_id = resource_properties.get('stack_id')
             if input_stack_id != None and len(input_stack_id.strip())!=0 and input_stack_id.strip() != "0":
-                try:
-                    ##Check for valid stack
-                    heat_driver.get_stack(input_stack_id.strip())
-                except StackNotFoundError as e:
-                    raise InfrastructureNotFoundError(str(e)) from e
-                else:
-                    stack_id = input_stack_id
-        if stack_id is None:
-            kwargs = {}
-            template_type = request_properties.get('template-type', None)
-            if template_type == None:
-                # Try and guess based on files
-                # Heat to take precedence
-                if driver_files.has_file('heat.yaml') or driver_files.has_file('heat.yml'):
-                    template_type = HEAT_TEMPLATE_TYPE
-                elif driver_files.has_file('tosca.yaml') or driver_files.has_file('tosca.yml'):
-                    template_type = TOSCA_TEMPLATE_TYPE
-                else:
-                    # Default to Heat, there are no heat files but we'll let this fail later
-                    template_type = HEAT_TEMPLATE_TYPE
-            else:
-                template_type = template_type.upper()
-            if template_type == TOSCA_TEMPLATE_TYPE.upper():
-                heat_template = self.__get_heat_template_from_tosca(driver_files)
-            elif template_type == HEAT_TEMPLATE_TYPE.upper():
-                heat_template = self.__get_heat_template(driver_files)
-                files = self.__gather_additional_heat_files(driver_files)
-                if len(files) > 0:
-                    kwargs['files'] = files
+                return input_stack_id
+        return None
+
+    def __stack_name(self, system_properties):
+        if 'resourceId' in system_properties and 'resourceName' in system_properties:
+            return self.stack_name_creator.create(system_properties['resourceId'], system_properties['resourceName'])
+        return 's' + str(uuid4())
+
+    def __handle_create(self, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location):
+        stack_id = None
+        request_id =None
+        input_stack_id = self.__input_stack_id(resource_properties)
+        if input_stack_id is not None:
+            try:
+                ##Check for valid stack
+                openstack_location.heat_driver.get_stack(input_stack_id.strip())
+            except StackNotFoundError as e:
+                raise InfrastructureNotFoundError(str(e)) from e
             else:
-                raise InvalidDriverFilesError('Cannot create using template of type \'{0}\'. Must be one of: {1}'.format(template_type, [TOSCA_TEMPLATE_TYPE, HEAT_TEMPLATE_TYPE]))
+                stack_id = input_stack_id
+        if stack_id is None:
+            stack_name = self.__stack_name(system_properties)
+            stack_id, request_id = self.__create_stack(stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location)
+        associated_topology = self.__build_associated_topology_response(stack_id)
+        return LifecycleExecuteResponse(request_id, associated_topology=associated_topology)
+
+    def __handle_async_create(self, driver_files, system_properties, resource_properties, request_properties, openstack_location):
+        stack_name = self.__stack_name(system_properties)
+        request_id = build_request_id(ASYNC_CREATE_REQUEST_PREFIX, stack_name, operation_id=new_operation_id())
+        create_func = functools.partial(self.__create_in_background, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location)
+        create_jobs.submit(request_id, create_func)
+        logger.debug('Accepted create of stack %s, request %s', stack_name, request_id)
+        # The stack is added to the associated topology by get_lifecycle_execution once it exists
+        return LifecycleExecuteResponse(request_id)
+
+    def __create_in_background(self, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location):
+        try:
+            # The pool of background threads caps the translations done at once, so these are not admitted through admission control
+            stack_id, _ = self.__create_stack(stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, admit=False)
+            return stack_id
+        finally:
+            self.__clean_up(driver_files, openstack_location)
+
+    def __create_stack(self, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, admit=True):
+        create_func = functools.partial(self.__create_stack_once, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, admit)
+        if self.resource_driver_config.detect_duplicate_stacks is not True:
+            return create_func()
+        # A Create redelivered while the first is still translating waits for it, as the stack it would find doesn't exist yet
+        (stack_id, request_id), shared = self.__creates_in_flight.do((openstack_location.name, stack_name), create_func)
+        if shared:
+            logger.info('Create of stack %s coalesced with one already in progress, returning stack %s', stack_name, stack_id)
+            metrics.DUPLICATE_CREATES.labels(source='coalesced').inc()
+        return stack_id, request_id
+
+    def __create_stack_once(self, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, admit):
+        preparing_heat_driver = self.__start_preparing_heat_driver(openstack_location)
+        try:
+            return self.__prepare_and_create_stack(stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, preparing_heat_driver, admit)
+        finally:
+            if preparing_heat_driver is not None:
+                # Nothing is left using the location after the request has finished with it (e.g. when the template was invalid)
+                preparing_heat_driver.cancel()
+                futures.wait([preparing_heat_driver])
+
+    def __start_preparing_heat_driver(self, openstack_location):
+        executor = self.__authentication_executor
+        if executor is None:
+            return None
+        # Runs in a copy of the request's context, so has the same deadline and is included in it's profiling
+        context = contextvars.copy_context()
+        return executor.submit(context.run, with_logging_context(self.__prepare_heat_driver), openstack_location)
+
+    def __prepare_heat_driver(self, openstack_location):
+        with metrics.lifecycle_stage(CREATE_LIFECYCLE, STAGE_AUTHENTICATE):
+            return openstack_location.prepare_heat_driver()
+
+    def __await_heat_driver(self, openstack_location, preparing_heat_driver):
+        if preparing_heat_driver is None or preparing_heat_driver.cancel():
+            # Not started as all threads were busy, so authenticates on the first call to Heat as it would without overlapping
+            return openstack_location.heat_driver
+        with metrics.lifecycle_stage(CREATE_LIFECYCLE, STAGE_AWAIT_AUTHENTICATION):
+            # Raises the error authenticating (if any), as the first call to Heat would have
+            return preparing_heat_driver.result()
+
+    def __prepare_and_create_stack(self, stack_name, driver_files, system_properties, resource_properties, request_properties, openstack_location, preparing_heat_driver, admit):
+        kwargs = {}
+        heat_template, files, template_digest = self.__prepare_template(CREATE_LIFECYCLE, driver_files, request_properties, admit)
+        if files:
+            kwargs['files'] = files
+        with metrics.lifecycle_stage(CREATE_LIFECYCLE, STAGE_FILTER_INPUTS):
             heat_input_util = openstack_location.get_heat_input_util()
             input_props = self.props_merger.merge(resource_properties, system_properties)
             heat_inputs = heat_input_util.filter_used_properties(heat_template, input_props)
-            if 'resourceId' in system_properties and 'resourceName' in system_properties:
-                stack_name = self.stack_name_creator.create(system_properties['resourceId'], system_properties['resourceName'])
+        tags = self.__stack_tags(system_properties, template_digest)
+        heat_driver = self.__await_heat_driver(openstack_location, preparing_heat_driver)
+        if self.resource_driver_config.detect_duplicate_stacks is True:
+            # Checked after translation, so authentication still overlaps it. A redelivered Create pays for translation but not a second stack
+            with metrics.lifecycle_stage(CREATE_LIFECYCLE, STAGE_FIND_DUPLICATE):
+                existing_stack = self.__find_duplicate_stack(heat_driver, stack_name, tags)
+            if existing_stack is not None:
+                stack_id = existing_stack['id']
+                logger.info('Stack %s already exists with id %s, returning it rather than creating another', stack_name, stack_id)
+                metrics.DUPLICATE_CREATES.labels(source='existing').inc()
+                return stack_id, build_request_id(CREATE_REQUEST_PREFIX, str(stack_id))
+        with metrics.lifecycle_stage(CREATE_LIFECYCLE, STAGE_CREATE):
+            return heat_driver.create_stack(stack_name, heat_template, heat_inputs, tags=tags, **kwargs)
+
+    def __prepare_template(self, lifecycle, driver_files, request_properties, admit):
+        """
+        Reads (and translates, if TOSCA) the template of the request, returning the Heat template, it's additional files (HEAT only) and digest
+        """
+        template_type, template, template_path, files, template_digest = self.__read_template(lifecycle, driver_files, request_properties)
+        heat_template = self.__translate_template(lifecycle, template_type, template, template_path, admit)
+        return heat_template, files, template_digest
+
+    def __read_template(self, lifecycle, driver_files, request_properties):
+        """
+        Reads the template of the request, returning it's type, the template, it's path (TOSCA only), additional files (HEAT only) and digest
+        """
+        template_path = None
+        files = None
+        template_type = request_properties.get('template-type', None)
+        if template_type == None:
+            # Try and guess based on files
+            # Heat to take precedence
+            if driver_files.has_file('heat.yaml') or driver_files.has_file('heat.yml'):
+                template_type = HEAT_TEMPLATE_TYPE
+            elif driver_files.has_file('tosca.yaml') or driver_files.has_file('tosca.yml'):
+                template_type = TOSCA_TEMPLATE_TYPE
             else:
-                stack_name = 's' + str(uuid4())       
-            stack_id,request_id = heat_driver.create_stack(stack_name, heat_template, heat_inputs, **kwargs)
-        associated_topology = self.__build_associated_topology_response(stack_id)
-        return LifecycleExecuteResponse(request_id, associated_topology=associated_topology)
+                # Default to Heat, there are no heat files but we'll let this fail later
+                template_type = HEAT_TEMPLATE_TYPE
+        else:
+            template_type = template_type.upper()
+        if template_type == TOSCA_TEMPLATE_TYPE.upper():
+            with metrics.lifecycle_stage(lifecycle, STAGE_READ_FILES):
+                template, template_path = self.__read_tosca_template(driver_files)
+                template_digest = self.__template_digest(template)
+        elif template_type == HEAT_TEMPLATE_TYPE.upper():
+            with metrics.lifecycle_stage(lifecycle, STAGE_READ_FILES):
+                template = self.__get_heat_template(driver_files)
+                files = self.__gather_additional_heat_files(driver_files)
+                template_digest = self.__template_digest(template, files)
+        else:
+            raise InvalidDriverFilesError('Cannot {0} using template of type \'{1}\'. Must be one of: {2}'.format(lifecycle, template_type, [TOSCA_TEMPLATE_TYPE, HEAT_TEMPLATE_TYPE]))
+        return template_type, template, template_path, files, template_digest
+
+    def __translate_template(self, lifecycle, template_type, template, template_path, admit):
+        if template_type != TOSCA_TEMPLATE_TYPE.upper():
+            return template
+        # Translation is CPU heavy, so is limited to leave capacity for other requests
+        with admission_control.translation() if admit else contextlib.nullcontext(), metrics.lifecycle_stage(lifecycle, STAGE_TRANSLATE):
+            return self.__translate_tosca_template(template, template_path)
+
+    def __template_digest(self, template, files=None):
+        digest = hashlib.sha256(template.encode('utf-8'))
+        for file_name in sorted((files or {}).keys()):
+            digest.update(b'\0' + file_name.encode('utf-8') + b'\0' + files[file_name].encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    def __stack_tags(self, system_properties, template_digest):
+        tags = [TEMPLATE_TAG_PREFIX + template_digest]
+        resource_tag = self.__resource_tag(system_properties)
+        if resource_tag is not None:
+            tags.insert(0, resource_tag)
+        return tags
+
+    def __resource_tag(self, system_properties):
+        if 'resourceId' not in system_properties or system_properties['resourceId'] is None:
+            return None
+        # Tags are sent comma separated, so only characters allowed in stack names are kept
+        resource_id = re.sub('[^A-Za-z0-9_.-]+', '', str(system_properties['resourceId']))
+        if len(resource_id) == 0:
+            return None
+        return (RESOURCE_TAG_PREFIX + resource_id)[:MAX_TAG_LENGTH]
+
+    def __find_duplicate_stack(self, heat_driver, stack_name, tags):
+        resource_tags = [tag for tag in tags if tag.startswith(RESOURCE_TAG_PREFIX)]
+        if len(resource_tags) == 0:
+            # Without a resource ID there is nothing to tell this resource's stack from another with the same name
+            return None
+        resource_tag = resource_tags[0]
+        candidates = heat_driver.find_stacks(stack_name=stack_name)
+        if len(candidates) == 0:
+            # Finds the stack of the resource even if it was given another name (e.g. the resource was renamed)
+            candidates = heat_driver.find_stacks(tags=resource_tags)
+        template_tag = next(tag for tag in tags if tag.startswith(TEMPLATE_TAG_PREFIX))
+        for stack in candidates:
+            stack_status = stack.get('stack_status', None)
+            if stack_status is not None and stack_status.startswith('DELETE'):
+                continue
+            stack_tags = stack.get('tags', None) or []
+            if resource_tag not in stack_tags:
+                # Not created for this resource, so the create goes ahead and fails if the name is taken
+                continue
+            stack_template_tags = [tag for tag in stack_tags if tag.startswith(TEMPLATE_TAG_PREFIX)]
+            # Stacks of the resource created before templates were tagged are assumed to be from the same template
+            if len(stack_template_tags) > 0 and template_tag not in stack_template_tags:
+                logger.warning('Stack %s (%s) exists for this resource but was created from a different template, so is not returned as a duplicate', stack.get('stack_name', None), stack.get('id', None))
+                continue
+            return stack
+        return None
 
     def __handle_adopt(self, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location):        
         stack_resource_entry = None
@@ -211,6 +461,56 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
         associated_topology = self.__build_associated_topology_response(stack_id)
         return LifecycleExecuteResponse(request_id, associated_topology=associated_topology)
 
+    def __handle_update(self, lifecycle_name, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location):
+        stack_resource_entry = associated_topology.get(STACK_NAME) if associated_topology is not None else None
+        if stack_resource_entry is None or stack_resource_entry.element_id is None or len(stack_resource_entry.element_id.strip()) == 0:
+            raise InvalidRequestError(f'You must supply the stack to {lifecycle_name} in associated_topology')
+        stack_id = stack_resource_entry.element_id.strip()
+        template_type, template, template_path, files, template_digest = self.__read_template(UPDATE_LIFECYCLE, driver_files, request_properties)
+        heat_driver = openstack_location.heat_driver
+        try:
+            stack = heat_driver.get_stack(stack_id)
+        except StackNotFoundError as e:
+            raise InfrastructureNotFoundError(str(e)) from e
+        if stack.get('stack_status', None) in [OS_STACK_STATUS_DELETE_COMPLETE, OS_STACK_STATUS_DELETE_IN_PROGRESS]:
+            raise InvalidRequestError(f'The stack \'{stack_id}\' has been deleted')
+        tags = self.__stack_tags(system_properties, template_digest)
+        stack_tags = stack.get('tags', None) or []
+        heat_input_util = openstack_location.get_heat_input_util()
+        input_props = self.props_merger.merge(resource_properties, system_properties)
+        request_id = build_request_id(UPDATE_REQUEST_PREFIX, stack_id, operation_id=self.__update_operation_id(stack))
+        if self.resource_driver_config.patch_parameter_updates is True and TEMPLATE_TAG_PREFIX + template_digest in stack_tags:
+            # Created (or last updated) from the same template, so only parameters have changed. Heat keeps the template and merges them in,
+            # so a TOSCA template isn't translated again and the inputs are those the stack already has parameters for
+            logger.debug('Template of stack %s is unchanged, updating it\'s parameters', stack_id)
+            with metrics.lifecycle_stage(UPDATE_LIFECYCLE, STAGE_FILTER_INPUTS):
+                heat_inputs = heat_input_util.filter_stack_parameters(stack.get('parameters', None) or {}, input_props)
+            with metrics.lifecycle_stage(UPDATE_LIFECYCLE, STAGE_UPDATE):
+                try:
+                    heat_driver.update_stack(stack_id, input_properties=heat_inputs, existing=True, driver_request_id=request_id)
+                except StackNotFoundError as e:
+                    raise InfrastructureNotFoundError(str(e)) from e
+        else:
+            heat_template = self.__translate_template(UPDATE_LIFECYCLE, template_type, template, template_path, True)
+            with metrics.lifecycle_stage(UPDATE_LIFECYCLE, STAGE_FILTER_INPUTS):
+                heat_inputs = heat_input_util.filter_used_properties(heat_template, input_props)
+            # Tags are replaced, so those not added by the driver are kept
+            tags = [tag for tag in stack_tags if not tag.startswith(TEMPLATE_TAG_PREFIX) and tag not in tags] + tags
+            with metrics.lifecycle_stage(UPDATE_LIFECYCLE, STAGE_UPDATE):
+                try:
+                    heat_driver.update_stack(stack_id, heat_template, heat_inputs, files=files, tags=tags, driver_request_id=request_id)
+                except StackNotFoundError as e:
+                    raise InfrastructureNotFoundError(str(e)) from e
+        associated_topology = self.__build_associated_topology_response(stack_id)
+        return LifecycleExecuteResponse(request_id, associated_topology=associated_topology)
+
+    def __update_operation_id(self, stack):
+        # Heat may start the update after answering the request, so polls tell it hasn't started from the stack's updated_time being unchanged
+        return new_operation_id() + UPDATE_OPERATION_SEPARATOR + self.__updated_time_digest(stack)
+
+    def __updated_time_digest(self, stack):
+        return hashlib.sha256(str(stack.get('updated_time', None)).encode('utf-8')).hexdigest()[:16]
+
     def __handle_delete(self, driver_files, system_properties, resource_properties, request_properties, associated_topology, openstack_location):
         stack_resource_entry = associated_topology.get(STACK_NAME)
         if stack_resource_entry is None:
@@ -231,6 +531,14 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
         return LifecycleExecuteResponse(request_id)
 
     def find_reference(self, instance_name, driver_files, deployment_location):
+        span_attributes = {'instance_name': instance_name, 'deployment_location.name': self.__location_name(deployment_location)}
+        with metrics.track_lifecycle_request('find_reference'), \
+                profiler.profile_request('find_reference', description=instance_name), \
+                tracer.start_span('find_reference', kind=SPAN_KIND_SERVER, attributes=span_attributes, parent_context=extract_request_context()), \
+                timeout_policy.request_deadline_for('find_reference'):
+            return self.__find_reference(instance_name, driver_files, deployment_location)
+
+    def __find_reference(self, instance_name, driver_files, deployment_location):
         openstack_location = None
         try:
             openstack_location = self.location_translator.from_deployment_location(deployment_location)
@@ -258,6 +566,9 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
                 openstack_location.close()
 
 
+    def __location_name(self, deployment_location):
+        return deployment_location.get('name', None) if isinstance(deployment_location, dict) else None
+
     def __split_request_id(self, request_id):
         split_parts = request_id.split(REQUEST_ID_SEPARATOR)
         if len(split_parts) != 3:
@@ -283,7 +594,7 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
             template = f.read()
         return template
 
-    def __get_heat_template_from_tosca(self, driver_files):
+    def __read_tosca_template(self, driver_files):
         if driver_files.has_file('tosca.yaml'):
             template_path = driver_files.get_file_path('tosca.yaml')
         elif driver_files.has_file('tosca.yml'):
@@ -292,6 +603,9 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
             raise InvalidDriverFilesError('Missing \'tosca.yaml\' or \'tosca.yml\' file')
         with open(template_path, 'r') as f:
             template = f.read()
+        return template, template_path
+
+    def __translate_tosca_template(self, template, template_path):
         try:
             heat_template = self.heat_translator.generate_heat_template(template, template_path=template_path)
         except ToscaValidationError as e:
@@ -325,43 +639,147 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
         return files
 
     def get_lifecycle_execution(self, request_id, deployment_location):
+        span_attributes = {'request_id': request_id, 'deployment_location.name': self.__location_name(deployment_location)}
+        with metrics.track_lifecycle_request('get_lifecycle_execution'), \
+                profiler.profile_request('get_lifecycle_execution', description=request_id), \
+                tracer.start_span('get_lifecycle_execution', kind=SPAN_KIND_SERVER, attributes=span_attributes, parent_context=extract_request_context()), \
+                timeout_policy.request_deadline_for('get_lifecycle_execution'):
+            return self.__get_lifecycle_execution(request_id, deployment_location)
+
+    def __get_lifecycle_execution(self, request_id, deployment_location):
+        # A finished request's outcome doesn't change, so there's no need to read the stack again
+        execution = request_journal.get_finished(self.__location_name(deployment_location), request_id)
+        if execution is not None:
+            return execution
+        if not lifecycle_status_cache.enabled:
+            return self.__observe_lifecycle_execution(request_id, deployment_location)
+        cache_key = (self.__location_name(deployment_location), request_id)
+        execution = lifecycle_status_cache.get(cache_key)
+        if execution is not None:
+            # Return the last known (in progress) status straight away and read the stack again for the next poll
+            self.__refresh_lifecycle_execution(cache_key, request_id, deployment_location)
+            return execution
+        execution = self.__observe_lifecycle_execution(request_id, deployment_location)
+        lifecycle_status_cache.put(cache_key, execution)
+        return execution
+
+    def __observe_lifecycle_execution(self, request_id, deployment_location):
+        execution = self.__read_lifecycle_execution(request_id, deployment_location)
+        self.__journal_execution(request_id, deployment_location, execution)
+        return execution
+
+    def __journal_execution(self, request_id, deployment_location, execution):
+        if request_journal.enabled:
+            request_type, stack_id, _ = self.__split_request_id(request_id)
+            request_journal.record_execution(self.__location_name(deployment_location), request_id, request_type, stack_id, execution)
+
+    def __refresh_lifecycle_execution(self, cache_key, request_id, deployment_location):
+        stack_id, create_job, execution = self.__find_execution_stack(request_id)
+        if execution is not None:
+            # Known without reading the stack
+            self.__journal_execution(request_id, deployment_location, execution)
+            lifecycle_status_cache.put(cache_key, execution)
+            return
+        # Read with the stacks of other executions in progress at the same location
+        lifecycle_status_cache.refresh(cache_key, StackStatusRead(self.__location_name(deployment_location), stack_id,
+                                                                  functools.partial(self.location_translator.from_deployment_location, deployment_location),
+                                                                  functools.partial(self.__refreshed_lifecycle_execution, request_id, deployment_location, stack_id, create_job)))
+
+    def __refreshed_lifecycle_execution(self, request_id, deployment_location, stack_id, create_job, stack):
+        if isinstance(stack, StackNotFoundError):
+            execution = self.__stack_not_found_execution(request_id, stack_id, create_job, stack)
+        elif isinstance(stack, Exception):
+            raise stack
+        else:
+            execution = self.__build_execution_response(stack, request_id)
+        self.__journal_execution(request_id, deployment_location, execution)
+        return execution
+
+    def __find_execution_stack(self, request_id):
+        """
+        Returns the ID of the stack to read for the execution, the background create job (if any) and the execution when it can
+        be determined without reading the stack
+        """
+        request_type, stack_id, _ = self.__split_request_id(request_id)
+        create_job = None
+        if request_type == ASYNC_CREATE_REQUEST_PREFIX:
+            # Only known to the worker process which accepted the create, others can only look for the stack by it's name
+            create_job = create_jobs.get(request_id)
+            if create_job is not None:
+                if create_job.state == JOB_PENDING:
+                    return stack_id, create_job, LifecycleExecution(request_id, STATUS_IN_PROGRESS)
+                elif create_job.state == JOB_FAILED:
+                    return stack_id, create_job, LifecycleExecution(request_id, STATUS_FAILED, failure_details=FailureDetails(FAILURE_CODE_INFRASTRUCTURE_ERROR, str(create_job.error)))
+                stack_id = create_job.stack_id
+        return stack_id, create_job, None
+
+    def __read_lifecycle_execution(self, request_id, deployment_location):
+        stack_id, create_job, execution = self.__find_execution_stack(request_id)
+        if execution is not None:
+            return execution
         openstack_location = self.location_translator.from_deployment_location(deployment_location)
-        heat_driver = openstack_location.heat_driver
-        request_type, stack_id, operation_id = self.__split_request_id(request_id)
         try:
-            stack = heat_driver.get_stack(stack_id, request_id)            
-        except StackNotFoundError as e:
-            logger.debug('Stack not found: %s', stack_id)
-            if request_type == DELETE_REQUEST_PREFIX:
-                logger.debug('Stack not found on delete request, returning task as successful: %s', stack_id)
-                return LifecycleExecution(request_id, STATUS_COMPLETE)
-            else:
-                raise InfrastructureNotFoundError(str(e)) from e
-        logger.debug('Retrieved stack: %s', stack)
-        return self.__build_execution_response(stack, request_id)
+            heat_driver = openstack_location.heat_driver
+            try:
+                stack = heat_driver.get_stack(stack_id, request_id)            
+            except StackNotFoundError as e:
+                return self.__stack_not_found_execution(request_id, stack_id, create_job, e)
+            logger.debug('Retrieved stack: %s', stack)
+            return self.__build_execution_response(stack, request_id)
+        finally:
+            openstack_location.close()
+
+    def __stack_not_found_execution(self, request_id, stack_id, create_job, error):
+        request_type, _, operation_id = self.__split_request_id(request_id)
+        logger.debug('Stack not found: %s', stack_id)
+        if request_type == DELETE_REQUEST_PREFIX:
+            logger.debug('Stack not found on delete request, returning task as successful: %s', stack_id)
+            return LifecycleExecution(request_id, STATUS_COMPLETE)
+        elif request_type == ASYNC_CREATE_REQUEST_PREFIX and create_job is None:
+            return self.__determine_pending_create_execution(request_id, stack_id, operation_id)
+        else:
+            raise InfrastructureNotFoundError(str(error)) from error
+
+    def __determine_pending_create_execution(self, request_id, stack_name, operation_id):
+        # The create may still be translating in another worker process, or have failed there before reaching Heat
+        accepted = accepted_at(operation_id)
+        if accepted is not None and time.time() - accepted < create_jobs.max_pending:
+            logger.debug('Stack %s not created yet, setting status in response to %s', stack_name, STATUS_IN_PROGRESS)
+            return LifecycleExecution(request_id, STATUS_IN_PROGRESS)
+        description = 'Stack \'{0}\' was not created within {1} seconds of the request being accepted'.format(stack_name, create_jobs.max_pending)
+        return LifecycleExecution(request_id, STATUS_FAILED, failure_details=FailureDetails(FAILURE_CODE_INFRASTRUCTURE_ERROR, description))
 
     def __build_execution_response(self, stack, request_id):
         request_type, stack_id, operation_id = self.__split_request_id(request_id)
         stack_status = stack.get('stack_status', None)
         failure_details = None
-        if request_type == CREATE_REQUEST_PREFIX:
+        if request_type == CREATE_REQUEST_PREFIX or request_type == ASYNC_CREATE_REQUEST_PREFIX:
             status = self.__determine_create_status(request_id, stack_id, stack_status)
         elif request_type == ADOPT_REQUEST_PREFIX:
             status = self.__determine_adopt_status(request_id, stack_id, stack_status)
+        elif request_type == UPDATE_REQUEST_PREFIX:
+            status = self.__determine_update_status(request_id, stack, operation_id)
         else:
             status = self.__determine_delete_status(request_id, stack_id, stack_status)
         if status == STATUS_FAILED:
             description = stack.get('stack_status_reason', None)
             if request_type == ADOPT_REQUEST_PREFIX:
                 description = "Adopt failed: cannot adopt stack with status "+stack.get('stack_status', None)
+            elif request_type == UPDATE_REQUEST_PREFIX and not self.__update_started(stack, operation_id):
+                description = 'Update of stack \'{0}\' was not started by Heat within {1} seconds'.format(stack_id, self.resource_driver_config.update_start_timeout)
+            elif stack_status in [OS_STACK_STATUS_ROLLBACK_COMPLETE, OS_STACK_STATUS_ROLLBACK_FAILED]:
+                description = 'Update failed and was rolled back ({0}): {1}'.format(stack_status, description)
             failure_details = FailureDetails(FAILURE_CODE_INFRASTRUCTURE_ERROR, description)
             status_reason = stack.get('stack_status_reason', None)
         outputs = None
         associated_topology = None
-        if request_type == CREATE_REQUEST_PREFIX or request_type == ADOPT_REQUEST_PREFIX:
+        if request_type in [CREATE_REQUEST_PREFIX, ASYNC_CREATE_REQUEST_PREFIX, ADOPT_REQUEST_PREFIX, UPDATE_REQUEST_PREFIX]:
             outputs_from_stack = stack.get('outputs', [])
             outputs = self.__translate_outputs_to_values_dict(outputs_from_stack)                               
-        return LifecycleExecution(request_id, status, failure_details=failure_details, outputs=outputs)
+        if request_type == ASYNC_CREATE_REQUEST_PREFIX:
+            # Not returned when the create was accepted, as the stack didn't exist yet
+            associated_topology = self.__build_associated_topology_response(stack.get('id'))
+        return LifecycleExecution(request_id, status, failure_details=failure_details, outputs=outputs, associated_topology=associated_topology)
 
     def __determine_create_status(self, request_id, stack_id, stack_status):
         if stack_status in [OS_STACK_STATUS_CREATE_IN_PROGRESS, OS_STACK_STATUS_ADOPT_IN_PROGRESS]:
@@ -391,6 +809,33 @@ class ResourceDriverHandler(Service, ResourceDriverHandlerCapability):
         logger.debug('Stack %s has stack_status %s, setting status in response to %s', stack_id, stack_status, adopt_status)
         return adopt_status  
 
+    def __determine_update_status(self, request_id, stack, operation_id):
+        stack_id = stack.get('id', None)
+        stack_status = stack.get('stack_status', None)
+        if not self.__update_started(stack, operation_id):
+            # Still shows the outcome of whatever was done to the stack before
+            accepted = accepted_at(operation_id.split(UPDATE_OPERATION_SEPARATOR)[0])
+            if accepted is None or time.time() - accepted < self.resource_driver_config.update_start_timeout:
+                update_status = STATUS_IN_PROGRESS
+            else:
+                update_status = STATUS_FAILED
+        elif stack_status in [OS_STACK_STATUS_UPDATE_IN_PROGRESS, OS_STACK_STATUS_ROLLBACK_IN_PROGRESS]:
+            update_status = STATUS_IN_PROGRESS
+        elif stack_status in [OS_STACK_STATUS_UPDATE_COMPLETE]:
+            update_status = STATUS_COMPLETE
+        elif stack_status in [OS_STACK_STATUS_UPDATE_FAILED, OS_STACK_STATUS_ROLLBACK_COMPLETE, OS_STACK_STATUS_ROLLBACK_FAILED]:
+            update_status = STATUS_FAILED
+        else:
+            raise ResourceDriverError(f'Cannot determine status for request \'{request_id}\' as the current Stack status is \'{stack_status}\' which is not a valid value for the expected transition')
+        logger.debug('Stack %s has stack_status %s, setting status in response to %s', stack_id, stack_status, update_status)
+        return update_status
+
+    def __update_started(self, stack, operation_id):
+        parts = operation_id.split(UPDATE_OPERATION_SEPARATOR)
+        if len(parts) != 2 or stack.get('stack_status', None) in [OS_STACK_STATUS_UPDATE_IN_PROGRESS, OS_STACK_STATUS_ROLLBACK_IN_PROGRESS]:
+            return True
+        return parts[1] != self.__updated_time_digest(stack)
+
     def __determine_delete_status(self, request_id, stack_id, stack_status):
         if stack_status in [OS_STACK_STATUS_DELETE_IN_PROGRESS]:
             delete_status = STATUS_IN_PROGRESS
@@ -0,0 +1,125 @@
+import socket
+import ssl
+from urllib.parse import urlparse, unquote
+
+DEFAULT_PORT = 6379
+
+
+class RespError(Exception):
+    """
+    Error reply from the server, or a failure talking to it
+    """
+    pass
+
+
+class RespConnection():
+    """
+    Minimal client of the Redis serialization protocol (RESP2), enough for the commands used by the Redis cache backend.
+    Not thread safe, each thread should use it's own connection
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, db=0, username=None, password=None, timeout=1, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.__socket = None
+        self.__reader = None
+
+    @staticmethod
+    def from_url(url, timeout=1):
+        """
+        Creates a connection from a redis://[[username]:password@]host[:port][/db] URL (rediss:// for TLS)
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ['redis', 'rediss']:
+            raise ValueError('Redis URL must start with redis:// or rediss://, not: {0}'.format(url))
+        db = parsed.path.lstrip('/')
+        return RespConnection(parsed.hostname or 'localhost', port=parsed.port or DEFAULT_PORT, db=int(db) if db else 0,
+                              username=unquote(parsed.username) if parsed.username else None,
+                              password=unquote(parsed.password) if parsed.password else None, timeout=timeout,
+                              ssl_context=ssl.create_default_context() if parsed.scheme == 'rediss' else None)
+
+    def execute(self, *args):
+        if self.__socket is None:
+            self.__connect()
+        try:
+            self.__socket.sendall(self.__encode(args))
+            reply = self.__read_reply()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise RespError('Request to {0}:{1} failed: {2}'.format(self.host, self.port, str(e))) from e
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def close(self):
+        sock = self.__socket
+        self.__socket = None
+        self.__reader = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def __connect(self):
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            if self.ssl_context is not None:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+        except OSError as e:
+            raise RespError('Could not connect to {0}:{1}: {2}'.format(self.host, self.port, str(e))) from e
+        self.__socket = sock
+        self.__reader = sock.makefile('rb')
+        try:
+            if self.password is not None:
+                self.execute(*(['AUTH', self.username, self.password] if self.username is not None else ['AUTH', self.password]))
+            if self.db != 0:
+                self.execute('SELECT', self.db)
+        except RespError:
+            self.close()
+            raise
+
+    def __encode(self, args):
+        parts = [b'*' + str(len(args)).encode('ascii') + b'\r\n']
+        for arg in args:
+            if isinstance(arg, bytes):
+                value = arg
+            else:
+                value = str(arg).encode('utf-8')
+            parts.append(b'$' + str(len(value)).encode('ascii') + b'\r\n' + value + b'\r\n')
+        return b''.join(parts)
+
+    def __read_line(self):
+        line = self.__reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ValueError('Connection closed by server')
+        return line[:-2]
+
+    def __read_reply(self):
+        line = self.__read_line()
+        reply_type, content = line[:1], line[1:]
+        if reply_type == b'+':
+            return content.decode('utf-8')
+        if reply_type == b'-':
+            return RespError(content.decode('utf-8'))
+        if reply_type == b':':
+            return int(content)
+        if reply_type == b'$':
+            length = int(content)
+            if length < 0:
+                return None
+            value = self.__reader.read(length + 2)
+            if len(value) != length + 2:
+                raise ValueError('Connection closed by server')
+            return value[:-2]
+        if reply_type == b'*':
+            length = int(content)
+            if length < 0:
+                return None
+            return [self.__read_reply() for _ in range(length)]
+        raise ValueError('Unexpected reply from server: {0}'.format(line))
@@ -0,0 +1,63 @@
+import logging
+import random
+from ignition.service.config import ConfigurationPropertiesGroup
+from osvimdriver.openstack.errors import is_retryable_error
+
+logger = logging.getLogger(__name__)
+
+
+class RetryProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('retry')
+        self.enabled = True
+        # Total number of attempts made for an idempotent request (e.g. get_stack), including the first
+        self.max_attempts = 3
+        # Seconds waited before the first retry, doubled for each retry after it (up to max_delay) and jittered
+        self.base_delay = 0.5
+        self.max_delay = 5
+
+
+class RetryPolicy():
+    """
+    Decides if, and after how long, a failed idempotent request to Openstack should be retried. Delays use exponential
+    backoff with "full jitter" (a random delay between 0 and the backoff) so retries from many requests are spread out
+    """
+
+    def __init__(self, max_attempts=1, base_delay=0.5, max_delay=5, random_func=random.random):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random_func = random_func
+
+    def configure(self, properties):
+        self.max_attempts = properties.max_attempts if properties.enabled is True else 1
+        self.base_delay = properties.base_delay
+        self.max_delay = properties.max_delay
+
+    def next_delay(self, attempt, error):
+        """
+        Returns the seconds to wait before making the next attempt, or None if the error should be raised.
+        The attempt is the number of the attempt which failed, starting at 1
+        """
+        if attempt >= self.max_attempts or not is_retryable_error(error):
+            return None
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return backoff * self.random_func()
+
+
+retry_policy = RetryPolicy()
+
+
+class RetryConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        retry_properties = configuration.property_groups.get_property_group(RetryProperties)
+        if retry_properties.enabled is True:
+            logger.debug('Retrying idempotent Openstack requests up to {0} attempts'.format(retry_properties.max_attempts))
+        else:
+            logger.debug('Disabled: retrying Openstack requests')
+        retry_policy.configure(retry_properties)
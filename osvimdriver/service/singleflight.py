@@ -0,0 +1,58 @@
+import threading
+
+
+class _Call():
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight():
+    """
+    Coalesces concurrent calls with the same key: the first runs and any made while it's running wait for, and share, it's result
+    (or error) rather than running again
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+
+    def do(self, key, func):
+        """
+        Returns a tuple of the result of func and whether it was shared with (i.e. produced by) an earlier call with the same key
+        """
+        with self.__lock:
+            call = self.__calls.get(key, None)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.__calls[key] = call
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = func()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Removed before waking the others, so calls made after this one finished run again
+            with self.__lock:
+                self.__calls.pop(key, None)
+            call.done.set()
+
+    def waiters(self, key):
+        """
+        Returns the number of calls waiting on the one in progress with the given key
+        """
+        with self.__lock:
+            call = self.__calls.get(key, None)
+            return call.waiters if call is not None else 0
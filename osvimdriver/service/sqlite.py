@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import threading
+
+
+def connect(path, busy_timeout=5):
+    connection = sqlite3.connect(path, timeout=busy_timeout)
+    # Readers don't block the writer (and the other way round), so worker processes can share the database
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class ThreadLocalConnections():
+    """
+    Connections to a SQLite database file, one for each thread as SQLite connections can't be shared between threads
+    (or with forked processes)
+    """
+
+    def __init__(self, path, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.__local = threading.local()
+
+    def get(self):
+        local = self.__local
+        connection = getattr(local, 'connection', None)
+        if connection is None or local.pid != os.getpid():
+            connection = connect(self.path, busy_timeout=self.busy_timeout)
+            local.connection = connection
+            local.pid = os.getpid()
+        return connection
+
+    def execute_script(self, statements):
+        connection = connect(self.path, busy_timeout=self.busy_timeout)
+        try:
+            with connection:
+                for statement in statements:
+                    connection.execute(statement)
+        finally:
+            connection.close()
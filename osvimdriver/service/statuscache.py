@@ -0,0 +1,219 @@
+import asyncio
+import functools
+import logging
+import threading
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.model.associated_topology import AssociatedTopology
+from ignition.model.lifecycle import LifecycleExecution, STATUS_IN_PROGRESS
+from ignition.model.failure import FailureDetails
+from osvimdriver.openstack.heat.async_driver import AsyncHeatDriver
+from osvimdriver.service.cache import caches, CacheCodec
+from osvimdriver.service.common import with_logging_context
+import osvimdriver.service.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StatusCacheProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('status_cache')
+        self.enabled = False
+        # Seconds after it was read from Heat that an in progress status may still be returned to a poll
+        self.max_staleness = 15
+        self.max_size = 10000
+        # Number of stacks of a deployment location read at once by the background refresh (in each worker process)
+        self.refresh_concurrency = 8
+
+
+def _encode_execution(execution):
+    failure_details = execution.failure_details
+    return {
+        'requestId': execution.request_id,
+        'status': execution.status,
+        'failureDetails': {'failureCode': failure_details.failure_code, 'description': failure_details.description} if failure_details is not None else None,
+        'outputs': execution.outputs,
+        'associatedTopology': execution.associated_topology.to_dict() if execution.associated_topology is not None else None
+    }
+
+
+def _decode_execution(data):
+    failure_details = data.get('failureDetails')
+    associated_topology = data.get('associatedTopology')
+    return LifecycleExecution(data['requestId'], data['status'],
+                              failure_details=FailureDetails(failure_details['failureCode'], failure_details['description']) if failure_details is not None else None,
+                              outputs=data.get('outputs'),
+                              associated_topology=AssociatedTopology.from_dict(associated_topology) if associated_topology is not None else None)
+
+
+# So statuses can be shared by worker processes (and pods) with the sqlite or redis cache backends
+EXECUTION_CODEC = CacheCodec(_encode_execution, _decode_execution)
+
+
+class StackStatusRead():
+    """
+    Background read of the stack of an in progress lifecycle execution
+    """
+
+    def __init__(self, location_name, stack_id, open_location, complete):
+        self.location_name = location_name
+        self.stack_id = stack_id
+        # Returns the OpenstackDeploymentLocation to read the stack from
+        self.open_location = open_location
+        # Returns the execution, given the stack read (or the error raised reading it)
+        self.complete = complete
+
+
+class StatusRefresher():
+    """
+    Makes background reads on an event loop in a thread of it's own, so the stacks of many executions are read at once without
+    a thread each. Each deployment location has one batch of reads in flight at a time, made with one AsyncOpenstackSession, and
+    reads queued meanwhile are made together in the next
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.__lock = threading.Lock()
+        self.__loop = None
+        self.__queued = {}
+
+    def submit(self, read, callback):
+        with self.__lock:
+            if self.__loop is None:
+                self.__loop = asyncio.new_event_loop()
+                threading.Thread(target=self.__loop.run_forever, name='ovd-status-refresh', daemon=True).start()
+            queued = self.__queued.get(read.location_name, None)
+            if queued is None:
+                # No batch in flight for the location
+                self.__queued[read.location_name] = [(read, callback)]
+                asyncio.run_coroutine_threadsafe(self.__read_location(read.location_name), self.__loop)
+            else:
+                queued.append((read, callback))
+
+    def stop(self):
+        with self.__lock:
+            loop = self.__loop
+            self.__loop = None
+            self.__queued = {}
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+    async def __read_location(self, location_name):
+        while True:
+            with self.__lock:
+                queued = self.__queued.get(location_name, None)
+                if not queued:
+                    self.__queued.pop(location_name, None)
+                    return
+                self.__queued[location_name] = []
+            await self.__read_batch(queued)
+
+    async def __read_batch(self, queued):
+        stack_ids = list(dict.fromkeys(read.stack_id for read, _ in queued))
+        try:
+            results = await self.__read_stacks(queued[0][0], stack_ids)
+        except Exception as e:
+            results = {stack_id: e for stack_id in stack_ids}
+        for read, callback in queued:
+            callback(results[read.stack_id])
+
+    async def __read_stacks(self, read, stack_ids):
+        # Creating the location (and it's keystone session) is blocking
+        openstack_location = await asyncio.get_running_loop().run_in_executor(None, read.open_location)
+        try:
+            async with openstack_location.create_async_session() as async_session:
+                return await AsyncHeatDriver(async_session).get_many_stacks(stack_ids, max_concurrency=self.max_concurrency)
+        finally:
+            openstack_location.close()
+
+
+class LifecycleStatusCache():
+    """
+    Stale-while-revalidate cache of the in progress lifecycle executions returned to get_lifecycle_execution requests.
+
+    Only IN_PROGRESS executions are held, so a COMPLETE or FAILED status is only ever returned from a read of the stack made
+    while handling the poll, never from the cache. Entries are keyed by request ID, so the status of one operation on a stack is never
+    returned for another
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__cache = None
+        self.__refresher = None
+        self.__refreshing = set()
+
+    def configure(self, properties):
+        with self.__lock:
+            refresher = self.__refresher
+            if properties is None or properties.enabled is not True:
+                self.__cache = None
+                self.__refresher = None
+            else:
+                self.__cache = caches.create('status', properties.max_staleness, max_size=properties.max_size, codec=EXECUTION_CODEC)
+                self.__refresher = StatusRefresher(properties.refresh_concurrency)
+            self.__refreshing = set()
+        if refresher is not None:
+            refresher.stop()
+
+    @property
+    def enabled(self):
+        return self.__cache is not None
+
+    def get(self, key):
+        cache = self.__cache
+        if cache is None:
+            return None
+        execution = cache.get(key)
+        metrics.LIFECYCLE_STATUS_CACHE_REQUESTS.labels(result='hit' if execution is not None else 'miss').inc()
+        return execution
+
+    def put(self, key, execution):
+        cache = self.__cache
+        if cache is None:
+            return
+        if execution.status == STATUS_IN_PROGRESS:
+            cache.put(key, execution)
+        else:
+            cache.remove(key)
+
+    def refresh(self, key, read):
+        """
+        Reads the stack of the execution again in the background (a StackStatusRead), unless a refresh of the same key is already running
+        """
+        with self.__lock:
+            refresher = self.__refresher
+            if refresher is None or key in self.__refreshing:
+                return
+            self.__refreshing.add(key)
+        refresher.submit(read, with_logging_context(functools.partial(self.__refreshed, key, read)))
+
+    def __refreshed(self, key, read, result):
+        try:
+            execution = read.complete(result)
+        except Exception as e:
+            # The cached status ages out after max_staleness, after which polls read the stack themselves and see the error
+            logger.warning('Failed to refresh status of {0} in the background: {1}'.format(key, str(e)))
+            metrics.LIFECYCLE_STATUS_REFRESHES.labels(result='failed').inc()
+        else:
+            self.put(key, execution)
+            metrics.LIFECYCLE_STATUS_REFRESHES.labels(result='updated').inc()
+        finally:
+            with self.__lock:
+                self.__refreshing.discard(key)
+
+
+lifecycle_status_cache = LifecycleStatusCache()
+
+
+class StatusCacheConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        status_cache_properties = configuration.property_groups.get_property_group(StatusCacheProperties)
+        if status_cache_properties.enabled is True:
+            logger.debug('Returning in progress lifecycle statuses up to {0} seconds old'.format(status_cache_properties.max_staleness))
+        else:
+            logger.debug('Disabled: stale-while-revalidate of lifecycle statuses')
+        lifecycle_status_cache.configure(status_cache_properties)
@@ -0,0 +1,168 @@
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+
+logger = logging.getLogger(__name__)
+
+
+class TimeoutProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('timeouts')
+        self.enabled = True
+        # Seconds to wait for a connection to an Openstack endpoint to be established
+        self.connect = 10
+        # Seconds to wait for data from an Openstack endpoint once connected (between reads, not for the whole response)
+        self.read = 60
+        # Overrides for a particular operation (as named in the ovd_openstack_request_* metrics), e.g. {'create_stack': {'read': 120}}
+        self.operations = {}
+        # Seconds each lifecycle request (execute, get execution or find reference) has to make it's calls to Openstack. 0 for no deadline
+        self.request_deadline = 120
+
+
+class DeadlineExceededError(TemporaryResourceDriverError):
+    pass
+
+
+class Deadline():
+
+    def __init__(self, seconds, description=None):
+        self.seconds = seconds
+        self.description = description
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, operation):
+        if self.expired:
+            raise DeadlineExceededError('Deadline of {0} seconds for {1} exceeded before {2} could be made'.format(
+                self.seconds, self.description or 'the request', operation))
+
+
+_current_deadline = contextvars.ContextVar('ovd_request_deadline', default=None)
+_current_timeout = contextvars.ContextVar('ovd_request_timeout', default=None)
+
+def current_deadline():
+    # Deadline of the lifecycle request being handled (if any)
+    return _current_deadline.get()
+
+def current_timeout():
+    # (connect, read) timeout of the Openstack call being made (if any)
+    return _current_timeout.get()
+
+
+class TimeoutPolicy():
+    """
+    Holds the connect/read timeouts of each operation and the deadline given to each lifecycle request. The timeout of a call
+    is cut short when the deadline of the request making it is closer than the configured timeout
+    """
+
+    def __init__(self):
+        self.connect = None
+        self.read = None
+        self.operations = {}
+        self.request_deadline = 0
+
+    def configure(self, properties):
+        operations = {}
+        for operation, overrides in (properties.operations or {}).items():
+            for key in (overrides or {}).keys():
+                if key not in ['connect', 'read']:
+                    raise ValueError('Unknown timeouts setting \'{0}\' for operation \'{1}\''.format(key, operation))
+            operations[operation] = overrides or {}
+        if properties.enabled is True:
+            self.connect = properties.connect
+            self.read = properties.read
+            self.operations = operations
+        else:
+            self.connect = None
+            self.read = None
+            self.operations = {}
+        self.request_deadline = properties.request_deadline or 0
+
+    def timeout_for(self, operation, deadline=None):
+        """
+        Returns the (connect, read) timeout for a call of the given operation, or None if there is no timeout.
+        Raises DeadlineExceededError if the deadline has already passed
+        """
+        if deadline is not None:
+            deadline.check(operation)
+        overrides = self.operations.get(operation, {})
+        connect = overrides.get('connect', self.connect)
+        read = overrides.get('read', self.read)
+        if deadline is not None:
+            remaining = deadline.remaining()
+            connect = remaining if connect is None else min(connect, remaining)
+            read = remaining if read is None else min(read, remaining)
+        if connect is None and read is None:
+            return None
+        return (connect, read)
+
+    def default_timeout(self):
+        # For requests made outside of a call (e.g. the token fetched for an async session), which aren't linked to an operation
+        if self.connect is None and self.read is None:
+            return None
+        return (self.connect, self.read)
+
+    @contextmanager
+    def request_deadline_for(self, description):
+        # Sets the deadline of a lifecycle request for all calls made within this context
+        if self.request_deadline is None or self.request_deadline <= 0:
+            yield None
+            return
+        deadline = Deadline(self.request_deadline, description=description)
+        token = _current_deadline.set(deadline)
+        try:
+            yield deadline
+        finally:
+            _current_deadline.reset(token)
+
+    @contextmanager
+    def operation_timeout(self, timeout):
+        # Sets the timeout used by the sessions for requests made within this context
+        token = _current_timeout.set(timeout)
+        try:
+            yield timeout
+        finally:
+            _current_timeout.reset(token)
+
+
+timeout_policy = TimeoutPolicy()
+
+
+def apply_timeouts(session):
+    # keystoneauth1 sessions have a single timeout, so the request method is wrapped to apply the timeout of the call being made.
+    # Requests made by the session itself (e.g. authenticating) go through the same method
+    request = session.request
+    def request_with_timeout(url, method, **kwargs):
+        if kwargs.get('timeout', None) is None:
+            timeout = current_timeout() or timeout_policy.default_timeout()
+            if timeout is not None:
+                kwargs['timeout'] = timeout
+        return request(url, method, **kwargs)
+    session.request = request_with_timeout
+    return session
+
+
+class TimeoutConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        timeout_properties = configuration.property_groups.get_property_group(TimeoutProperties)
+        if timeout_properties.enabled is True:
+            logger.debug('Openstack requests time out after {0} seconds connecting, {1} seconds reading'.format(timeout_properties.connect, timeout_properties.read))
+        else:
+            logger.debug('Disabled: timeouts on Openstack requests')
+        if timeout_properties.request_deadline:
+            logger.debug('Lifecycle requests have a deadline of {0} seconds'.format(timeout_properties.request_deadline))
+        timeout_policy.configure(timeout_properties)
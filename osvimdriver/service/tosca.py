@@ -1,15 +1,69 @@
+import importlib
 import logging
+import pkgutil
+import threading
 from ignition.service.framework import Capability, interface, Service
-from toscaparser.tosca_template import ToscaTemplate
-from translator.hot.tosca_translator import TOSCATranslator
-from osvimdriver.tosca.discover import ToscaTopologySearchEngine, NotDiscoveredError
+from osvimdriver.tosca.exceptions import NotDiscoveredError
+from osvimdriver.tosca.translator_conf import configure_translator_conf
+from osvimdriver.tosca.definitions_cache import install_definitions_cache
+from osvimdriver.tosca.parser_state import install_thread_safe_parser
 import osvimdriver.tosca.definitions as tosca_definitions
-import toscaparser.common.exception as toscaparser_exceptions
+from osvimdriver.service.tracing import tracer
 import yaml
 import os
 
 logger = logging.getLogger(__name__)
 
+# The TOSCA parser and heat-translator are slow to import and only needed by create and find requests,
+# so they are loaded on first use (or on first access of these module attributes) rather than at import time
+_LAZY_ATTRIBUTES = {
+    'ToscaTemplate': ('toscaparser.tosca_template', 'ToscaTemplate'),
+    'TOSCATranslator': ('translator.hot.tosca_translator', 'TOSCATranslator'),
+    'ToscaTopologySearchEngine': ('osvimdriver.tosca.discover', 'ToscaTopologySearchEngine'),
+    'toscaparser_exceptions': ('toscaparser.common.exception', None)
+}
+_lazy_lock = threading.Lock()
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _lazy(name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def _lazy(name):
+    value = globals().get(name, None)
+    if value is None:
+        with _lazy_lock:
+            value = globals().get(name, None)
+            if value is None:
+                module_name, attribute_name = _LAZY_ATTRIBUTES[name]
+                if module_name.startswith('translator'):
+                    configure_translator_conf()
+                module = importlib.import_module(module_name)
+                if module_name.startswith('toscaparser'):
+                    install_definitions_cache()
+                    install_thread_safe_parser()
+                value = getattr(module, attribute_name) if attribute_name is not None else module
+                globals()[name] = value
+    return value
+
+def load_tosca_modules():
+    # Loads everything up front, for when the import cost should be paid before the first request
+    for name in _LAZY_ATTRIBUTES:
+        _lazy(name)
+
+def warm_up():
+    """
+    Loads the TOSCA parser, translator and our custom translations, then parses and translates a template which imports
+    the type definitions included with this driver, so they are loaded and cached before the first request needs them
+    """
+    load_tosca_modules()
+    import osvimdriver.tosca.translations as translations
+    for module_info in pkgutil.iter_modules(translations.__path__):
+        importlib.import_module('{0}.{1}'.format(translations.__name__, module_info.name))
+    with open(tosca_definitions.WARMUP_TEMPLATE_FILE, 'r') as f:
+        warmup_template = f.read()
+    ToscaHeatTranslatorService(tosca_parser_service=ToscaParserService()).generate_heat_template(warmup_template)
+
 class ToscaValidationError(Exception):
     pass
 
@@ -24,14 +78,17 @@ class ToscaParserCapability(Capability):
 class ToscaParserService(Service, ToscaParserCapability):
 
     def parse_tosca_str(self, tosca_template_str, inputs=None, template_path=None):
-        tosca_template = self.__load_yaml(tosca_template_str)
-        if template_path is not None:
-            self.__convert_relative_imports(tosca_template, template_path)
-        self.include_extensions(tosca_template)
-        try:
-            return ToscaTemplate(None, inputs, False, tosca_template)
-        except toscaparser_exceptions.ValidationError as e:
-            raise ToscaValidationError(str(e)) from e
+        with tracer.start_span('tosca.parse'):
+            tosca_template = self.__load_yaml(tosca_template_str)
+            if template_path is not None:
+                self.__convert_relative_imports(tosca_template, template_path)
+            self.include_extensions(tosca_template)
+            tosca_validation_error = _lazy('toscaparser_exceptions').ValidationError
+            tosca_template_class = _lazy('ToscaTemplate')
+            try:
+                return tosca_template_class(None, inputs, False, tosca_template)
+            except tosca_validation_error as e:
+                raise ToscaValidationError(str(e)) from e
 
     def __load_yaml(self, template_str):
         return yaml.safe_load(template_str)
@@ -89,11 +146,12 @@ class ToscaHeatTranslatorService(Service, ToscaHeatTranslatorCapability):
         if tosca_template_str is None:
             raise ValueError('Must provide tosca_template_str parameter')
         tosca = self.tosca_parser_service.parse_tosca_str(tosca_template_str, template_path=template_path)
-        heat_translator = TOSCATranslator(tosca, {})
-        # heat translator returns translated heat in a dict
-        translation_dict_key = 'main_hot'
-        heat_translations = heat_translator.translate_to_yaml_files_dict(translation_dict_key)
-        heat_result = heat_translations[translation_dict_key]
+        with tracer.start_span('tosca.translate'):
+            heat_translator = _lazy('TOSCATranslator')(tosca, {})
+            # heat translator returns translated heat in a dict
+            translation_dict_key = 'main_hot'
+            heat_translations = heat_translator.translate_to_yaml_files_dict(translation_dict_key)
+            heat_result = heat_translations[translation_dict_key]
         logger.debug('Translated Heat: {0}'.format(heat_result))
         return heat_result
 
@@ -118,4 +176,4 @@ class ToscaTopologyDiscoveryService(Service, ToscaTopologyDiscoveryCapability):
         if openstack_location is None:
             raise ValueError('Must provide openstack_location parameter')
         tosca = self.tosca_parser_service.parse_tosca_str(tosca_template_str, inputs)
-        return ToscaTopologySearchEngine(tosca, openstack_location).discover()
+        return _lazy('ToscaTopologySearchEngine')(tosca, openstack_location).discover()
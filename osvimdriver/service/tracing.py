@@ -0,0 +1,265 @@
+import contextvars
+import importlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from ignition.service.config import ConfigurationPropertiesGroup
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 'INTERNAL'
+SPAN_KIND_SERVER = 'SERVER'
+SPAN_KIND_CLIENT = 'CLIENT'
+
+STATUS_UNSET = 'UNSET'
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+
+TRACEPARENT_HEADER = 'traceparent'
+TRACEPARENT_REGEX = re.compile('^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+INVALID_TRACE_ID = '0' * 32
+INVALID_SPAN_ID = '0' * 16
+
+EXPORTER_NONE = 'none'
+EXPORTER_LOGGING = 'logging'
+EXPORTER_FILE = 'file'
+EXPORTER_MEMORY = 'memory'
+
+
+class TracingProperties(ConfigurationPropertiesGroup):
+
+    def __init__(self):
+        super().__init__('tracing')
+        self.enabled = False
+        # One of: none, logging, file, memory or the import path of a custom exporter class (e.g. mymodule:MyExporter)
+        self.exporter = EXPORTER_LOGGING
+        self.file_path = './traces.jsonl'
+
+
+class SpanContext():
+
+    def __init__(self, trace_id, span_id, sampled=True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self):
+        return '00-{0}-{1}-{2}'.format(self.trace_id, self.span_id, '01' if self.sampled else '00')
+
+    @staticmethod
+    def from_traceparent(traceparent):
+        if traceparent is None:
+            return None
+        match = TRACEPARENT_REGEX.match(traceparent.strip().lower())
+        if match is None:
+            return None
+        version, trace_id, span_id, flags = match.groups()
+        if version == 'ff' or trace_id == INVALID_TRACE_ID or span_id == INVALID_SPAN_ID:
+            return None
+        return SpanContext(trace_id, span_id, sampled=(int(flags, 16) & 1) == 1)
+
+
+class Span():
+
+    def __init__(self, name, context, parent_span_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes is not None else {}
+        self.events = []
+        self.status = STATUS_UNSET
+        self.status_description = None
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_status(self, status, description=None):
+        self.status = status
+        self.status_description = description
+
+    def record_exception(self, exception):
+        self.events.append({
+            'name': 'exception',
+            'timeUnixNano': time.time_ns(),
+            'attributes': {
+                'exception.type': type(exception).__name__,
+                'exception.message': str(exception)
+            }
+        })
+        self.set_status(STATUS_ERROR, str(exception))
+
+    def end(self):
+        if self.end_time_unix_nano is None:
+            self.end_time_unix_nano = time.time_ns()
+
+    @property
+    def duration_seconds(self):
+        if self.end_time_unix_nano is None:
+            return None
+        return (self.end_time_unix_nano - self.start_time_unix_nano) / 1e9
+
+    def to_dict(self):
+        # Field names follow the OTLP JSON encoding of a span
+        span_dict = {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'name': self.name,
+            'kind': 'SPAN_KIND_' + self.kind,
+            'startTimeUnixNano': self.start_time_unix_nano,
+            'endTimeUnixNano': self.end_time_unix_nano,
+            'attributes': self.attributes,
+            'events': self.events,
+            'status': {'code': 'STATUS_CODE_' + self.status}
+        }
+        if self.parent_span_id is not None:
+            span_dict['parentSpanId'] = self.parent_span_id
+        if self.status_description is not None:
+            span_dict['status']['message'] = self.status_description
+        return span_dict
+
+
+class InMemorySpanExporter():
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__spans = []
+
+    def export(self, span):
+        with self.__lock:
+            self.__spans.append(span)
+
+    def get_finished_spans(self):
+        with self.__lock:
+            return list(self.__spans)
+
+    def clear(self):
+        with self.__lock:
+            self.__spans = []
+
+
+class FileSpanExporter():
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.__lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict())
+        with self.__lock:
+            with open(self.file_path, 'a') as f:
+                f.write(line + '\n')
+
+
+class LoggingSpanExporter():
+
+    def export(self, span):
+        logger.info('Span: {0}'.format(json.dumps(span.to_dict())))
+
+
+class Tracer():
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.__current_span = contextvars.ContextVar('ovd_current_span', default=None)
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def get_current_span(self):
+        return self.__current_span.get()
+
+    @contextmanager
+    def start_span(self, name, kind=SPAN_KIND_INTERNAL, attributes=None, parent_context=None):
+        if not self.enabled:
+            yield None
+            return
+        if parent_context is None:
+            current_span = self.get_current_span()
+            parent_context = current_span.context if current_span is not None else None
+        if parent_context is not None:
+            context = SpanContext(parent_context.trace_id, _generate_span_id(), sampled=parent_context.sampled)
+            parent_span_id = parent_context.span_id
+        else:
+            context = SpanContext(_generate_trace_id(), _generate_span_id())
+            parent_span_id = None
+        span = Span(name, context, parent_span_id=parent_span_id, kind=kind, attributes=attributes)
+        token = self.__current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self.__current_span.reset(token)
+            span.end()
+            if context.sampled:
+                self.__export(span)
+
+    def __export(self, span):
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning('Failed to export span {0}: {1}'.format(span.name, str(e)))
+
+
+def _generate_trace_id():
+    return '{0:032x}'.format(random.getrandbits(128))
+
+def _generate_span_id():
+    return '{0:016x}'.format(random.getrandbits(64))
+
+def build_exporter(tracing_properties):
+    exporter_name = tracing_properties.exporter
+    if exporter_name is None or exporter_name == EXPORTER_NONE:
+        return None
+    elif exporter_name == EXPORTER_LOGGING:
+        return LoggingSpanExporter()
+    elif exporter_name == EXPORTER_FILE:
+        return FileSpanExporter(tracing_properties.file_path)
+    elif exporter_name == EXPORTER_MEMORY:
+        return InMemorySpanExporter()
+    elif ':' in exporter_name:
+        module_name, class_name = exporter_name.split(':', 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    else:
+        raise ValueError('tracing.exporter must be one of: {0} or the import path of an exporter class (module:Class) but was \'{1}\''.format(
+            [EXPORTER_NONE, EXPORTER_LOGGING, EXPORTER_FILE, EXPORTER_MEMORY], exporter_name))
+
+def extract_request_context():
+    # Reads the W3C trace context from the headers of the incoming API request, if there is one
+    try:
+        import flask
+        import connexion
+        if not flask.has_request_context():
+            return None
+        return SpanContext.from_traceparent(connexion.request.headers.get(TRACEPARENT_HEADER, None))
+    except Exception as e:
+        logger.debug('Could not extract trace context from request headers: {0}'.format(str(e)))
+        return None
+
+
+# Process wide tracer, spans are discarded until an exporter is configured
+tracer = Tracer()
+
+
+class TracingConfigurator():
+
+    def __init__(self):
+        pass
+
+    def configure(self, configuration, service_register):
+        tracing_properties = configuration.property_groups.get_property_group(TracingProperties)
+        if tracing_properties.enabled is True:
+            logger.debug('Configuring tracing with exporter: {0}'.format(tracing_properties.exporter))
+            tracer.exporter = build_exporter(tracing_properties)
+        else:
+            logger.debug('Disabled: tracing')
+            tracer.exporter = None
@@ -5,4 +5,7 @@ package_path = str(pathlib.Path(__file__).parent.resolve())
 TYPE_EXTENSIONS_FILE = os.path.join(package_path, 'type_extensions.yaml')
 ETSI_COMMON_TYPES_FILE = os.path.join(package_path, 'etsi_nfv_sol001_common_types.yaml')
 ETSI_VNFD_TYPES_FILE = os.path.join(package_path, 'etsi_nfv_sol001_vnfd_types.yaml')
-NFV_EXTENSIONS_FILE = os.path.join(package_path, 'nfv_extensions.yaml')
\ No newline at end of file
+NFV_EXTENSIONS_FILE = os.path.join(package_path, 'nfv_extensions.yaml')
+
+# Not a type definition, a template translated at start up to warm the TOSCA parser and translator
+WARMUP_TEMPLATE_FILE = os.path.join(package_path, 'warmup.yaml')
@@ -0,0 +1,56 @@
+import copy
+import logging
+import os
+import threading
+import osvimdriver.tosca.definitions as tosca_definitions
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Held while a definitions file is first parsed, so threads parsing at the same time wait for it rather than parse it again
+_cache_lock = threading.Lock()
+_cache = {}
+_installed = False
+
+
+def install_definitions_cache():
+    """
+    The type definitions included with this driver are imported by every template we parse, so toscaparser would
+    otherwise re-read and parse the same YAML files on each request. This wraps the loader used by toscaparser's imports
+    so each of these files is parsed once per process (and shared by workers when loaded before forking)
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        import toscaparser.imports as toscaparser_imports
+        original_loader = getattr(toscaparser_imports, 'YAML_LOADER', None)
+        if original_loader is None:
+            logger.warning('Unable to cache TOSCA type definitions, the toscaparser version in use has no YAML_LOADER')
+            return
+        toscaparser_imports.YAML_LOADER = _build_caching_loader(original_loader)
+        _installed = True
+
+def _build_caching_loader(original_loader):
+    def caching_loader(path, a_file=True):
+        if not a_file or not _is_packaged_definition(path):
+            return original_loader(path, a_file)
+        abs_path = os.path.abspath(path)
+        parsed = _cache.get(abs_path, None)
+        if parsed is None:
+            with _cache_lock:
+                parsed = _cache.get(abs_path, None)
+                if parsed is None:
+                    parsed = original_loader(path, a_file)
+                    if parsed is None:
+                        return None
+                    _cache[abs_path] = parsed
+        # Copied as toscaparser may modify the definitions it's given
+        return copy.deepcopy(parsed)
+    return caching_loader
+
+def _is_packaged_definition(path):
+    return os.path.dirname(os.path.abspath(path)) == tosca_definitions.package_path
+
+def clear_definitions_cache():
+    _cache.clear()
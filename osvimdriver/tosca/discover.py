@@ -2,6 +2,7 @@
 from uuid import uuid4
 from toscaparser.functions import GetInput, GetAttribute, GetProperty, Function
 from neutronclient.common import exceptions as neutronexceptions
+from osvimdriver.tosca.exceptions import NotDiscoveredError
 
 
 class ToscaTopologySearchEngine:
@@ -24,9 +25,6 @@ class DiscoveryResult:
         self.discover_id = discover_id
         self.outputs = outputs
 
-class NotDiscoveredError(Exception):
-    pass
-
 class NetworkSearchImpl:
 
     def __init__(self, openstack_location):
@@ -0,0 +1,3 @@
+
+class NotDiscoveredError(Exception):
+    pass
@@ -0,0 +1,76 @@
+import threading
+import traceback
+
+_lock = threading.Lock()
+_installed = False
+_local = threading.local()
+_updated_versions = set()
+
+
+def install_thread_safe_parser():
+    """
+    toscaparser keeps the validation errors of the template being parsed (or translated) in class level state of the
+    ExceptionCollector, so concurrent parses would clear or report each other's errors. This gives each thread it's own
+    errors instead. The type definitions of an extension profile (e.g. NFV), which toscaparser adds to the definitions
+    shared by every template when a template of that version is parsed, are also only added once, under a lock
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        import toscaparser.tosca_template as toscaparser_tosca_template
+        from toscaparser.common.exception import ExceptionCollector
+        ExceptionCollector.clear = staticmethod(_clear)
+        ExceptionCollector.start = staticmethod(_start)
+        ExceptionCollector.stop = staticmethod(_stop)
+        ExceptionCollector.contains = staticmethod(_contains)
+        ExceptionCollector.appendException = staticmethod(_append_exception)
+        ExceptionCollector.exceptionsCaught = staticmethod(_exceptions_caught)
+        ExceptionCollector.getExceptions = staticmethod(_exceptions)
+        ExceptionCollector.getExceptionsReport = staticmethod(_exceptions_report)
+        toscaparser_tosca_template.update_definitions = _build_update_definitions_once(toscaparser_tosca_template.update_definitions)
+        _installed = True
+
+
+def _exceptions():
+    exceptions = getattr(_local, 'exceptions', None)
+    if exceptions is None:
+        exceptions = []
+        _local.exceptions = exceptions
+    return exceptions
+
+def _clear():
+    del _exceptions()[:]
+
+def _start():
+    _clear()
+    _local.collecting = True
+
+def _stop():
+    _local.collecting = False
+
+def _contains(exception):
+    return any(str(collected) == str(exception) for collected in _exceptions())
+
+def _append_exception(exception):
+    if not getattr(_local, 'collecting', False):
+        raise exception
+    if not _contains(exception):
+        exception.trace = traceback.extract_stack()[:-1]
+        _exceptions().append(exception)
+
+def _exceptions_caught():
+    return len(_exceptions()) > 0
+
+def _exceptions_report(full=True):
+    from toscaparser.common.exception import ExceptionCollector
+    return [ExceptionCollector.getExceptionReportEntry(exception, full) for exception in _exceptions()]
+
+def _build_update_definitions_once(original_update_definitions):
+    def update_definitions_once(version):
+        with _lock:
+            if version in _updated_versions:
+                return
+            original_update_definitions(version)
+            _updated_versions.add(version)
+    return update_definitions_once
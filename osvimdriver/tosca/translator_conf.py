@@ -0,0 +1,54 @@
+import atexit
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+TRANSLATOR_CONF_ENV = 'TRANSLATOR_CONF'
+
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+base_translator_conf_path = os.path.join(package_path, 'translator.conf')
+translations_path = os.path.join(package_path, 'tosca', 'translations')
+
+_lock = threading.Lock()
+_active_conf_path = None
+
+
+def build_translator_conf():
+    # Adds the absolute path of our custom translations, so they are found regardless of the working directory
+    with open(base_translator_conf_path, 'r') as f:
+        content = f.read()
+    new_content = ''
+    for s in content.splitlines():
+        if s.startswith('custom_types_location=osvimdriver/tosca/translations'):
+            new_content += f'{s},{translations_path}'
+        else:
+            new_content += s
+        new_content += '\n'
+    return new_content
+
+def configure_translator_conf():
+    """
+    Set the environment variable (read by our fork of the translator) to the path of the translator conf.
+    IMPORTANT: this must happen before the heat-translator module is imported, otherwise it's too late and the default config is used
+    """
+    global _active_conf_path
+    with _lock:
+        if _active_conf_path is None:
+            # Written to a temporary file rather than the working directory, which may be read-only or shared between workers
+            fd, conf_path = tempfile.mkstemp(prefix='ovd-translator-', suffix='.conf')
+            with os.fdopen(fd, 'w') as f:
+                f.write(build_translator_conf())
+            atexit.register(_remove_conf, conf_path)
+            logger.debug(f'Setting {TRANSLATOR_CONF_ENV} to {conf_path}')
+            os.environ[TRANSLATOR_CONF_ENV] = conf_path
+            _active_conf_path = conf_path
+        return _active_conf_path
+
+def _remove_conf(conf_path):
+    try:
+        os.remove(conf_path)
+    except OSError:
+        pass
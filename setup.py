@@ -25,6 +25,8 @@ setup(
         'python-keystoneclient>=3.19.0,<4.0',
         'python-neutronclient>=6.5.1,<7.0',
         'python-novaclient>=13.0.0,<14.0.0',
+        'aiohttp>=3.8.0,<4.0',
+        'prometheus-client>=0.17.0,<1.0',
         'tosca-parser @ git+https://github.com/IBM/tosca-parser.git@accanto',
         'heat-translator @ git+https://github.com/IBM/heat-translator.git@accanto-nfv',
         'gunicorn==20.1.0'
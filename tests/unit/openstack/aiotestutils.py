@@ -0,0 +1,39 @@
+import json
+from unittest.mock import MagicMock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+class FakeOpenstackApi():
+    """
+    In-process HTTP server standing in for an Openstack API, with a keystone Session mock pointing at it
+    """
+
+    def __init__(self):
+        self.app = web.Application()
+        self.requests = []
+        self.server = None
+        self.keystone_session = MagicMock()
+        self.keystone_session.verify = True
+        self.keystone_session.cert = None
+        self.keystone_session.get_token.return_value = 'mock_token'
+
+    def add_route(self, method, path, status=200, body=None, handler=None):
+        async def default_handler(request):
+            return web.Response(status=status, text=json.dumps(body) if body is not None else '',
+                                content_type='application/json' if body is not None else 'text/plain')
+        async def recording_handler(request):
+            self.requests.append({'method': request.method, 'path': request.path, 'query': dict(request.query),
+                                  'headers': dict(request.headers), 'body': await request.json() if request.can_read_body else None})
+            return await (handler or default_handler)(request)
+        self.app.router.add_route(method, path, recording_handler)
+
+    async def start(self):
+        self.server = TestServer(self.app)
+        await self.server.start_server()
+        self.keystone_session.get_endpoint.return_value = str(self.server.make_url(''))
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            await self.server.close()
@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from aiohttp import web
+from osvimdriver.openstack.aio import AsyncOpenstackSession, OpenstackHttpError
+from osvimdriver.openstack.heat.async_driver import AsyncHeatDriver
+from osvimdriver.openstack.heat.driver import StackNotFoundError
+from osvimdriver.service.bulkhead import bulkheads, BulkheadProperties
+from tests.unit.openstack.aiotestutils import FakeOpenstackApi
+
+
+class TestAsyncHeatDriver(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.api = FakeOpenstackApi()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.api.close()
+
+    async def start(self):
+        await self.api.start()
+        self.session = AsyncOpenstackSession(self.api.keystone_session, location_name='Test')
+        return AsyncHeatDriver(self.session)
+
+    async def test_create_stack(self):
+        self.api.add_route('POST', '/stacks', status=201, body={'stack': {'id': 'mock_stack_id'}})
+        heat_driver = await self.start()
+        stack_id = await heat_driver.create_stack('test_stack', 'heat_template_text', {'propA': 1})
+        self.assertEqual(stack_id, 'mock_stack_id')
+        self.assertEqual(self.api.requests[0]['body'], {'stack_name': 'test_stack', 'template': 'heat_template_text', 'parameters': {'propA': 1}, 'files': {}})
+
+    async def test_create_stack_with_tags(self):
+        self.api.add_route('POST', '/stacks', status=201, body={'stack': {'id': 'mock_stack_id'}})
+        heat_driver = await self.start()
+        await heat_driver.create_stack('test_stack', 'heat_template_text', tags=['tagA', 'tagB'])
+        self.assertEqual(self.api.requests[0]['body']['tags'], 'tagA,tagB')
+
+    async def test_create_stack_without_name_fails(self):
+        heat_driver = await self.start()
+        with self.assertRaises(ValueError):
+            await heat_driver.create_stack(None, 'heat_template_text')
+
+    async def test_update_stack(self):
+        self.api.add_route('PUT', '/stacks/test_stack/12345', status=202)
+        heat_driver = await self.start()
+        await heat_driver.update_stack('12345', 'heat_template_text', {'propA': 1}, tags=['tagA'], stack_name='test_stack')
+        self.assertEqual(self.api.requests[0]['body'], {'template': 'heat_template_text', 'parameters': {'propA': 1}, 'files': {}, 'tags': 'tagA'})
+
+    async def test_update_existing_stack(self):
+        self.api.add_route('GET', '/stacks/12345', body={'stack': {'id': '12345', 'stack_name': 'test_stack'}})
+        self.api.add_route('PATCH', '/stacks/test_stack/12345', status=202)
+        heat_driver = await self.start()
+        await heat_driver.update_stack('12345', input_properties={'propA': 1}, existing=True)
+        self.assertEqual(self.api.requests[1]['method'], 'PATCH')
+        self.assertEqual(self.api.requests[1]['body'], {'parameters': {'propA': 1}})
+
+    async def test_update_stack_not_found(self):
+        self.api.add_route('PATCH', '/stacks/test_stack/12345', status=404, body={'error': {'message': 'The Stack (12345) could not be found.'}})
+        heat_driver = await self.start()
+        with self.assertRaises(StackNotFoundError):
+            await heat_driver.update_stack('12345', existing=True, stack_name='test_stack')
+
+    async def test_get_stack(self):
+        self.api.add_route('GET', '/stacks/12345', body={'stack': {'id': '12345', 'stack_status': 'CREATE_COMPLETE'}})
+        heat_driver = await self.start()
+        stack = await heat_driver.get_stack('12345')
+        self.assertEqual(stack, {'id': '12345', 'stack_status': 'CREATE_COMPLETE'})
+
+    async def test_get_stack_not_found(self):
+        self.api.add_route('GET', '/stacks/12345', status=404, body={'error': {'message': 'The Stack (12345) could not be found.'}})
+        heat_driver = await self.start()
+        with self.assertRaises(StackNotFoundError):
+            await heat_driver.get_stack('12345')
+
+    async def test_get_stack_other_error(self):
+        self.api.add_route('GET', '/stacks/12345', status=503, body={'error': {'message': 'Unavailable'}})
+        heat_driver = await self.start()
+        with self.assertRaises(OpenstackHttpError):
+            await heat_driver.get_stack('12345')
+
+    async def test_get_many_stacks(self):
+        self.api.add_route('GET', '/stacks/1', body={'stack': {'id': '1'}})
+        self.api.add_route('GET', '/stacks/2', status=404, body={'error': {'message': 'Not found'}})
+        heat_driver = await self.start()
+        stacks = await heat_driver.get_many_stacks(['1', '2'], max_concurrency=2)
+        self.assertEqual(stacks['1'], {'id': '1'})
+        self.assertIsInstance(stacks['2'], StackNotFoundError)
+
+    async def test_delete_stack(self):
+        self.api.add_route('DELETE', '/stacks/12345', status=204)
+        heat_driver = await self.start()
+        await heat_driver.delete_stack('12345')
+        self.assertEqual(self.api.requests[0]['method'], 'DELETE')
+
+    async def test_delete_stack_not_found(self):
+        self.api.add_route('DELETE', '/stacks/12345', status=404, body={'error': {'message': 'Not found'}})
+        heat_driver = await self.start()
+        with self.assertRaises(StackNotFoundError):
+            await heat_driver.delete_stack('12345')
+
+    async def test_get_stacks(self):
+        self.api.add_route('GET', '/stacks', body={'stacks': [{'id': '1'}]})
+        heat_driver = await self.start()
+        stacks = await heat_driver.get_stacks(limit=1)
+        self.assertEqual(stacks, [{'id': '1'}])
+        self.assertEqual(self.api.requests[0]['query'], {'limit': '1'})
+
+    async def test_get_stack_events(self):
+        self.api.add_route('GET', '/stacks/12345', body={'stack': {'id': '12345', 'stack_name': 'test_stack'}})
+        self.api.add_route('GET', '/stacks/test_stack/12345/events', body={'events': [{'id': 'event1'}]})
+        heat_driver = await self.start()
+        events = await heat_driver.get_stack_events('12345')
+        self.assertEqual(events, [{'id': 'event1'}])
+
+    async def test_get_stack_events_with_name(self):
+        self.api.add_route('GET', '/stacks/test_stack/12345/events', body={'events': [{'id': 'event1'}]})
+        heat_driver = await self.start()
+        events = await heat_driver.get_stack_events('12345', stack_name='test_stack')
+        self.assertEqual(events, [{'id': 'event1'}])
+        self.assertEqual(len(self.api.requests), 1)
+
+    async def test_get_stack_outputs(self):
+        self.api.add_route('GET', '/stacks/12345', body={'stack': {'id': '12345', 'outputs': [{'output_key': 'ip', 'output_value': '10.0.0.1'}]}})
+        heat_driver = await self.start()
+        outputs = await heat_driver.get_stack_outputs('12345')
+        self.assertEqual(outputs, [{'output_key': 'ip', 'output_value': '10.0.0.1'}])
+
+    async def test_get_many_stacks_beyond_bulkhead(self):
+        properties = BulkheadProperties()
+        properties.max_concurrent_calls = 4
+        bulkheads.configure(properties)
+        try:
+            in_flight = []
+            max_in_flight = []
+            async def handler(request):
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+                await asyncio.sleep(0.01)
+                in_flight.pop()
+                return web.json_response({'stack': {'id': request.match_info['stack_id']}})
+            self.api.add_route('GET', '/stacks/{stack_id}', handler=handler)
+            heat_driver = await self.start()
+            stack_ids = [str(i) for i in range(30)]
+            stacks = await heat_driver.get_many_stacks(stack_ids, max_concurrency=30)
+            # Calls beyond the bulkhead wait for a slot rather than failing
+            self.assertEqual(stacks, {stack_id: {'id': stack_id} for stack_id in stack_ids})
+            self.assertEqual(max(max_in_flight), 4)
+        finally:
+            bulkheads.configure(None)
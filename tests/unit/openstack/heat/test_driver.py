@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 from osvimdriver.openstack.heat.driver import HeatDriver, StackNotFoundError
 from heatclient import exc as heatexc
 
@@ -16,6 +16,15 @@ class TestHeatDriver(unittest.TestCase):
         mock_heat_client.stacks.create.assert_called_once_with(stack_name='test_stack', template='heat_template_text', parameters={'propA': 1}, files={})
         self.assertEqual(stack_id, 'mock_stack_id','request1234')
 
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_create_stack_with_tags(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_heat_client.stacks.create.return_value = {'stack': {'id': 'mock_stack_id'}}
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        heat_driver.create_stack('test_stack', 'heat_template_text', {'propA': 1}, tags=['tagA', 'tagB'])
+        mock_heat_client.stacks.create.assert_called_once_with(stack_name='test_stack', template='heat_template_text', parameters={'propA': 1}, files={}, tags='tagA,tagB')
+
     @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
     def test_create_stack_without_name(self, mock_heat_client_init):
         mock_session = MagicMock()
@@ -56,6 +65,34 @@ class TestHeatDriver(unittest.TestCase):
         self.assertEqual(stack_id, 'mock_stack_id','request1234')
         #self.assertEqual(request_id, 'request1234')
 
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_update_stack(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        heat_driver = HeatDriver(MagicMock())
+        heat_driver.update_stack('12345', 'heat_template_text', {'propA': 1}, files={'fileA': 'somecontent'}, tags=['tagA', 'tagB'])
+        mock_heat_client.stacks.update.assert_called_once_with('12345', template='heat_template_text', parameters={'propA': 1}, files={'fileA': 'somecontent'}, tags='tagA,tagB')
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_update_existing_stack(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        heat_driver = HeatDriver(MagicMock())
+        heat_driver.update_stack('12345', input_properties={'propA': 1}, existing=True)
+        mock_heat_client.stacks.update.assert_called_once_with('12345', parameters={'propA': 1}, existing=True)
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_update_stack_without_template_fails(self, mock_heat_client_init):
+        heat_driver = HeatDriver(MagicMock())
+        with self.assertRaises(ValueError):
+            heat_driver.update_stack('12345', input_properties={'propA': 1})
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_update_stack_not_found_fails(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_heat_client.stacks.update.side_effect = heatexc.HTTPNotFound('Not found')
+        heat_driver = HeatDriver(MagicMock())
+        with self.assertRaises(StackNotFoundError):
+            heat_driver.update_stack('12345', 'heat_template_text')
+
     @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
     def test_delete_stack(self, mock_heat_client_init):
         mock_heat_client = mock_heat_client_init.return_value
@@ -113,3 +150,72 @@ class TestHeatDriver(unittest.TestCase):
         with self.assertRaises(StackNotFoundError) as context:
             heat_driver.get_stack('12345')
         self.assertEqual(str(context.exception), 'ERROR: Not found')
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_get_stacks_with_limit(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_heat_client.stacks.list.return_value = iter(['stackA'])
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        # The client returns a generator, the requests it makes must happen within the driver call
+        self.assertEqual(heat_driver.get_stacks(limit=1), ['stackA'])
+        mock_heat_client.stacks.list.assert_called_once_with(limit=1)
+
+    @patch('osvimdriver.openstack.heat.driver.LIST_STACKS_PAGE_SIZE', 2)
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_get_stacks_is_lazy(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        stacks = [MagicMock(id=stack_id) for stack_id in ['A', 'B', 'C']]
+        mock_heat_client.stacks.list.side_effect = [iter(stacks[:2]), iter(stacks[2:])]
+        mock_session = MagicMock()
+        mock_call_handler = MagicMock()
+        mock_call_handler.call_idempotent.side_effect = lambda operation, func, *args, **kwargs: func(*args, **kwargs)
+        heat_driver = HeatDriver(mock_session, call_handler=mock_call_handler)
+        # Without a limit, pages are left to be read as the caller iterates
+        result = heat_driver.get_stacks()
+        mock_heat_client.stacks.list.assert_not_called()
+        self.assertIs(next(result), stacks[0])
+        mock_heat_client.stacks.list.assert_called_once_with(limit=2)
+        self.assertEqual(list(result), stacks[1:])
+        mock_heat_client.stacks.list.assert_called_with(limit=2, marker='B')
+        # Each page is a call through the call handler
+        self.assertEqual(mock_call_handler.call_idempotent.call_count, 2)
+        mock_call_handler.call_idempotent.assert_called_with('list_stacks', ANY, mock_heat_client, limit=2, marker='B')
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_find_stacks_by_name(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_stack = MagicMock()
+        mock_stack.to_dict.return_value = {'id': '123', 'stack_name': 'test_stack'}
+        mock_heat_client.stacks.list.return_value = iter([mock_stack])
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        self.assertEqual(heat_driver.find_stacks(stack_name='test_stack'), [{'id': '123', 'stack_name': 'test_stack'}])
+        mock_heat_client.stacks.list.assert_called_once_with(filters={'name': 'test_stack'})
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_find_stacks_by_tags(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_heat_client.stacks.list.return_value = iter([])
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        self.assertEqual(heat_driver.find_stacks(tags=['tagA', 'tagB']), [])
+        mock_heat_client.stacks.list.assert_called_once_with(tags='tagA,tagB')
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_find_stacks_without_name_or_tags_fails(self, mock_heat_client_init):
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        with self.assertRaises(ValueError) as context:
+            heat_driver.find_stacks()
+        self.assertEqual(str(context.exception), 'stack_name or tags must be provided')
+
+    @patch('osvimdriver.openstack.heat.driver.heatclient.Client')
+    def test_get_build_info(self, mock_heat_client_init):
+        mock_heat_client = mock_heat_client_init.return_value
+        mock_heat_client.build_info.build_info.return_value = {'api': {'revision': '1'}}
+        mock_session = MagicMock()
+        heat_driver = HeatDriver(mock_session)
+        build_info = heat_driver.get_build_info()
+        mock_heat_client.build_info.build_info.assert_called_once_with()
+        self.assertEqual(build_info, {'api': {'revision': '1'}})
@@ -16,6 +16,13 @@ class TestHeatInputUtil(unittest.TestCase):
         new_props = util.filter_used_properties(heat_yml, orig_props)
         self.assertEqual(new_props, {'propA': 'testA', 'propB': 'testB'})
 
+    def test_filter_stack_parameters(self):
+        util = HeatInputUtil()
+        stack_parameters = {'propA': 'oldA', 'propB': 'oldB', 'OS::stack_id': '123', 'OS::stack_name': 'test'}
+        orig_props = {'propA': 'testA', 'propB': 'testB', 'propC': 'testC', 'OS::stack_id': '456'}
+        new_props = util.filter_stack_parameters(stack_parameters, orig_props)
+        self.assertEqual(new_props, {'propA': 'testA', 'propB': 'testB'})
+
     def test_filter_used_properties_prop_value_map(self):
         util = HeatInputUtil()
         heat_yml = '''
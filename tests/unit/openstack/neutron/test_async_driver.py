@@ -0,0 +1,57 @@
+import unittest
+from neutronclient.common import exceptions as neutronexceptions
+from osvimdriver.openstack.aio import AsyncOpenstackSession
+from osvimdriver.openstack.neutron.async_driver import AsyncNeutronDriver
+from tests.unit.openstack.aiotestutils import FakeOpenstackApi
+
+
+class TestAsyncNeutronDriver(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.api = FakeOpenstackApi()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.api.close()
+
+    async def start(self):
+        await self.api.start()
+        self.session = AsyncOpenstackSession(self.api.keystone_session, location_name='Test')
+        return AsyncNeutronDriver(self.session)
+
+    async def test_get_network_by_id(self):
+        self.api.add_route('GET', '/v2.0/networks/123', body={'network': {'id': '123', 'name': 'private'}})
+        neutron_driver = await self.start()
+        network = await neutron_driver.get_network_by_id('123')
+        self.assertEqual(network, {'id': '123', 'name': 'private'})
+
+    async def test_get_network_by_id_not_found(self):
+        self.api.add_route('GET', '/v2.0/networks/123', status=404, body={'NeutronError': {'message': 'Network 123 could not be found.'}})
+        neutron_driver = await self.start()
+        with self.assertRaises(neutronexceptions.NotFound):
+            await neutron_driver.get_network_by_id('123')
+
+    async def test_get_network_by_name(self):
+        self.api.add_route('GET', '/v2.0/networks', body={'networks': [{'id': '123', 'name': 'private'}]})
+        neutron_driver = await self.start()
+        network = await neutron_driver.get_network_by_name('private')
+        self.assertEqual(network, {'id': '123', 'name': 'private'})
+        self.assertEqual(self.api.requests[0]['query'], {'name': 'private'})
+
+    async def test_get_network_by_name_not_found(self):
+        self.api.add_route('GET', '/v2.0/networks', body={'networks': []})
+        neutron_driver = await self.start()
+        with self.assertRaises(neutronexceptions.NotFound):
+            await neutron_driver.get_network_by_name('private')
+
+    async def test_get_network_by_name_not_unique(self):
+        self.api.add_route('GET', '/v2.0/networks', body={'networks': [{'id': '1', 'name': 'private'}, {'id': '2', 'name': 'private'}]})
+        neutron_driver = await self.start()
+        with self.assertRaises(neutronexceptions.NeutronClientNoUniqueMatch):
+            await neutron_driver.get_network_by_name('private')
+
+    async def test_get_subnet_by_id(self):
+        self.api.add_route('GET', '/v2.0/subnets/456', body={'subnet': {'id': '456'}})
+        neutron_driver = await self.start()
+        subnet = await neutron_driver.get_subnet_by_id('456')
+        self.assertEqual(subnet, {'id': '456'})
@@ -0,0 +1,131 @@
+import unittest
+import asyncio
+import ssl
+from unittest.mock import MagicMock, patch
+from aiohttp import web
+from osvimdriver.openstack.aio import AsyncOpenstackSession, OpenstackHttpError, build_ssl_context, gather_bounded, HEAT_SERVICE_TYPE
+from osvimdriver.service.timeouts import timeout_policy
+from osvimdriver.service.endpoints import EndpointSelector
+from tests.unit.openstack.aiotestutils import FakeOpenstackApi
+
+
+class TestAsyncOpenstackSession(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.api = FakeOpenstackApi()
+
+    async def asyncTearDown(self):
+        await self.api.close()
+
+    async def test_request_uses_keystone_token_and_endpoint(self):
+        self.api.add_route('GET', '/stacks', body={'stacks': []})
+        await self.api.start()
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            status, body = await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'stacks': []})
+        self.assertEqual(self.api.requests[0]['headers']['X-Auth-Token'], 'mock_token')
+        self.api.keystone_session.get_endpoint.assert_called_once_with(service_type=HEAT_SERVICE_TYPE, interface='public')
+
+    async def test_endpoint_looked_up_once(self):
+        self.api.add_route('GET', '/stacks', body={'stacks': []})
+        await self.api.start()
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+            await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+        self.api.keystone_session.get_endpoint.assert_called_once()
+
+    async def test_error_response_raises(self):
+        self.api.add_route('GET', '/stacks', status=500, body={'error': {'message': 'Internal error'}})
+        await self.api.start()
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            with self.assertRaises(OpenstackHttpError) as context:
+                await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+        self.assertEqual(context.exception.status_code, 500)
+        self.assertEqual(context.exception.message, 'Internal error')
+
+    async def test_reauthenticates_once_on_unauthorized(self):
+        attempts = []
+        async def handler(request):
+            attempts.append(request.headers['X-Auth-Token'])
+            if len(attempts) == 1:
+                return web.json_response({'error': {'message': 'Unauthorized'}}, status=401)
+            return web.json_response({'stacks': []})
+        self.api.add_route('GET', '/stacks', handler=handler)
+        await self.api.start()
+        self.api.keystone_session.get_token.side_effect = ['expired_token', 'new_token']
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            status, _ = await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+        self.assertEqual(status, 200)
+        self.assertEqual(attempts, ['expired_token', 'new_token'])
+        self.api.keystone_session.invalidate.assert_called_once()
+
+    async def test_request_times_out(self):
+        async def handler(request):
+            await asyncio.sleep(1)
+            return web.json_response({'stacks': []})
+        self.api.add_route('GET', '/stacks', handler=handler)
+        await self.api.start()
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            with timeout_policy.operation_timeout((5, 0.05)):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+
+    async def test_request_sent_to_selected_endpoint(self):
+        self.api.add_route('GET', '/stacks', body={'stacks': []})
+        await self.api.start()
+        # Catalog gives a different host of the location, the request should be sent to the selected one
+        self.api.keystone_session.get_endpoint.return_value = str(self.api.server.make_url('')).replace('127.0.0.1', 'localhost')
+        selector = EndpointSelector('testdl', ['http://127.0.0.1:5000', 'http://localhost:5000'])
+        async with AsyncOpenstackSession(self.api.keystone_session, endpoint_selector=selector) as session:
+            status, _ = await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+        self.assertEqual(status, 200)
+        self.assertEqual(self.api.requests[0]['headers']['Host'].split(':')[0], '127.0.0.1')
+        self.assertIsNotNone(selector.stats('127.0.0.1').latency)
+        self.assertIsNone(selector.stats('localhost').latency)
+
+    async def test_missing_endpoint_raises(self):
+        await self.api.start()
+        self.api.keystone_session.get_endpoint.return_value = None
+        async with AsyncOpenstackSession(self.api.keystone_session) as session:
+            with self.assertRaises(ValueError):
+                await session.request(HEAT_SERVICE_TYPE, 'GET', '/stacks')
+
+
+class TestBuildSslContext(unittest.TestCase):
+
+    def test_default_verifies(self):
+        session = MagicMock(verify=True, cert=None)
+        ssl_context = build_ssl_context(session)
+        self.assertEqual(ssl_context.verify_mode, ssl.CERT_REQUIRED)
+
+    def test_verify_disabled(self):
+        session = MagicMock(verify=False, cert=None)
+        ssl_context = build_ssl_context(session)
+        self.assertEqual(ssl_context.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(ssl_context.check_hostname)
+
+    @patch('osvimdriver.openstack.aio.ssl.create_default_context')
+    def test_ca_cert_and_client_cert(self, mock_create_default_context):
+        session = MagicMock(verify='/tmp/ca.cert', cert=('/tmp/client.cert', '/tmp/client.key'))
+        ssl_context = build_ssl_context(session)
+        mock_create_default_context.assert_called_once_with(cafile='/tmp/ca.cert')
+        ssl_context.load_cert_chain.assert_called_once_with('/tmp/client.cert', '/tmp/client.key')
+
+
+class TestGatherBounded(unittest.IsolatedAsyncioTestCase):
+
+    async def test_limits_concurrency_and_returns_exceptions(self):
+        active = {'current': 0, 'max': 0}
+        async def work(i):
+            active['current'] += 1
+            active['max'] = max(active['max'], active['current'])
+            await asyncio.sleep(0.01)
+            active['current'] -= 1
+            if i == 3:
+                raise ValueError('Failed')
+            return i
+        results = await gather_bounded([work(i) for i in range(10)], 3)
+        self.assertEqual(active['max'], 3)
+        self.assertEqual(results[0], 0)
+        self.assertIsInstance(results[3], ValueError)
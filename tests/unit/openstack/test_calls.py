@@ -0,0 +1,257 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from heatclient import exc as heatexc
+import osvimdriver.service.metrics as metrics
+from osvimdriver.openstack.calls import OpenstackCallHandler
+from osvimdriver.service.ratelimit import rate_limiters, RateLimitProperties, RateLimitExceededError
+from osvimdriver.service.retry import retry_policy
+from osvimdriver.service.circuitbreaker import circuit_breakers, CircuitBreakerProperties, CircuitOpenError
+from osvimdriver.service.timeouts import timeout_policy, current_timeout, DeadlineExceededError
+from osvimdriver.service.bulkhead import bulkheads, BulkheadProperties, BulkheadFullError
+from osvimdriver.service.hedging import hedging_policy, HedgingProperties
+
+
+class TestOpenstackCallHandler(unittest.TestCase):
+
+    def test_call_records_duration(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-dl')
+        func = MagicMock(return_value='result')
+        result = handler.call('get_stack', func, '123', resolve_outputs=True)
+        self.assertEqual(result, 'result')
+        func.assert_called_once_with('123', resolve_outputs=True)
+        _, count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='heat', operation='get_stack', location='test-calls-dl').snapshot()
+        self.assertEqual(count, 1)
+
+    def test_call_records_error(self):
+        handler = OpenstackCallHandler('neutron', 'test-calls-dl')
+        func = MagicMock(side_effect=ValueError('Failed'))
+        with self.assertRaises(ValueError):
+            handler.call('show_network', func, '123')
+        errors = metrics.OPENSTACK_REQUEST_ERRORS.labels(service='neutron', operation='show_network', location='test-calls-dl', error='ValueError')
+        self.assertEqual(errors.get(), 1)
+        _, count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='neutron', operation='show_network', location='test-calls-dl').snapshot()
+        self.assertEqual(count, 1)
+
+    def test_call_rate_limited(self):
+        properties = RateLimitProperties()
+        properties.enabled = True
+        properties.max_concurrency = 1
+        properties.max_wait = 0
+        rate_limiters.configure(properties)
+        try:
+            handler = OpenstackCallHandler('heat', 'test-calls-limited-dl')
+            def nested_call():
+                # The only slot is held by the outer call
+                return handler.call('get_stack', MagicMock())
+            with self.assertRaises(RateLimitExceededError):
+                handler.call('create_stack', nested_call)
+            self.assertEqual(handler.call('get_stack', MagicMock(return_value='result')), 'result')
+        finally:
+            rate_limiters.configure(None)
+
+    @patch.object(retry_policy, 'random_func', lambda: 0)
+    @patch.object(retry_policy, 'max_attempts', 3)
+    def test_call_idempotent_retries_transient_errors(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-retry-dl')
+        func = MagicMock(side_effect=[heatexc.HTTPServiceUnavailable('Unavailable'), heatexc.HTTPBadGateway('Bad gateway'), 'result'])
+        self.assertEqual(handler.call_idempotent('get_stack', func, '123'), 'result')
+        self.assertEqual(func.call_count, 3)
+        retries = metrics.OPENSTACK_REQUEST_RETRIES.labels(service='heat', operation='get_stack', location='test-calls-retry-dl', error='HTTPServiceUnavailable')
+        self.assertEqual(retries.get(), 1)
+
+    @patch.object(retry_policy, 'random_func', lambda: 0)
+    @patch.object(retry_policy, 'max_attempts', 3)
+    def test_call_idempotent_raises_after_max_attempts(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-retry-dl')
+        func = MagicMock(side_effect=heatexc.HTTPServiceUnavailable('Unavailable'))
+        with self.assertRaises(heatexc.HTTPServiceUnavailable):
+            handler.call_idempotent('list_stacks', func)
+        self.assertEqual(func.call_count, 3)
+
+    @patch.object(retry_policy, 'random_func', lambda: 0)
+    @patch.object(retry_policy, 'max_attempts', 3)
+    def test_call_idempotent_does_not_retry_client_errors(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-retry-dl')
+        func = MagicMock(side_effect=heatexc.HTTPNotFound('Not found'))
+        with self.assertRaises(heatexc.HTTPNotFound):
+            handler.call_idempotent('get_stack', func, '123')
+        self.assertEqual(func.call_count, 1)
+
+    @patch.object(retry_policy, 'random_func', lambda: 0)
+    @patch.object(retry_policy, 'max_attempts', 3)
+    def test_call_not_retried(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-retry-dl')
+        func = MagicMock(side_effect=heatexc.HTTPServiceUnavailable('Unavailable'))
+        with self.assertRaises(heatexc.HTTPServiceUnavailable):
+            handler.call('create_stack', func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_call_fails_fast_when_breaker_open(self):
+        properties = CircuitBreakerProperties()
+        properties.failure_threshold = 2
+        circuit_breakers.configure(properties)
+        try:
+            handler = OpenstackCallHandler('heat', 'test-calls-breaker-dl')
+            func = MagicMock(side_effect=heatexc.HTTPServiceUnavailable('Unavailable'))
+            for _ in range(2):
+                with self.assertRaises(heatexc.HTTPServiceUnavailable):
+                    handler.call('get_stack', func)
+            with self.assertRaises(CircuitOpenError):
+                handler.call('get_stack', func)
+            # Shared by all services of the location
+            with self.assertRaises(CircuitOpenError):
+                OpenstackCallHandler('neutron', 'test-calls-breaker-dl').call('show_network', func)
+            self.assertEqual(func.call_count, 2)
+            self.assertEqual(OpenstackCallHandler('heat', 'test-calls-other-dl').call('get_stack', MagicMock(return_value='result')), 'result')
+        finally:
+            circuit_breakers.configure(None)
+
+    def test_call_fails_fast_when_location_saturated(self):
+        properties = BulkheadProperties()
+        properties.max_concurrent_calls = 1
+        bulkheads.configure(properties)
+        try:
+            handler = OpenstackCallHandler('heat', 'test-calls-bulkhead-dl')
+            auth_handler = OpenstackCallHandler('keystone', 'test-calls-bulkhead-dl')
+            other_handler = OpenstackCallHandler('heat', 'test-calls-other-bulkhead-dl')
+            errors = []
+            def slow_call():
+                # Authenticating within the call uses the slot of the call
+                auth_handler.call('authenticate', MagicMock())
+                # The only slot of this location is held, but other locations are unaffected
+                self.assertEqual(other_handler.call('get_stack', MagicMock(return_value='result')), 'result')
+                thread = threading.Thread(target=lambda: errors.append(self.__call_error(handler, 'get_stack')))
+                thread.start()
+                thread.join()
+            handler.call('create_stack', slow_call)
+            self.assertIsInstance(errors[0], BulkheadFullError)
+            self.assertEqual(handler.call('get_stack', MagicMock(return_value='result')), 'result')
+        finally:
+            bulkheads.configure(None)
+
+    def test_call_idempotent_hedged(self):
+        properties = HedgingProperties()
+        properties.enabled = True
+        properties.min_samples = 1
+        properties.min_delay = 0.01
+        properties.budget_ratio = 1
+        hedging_policy.configure(properties)
+        try:
+            handler = OpenstackCallHandler('heat', 'test-calls-hedge-dl')
+            handler.call_idempotent('get_stack', MagicMock(return_value='warm up'))
+            attempts = []
+            def get_stack(stack_id):
+                attempts.append(stack_id)
+                if len(attempts) == 1:
+                    time.sleep(1)
+                    return 'slow'
+                return 'fast'
+            self.assertEqual(handler.call_idempotent('get_stack', get_stack, '123'), 'fast')
+            self.assertEqual(attempts, ['123', '123'])
+            # Both requests are recorded
+            _, count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='heat', operation='get_stack', location='test-calls-hedge-dl').snapshot()
+            self.assertGreaterEqual(count, 2)
+            # Not idempotent, so never hedged
+            self.assertEqual(handler.call('create_stack', MagicMock(return_value='created')), 'created')
+        finally:
+            hedging_policy.configure(None)
+
+    def __call_error(self, handler, operation):
+        try:
+            handler.call(operation, MagicMock())
+        except Exception as e:
+            return e
+        return None
+
+    @patch.object(timeout_policy, 'connect', 5)
+    @patch.object(timeout_policy, 'read', 30)
+    @patch.object(timeout_policy, 'operations', {'create_stack': {'read': 120}})
+    def test_call_applies_operation_timeout(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-timeout-dl')
+        self.assertEqual(handler.call('get_stack', current_timeout), (5, 30))
+        self.assertEqual(handler.call('create_stack', current_timeout), (5, 120))
+        self.assertIsNone(current_timeout())
+
+    @patch.object(timeout_policy, 'request_deadline', 0.01)
+    def test_call_fails_once_deadline_exceeded(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-deadline-dl')
+        func = MagicMock()
+        with timeout_policy.request_deadline_for('get_lifecycle_execution'):
+            time.sleep(0.02)
+            with self.assertRaises(DeadlineExceededError):
+                handler.call('get_stack', func)
+        func.assert_not_called()
+
+    @patch.object(timeout_policy, 'request_deadline', 10)
+    def test_call_timeout_limited_by_deadline(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-deadline-dl')
+        with timeout_policy.request_deadline_for('get_lifecycle_execution'):
+            connect, read = handler.call('get_stack', current_timeout)
+        self.assertLessEqual(connect, 10)
+        self.assertLessEqual(read, 10)
+
+    @patch.object(retry_policy, 'random_func', lambda: 1)
+    @patch.object(retry_policy, 'max_attempts', 3)
+    @patch.object(retry_policy, 'base_delay', 1)
+    @patch.object(timeout_policy, 'request_deadline', 0.5)
+    def test_call_idempotent_not_retried_past_deadline(self):
+        handler = OpenstackCallHandler('heat', 'test-calls-deadline-dl')
+        func = MagicMock(side_effect=heatexc.HTTPServiceUnavailable('Unavailable'))
+        with timeout_policy.request_deadline_for('get_lifecycle_execution'):
+            with self.assertRaises(heatexc.HTTPServiceUnavailable):
+                handler.call_idempotent('get_stack', func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_instrument_auth(self):
+        handler = OpenstackCallHandler('keystone', 'test-auth-dl')
+        auth = MagicMock()
+        get_auth_ref = auth.get_auth_ref
+        handler.instrument_auth(auth)
+        auth.get_auth_ref('session')
+        get_auth_ref.assert_called_once_with('session')
+        _, count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='keystone', operation='authenticate', location='test-auth-dl').snapshot()
+        self.assertEqual(count, 1)
+
+
+class TestOpenstackCallHandlerAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_acall_records_duration(self):
+        handler = OpenstackCallHandler('heat', 'test-acalls-dl')
+        async def func(stack_id):
+            return stack_id
+        result = await handler.acall('get_stack', func, '123')
+        self.assertEqual(result, '123')
+        _, count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='heat', operation='get_stack', location='test-acalls-dl').snapshot()
+        self.assertEqual(count, 1)
+
+    async def test_acall_records_error(self):
+        handler = OpenstackCallHandler('neutron', 'test-acalls-dl')
+        async def func():
+            raise ValueError('Failed')
+        with self.assertRaises(ValueError):
+            await handler.acall('show_network', func)
+        errors = metrics.OPENSTACK_REQUEST_ERRORS.labels(service='neutron', operation='show_network', location='test-acalls-dl', error='ValueError')
+        self.assertEqual(errors.get(), 1)
+
+    @patch.object(timeout_policy, 'connect', 5)
+    @patch.object(timeout_policy, 'read', 30)
+    async def test_acall_applies_operation_timeout(self):
+        handler = OpenstackCallHandler('heat', 'test-acalls-timeout-dl')
+        async def func():
+            return current_timeout()
+        self.assertEqual(await handler.acall('get_stack', func), (5, 30))
+
+    @patch.object(retry_policy, 'random_func', lambda: 0)
+    @patch.object(retry_policy, 'max_attempts', 2)
+    async def test_acall_idempotent_retries_transient_errors(self):
+        handler = OpenstackCallHandler('heat', 'test-acalls-retry-dl')
+        attempts = []
+        async def func():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionResetError('Reset')
+            return 'result'
+        self.assertEqual(await handler.acall_idempotent('get_stack', func), 'result')
+        self.assertEqual(len(attempts), 2)
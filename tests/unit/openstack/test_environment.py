@@ -1,9 +1,29 @@
 import os
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import yaml
 import tests.unit.openstack.certs as certs
-from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator, OpenstackDeploymentLocation, OpenstackPasswordAuth, OS_URL_PROP, AUTH_ENABLED_PROP, AUTH_API_PROP
+from osvimdriver.openstack.environment import (OpenstackDeploymentLocationTranslator, OpenstackDeploymentLocation, OpenstackPasswordAuth, OpenstackApplicationCredentialAuth,
+                                               OpenstackTokenAuth, OS_URL_PROP, AUTH_ENABLED_PROP, AUTH_API_PROP, AUTH_TYPE_PROP)
 from unittest.mock import patch, MagicMock
+from osvimdriver.openstack.tls import SSLContextAdapter, ssl_contexts
+from osvimdriver.service.endpoints import endpoint_selection, EndpointSelectionProperties
+from osvimdriver.service.authcache import auth_state_cache, AuthCacheProperties
+from osvimdriver.service.connections import connection_pools, ConnectionPoolProperties
+from osvimdriver.openstack.heat.async_driver import AsyncHeatDriver
+from osvimdriver.openstack.neutron.async_driver import AsyncNeutronDriver
+import osvimdriver.service.metrics as metrics
+from tests.unit.openstack.aiotestutils import FakeOpenstackApi
+
+
+def read_test_certs():
+    certs_dir = os.path.dirname(os.path.abspath(certs.__file__))
+    contents = []
+    for file_name in ['ca.cert', 'client.cert', 'client.key']:
+        with open(os.path.join(certs_dir, file_name), 'r') as f:
+            contents.append(f.read())
+    return tuple(contents)
 
 
 class TestOpenstackPasswordAuth(unittest.TestCase):
@@ -21,6 +41,20 @@ class TestOpenstackPasswordAuth(unittest.TestCase):
         self.assertEqual(os_auth, mock_password)
         mock_keystone_password_init.assert_called_with(auth_url='http://testip/identity/v3', username='test', password='secret')
 
+    @patch('osvimdriver.openstack.environment.keystonev3.ApplicationCredential')
+    def test_build_application_credential_auth(self, mock_keystone_app_cred_init):
+        auth = OpenstackApplicationCredentialAuth('identity/v3', auth_properties={'application_credential_id': 'abc', 'application_credential_secret': 'secret'})
+        os_auth = auth.build_os_auth('http://testip')
+        self.assertEqual(os_auth, mock_keystone_app_cred_init.return_value)
+        mock_keystone_app_cred_init.assert_called_with(auth_url='http://testip/identity/v3', application_credential_id='abc', application_credential_secret='secret')
+
+    @patch('osvimdriver.openstack.environment.keystonev3.Token')
+    def test_build_token_auth(self, mock_keystone_token_init):
+        auth = OpenstackTokenAuth('identity/v3', auth_properties={'token': 'abc', 'project_id': '123'})
+        os_auth = auth.build_os_auth('http://testip')
+        self.assertEqual(os_auth, mock_keystone_token_init.return_value)
+        mock_keystone_token_init.assert_called_with(auth_url='http://testip/identity/v3', token='abc', project_id='123')
+
 
 class TestOpenstackDeploymentLocation(unittest.TestCase):
 
@@ -88,6 +122,28 @@ class TestOpenstackDeploymentLocation(unittest.TestCase):
         second_heat_driver = location.heat_driver
         self.assertEqual(second_heat_driver, first_heat_driver)
 
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    @patch('osvimdriver.openstack.environment.HeatDriver')
+    def test_prepare_heat_driver(self, mock_heat_driver_init, mock_keystone_session_init):
+        mock_session = mock_keystone_session_init.return_value
+        mock_auth = MagicMock()
+        mock_auth.build_os_auth.return_value = MagicMock()
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', mock_auth)
+        heat_driver = location.prepare_heat_driver()
+        self.assertEqual(heat_driver, mock_heat_driver_init.return_value)
+        self.assertIs(location.heat_driver, heat_driver)
+        mock_session.get_token.assert_called_once()
+        mock_session.get_endpoint.assert_called_once_with(service_type='orchestration', interface='public')
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    @patch('osvimdriver.openstack.environment.HeatDriver')
+    def test_prepare_heat_driver_without_auth(self, mock_heat_driver_init, mock_keystone_session_init):
+        mock_session = mock_keystone_session_init.return_value
+        mock_session.auth = None
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', None)
+        self.assertEqual(location.prepare_heat_driver(), mock_heat_driver_init.return_value)
+        mock_session.get_token.assert_not_called()
+
     @patch('osvimdriver.openstack.environment.keystonesession.Session')
     @patch('osvimdriver.openstack.environment.NeutronDriver')
     def test_get_neutron_driver(self, mock_neutron_driver_init, mock_keystone_session_init):
@@ -114,50 +170,147 @@ class TestOpenstackDeploymentLocation(unittest.TestCase):
         self.assertEqual(second_neutron_driver, first_neutron_driver)
 
     @patch('osvimdriver.openstack.environment.keystonesession.Session')
-    def test_get_session_with_certs(self, mock_keystone_session_init):
-        mock_os_auth = MagicMock()
-        mock_auth = MagicMock()
-        mock_auth.build_os_auth.return_value = mock_os_auth
-        mock_keystone_session = mock_keystone_session_init.return_value
-        certs_dir = os.path.dirname(os.path.abspath(certs.__file__))
-        ca_cert_path = os.path.join(certs_dir, 'ca.cert')
-        with open(ca_cert_path, 'r') as f:
-            ca_cert = f.read()
-        client_cert_path = os.path.join(certs_dir, 'client.cert')
-        with open(client_cert_path, 'r') as f:
-            client_cert = f.read()
-        client_key_path = os.path.join(certs_dir, 'client.key')
-        with open(client_key_path, 'r') as f:
-            client_key = f.read()
-        location = OpenstackDeploymentLocation('testdl', 'http://testip', mock_auth, ca_cert=ca_cert, client_cert=client_cert, client_key=client_key)
+    @patch('osvimdriver.openstack.environment.HeatDriver')
+    @patch('osvimdriver.openstack.environment.NeutronDriver')
+    def test_concurrent_lazy_init_creates_one_session_and_driver(self, mock_neutron_driver_init, mock_heat_driver_init, mock_keystone_session_init):
+        # Slow construction widens the window in which unlocked lazy init would create duplicates
+        def slow_session(**kwargs):
+            time.sleep(0.01)
+            return MagicMock()
+        mock_keystone_session_init.side_effect = slow_session
+        mock_heat_driver_init.side_effect = lambda *args, **kwargs: (time.sleep(0.01), MagicMock())[1]
+        mock_neutron_driver_init.side_effect = lambda *args, **kwargs: (time.sleep(0.01), MagicMock())[1]
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', MagicMock(), ca_cert=read_test_certs()[0])
         try:
-            created_session = location.create_session()
-            mock_keystone_session_init.assert_called_once_with(auth=mock_os_auth, verify=location._OpenstackDeploymentLocation__ca_cert_path, cert=(location._OpenstackDeploymentLocation__client_cert_path, location._OpenstackDeploymentLocation__client_key_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__ca_cert_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__client_cert_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__client_key_path))
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                heat_drivers = list(executor.map(lambda _: location.heat_driver, range(64)))
+                neutron_drivers = list(executor.map(lambda _: location.neutron_driver, range(64)))
+            self.assertEqual(mock_keystone_session_init.call_count, 1)
+            self.assertEqual(mock_heat_driver_init.call_count, 1)
+            self.assertEqual(mock_neutron_driver_init.call_count, 1)
+            self.assertTrue(all(driver is heat_drivers[0] for driver in heat_drivers))
+            self.assertTrue(all(driver is neutron_drivers[0] for driver in neutron_drivers))
         finally:
             location.close()
 
     @patch('osvimdriver.openstack.environment.keystonesession.Session')
-    def test_close_session_with_certs_removes_files(self, mock_keystone_session_init):
+    def test_create_async_session(self, mock_keystone_session_init):
+        mock_auth = MagicMock()
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', mock_auth)
+        async_session = location.create_async_session(connection_limit=10)
+        self.assertEqual(async_session.keystone_session, mock_keystone_session_init.return_value)
+        self.assertEqual(async_session.location_name, 'testdl')
+        self.assertEqual(async_session.connection_limit, 10)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_session_selects_between_api_urls(self, mock_keystone_session_init):
+        endpoint_selection.configure(EndpointSelectionProperties())
+        try:
+            mock_request = mock_keystone_session_init.return_value.request
+            location = OpenstackDeploymentLocation('testdl', 'http://vip-a:5000', MagicMock(), api_urls=['http://vip-a:5000', 'http://vip-b:5000'])
+            session = location.get_session()
+            session.request('http://vip-a:8004/v1/stacks', 'GET')
+            session.request('http://vip-a:8004/v1/stacks', 'GET')
+            # Each endpoint is measured before the fastest is chosen
+            self.assertEqual([call[0][0] for call in mock_request.call_args_list], ['http://vip-a:8004/v1/stacks', 'http://vip-b:8004/v1/stacks'])
+            async_session = location.create_async_session()
+            self.assertEqual(async_session.endpoint_selector.hosts, ['vip-a', 'vip-b'])
+        finally:
+            endpoint_selection.configure(None)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_auth_state_shared_between_locations(self, mock_keystone_session_init):
+        auth_state_cache.configure(AuthCacheProperties())
+        try:
+            auth = OpenstackPasswordAuth('identity/v3', {'username': 'test', 'password': 'secret'})
+            first_plugin = MagicMock()
+            first_plugin.get_auth_state.return_value = '{"auth_token": "abc"}'
+            second_plugin = MagicMock()
+            with patch.object(auth, 'build_os_auth', side_effect=[first_plugin, second_plugin]):
+                first_location = OpenstackDeploymentLocation('testdl', 'http://testip', auth)
+                first_location.get_session()
+                first_plugin.set_auth_state.assert_not_called()
+                first_location.close()
+                second_location = OpenstackDeploymentLocation('testdl', 'http://testip', auth)
+                second_location.get_session()
+                second_location.close()
+            second_plugin.set_auth_state.assert_called_once_with('{"auth_token": "abc"}')
+            # Discovered API versions are shared too
+            first_discovery_cache = mock_keystone_session_init.call_args_list[0][1]['discovery_cache']
+            self.assertIs(mock_keystone_session_init.call_args_list[1][1]['discovery_cache'], first_discovery_cache)
+        finally:
+            auth_state_cache.configure(None)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_get_session_with_certs(self, mock_keystone_session_init):
         mock_os_auth = MagicMock()
         mock_auth = MagicMock()
         mock_auth.build_os_auth.return_value = mock_os_auth
-        mock_keystone_session = mock_keystone_session_init.return_value
-        location = OpenstackDeploymentLocation('testdl', 'http://testip', mock_auth, ca_cert='cacert', client_cert='clientcert', client_key='clientkey')
+        ca_cert, client_cert, client_key = read_test_certs()
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', mock_auth, ca_cert=ca_cert, client_cert=client_cert, client_key=client_key)
+        with patch('osvimdriver.openstack.tls.tempfile') as mock_tempfile:
+            location.create_session()
+        mock_tempfile.assert_not_called()
+        mock_keystone_session_init.assert_called_once()
+        self.assertEqual(mock_keystone_session_init.call_args[1]['auth'], mock_os_auth)
+        self.assertNotIn('verify', mock_keystone_session_init.call_args[1])
+        self.assertNotIn('cert', mock_keystone_session_init.call_args[1])
+        https_adapter = mock_keystone_session_init.call_args[1]['session'].get_adapter('https://testip')
+        self.assertIsInstance(https_adapter, SSLContextAdapter)
+        self.assertIs(https_adapter.ssl_context, ssl_contexts.get(ca_cert=ca_cert, client_cert=client_cert, client_key=client_key))
+        async_session = location.create_async_session()
+        self.assertIs(async_session.ssl_context, https_adapter.ssl_context)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_ssl_context_shared_by_locations_with_same_certs(self, mock_keystone_session_init):
+        ca_cert, _, _ = read_test_certs()
+        OpenstackDeploymentLocation('testdl', 'http://testip', None, ca_cert=ca_cert).create_session()
+        OpenstackDeploymentLocation('otherdl', 'http://otherip', None, ca_cert=ca_cert).create_session()
+        first_context = mock_keystone_session_init.call_args_list[0][1]['session'].get_adapter('https://testip').ssl_context
+        second_context = mock_keystone_session_init.call_args_list[1][1]['session'].get_adapter('https://otherip').ssl_context
+        self.assertIs(first_context, second_context)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_get_session_without_certs(self, mock_keystone_session_init):
+        location = OpenstackDeploymentLocation('testdl', 'http://testip', None)
+        location.create_session()
+        mock_keystone_session_init.assert_called_once_with(auth=None)
+        self.assertIsNone(location.create_async_session().ssl_context)
+
+    @patch('osvimdriver.openstack.environment.keystonesession.Session')
+    def test_get_session_shares_connection_pool(self, mock_keystone_session_init):
+        connection_pools.configure(ConnectionPoolProperties())
         try:
-            created_session = location.create_session()
-            mock_keystone_session_init.assert_called_once_with(auth=mock_os_auth, verify=location._OpenstackDeploymentLocation__ca_cert_path, cert=(location._OpenstackDeploymentLocation__client_cert_path, location._OpenstackDeploymentLocation__client_key_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__ca_cert_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__client_cert_path))
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__client_key_path))
-            location.close()
-            self.assertFalse(os.path.exists(location._OpenstackDeploymentLocation__ca_cert_path))
-            self.assertFalse(os.path.exists(location._OpenstackDeploymentLocation__client_cert_path))
-            self.assertFalse(os.path.exists(location._OpenstackDeploymentLocation__client_key_path))
+            OpenstackDeploymentLocation('testdl', 'http://testip', None).create_session()
+            OpenstackDeploymentLocation('testdl', 'http://testip', None).create_session()
+            first_http_session = mock_keystone_session_init.call_args_list[0][1]['session']
+            self.assertIs(mock_keystone_session_init.call_args_list[1][1]['session'], first_http_session)
+            self.assertIs(first_http_session, connection_pools.get('testdl'))
         finally:
-            location.close()
+            connection_pools.configure(None)
+
+
+class TestOpenstackDeploymentLocationAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_async_drivers_share_session_of_location(self):
+        api = FakeOpenstackApi()
+        api.add_route('GET', '/stacks/12345', body={'stack': {'id': '12345'}})
+        api.add_route('GET', '/v2.0/networks/123', body={'network': {'id': '123'}})
+        await api.start()
+        try:
+            location = OpenstackDeploymentLocation('test-async-drivers-dl', 'http://testip', MagicMock())
+            with patch('osvimdriver.openstack.environment.keystonesession.Session', return_value=api.keystone_session):
+                async with location.create_async_session() as async_session:
+                    self.assertEqual(await AsyncHeatDriver(async_session).get_stack('12345'), {'id': '12345'})
+                    self.assertEqual(await AsyncNeutronDriver(async_session).get_network_by_id('123'), {'id': '123'})
+        finally:
+            await api.close()
+        # Authenticated with the token of the location's session, and made through the call handler of the location
+        self.assertEqual([request['headers']['X-Auth-Token'] for request in api.requests], ['mock_token', 'mock_token'])
+        _, heat_count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='heat', operation='get_stack', location='test-async-drivers-dl').snapshot()
+        _, neutron_count, _ = metrics.OPENSTACK_REQUEST_DURATION.labels(service='neutron', operation='show_network', location='test-async-drivers-dl').snapshot()
+        self.assertEqual((heat_count, neutron_count), (1, 1))
+
 
 class TestOpenstackDeploymentLocationTranslator(unittest.TestCase):
 
@@ -190,6 +343,22 @@ class TestOpenstackDeploymentLocationTranslator(unittest.TestCase):
         }})
         self.assertIsNone(openstack_location._OpenstackDeploymentLocation__auth)
 
+    def test_from_deployment_location_multiple_urls(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        for api_urls in [['http://vip-a:5000', 'http://vip-b:5000'], 'http://vip-a:5000, http://vip-b:5000']:
+            openstack_location = translator.from_deployment_location({'name': 'testdl', 'properties': {
+                OS_URL_PROP: api_urls,
+                AUTH_ENABLED_PROP: False
+            }})
+            self.assertEqual(openstack_location._OpenstackDeploymentLocation__api_url, 'http://vip-a:5000')
+            self.assertEqual(openstack_location._OpenstackDeploymentLocation__api_urls, ['http://vip-a:5000', 'http://vip-b:5000'])
+
+    def test_from_deployment_location_empty_urls(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        with self.assertRaises(ValueError) as context:
+            translator.from_deployment_location({'name': 'testdl', 'properties': {OS_URL_PROP: []}})
+        self.assertEqual(str(context.exception), 'Deployment Location managed by the Openstack VIM Driver must specify a property value for \'{0}\''.format(OS_URL_PROP))
+
     def test_from_deployment_location_auth_enabled_not_a_bool(self):
         translator = OpenstackDeploymentLocationTranslator()
         with self.assertRaises(ValueError) as context:
@@ -227,6 +396,52 @@ class TestOpenstackDeploymentLocationTranslator(unittest.TestCase):
         self.assertEqual(openstack_auth.auth_properties['domain_id'], 'testdomain')
         self.assertEqual(len(openstack_auth.auth_properties), 3)
 
+    def test_from_deployment_location_application_credential_auth(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        openstack_location = translator.from_deployment_location({'name': 'testdl', 'properties': {
+            OS_URL_PROP: 'testip',
+            AUTH_API_PROP: 'identity/v3',
+            AUTH_TYPE_PROP: 'application_credential',
+            'os_auth_application_credential_id': 'abc',
+            'os_auth_application_credential_secret': 'secret'
+        }})
+        openstack_auth = openstack_location._OpenstackDeploymentLocation__auth
+        self.assertEqual(type(openstack_auth), OpenstackApplicationCredentialAuth)
+        self.assertEqual(openstack_auth.auth_properties, {'application_credential_id': 'abc', 'application_credential_secret': 'secret'})
+
+    def test_from_deployment_location_token_auth(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        openstack_location = translator.from_deployment_location({'name': 'testdl', 'properties': {
+            OS_URL_PROP: 'testip',
+            AUTH_API_PROP: 'identity/v3',
+            AUTH_TYPE_PROP: 'token',
+            'os_auth_token': 'abc',
+            'os_auth_project_id': '123'
+        }})
+        openstack_auth = openstack_location._OpenstackDeploymentLocation__auth
+        self.assertEqual(type(openstack_auth), OpenstackTokenAuth)
+        self.assertEqual(openstack_auth.auth_properties, {'token': 'abc', 'project_id': '123'})
+
+    def test_from_deployment_location_token_auth_missing_token(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        with self.assertRaises(ValueError) as context:
+            translator.from_deployment_location({'name': 'testdl', 'properties': {
+                OS_URL_PROP: 'testip',
+                AUTH_API_PROP: 'identity/v3',
+                AUTH_TYPE_PROP: 'token'
+            }})
+        self.assertEqual(str(context.exception), 'Deployment Location must specify a value for property \'os_auth_token\' when \'os_auth_type\' is \'token\'')
+
+    def test_from_deployment_location_unknown_auth_type(self):
+        translator = OpenstackDeploymentLocationTranslator()
+        with self.assertRaises(ValueError) as context:
+            translator.from_deployment_location({'name': 'testdl', 'properties': {
+                OS_URL_PROP: 'testip',
+                AUTH_API_PROP: 'identity/v3',
+                AUTH_TYPE_PROP: 'kerberos'
+            }})
+        self.assertEqual(str(context.exception), 'Deployment Location has an unsupported value for property \'os_auth_type\', must be one of: password, application_credential, token')
+
     def test_from_deployment_location_with_certs(self):
         translator = OpenstackDeploymentLocationTranslator()
         certs_dir = os.path.dirname(os.path.abspath(certs.__file__))
@@ -263,12 +478,11 @@ class TestOpenstackDeploymentLocationTranslator(unittest.TestCase):
         location = translator.from_deployment_location(location_dict)
         try:
             location.create_session()
-            self.assertTrue(os.path.exists(location._OpenstackDeploymentLocation__ca_cert_path))
             path_to_expected_cacert = os.path.join(certs_dir, 'ca.cert')
             with open(path_to_expected_cacert, 'r') as f:
                 expected_cacert = f.read()
-            with open(location._OpenstackDeploymentLocation__ca_cert_path, 'r') as f:
-                actual_cacert = f.read()
-            self.assertEqual(actual_cacert, expected_cacert)
+            self.assertEqual(location._OpenstackDeploymentLocation__ca_cert, expected_cacert)
+            https_adapter = mock_keystone_session_init.call_args[1]['session'].get_adapter('https://testing.example.com')
+            self.assertIs(https_adapter.ssl_context, ssl_contexts.get(ca_cert=expected_cacert))
         finally:
             location.close()
\ No newline at end of file
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+import aiohttp
+from heatclient import exc as heatexc
+from keystoneauth1 import exceptions as keystoneexceptions
+from neutronclient.common import exceptions as neutronexceptions
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+from osvimdriver.openstack.aio import OpenstackHttpError
+from osvimdriver.openstack.errors import status_code_of, is_server_error, is_retryable_error
+
+
+class TestErrors(unittest.TestCase):
+
+    def test_status_code_of(self):
+        self.assertEqual(status_code_of(heatexc.HTTPServiceUnavailable('Unavailable')), 503)
+        self.assertEqual(status_code_of(neutronexceptions.NeutronClientException(status_code=502)), 502)
+        self.assertEqual(status_code_of(keystoneexceptions.GatewayTimeout()), 504)
+        self.assertEqual(status_code_of(OpenstackHttpError(500, 'Failed')), 500)
+        self.assertIsNone(status_code_of(heatexc.HTTPException('Unknown')))
+        self.assertIsNone(status_code_of(ValueError('Not an HTTP error')))
+
+    def test_server_errors(self):
+        self.assertTrue(is_server_error(heatexc.HTTPInternalServerError('Failed')))
+        self.assertTrue(is_server_error(heatexc.HTTPBadGateway('Failed')))
+        self.assertTrue(is_server_error(neutronexceptions.ServiceUnavailable()))
+        self.assertTrue(is_server_error(OpenstackHttpError(503, 'Unavailable')))
+        self.assertTrue(is_server_error(keystoneexceptions.ConnectFailure('Refused')))
+        self.assertTrue(is_server_error(keystoneexceptions.ConnectTimeout('Timed out')))
+        self.assertTrue(is_server_error(neutronexceptions.ConnectionFailed()))
+        self.assertTrue(is_server_error(aiohttp.ServerDisconnectedError()))
+        self.assertTrue(is_server_error(asyncio.TimeoutError()))
+        self.assertTrue(is_server_error(ConnectionResetError()))
+
+    def test_not_server_errors(self):
+        self.assertFalse(is_server_error(heatexc.HTTPNotFound('Not found')))
+        self.assertFalse(is_server_error(heatexc.HTTPBadRequest('Invalid')))
+        self.assertFalse(is_server_error(heatexc.HTTPOverLimit('Over limit')))
+        self.assertFalse(is_server_error(OpenstackHttpError(401, 'Unauthorized')))
+        self.assertFalse(is_server_error(keystoneexceptions.SSLError('Bad certificate')))
+        self.assertFalse(is_server_error(ValueError('Failed')))
+        # Raised by this driver, with a 503 status code
+        self.assertFalse(is_server_error(TemporaryResourceDriverError('Rate limited')))
+
+    def test_retryable_errors(self):
+        self.assertTrue(is_retryable_error(heatexc.HTTPServiceUnavailable('Unavailable')))
+        self.assertTrue(is_retryable_error(heatexc.HTTPOverLimit('Over limit')))
+        self.assertTrue(is_retryable_error(OpenstackHttpError(429, 'Too many requests')))
+        self.assertTrue(is_retryable_error(keystoneexceptions.ConnectFailure('Refused')))
+        self.assertFalse(is_retryable_error(heatexc.HTTPNotFound('Not found')))
+        self.assertFalse(is_retryable_error(heatexc.HTTPConflict('Conflict')))
+        self.assertFalse(is_retryable_error(TemporaryResourceDriverError('Rate limited')))
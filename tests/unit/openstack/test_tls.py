@@ -0,0 +1,98 @@
+import os
+import ssl
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+import tests.unit.openstack.certs as certs
+from osvimdriver.openstack.tls import build_ssl_context, SSLContextCache, SSLContextAdapter, ResumingSSLContext
+
+
+def read_cert(file_name):
+    with open(os.path.join(os.path.dirname(os.path.abspath(certs.__file__)), file_name), 'r') as f:
+        return f.read()
+
+
+class TestBuildSslContext(unittest.TestCase):
+
+    def test_default_trusted_cas(self):
+        ssl_context = build_ssl_context()
+        self.assertIsInstance(ssl_context, ResumingSSLContext)
+        self.assertEqual(ssl_context.verify_mode, ssl.CERT_REQUIRED)
+        self.assertTrue(ssl_context.check_hostname)
+        self.assertGreater(len(ssl_context.get_ca_certs()), 0)
+
+    def test_ca_cert_in_memory(self):
+        ssl_context = build_ssl_context(ca_cert=read_cert('ca.cert'))
+        ca_certs = ssl_context.get_ca_certs()
+        self.assertEqual(len(ca_certs), 1)
+
+    @patch('osvimdriver.openstack.tls.tempfile')
+    def test_client_cert_and_key_not_written_to_disk(self, mock_tempfile):
+        with patch('osvimdriver.openstack.tls.ResumingSSLContext.load_cert_chain') as mock_load_cert_chain:
+            build_ssl_context(ca_cert=read_cert('ca.cert'), client_cert=read_cert('client.cert'), client_key=read_cert('client.key'))
+        mock_tempfile.mkdtemp.assert_not_called()
+        self.assertTrue(mock_load_cert_chain.call_args[0][0].startswith('/proc/self/fd/'))
+
+    @patch('osvimdriver.openstack.tls._memfd_create', None)
+    def test_client_cert_and_key_written_to_private_file_without_memfd(self):
+        loaded = {}
+        def load_cert_chain(path):
+            loaded['mode'] = os.stat(path).st_mode & 0o777
+            loaded['directory_mode'] = os.stat(os.path.dirname(path)).st_mode & 0o777
+            loaded['path'] = path
+        with patch('osvimdriver.openstack.tls.ResumingSSLContext.load_cert_chain', side_effect=load_cert_chain):
+            build_ssl_context(client_cert=read_cert('client.cert'), client_key=read_cert('client.key'))
+        self.assertEqual(loaded['mode'], 0o600)
+        self.assertEqual(loaded['directory_mode'], 0o700)
+        self.assertFalse(os.path.exists(os.path.dirname(loaded['path'])))
+
+    @patch('osvimdriver.openstack.tls._memfd_create', None)
+    def test_client_cert_and_key_loaded_without_memfd(self):
+        build_ssl_context(client_cert=read_cert('client.cert'), client_key=read_cert('client.key'))
+
+    def test_client_cert_and_key_loaded(self):
+        build_ssl_context(client_cert=read_cert('client.cert'), client_key=read_cert('client.key'))
+
+    def test_invalid_cert(self):
+        with self.assertRaises(ssl.SSLError):
+            build_ssl_context(ca_cert='not a cert')
+
+
+class TestResumingSSLContext(unittest.TestCase):
+
+    def test_save_session(self):
+        ssl_context = ResumingSSLContext()
+        first_session = MagicMock(has_ticket=False)
+        ssl_context.save_session('vip-a', first_session)
+        self.assertIs(ssl_context._ResumingSSLContext__sessions['vip-a'], first_session)
+        resumable_session = MagicMock(has_ticket=True)
+        ssl_context.save_session('vip-a', resumable_session)
+        ssl_context.save_session('vip-a', MagicMock(has_ticket=False))
+        ssl_context.save_session('vip-a', None)
+        self.assertIs(ssl_context._ResumingSSLContext__sessions['vip-a'], resumable_session)
+
+
+class TestSSLContextCache(unittest.TestCase):
+
+    def test_shared_by_content(self):
+        cache = SSLContextCache()
+        ca_cert = read_cert('ca.cert')
+        ssl_context = cache.get(ca_cert=ca_cert)
+        self.assertIs(cache.get(ca_cert=ca_cert), ssl_context)
+        self.assertIsNot(cache.get(ca_cert=ca_cert, client_cert=read_cert('client.cert'), client_key=read_cert('client.key')), ssl_context)
+        self.assertIsNot(cache.get(), ssl_context)
+
+
+class TestSSLContextAdapter(unittest.TestCase):
+
+    def test_connection_uses_ssl_context(self):
+        ssl_context = build_ssl_context(ca_cert=read_cert('ca.cert'))
+        adapter = SSLContextAdapter(ssl_context)
+        request = requests.Request('GET', 'https://testip:8004/v1/stacks').prepare()
+        conn = adapter.get_connection_with_tls_context(request, True, cert=('/missing/client.cert', '/missing/client.key'))
+        self.assertIs(conn.conn_kw['ssl_context'], ssl_context)
+        self.assertIsNone(conn.ca_certs)
+        self.assertIsNone(conn.cert_file)
+        self.assertEqual(conn.cert_reqs, 'CERT_REQUIRED')
+        adapter.cert_verify(conn, request.url, True, None)
+        self.assertIsNone(conn.ca_certs)
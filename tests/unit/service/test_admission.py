@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.timeouts import timeout_policy
+from osvimdriver.service.admission import (AdmissionPool, AdmissionController, AdmissionProperties, AdmissionConfigurator,
+                                           AdmissionRejectedError, NUM_THREADS_ENV, admission_control, translation_limits)
+
+
+class TestAdmissionPool(unittest.TestCase):
+
+    def __hold(self, pool, release_event):
+        admitted = threading.Event()
+        def hold():
+            with pool.admit():
+                admitted.set()
+                release_event.wait()
+        thread = threading.Thread(target=hold)
+        thread.start()
+        admitted.wait()
+        return thread
+
+    def test_admits_up_to_max_concurrency(self):
+        pool = AdmissionPool('test-admit', 2)
+        with pool.admit():
+            with pool.admit():
+                self.assertEqual(pool.in_flight, 2)
+                self.assertEqual(metrics.ADMISSION_IN_FLIGHT.labels(pool='test-admit').get(), 2)
+        self.assertEqual(pool.in_flight, 0)
+
+    def test_rejects_immediately_when_queue_full(self):
+        pool = AdmissionPool('test-queue-full', 1, max_queued=0, max_wait=10)
+        with pool.admit():
+            start = time.monotonic()
+            with self.assertRaises(AdmissionRejectedError) as context:
+                with pool.admit():
+                    pass
+            self.assertLess(time.monotonic() - start, 1)
+        self.assertIsInstance(context.exception, TemporaryResourceDriverError)
+        self.assertEqual(str(context.exception), 'Driver is busy, test-queue-full request rejected: 1 already in progress and 0 waiting')
+        self.assertEqual(metrics.ADMISSION_REJECTED.labels(pool='test-queue-full').get(), 1)
+
+    def test_queued_request_admitted_when_slot_free(self):
+        pool = AdmissionPool('test-queued', 1, max_queued=1, max_wait=10)
+        release = threading.Event()
+        holder = self.__hold(pool, release)
+        threading.Timer(0.05, release.set).start()
+        with pool.admit():
+            self.assertEqual(pool.in_flight, 1)
+        holder.join()
+        self.assertEqual(pool.waiting, 0)
+
+    def test_queued_request_rejected_after_max_wait(self):
+        pool = AdmissionPool('test-wait', 1, max_queued=1, max_wait=0.05)
+        release = threading.Event()
+        holder = self.__hold(pool, release)
+        try:
+            with self.assertRaises(AdmissionRejectedError):
+                with pool.admit():
+                    pass
+            self.assertEqual(pool.waiting, 0)
+            self.assertEqual(metrics.ADMISSION_QUEUE_DEPTH.labels(pool='test-wait').get(), 0)
+        finally:
+            release.set()
+            holder.join()
+
+    @patch.object(timeout_policy, 'request_deadline', 0.05)
+    def test_wait_limited_by_request_deadline(self):
+        pool = AdmissionPool('test-deadline', 1, max_queued=1, max_wait=10)
+        release = threading.Event()
+        holder = self.__hold(pool, release)
+        try:
+            start = time.monotonic()
+            with timeout_policy.request_deadline_for('execute_lifecycle (Create)'):
+                with self.assertRaises(AdmissionRejectedError):
+                    with pool.admit():
+                        pass
+            self.assertLess(time.monotonic() - start, 1)
+        finally:
+            release.set()
+            holder.join()
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_not_limited_until_configured(self):
+        controller = AdmissionController()
+        self.assertIsNone(controller.translation_pool)
+        with controller.translation():
+            with controller.translation():
+                pass
+
+    def test_configure(self):
+        properties = AdmissionProperties()
+        properties.max_concurrent_translations = 2
+        properties.max_queued_translations = 3
+        properties.max_wait = 4
+        controller = AdmissionController()
+        controller.configure(properties)
+        pool = controller.translation_pool
+        self.assertEqual(pool.name, 'translation')
+        self.assertEqual(pool.max_concurrency, 2)
+        self.assertEqual(pool.max_queued, 3)
+        self.assertEqual(pool.max_wait, 4)
+        with controller.translation():
+            self.assertEqual(pool.in_flight, 1)
+
+    def test_configure_sized_from_threads(self):
+        properties = AdmissionProperties()
+        controller = AdmissionController()
+        controller.configure(properties, threads=8)
+        self.assertEqual(controller.translation_pool.max_concurrency, 2)
+        self.assertEqual(controller.translation_pool.max_queued, 2)
+
+    def test_configure_single_thread_not_limited(self):
+        properties = AdmissionProperties()
+        controller = AdmissionController()
+        controller.configure(properties, threads=1)
+        self.assertIsNone(controller.translation_pool)
+
+    def test_configure_disabled(self):
+        properties = AdmissionProperties()
+        properties.enabled = False
+        controller = AdmissionController()
+        controller.configure(properties)
+        self.assertIsNone(controller.translation_pool)
+
+
+class TestTranslationLimits(unittest.TestCase):
+
+    def test_sized_from_threads(self):
+        properties = AdmissionProperties()
+        self.assertIsNone(translation_limits(properties, 1))
+        self.assertEqual(translation_limits(properties, 2), (1, 0))
+        self.assertEqual(translation_limits(properties, 4), (1, 1))
+        self.assertEqual(translation_limits(properties, 6), (2, 1))
+        self.assertEqual(translation_limits(properties, 16), (4, 4))
+
+    def test_configured_limits_used(self):
+        properties = AdmissionProperties()
+        properties.max_concurrent_translations = 3
+        properties.max_queued_translations = 5
+        self.assertEqual(translation_limits(properties, 1), (3, 5))
+        self.assertEqual(translation_limits(properties, 16), (3, 5))
+
+    def test_missing_limit_sized_from_threads(self):
+        properties = AdmissionProperties()
+        properties.max_queued_translations = 0
+        self.assertEqual(translation_limits(properties, 1), (1, 0))
+        self.assertEqual(translation_limits(properties, 8), (4, 0))
+        properties.max_queued_translations = None
+        properties.max_concurrent_translations = 3
+        self.assertEqual(translation_limits(properties, 8), (3, 1))
+
+
+class TestAdmissionConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        admission_control.configure(None)
+
+    def test_configure(self):
+        properties = AdmissionProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        with patch.dict(os.environ, {NUM_THREADS_ENV: '4'}):
+            AdmissionConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(AdmissionProperties)
+        self.assertEqual(admission_control.translation_pool.max_concurrency, 1)
+        self.assertEqual(admission_control.translation_pool.max_queued, 1)
+
+    def test_configure_single_thread(self):
+        properties = AdmissionProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        with patch.dict(os.environ, {NUM_THREADS_ENV: '1'}):
+            AdmissionConfigurator().configure(configuration, MagicMock())
+        self.assertIsNone(admission_control.translation_pool)
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+import uuid
+from unittest.mock import MagicMock
+from osvimdriver.service.asynccreate import (CreateJobs, AsyncCreateProperties, AsyncCreateConfigurator, AsyncCreateRejectedError, create_jobs,
+                                             new_operation_id, accepted_at, JOB_PENDING, JOB_CREATED, JOB_FAILED)
+from tests.unit.service.test_statuscache import wait_for
+
+
+class TestOperationId(unittest.TestCase):
+
+    def test_accepted_at(self):
+        before = time.time()
+        operation_id = new_operation_id()
+        self.assertAlmostEqual(accepted_at(operation_id), before, delta=1)
+
+    def test_accepted_at_unknown(self):
+        self.assertIsNone(accepted_at(str(uuid.uuid4())))
+        self.assertIsNone(accepted_at('request123'))
+
+
+class TestCreateJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = CreateJobs()
+        self.properties = AsyncCreateProperties()
+        self.properties.enabled = True
+        self.jobs.configure(self.properties)
+
+    def tearDown(self):
+        self.jobs.configure(None)
+
+    def test_disabled_until_configured(self):
+        jobs = CreateJobs()
+        self.assertFalse(jobs.enabled)
+        self.assertIsNone(jobs.get('AsyncCreate::s1::1'))
+        with self.assertRaises(ValueError):
+            jobs.submit('AsyncCreate::s1::1', MagicMock())
+
+    def test_created(self):
+        job = self.jobs.submit('AsyncCreate::s1::1', lambda: '123')
+        self.assertIs(self.jobs.get('AsyncCreate::s1::1'), job)
+        wait_for(lambda: job.state == JOB_CREATED)
+        self.assertEqual(job.stack_id, '123')
+        self.assertIsNone(job.error)
+
+    def test_failed(self):
+        error = ValueError('Invalid template')
+        def create():
+            raise error
+        job = self.jobs.submit('AsyncCreate::s1::1', create)
+        wait_for(lambda: job.state == JOB_FAILED)
+        self.assertIs(job.error, error)
+        self.assertIsNone(job.stack_id)
+
+    def test_pending_until_created(self):
+        release = threading.Event()
+        def create():
+            release.wait(5)
+            return '123'
+        job = self.jobs.submit('AsyncCreate::s1::1', create)
+        self.assertEqual(job.state, JOB_PENDING)
+        release.set()
+        wait_for(lambda: job.state == JOB_CREATED)
+
+    def test_rejected_when_too_many_in_progress(self):
+        self.properties.max_queued = 1
+        self.jobs.configure(self.properties)
+        release = threading.Event()
+        job = self.jobs.submit('AsyncCreate::s1::1', lambda: release.wait(5))
+        create_func = MagicMock()
+        with self.assertRaises(AsyncCreateRejectedError):
+            self.jobs.submit('AsyncCreate::s2::2', create_func)
+        create_func.assert_not_called()
+        self.assertIsNone(self.jobs.get('AsyncCreate::s2::2'))
+        release.set()
+        wait_for(lambda: job.state == JOB_CREATED)
+        self.jobs.submit('AsyncCreate::s2::2', create_func)
+
+    def test_max_pending_kept_when_disabled(self):
+        self.properties.enabled = False
+        self.properties.max_pending = 120
+        self.jobs.configure(self.properties)
+        self.assertFalse(self.jobs.enabled)
+        self.assertEqual(self.jobs.max_pending, 120)
+
+
+class TestAsyncCreateConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        create_jobs.configure(None)
+
+    def test_configure(self):
+        properties = AsyncCreateProperties()
+        properties.enabled = True
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        AsyncCreateConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(AsyncCreateProperties)
+        self.assertTrue(create_jobs.enabled)
+
+    def test_configure_disabled(self):
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = AsyncCreateProperties()
+        AsyncCreateConfigurator().configure(configuration, MagicMock())
+        self.assertFalse(create_jobs.enabled)
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock
+from osvimdriver.openstack.environment import OpenstackPasswordAuth, OpenstackTokenAuth
+from osvimdriver.service.authcache import AuthStateCache, AuthCacheProperties, AuthCacheConfigurator, CachedAuth, auth_state_cache
+
+
+class TestCachedAuth(unittest.TestCase):
+
+    def test_restore_nothing_saved(self):
+        plugin = MagicMock()
+        self.assertFalse(CachedAuth().restore(plugin))
+        plugin.set_auth_state.assert_not_called()
+
+    def test_save_and_restore(self):
+        cached_auth = CachedAuth()
+        authenticated_plugin = MagicMock()
+        authenticated_plugin.get_auth_state.return_value = '{"auth_token": "abc"}'
+        cached_auth.save(authenticated_plugin)
+        new_plugin = MagicMock()
+        self.assertTrue(cached_auth.restore(new_plugin))
+        new_plugin.set_auth_state.assert_called_once_with('{"auth_token": "abc"}')
+
+    def test_save_unauthenticated_keeps_state(self):
+        cached_auth = CachedAuth()
+        cached_auth.state = '{"auth_token": "abc"}'
+        plugin = MagicMock()
+        plugin.get_auth_state.return_value = None
+        cached_auth.save(plugin)
+        self.assertEqual(cached_auth.state, '{"auth_token": "abc"}')
+
+
+class TestAuthStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AuthStateCache()
+        self.cache.configure(AuthCacheProperties())
+        self.auth = OpenstackPasswordAuth('identity/v3', {'username': 'test', 'password': 'secret'})
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(AuthStateCache().get('testdl', 'http://testip', self.auth))
+
+    def test_no_auth(self):
+        self.assertIsNone(self.cache.get('testdl', 'http://testip', None))
+
+    def test_shared_by_location(self):
+        cached_auth = self.cache.get('testdl', 'http://testip', self.auth)
+        same_auth = OpenstackPasswordAuth('identity/v3', {'username': 'test', 'password': 'secret'})
+        self.assertIs(self.cache.get('testdl', 'http://testip', same_auth), cached_auth)
+        self.assertIsNot(self.cache.get('otherdl', 'http://testip', same_auth), cached_auth)
+
+    def test_changed_credentials_not_shared(self):
+        cached_auth = self.cache.get('testdl', 'http://testip', self.auth)
+        changed_password = OpenstackPasswordAuth('identity/v3', {'username': 'test', 'password': 'changed'})
+        self.assertIsNot(self.cache.get('testdl', 'http://testip', changed_password), cached_auth)
+        token_auth = OpenstackTokenAuth('identity/v3', {'username': 'test', 'password': 'secret'})
+        self.assertIsNot(self.cache.get('testdl', 'http://testip', token_auth), cached_auth)
+        self.assertIsNot(self.cache.get('testdl', 'http://otherip', self.auth), cached_auth)
+
+    def test_disabled(self):
+        properties = AuthCacheProperties()
+        properties.enabled = False
+        self.cache.configure(properties)
+        self.assertIsNone(self.cache.get('testdl', 'http://testip', self.auth))
+
+
+class TestAuthCacheConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        auth_state_cache.configure(None)
+
+    def test_configure(self):
+        properties = AuthCacheProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        AuthCacheConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(AuthCacheProperties)
+        self.assertIsNotNone(auth_state_cache.get('testdl', 'http://testip', OpenstackPasswordAuth('identity/v3', {})))
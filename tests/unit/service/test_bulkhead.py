@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.bulkhead import Bulkhead, BulkheadRegistry, BulkheadProperties, BulkheadConfigurator, BulkheadFullError, bulkheads
+
+
+class TestBulkhead(unittest.TestCase):
+
+    def test_rejects_when_full(self):
+        bulkhead = Bulkhead('test-full-dl', 2)
+        bulkhead.enter()
+        bulkhead.enter()
+        self.assertEqual(bulkhead.in_flight, 2)
+        self.assertEqual(metrics.OPENSTACK_BULKHEAD_IN_FLIGHT.labels(location='test-full-dl').get(), 2)
+        with self.assertRaises(BulkheadFullError) as context:
+            bulkhead.enter()
+        self.assertIsInstance(context.exception, TemporaryResourceDriverError)
+        self.assertEqual(str(context.exception), 'Deployment location \'test-full-dl\' is saturated, 2 calls already in flight')
+        self.assertEqual(metrics.OPENSTACK_BULKHEAD_REJECTED.labels(location='test-full-dl').get(), 1)
+        bulkhead.exit()
+        bulkhead.enter()
+        self.assertEqual(bulkhead.in_flight, 2)
+
+
+class TestBulkheadRegistry(unittest.TestCase):
+
+    def __registry(self, **kwargs):
+        properties = BulkheadProperties()
+        for key, value in kwargs.items():
+            setattr(properties, key, value)
+        registry = BulkheadRegistry()
+        registry.configure(properties)
+        return registry
+
+    def test_disabled_until_configured(self):
+        registry = BulkheadRegistry()
+        self.assertIsNone(registry.get_bulkhead('dl'))
+        registry = self.__registry(enabled=False)
+        self.assertIsNone(registry.get_bulkhead('dl'))
+        with registry.compartment('dl'):
+            pass
+
+    def test_one_bulkhead_per_location(self):
+        registry = self.__registry(locations={'slow-dl': 2})
+        bulkhead = registry.get_bulkhead('dl')
+        self.assertIs(registry.get_bulkhead('dl'), bulkhead)
+        self.assertEqual(bulkhead.max_concurrent_calls, 8)
+        self.assertEqual(registry.get_bulkhead('slow-dl').max_concurrent_calls, 2)
+        self.assertIsNone(registry.get_bulkhead(None))
+
+    def test_compartment(self):
+        registry = self.__registry(max_concurrent_calls=1)
+        with registry.compartment('test-compartment-dl'):
+            self.assertEqual(registry.get_bulkhead('test-compartment-dl').in_flight, 1)
+            # Calls made within a call to the same location (e.g. authenticating) use the same slot
+            with registry.compartment('test-compartment-dl'):
+                self.assertEqual(registry.get_bulkhead('test-compartment-dl').in_flight, 1)
+            # Other locations are unaffected
+            with registry.compartment('test-compartment-other-dl'):
+                pass
+        self.assertEqual(registry.get_bulkhead('test-compartment-dl').in_flight, 0)
+
+    def test_compartment_full_in_other_thread(self):
+        registry = self.__registry(max_concurrent_calls=1)
+        entered = threading.Event()
+        release = threading.Event()
+        def hold():
+            with registry.compartment('test-thread-dl'):
+                entered.set()
+                release.wait()
+        thread = threading.Thread(target=hold)
+        thread.start()
+        entered.wait()
+        try:
+            with self.assertRaises(BulkheadFullError):
+                with registry.compartment('test-thread-dl'):
+                    pass
+        finally:
+            release.set()
+            thread.join()
+        with registry.compartment('test-thread-dl'):
+            pass
+
+
+class TestBulkheadRegistryAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_async_compartment_waits_for_slot(self):
+        properties = BulkheadProperties()
+        properties.max_concurrent_calls = 2
+        registry = BulkheadRegistry()
+        registry.configure(properties)
+        in_flight = []
+        max_in_flight = []
+        async def call():
+            async with registry.async_compartment('test-async-dl'):
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+                # Calls made within a call to the same location use the same slot
+                async with registry.async_compartment('test-async-dl'):
+                    await asyncio.sleep(0.01)
+                in_flight.pop()
+        await asyncio.gather(*[call() for _ in range(6)])
+        self.assertEqual(max(max_in_flight), 2)
+        self.assertEqual(metrics.OPENSTACK_BULKHEAD_IN_FLIGHT.labels(location='test-async-dl').get(), 0)
+
+    async def test_async_compartment_not_limited_by_sync_calls(self):
+        properties = BulkheadProperties()
+        properties.max_concurrent_calls = 1
+        registry = BulkheadRegistry()
+        registry.configure(properties)
+        with registry.compartment('test-async-sync-dl'):
+            async with registry.async_compartment('test-async-sync-dl'):
+                pass
+
+
+class TestBulkheadConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        bulkheads.configure(None)
+
+    def test_configure(self):
+        properties = BulkheadProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        BulkheadConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(BulkheadProperties)
+        self.assertEqual(bulkheads.get_bulkhead('dl').max_concurrent_calls, 8)
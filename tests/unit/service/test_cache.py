@@ -0,0 +1,289 @@
+import os
+import shutil
+import tempfile
+import unittest
+import time
+from unittest.mock import MagicMock
+from osvimdriver.service.cache import (TTLCache, SqliteCache, RedisCache, CacheCodec, CacheProperties, CacheRegistry, CacheConfigurator,
+                                       JSON_CODEC, caches)
+import osvimdriver.service.metrics as metrics
+from tests.unit.testutils.respserver import FakeRespServer
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_get_and_put(self):
+        cache = TTLCache(10)
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(cache.get('A', 'default'), 'default')
+        cache.put('A', 1)
+        self.assertEqual(cache.get('A'), 1)
+
+    def test_entries_expire(self):
+        cache = TTLCache(0.05)
+        cache.put('A', 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(len(cache), 0)
+
+    def test_remove(self):
+        cache = TTLCache(10)
+        cache.put('A', 1)
+        cache.remove('A')
+        cache.remove('B')
+        self.assertIsNone(cache.get('A'))
+
+    def test_disabled_with_zero_ttl(self):
+        cache = TTLCache(0)
+        cache.put('A', 1)
+        self.assertIsNone(cache.get('A'))
+
+    def test_oldest_entries_evicted_when_full(self):
+        cache = TTLCache(10, max_size=2)
+        cache.put('A', 1)
+        cache.put('B', 2)
+        cache.put('C', 3)
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(cache.get('B'), 2)
+        self.assertEqual(cache.get('C'), 3)
+
+    def test_clear(self):
+        cache = TTLCache(10)
+        cache.put('A', 1)
+        cache.clear()
+        self.assertIsNone(cache.get('A'))
+
+    def test_least_recently_used_evicted_when_full(self):
+        cache = TTLCache(10, max_size=2)
+        cache.put('A', 1)
+        cache.put('B', 2)
+        cache.get('A')
+        cache.put('C', 3)
+        self.assertEqual(cache.get('A'), 1)
+        self.assertIsNone(cache.get('B'))
+
+    def test_evictions_measured(self):
+        cache = TTLCache(10, max_size=1, name='test-memory')
+        before = metrics.CACHE_EVICTIONS.labels(cache='test-memory', backend='memory', reason='size').get()
+        cache.put('A', 1)
+        cache.put('B', 2)
+        self.assertEqual(metrics.CACHE_EVICTIONS.labels(cache='test-memory', backend='memory', reason='size').get(), before + 1)
+        before = metrics.CACHE_EVICTIONS.labels(cache='test-memory', backend='memory', reason='flushed').get()
+        cache.clear()
+        self.assertEqual(metrics.CACHE_EVICTIONS.labels(cache='test-memory', backend='memory', reason='flushed').get(), before + 1)
+
+
+class TestSqliteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'cache.sqlite3')
+        self.cache = SqliteCache('test-sqlite', 10, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get(('dl', 'A')))
+        self.assertEqual(self.cache.get(('dl', 'A'), 'default'), 'default')
+        self.cache.put(('dl', 'A'), {'value': [1, 2]})
+        self.assertEqual(self.cache.get(('dl', 'A')), {'value': [1, 2]})
+        self.assertEqual(len(self.cache), 1)
+
+    def test_codec(self):
+        cache = SqliteCache('test-codec', 10, self.path, codec=CacheCodec(lambda value: value.split(','), lambda value: ','.join(value)))
+        cache.put('A', 'a,b')
+        self.assertEqual(cache.get('A'), 'a,b')
+
+    def test_shared_by_caches_with_same_name(self):
+        # As it would be by worker processes
+        other_cache = SqliteCache('test-sqlite', 10, self.path)
+        self.cache.put('A', 1)
+        self.assertEqual(other_cache.get('A'), 1)
+        self.assertIsNone(SqliteCache('other', 10, self.path).get('A'))
+
+    def test_entries_expire(self):
+        cache = SqliteCache('test-expire', 0.05, self.path)
+        cache.put('A', 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(len(cache), 0)
+
+    def test_remove(self):
+        self.cache.put('A', 1)
+        self.cache.remove('A')
+        self.cache.remove('B')
+        self.assertIsNone(self.cache.get('A'))
+
+    def test_disabled_with_zero_ttl(self):
+        cache = SqliteCache('test-zero', 0, self.path)
+        cache.put('A', 1)
+        self.assertIsNone(cache.get('A'))
+
+    def test_evicted_when_full(self):
+        cache = SqliteCache('test-full', 10, self.path, max_size=2)
+        before = metrics.CACHE_EVICTIONS.labels(cache='test-full', backend='sqlite', reason='size').get()
+        cache.put('A', 1)
+        time.sleep(0.01)
+        cache.put('B', 2)
+        time.sleep(0.01)
+        cache.put('C', 3)
+        self.assertIsNone(cache.get('A'))
+        self.assertEqual(cache.get('B'), 2)
+        self.assertEqual(cache.get('C'), 3)
+        self.assertEqual(metrics.CACHE_EVICTIONS.labels(cache='test-full', backend='sqlite', reason='size').get(), before + 1)
+
+    def test_clear(self):
+        self.cache.put('A', 1)
+        other_cache = SqliteCache('other', 10, self.path)
+        other_cache.put('A', 1)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('A'))
+        self.assertEqual(other_cache.get('A'), 1)
+
+    def test_unencodable_value_not_cached(self):
+        before = metrics.CACHE_ERRORS.labels(cache='test-sqlite', backend='sqlite').get()
+        self.cache.put('A', object())
+        self.assertIsNone(self.cache.get('A'))
+        self.assertEqual(metrics.CACHE_ERRORS.labels(cache='test-sqlite', backend='sqlite').get(), before + 1)
+
+
+class TestRedisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeRespServer()
+        self.cache = RedisCache('test-redis', 10, self.server.url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get(('dl', 'A')))
+        self.cache.put(('dl', 'A'), {'value': [1, 2]})
+        self.assertEqual(self.cache.get(('dl', 'A')), {'value': [1, 2]})
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(list(self.server.data.keys()), [b'ovd:test-redis:["dl","A"]'])
+
+    def test_entries_expire(self):
+        cache = RedisCache('test-expire', 0.05, self.server.url)
+        cache.put('A', 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('A'))
+
+    def test_remove(self):
+        self.cache.put('A', 1)
+        self.cache.remove('A')
+        self.assertIsNone(self.cache.get('A'))
+
+    def test_clear(self):
+        other_cache = RedisCache('other', 10, self.server.url)
+        self.cache.put('A', 1)
+        self.cache.put('B', 2)
+        other_cache.put('A', 1)
+        before = metrics.CACHE_EVICTIONS.labels(cache='test-redis', backend='redis', reason='flushed').get()
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(other_cache.get('A'), 1)
+        self.assertEqual(metrics.CACHE_EVICTIONS.labels(cache='test-redis', backend='redis', reason='flushed').get(), before + 2)
+
+    def test_unavailable_treated_as_miss(self):
+        self.cache.put('A', 1)
+        self.server.stop()
+        before = metrics.CACHE_ERRORS.labels(cache='test-redis', backend='redis').get()
+        self.assertEqual(self.cache.get('A', 'default'), 'default')
+        self.cache.put('B', 2)
+        self.assertEqual(metrics.CACHE_ERRORS.labels(cache='test-redis', backend='redis').get(), before + 2)
+
+    def test_invalid_url(self):
+        with self.assertRaises(ValueError):
+            RedisCache('test-redis', 10, 'localhost:6379')
+
+
+class TestCacheRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.properties = CacheProperties()
+        self.properties.sqlite_path = os.path.join(self.tmp_dir, 'cache.sqlite3')
+        self.registry = CacheRegistry()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_memory_until_configured(self):
+        self.assertIsInstance(self.registry.create('test', 10, codec=JSON_CODEC), TTLCache)
+
+    def test_configured_backend(self):
+        self.properties.backend = 'sqlite'
+        self.registry.configure(self.properties)
+        cache = self.registry.create('test', 10, max_size=5, codec=JSON_CODEC)
+        self.assertIsInstance(cache, SqliteCache)
+        self.assertEqual(cache.max_size, 5)
+
+    def test_backend_overridden_by_name(self):
+        self.properties.backends = {'test': 'sqlite'}
+        self.registry.configure(self.properties)
+        self.assertIsInstance(self.registry.create('test', 10, codec=JSON_CODEC), SqliteCache)
+        self.assertIsInstance(self.registry.create('other', 10, codec=JSON_CODEC), TTLCache)
+
+    def test_without_codec_kept_in_memory(self):
+        self.properties.backend = 'sqlite'
+        self.registry.configure(self.properties)
+        self.assertIsInstance(self.registry.create('test', 10), TTLCache)
+
+    def test_kept_in_memory_when_backend_unusable(self):
+        self.properties.backend = 'sqlite'
+        self.properties.sqlite_path = os.path.join(self.tmp_dir, 'missing', 'cache.sqlite3')
+        self.registry.configure(self.properties)
+        self.assertIsInstance(self.registry.create('test', 10, codec=JSON_CODEC), TTLCache)
+        self.properties.backend = 'unknown'
+        self.assertIsInstance(self.registry.create('test', 10, codec=JSON_CODEC), TTLCache)
+
+    def test_get_caches(self):
+        cache = self.registry.create('test', 10)
+        self.assertIs(self.registry.get('test'), cache)
+        self.assertIsNone(self.registry.get('other'))
+        self.assertEqual(self.registry.get_caches(), [cache])
+
+    def test_refresh_metrics(self):
+        self.properties.backends = {'test-metrics-sqlite': 'sqlite'}
+        self.registry.configure(self.properties)
+        memory_cache = self.registry.create('test-metrics-memory', 10)
+        sqlite_cache = self.registry.create('test-metrics-sqlite', 10, codec=JSON_CODEC)
+        memory_cache.put('A', 1)
+        memory_cache.put('B', 1)
+        sqlite_cache.put('A', 1)
+        self.registry.refresh_metrics()
+        self.assertEqual(metrics.CACHE_ENTRIES.labels(cache='test-metrics-memory', backend='memory').get(), 2)
+        self.assertEqual(metrics.CACHE_ENTRIES.labels(cache='test-metrics-sqlite', backend='sqlite').get(), 1)
+
+    def test_flush(self):
+        cache_a = self.registry.create('A', 10)
+        cache_b = self.registry.create('B', 10)
+        cache_a.put('key', 1)
+        cache_b.put('key', 1)
+        self.assertEqual(self.registry.flush('A'), ['A'])
+        self.assertIsNone(cache_a.get('key'))
+        self.assertEqual(cache_b.get('key'), 1)
+        self.assertEqual(self.registry.flush(), ['A', 'B'])
+        self.assertIsNone(cache_b.get('key'))
+
+    def test_flush_unknown(self):
+        with self.assertRaises(KeyError):
+            self.registry.flush('unknown')
+
+
+class TestCacheConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        caches.configure(None)
+
+    def test_configure(self):
+        properties = CacheProperties()
+        properties.backends = {'test-configured': 'redis'}
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        CacheConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(CacheProperties)
+        self.assertEqual(caches.backend_for('test-configured'), 'redis')
+        self.assertEqual(caches.backend_for('other'), 'memory')
@@ -0,0 +1,137 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from heatclient import exc as heatexc
+from keystoneauth1 import exceptions as keystoneexceptions
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.circuitbreaker import (CircuitBreaker, CircuitBreakerRegistry, CircuitBreakerProperties, CircuitBreakerConfigurator,
+                                                CircuitOpenError, circuit_breakers, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def __fail(self, breaker, times=1, error=None):
+        for _ in range(times):
+            breaker.before_call()
+            breaker.record_error(error if error is not None else keystoneexceptions.ConnectFailure('Refused'))
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('test-open-dl', failure_threshold=3, reset_timeout=30)
+        self.__fail(breaker, times=2)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+        self.__fail(breaker)
+        self.assertEqual(breaker.state, STATE_OPEN)
+        with self.assertRaises(CircuitOpenError) as context:
+            breaker.before_call()
+        self.assertIsInstance(context.exception, TemporaryResourceDriverError)
+        self.assertIn('test-open-dl', str(context.exception))
+        self.assertIn('ConnectFailure: Refused', str(context.exception))
+        self.assertEqual(metrics.OPENSTACK_CIRCUIT_BREAKER_STATE.labels(location='test-open-dl').get(), 2)
+        self.assertEqual(metrics.OPENSTACK_CIRCUIT_BREAKER_REJECTED.labels(location='test-open-dl').get(), 1)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker('test-reset-dl', failure_threshold=3, reset_timeout=30)
+        self.__fail(breaker, times=2)
+        breaker.record_success()
+        self.__fail(breaker, times=2)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_client_errors_show_location_is_reachable(self):
+        breaker = CircuitBreaker('test-client-error-dl', failure_threshold=2, reset_timeout=30)
+        self.__fail(breaker)
+        self.__fail(breaker, error=heatexc.HTTPNotFound('Not found'))
+        self.__fail(breaker)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_driver_errors_ignored(self):
+        breaker = CircuitBreaker('test-driver-error-dl', failure_threshold=2, reset_timeout=30)
+        self.__fail(breaker)
+        self.__fail(breaker, times=3, error=TemporaryResourceDriverError('Rate limited'))
+        self.assertEqual(breaker.to_dict()['consecutiveFailures'], 1)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker('test-probe-success-dl', failure_threshold=1, reset_timeout=0.05)
+        self.__fail(breaker)
+        time.sleep(0.06)
+        breaker.before_call()
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, STATE_CLOSED)
+        breaker.before_call()
+
+    def test_half_open_probe_reopens_on_failure(self):
+        breaker = CircuitBreaker('test-probe-failure-dl', failure_threshold=1, reset_timeout=0.05)
+        self.__fail(breaker)
+        time.sleep(0.06)
+        self.__fail(breaker)
+        self.assertEqual(breaker.state, STATE_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_half_open_allows_one_probe(self):
+        breaker = CircuitBreaker('test-one-probe-dl', failure_threshold=1, reset_timeout=0.05)
+        self.__fail(breaker)
+        time.sleep(0.06)
+        breaker.before_call()
+        # Requests made by the probe (e.g. authenticating) are allowed
+        breaker.before_call()
+        errors = []
+        def other_request():
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                errors.append(e)
+        thread = threading.Thread(target=other_request)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_to_dict(self):
+        breaker = CircuitBreaker('test-dict-dl', failure_threshold=1, reset_timeout=30)
+        self.assertEqual(breaker.to_dict(), {'deploymentLocation': 'test-dict-dl', 'state': 'CLOSED', 'consecutiveFailures': 0, 'lastError': None, 'retryInSeconds': None})
+        self.__fail(breaker)
+        breaker_dict = breaker.to_dict()
+        self.assertEqual(breaker_dict['state'], 'OPEN')
+        self.assertEqual(breaker_dict['consecutiveFailures'], 1)
+        self.assertEqual(breaker_dict['lastError'], 'ConnectFailure: Refused')
+        self.assertGreater(breaker_dict['retryInSeconds'], 29)
+
+
+class TestCircuitBreakerRegistry(unittest.TestCase):
+
+    def test_disabled_until_configured(self):
+        registry = CircuitBreakerRegistry()
+        self.assertIsNone(registry.get_breaker('dl'))
+        properties = CircuitBreakerProperties()
+        properties.enabled = False
+        registry.configure(properties)
+        self.assertIsNone(registry.get_breaker('dl'))
+
+    def test_one_breaker_per_location(self):
+        registry = CircuitBreakerRegistry()
+        registry.configure(CircuitBreakerProperties())
+        breaker = registry.get_breaker('dlB')
+        self.assertIs(registry.get_breaker('dlB'), breaker)
+        other_breaker = registry.get_breaker('dlA')
+        self.assertIsNot(other_breaker, breaker)
+        self.assertIsNone(registry.get_breaker(None))
+        self.assertEqual(registry.get_breakers(), [other_breaker, breaker])
+        self.assertEqual(breaker.failure_threshold, 5)
+        self.assertEqual(breaker.reset_timeout, 30)
+
+
+class TestCircuitBreakerConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        circuit_breakers.configure(None)
+
+    def test_configure(self):
+        properties = CircuitBreakerProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        CircuitBreakerConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(CircuitBreakerProperties)
+        self.assertIsNotNone(circuit_breakers.get_breaker('dl'))
@@ -0,0 +1,65 @@
+import threading
+import unittest
+from unittest.mock import patch
+from ignition.service.logging import logging_context
+import osvimdriver.service.common as common
+
+
+class TestGenerateAdditionalLogs(unittest.TestCase):
+
+    def setUp(self):
+        logging_context.clear()
+
+    def tearDown(self):
+        logging_context.clear()
+
+    def test_sets_context_while_logging(self):
+        captured = {}
+        def capture(message):
+            captured.update(logging_context.get_all())
+        with patch.object(common.logger, 'info', side_effect=capture):
+            common._generate_additional_logs('data', 'sent', 'ext123', 'application/json', 'request', 'https', {'method': 'POST'}, 'drv123')
+        self.assertEqual(captured['message_direction'], 'sent')
+        self.assertEqual(captured['tracectx.externalrequestid'], 'ext123')
+        self.assertEqual(captured['tracectx.driverrequestid'], 'drv123')
+        self.assertEqual(captured['protocol_metadata'], '{"method": "POST"}')
+
+    def test_removes_keys_after_logging(self):
+        common._generate_additional_logs('data', 'sent', 'ext123', 'application/json', 'request', 'https', {}, 'drv123')
+        self.assertEqual(dict(logging_context.get_all()), {})
+
+    def test_restores_existing_values(self):
+        logging_context.set_from_dict({'tracectx.driverrequestid': 'outer', 'tracectx.transactionid': 'tx1'})
+        common._generate_additional_logs('data', 'sent', None, None, None, None, None, 'inner')
+        self.assertEqual(dict(logging_context.get_all()), {'tracectx.driverrequestid': 'outer', 'tracectx.transactionid': 'tx1'})
+
+    def test_keeps_existing_values_not_overwritten(self):
+        logging_context.set_from_dict({'tracectx.driverrequestid': 'outer'})
+        common._generate_additional_logs('data', 'sent', 'ext123', None, None, None, None, None)
+        self.assertEqual(dict(logging_context.get_all()), {'tracectx.driverrequestid': 'outer'})
+
+
+class TestWithLoggingContext(unittest.TestCase):
+
+    def setUp(self):
+        logging_context.clear()
+
+    def tearDown(self):
+        logging_context.clear()
+
+    def test_runs_with_callers_context_in_other_thread(self):
+        logging_context.set_from_dict({'tracectx.transactionid': 'tx1'})
+        wrapped = common.with_logging_context(lambda: dict(logging_context.get_all()))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(wrapped()))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [{'tracectx.transactionid': 'tx1'}])
+
+    def test_restores_context_of_running_thread(self):
+        logging_context.set_from_dict({'tracectx.transactionid': 'tx1'})
+        wrapped = common.with_logging_context(lambda: logging_context.set_from_dict({'tracectx.transactionid': 'changed'}))
+        logging_context.clear()
+        logging_context.set_from_dict({'tracectx.transactionid': 'tx2'})
+        wrapped()
+        self.assertEqual(dict(logging_context.get_all()), {'tracectx.transactionid': 'tx2'})
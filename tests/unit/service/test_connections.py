@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock
+from keystoneauth1.session import TCPKeepAliveAdapter
+from osvimdriver.openstack.tls import build_ssl_context, SSLContextAdapter
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.connections import ConnectionPools, ConnectionPoolProperties, ConnectionPoolConfigurator, connection_pools
+
+
+class TestConnectionPools(unittest.TestCase):
+
+    def setUp(self):
+        self.pools = ConnectionPools()
+        self.properties = ConnectionPoolProperties()
+        self.pools.configure(self.properties)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(ConnectionPools().get('testdl'))
+
+    def test_disabled(self):
+        self.properties.enabled = False
+        self.pools.configure(self.properties)
+        self.assertIsNone(self.pools.get('testdl'))
+
+    def test_shared_by_location(self):
+        http_session = self.pools.get('testdl')
+        self.assertIs(self.pools.get('testdl'), http_session)
+        self.assertIsNot(self.pools.get('otherdl'), http_session)
+        adapter = http_session.get_adapter('https://testip')
+        self.assertIsInstance(adapter, TCPKeepAliveAdapter)
+        self.assertEqual(adapter._pool_maxsize, 10)
+        self.assertEqual(adapter._pool_connections, 10)
+
+    def test_pool_size_per_location(self):
+        self.properties.pool_maxsize = 4
+        self.properties.locations = {'busy': {'pool_maxsize': 20}}
+        self.pools.configure(self.properties)
+        self.assertEqual(self.pools.get('testdl').get_adapter('https://testip')._pool_maxsize, 4)
+        self.assertEqual(self.pools.get('busy').get_adapter('https://testip')._pool_maxsize, 20)
+
+    def test_uses_ssl_context(self):
+        ssl_context = build_ssl_context()
+        http_session = self.pools.get('testdl', ssl_context=ssl_context)
+        adapter = http_session.get_adapter('https://testip')
+        self.assertIsInstance(adapter, SSLContextAdapter)
+        self.assertIs(adapter.ssl_context, ssl_context)
+        self.assertIs(self.pools.get('testdl', ssl_context=ssl_context), http_session)
+
+    def test_usage(self):
+        self.properties.pool_maxsize = 4
+        self.pools.configure(self.properties)
+        http_session = self.pools.get('test-usage-dl')
+        self.assertEqual(self.pools.usage(), {'test-usage-dl': (0, 0)})
+        host_pool = http_session.get_adapter('https://testip').poolmanager.connection_from_url('https://testip')
+        connection = host_pool._get_conn()
+        self.assertEqual(self.pools.usage(), {'test-usage-dl': (4, 1)})
+        self.pools.refresh_metrics()
+        self.assertEqual(metrics.OPENSTACK_CONNECTION_POOL_SIZE.labels(location='test-usage-dl').get(), 4)
+        self.assertEqual(metrics.OPENSTACK_CONNECTION_POOL_IN_USE.labels(location='test-usage-dl').get(), 1)
+        host_pool._put_conn(connection)
+        self.assertEqual(self.pools.usage(), {'test-usage-dl': (4, 0)})
+        # No longer reported once the pools are replaced
+        self.pools.configure(self.properties)
+        self.pools.refresh_metrics()
+        self.assertEqual(metrics.OPENSTACK_CONNECTION_POOL_SIZE.labels(location='test-usage-dl').get(), 0)
+
+    def test_replaced_when_ssl_context_changes(self):
+        http_session = self.pools.get('testdl')
+        new_http_session = self.pools.get('testdl', ssl_context=build_ssl_context())
+        self.assertIsNot(new_http_session, http_session)
+        self.assertIs(self.pools.get('testdl', ssl_context=new_http_session.get_adapter('https://testip').ssl_context), new_http_session)
+
+
+class TestConnectionPoolConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        connection_pools.configure(None)
+
+    def test_configure(self):
+        properties = ConnectionPoolProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        ConnectionPoolConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(ConnectionPoolProperties)
+        self.assertIsNotNone(connection_pools.get('testdl'))
@@ -0,0 +1,202 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+from keystoneauth1 import exceptions as keystoneexceptions
+from osvimdriver.service.endpoints import (EndpointSelector, EndpointSelection, EndpointSelectionProperties, EndpointSelectionConfigurator,
+                                           apply_endpoint_selection, endpoint_selection, host_of)
+
+
+class MockResponse():
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestEndpointSelector(unittest.TestCase):
+
+    def setUp(self):
+        self.selector = EndpointSelector('testdl', ['http://vip-a:5000', 'https://vip-b:5000/identity', 'vip-c'], explore_ratio=0,
+                                         failure_threshold=2, recovery_time=30)
+
+    def test_host_of(self):
+        self.assertEqual(host_of('http://vip-a:5000/v3'), 'vip-a')
+        self.assertEqual(host_of('10.10.8.8:5000'), '10.10.8.8')
+        self.assertEqual(host_of('testip'), 'testip')
+
+    def test_hosts(self):
+        self.assertEqual(self.selector.hosts, ['vip-a', 'vip-b', 'vip-c'])
+        self.assertTrue(self.selector.manages('http://vip-b:8004/v1/project/stacks'))
+        self.assertFalse(self.selector.manages('http://other:8004/v1/project/stacks'))
+
+    def test_unmeasured_endpoints_selected_first(self):
+        self.assertEqual(self.selector.select(), 'vip-a')
+        self.selector.record_success('vip-a', 0.1)
+        self.assertEqual(self.selector.select(), 'vip-b')
+        self.selector.record_success('vip-b', 0.2)
+        self.assertEqual(self.selector.select(), 'vip-c')
+
+    def test_selects_fastest(self):
+        self.selector.record_success('vip-a', 0.5)
+        self.selector.record_success('vip-b', 0.1)
+        self.selector.record_success('vip-c', 0.3)
+        self.assertEqual(self.selector.select(), 'vip-b')
+        self.assertEqual(self.selector.select(exclude=['vip-b']), 'vip-c')
+        self.assertIsNone(self.selector.select(exclude=['vip-a', 'vip-b', 'vip-c']))
+
+    def test_latency_is_moving_average(self):
+        selector = EndpointSelector('testdl', ['vip-a', 'vip-b'], ewma_alpha=0.5)
+        selector.record_success('vip-a', 1.0)
+        selector.record_success('vip-a', 3.0)
+        self.assertEqual(selector.stats('vip-a').latency, 2.0)
+
+    def test_explores_other_endpoints(self):
+        selector = EndpointSelector('testdl', ['vip-a', 'vip-b', 'vip-c'], explore_ratio=0.5, random_func=lambda: 0.1)
+        selector.record_success('vip-a', 0.1)
+        selector.record_success('vip-b', 0.2)
+        selector.record_success('vip-c', 0.3)
+        first = selector.select()
+        second = selector.select()
+        self.assertNotEqual(first, 'vip-a')
+        self.assertNotEqual(second, 'vip-a')
+        self.assertNotEqual(first, second)
+
+    def test_avoids_endpoint_after_server_errors(self):
+        self.selector.record_success('vip-a', 0.1)
+        self.selector.record_success('vip-b', 0.2)
+        self.selector.record_success('vip-c', 0.3)
+        self.selector.record_response('vip-a', 503, 0.1)
+        self.assertEqual(self.selector.select(), 'vip-a')
+        self.selector.record_response('vip-a', 503, 0.1)
+        self.assertEqual(self.selector.select(), 'vip-b')
+
+    def test_avoids_endpoint_after_connection_failure(self):
+        self.selector.record_success('vip-a', 0.1)
+        self.selector.record_success('vip-b', 0.2)
+        self.selector.record_success('vip-c', 0.3)
+        self.selector.record_error('vip-a', keystoneexceptions.ConnectFailure('Connection refused'), 0.1)
+        self.assertEqual(self.selector.select(), 'vip-b')
+
+    def test_client_errors_do_not_count_as_failures(self):
+        error = keystoneexceptions.NotFound()
+        self.selector.record_error('vip-a', error, 0.1)
+        self.selector.record_error('vip-a', error, 0.1)
+        self.assertEqual(self.selector.stats('vip-a').consecutive_failures, 0)
+        self.assertAlmostEqual(self.selector.stats('vip-a').latency, 0.1)
+
+    def test_endpoint_recovers(self):
+        selector = EndpointSelector('testdl', ['vip-a', 'vip-b'], recovery_time=0.05, explore_ratio=0)
+        selector.record_success('vip-a', 0.1)
+        selector.record_success('vip-b', 0.2)
+        selector.record_failure('vip-a', connection_failed=True)
+        self.assertEqual(selector.select(), 'vip-b')
+        time.sleep(0.06)
+        self.assertEqual(selector.select(), 'vip-a')
+
+    def test_all_unhealthy_selects_soonest_to_recover(self):
+        self.selector.record_failure('vip-b', connection_failed=True)
+        self.selector.record_failure('vip-c', connection_failed=True)
+        self.selector.record_failure('vip-a', connection_failed=True)
+        self.assertEqual(self.selector.select(), 'vip-b')
+
+    def test_rewrite(self):
+        self.assertEqual(self.selector.rewrite('http://vip-a:8004/v1/project/stacks?limit=1', 'vip-b'), 'http://vip-b:8004/v1/project/stacks?limit=1')
+        self.assertEqual(self.selector.rewrite('https://vip-a/identity/v3', 'vip-c'), 'https://vip-c/identity/v3')
+        self.assertEqual(self.selector.rewrite('http://vip-a:9696/v2.0', 'fd00::1'), 'http://[fd00::1]:9696/v2.0')
+
+
+class TestApplyEndpointSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.request = self.session.request
+        self.selector = EndpointSelector('testdl', ['http://vip-a:5000', 'http://vip-b:5000'], explore_ratio=0)
+        self.selector.record_success('vip-a', 0.5)
+        self.selector.record_success('vip-b', 0.1)
+        apply_endpoint_selection(self.session, self.selector)
+
+    def test_sends_to_selected_endpoint(self):
+        self.request.return_value = MockResponse(200)
+        response = self.session.request('http://vip-a:8004/v1/stacks', 'GET', headers={})
+        self.assertEqual(response.status_code, 200)
+        self.request.assert_called_once_with('http://vip-b:8004/v1/stacks', 'GET', headers={})
+
+    def test_other_hosts_unchanged(self):
+        self.session.request('http://object-store:8080/v1', 'GET')
+        self.request.assert_called_once_with('http://object-store:8080/v1', 'GET')
+
+    def test_server_error_response_recorded(self):
+        self.request.return_value = MockResponse(503)
+        self.session.request('http://vip-a:8004/v1/stacks', 'GET')
+        self.assertEqual(self.selector.stats('vip-b').consecutive_failures, 1)
+
+    def test_fails_over_on_connection_failure(self):
+        self.request.side_effect = [keystoneexceptions.ConnectFailure('Connection refused'), MockResponse(200)]
+        response = self.session.request('http://vip-a:8004/v1/stacks', 'GET')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call[0][0] for call in self.request.call_args_list], ['http://vip-b:8004/v1/stacks', 'http://vip-a:8004/v1/stacks'])
+        self.assertEqual(self.selector.select(), 'vip-a')
+
+    def test_raises_when_all_endpoints_fail(self):
+        self.request.side_effect = keystoneexceptions.ConnectFailure('Connection refused')
+        with self.assertRaises(keystoneexceptions.ConnectFailure):
+            self.session.request('http://vip-a:8004/v1/stacks', 'GET')
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_does_not_fail_over_post(self):
+        self.request.side_effect = keystoneexceptions.ConnectTimeout('Timed out')
+        with self.assertRaises(keystoneexceptions.ConnectTimeout):
+            self.session.request('http://vip-a:8004/v1/stacks', 'POST', json={})
+        self.assertEqual(self.request.call_count, 1)
+        # Next request avoids the endpoint
+        self.assertEqual(self.selector.select(), 'vip-a')
+
+    def test_does_not_fail_over_client_error(self):
+        self.request.side_effect = keystoneexceptions.NotFound()
+        with self.assertRaises(keystoneexceptions.NotFound):
+            self.session.request('http://vip-a:8004/v1/stacks/missing', 'GET')
+        self.assertEqual(self.request.call_count, 1)
+
+
+class TestEndpointSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.selection = EndpointSelection()
+        self.selection.configure(EndpointSelectionProperties())
+
+    def test_no_selector_for_single_endpoint(self):
+        self.assertIsNone(self.selection.selector_for('testdl', ['http://vip-a:5000']))
+        self.assertIsNone(self.selection.selector_for('testdl', ['http://vip-a:5000', 'https://vip-a:13000']))
+
+    def test_no_selector_when_disabled(self):
+        properties = EndpointSelectionProperties()
+        properties.enabled = False
+        self.selection.configure(properties)
+        self.assertIsNone(self.selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-b:5000']))
+
+    def test_selector_kept_between_requests(self):
+        selector = self.selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-b:5000'])
+        self.assertEqual(selector.hosts, ['vip-a', 'vip-b'])
+        self.assertIs(self.selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-b:5000']), selector)
+        self.assertIsNot(self.selection.selector_for('otherdl', ['http://vip-a:5000', 'http://vip-b:5000']), selector)
+
+    def test_selector_replaced_when_endpoints_change(self):
+        selector = self.selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-b:5000'])
+        new_selector = self.selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-c:5000'])
+        self.assertIsNot(new_selector, selector)
+        self.assertEqual(new_selector.hosts, ['vip-a', 'vip-c'])
+
+
+class TestEndpointSelectionConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        endpoint_selection.configure(None)
+
+    def test_configure(self):
+        properties = EndpointSelectionProperties()
+        properties.recovery_time = 10
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        EndpointSelectionConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(EndpointSelectionProperties)
+        selector = endpoint_selection.selector_for('testdl', ['http://vip-a:5000', 'http://vip-b:5000'])
+        self.assertEqual(selector.recovery_time, 10)
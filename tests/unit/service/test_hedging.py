@@ -0,0 +1,175 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.timeouts import timeout_policy, current_deadline
+from osvimdriver.service.hedging import LatencyTracker, HedgeBudget, HedgingPolicy, HedgingProperties, HedgingConfigurator, hedging_policy
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for duration in range(1, 101):
+            tracker.record('key', duration / 100)
+        self.assertEqual(tracker.percentile('key', 95), 0.95)
+        self.assertEqual(tracker.percentile('key', 50), 0.5)
+        self.assertEqual(tracker.percentile('key', 100), 1.0)
+        self.assertIsNone(tracker.percentile('other', 95))
+
+    def test_min_samples(self):
+        tracker = LatencyTracker()
+        tracker.record('key', 0.1)
+        self.assertIsNone(tracker.percentile('key', 95, min_samples=2))
+        tracker.record('key', 0.2)
+        self.assertEqual(tracker.percentile('key', 95, min_samples=2), 0.2)
+
+    def test_window(self):
+        tracker = LatencyTracker(window=2)
+        tracker.record('key', 5)
+        tracker.record('key', 0.1)
+        tracker.record('key', 0.2)
+        self.assertEqual(tracker.percentile('key', 100), 0.2)
+
+
+class TestHedgeBudget(unittest.TestCase):
+
+    def test_spend_earned_hedges(self):
+        budget = HedgeBudget(0.5, max_tokens=1)
+        self.assertFalse(budget.spend())
+        budget.earn()
+        self.assertFalse(budget.spend())
+        budget.earn()
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+        for _ in range(10):
+            budget.earn()
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+
+
+class TestHedgingPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.properties = HedgingProperties()
+        self.properties.enabled = True
+        self.properties.min_samples = 5
+        self.properties.min_delay = 0.01
+        self.properties.budget_ratio = 1
+        self.policy = HedgingPolicy()
+        self.policy.configure(self.properties)
+
+    def tearDown(self):
+        self.policy.configure(None)
+
+    def __warm_up(self, location, duration=0.01):
+        for _ in range(self.properties.min_samples):
+            self.policy.call('heat', 'get_stack', location, lambda: time.sleep(duration))
+
+    def __requests(self, *behaviours):
+        # Each request made by the policy takes the next behaviour: a (delay, result or exception) pair
+        lock = threading.Lock()
+        remaining = list(behaviours)
+        calls = []
+        def func():
+            with lock:
+                delay, outcome = remaining.pop(0)
+                calls.append(outcome)
+            time.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return func, calls
+
+    def test_disabled(self):
+        policy = HedgingPolicy()
+        self.assertFalse(policy.applies_to('get_stack'))
+        self.assertEqual(policy.call('heat', 'get_stack', 'dl', lambda: 'result'), 'result')
+
+    def test_applies_to(self):
+        self.assertTrue(self.policy.applies_to('get_stack'))
+        self.assertTrue(self.policy.applies_to('show_network'))
+        self.assertFalse(self.policy.applies_to('create_stack'))
+
+    def test_no_hedge_until_enough_samples(self):
+        func, calls = self.__requests((0.1, 'first'), (0, 'hedge'))
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-cold-dl', func), 'first')
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(self.policy.hedge_delay(('heat', 'get_stack', 'test-hedge-cold-dl')))
+
+    def test_no_hedge_when_answered_in_time(self):
+        self.__warm_up('test-hedge-fast-dl', duration=0.05)
+        func, calls = self.__requests((0, 'first'), (0, 'hedge'))
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-fast-dl', func), 'first')
+        self.assertEqual(calls, ['first'])
+
+    def test_hedge_wins(self):
+        self.__warm_up('test-hedge-win-dl')
+        func, calls = self.__requests((1, 'first'), (0, 'hedge'))
+        start = time.monotonic()
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-win-dl', func), 'hedge')
+        self.assertLess(time.monotonic() - start, 0.5)
+        labels = {'service': 'heat', 'operation': 'get_stack', 'location': 'test-hedge-win-dl'}
+        self.assertEqual(metrics.OPENSTACK_HEDGED_REQUESTS.labels(**labels).get(), 1)
+        self.assertEqual(metrics.OPENSTACK_HEDGE_WINS.labels(**labels).get(), 1)
+
+    def test_first_request_wins(self):
+        self.__warm_up('test-hedge-first-dl')
+        func, calls = self.__requests((0.1, 'first'), (1, 'hedge'))
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-first-dl', func), 'first')
+        self.assertEqual(calls, ['first', 'hedge'])
+        labels = {'service': 'heat', 'operation': 'get_stack', 'location': 'test-hedge-first-dl'}
+        self.assertEqual(metrics.OPENSTACK_HEDGED_REQUESTS.labels(**labels).get(), 1)
+        self.assertEqual(metrics.OPENSTACK_HEDGE_WINS.labels(**labels).get(), 0)
+
+    def test_failed_request_waits_for_other(self):
+        self.__warm_up('test-hedge-error-dl')
+        func, calls = self.__requests((0.1, ValueError('Failed')), (0.2, 'hedge'))
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-error-dl', func), 'hedge')
+
+    def test_both_fail(self):
+        self.__warm_up('test-hedge-both-dl')
+        func, calls = self.__requests((0.1, ValueError('First failed')), (0, ValueError('Hedge failed')))
+        with self.assertRaises(ValueError) as context:
+            self.policy.call('heat', 'get_stack', 'test-hedge-both-dl', func)
+        self.assertEqual(str(context.exception), 'First failed')
+
+    def test_budget_exhausted(self):
+        self.properties.budget_ratio = 0
+        self.policy.configure(self.properties)
+        self.__warm_up('test-hedge-budget-dl')
+        func, calls = self.__requests((0.1, 'first'), (0, 'hedge'))
+        self.assertEqual(self.policy.call('heat', 'get_stack', 'test-hedge-budget-dl', func), 'first')
+        self.assertEqual(calls, ['first'])
+        labels = {'service': 'heat', 'operation': 'get_stack', 'location': 'test-hedge-budget-dl'}
+        self.assertEqual(metrics.OPENSTACK_HEDGE_BUDGET_EXHAUSTED.labels(**labels).get(), 1)
+
+    def test_requests_keep_callers_context(self):
+        self.__warm_up('test-hedge-context-dl')
+        deadlines = []
+        def func():
+            deadlines.append(current_deadline())
+            time.sleep(0.1)
+        timeout_policy.request_deadline = 60
+        try:
+            with timeout_policy.request_deadline_for('get_lifecycle_execution') as deadline:
+                self.policy.call('heat', 'get_stack', 'test-hedge-context-dl', func)
+        finally:
+            timeout_policy.request_deadline = 0
+        self.assertEqual(deadlines, [deadline, deadline])
+
+
+class TestHedgingConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        hedging_policy.configure(None)
+
+    def test_configure(self):
+        properties = HedgingProperties()
+        properties.enabled = True
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        HedgingConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(HedgingProperties)
+        self.assertTrue(hedging_policy.applies_to('get_stack'))
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from ignition.model.associated_topology import AssociatedTopology
+from ignition.model.lifecycle import LifecycleExecution, STATUS_IN_PROGRESS, STATUS_COMPLETE, STATUS_FAILED
+from ignition.model.failure import FailureDetails, FAILURE_CODE_INFRASTRUCTURE_ERROR
+from osvimdriver.service.journal import RequestJournal, JournalProperties, JournalConfigurator, request_journal
+import osvimdriver.service.metrics as metrics
+
+
+class TestRequestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.properties = JournalProperties()
+        self.properties.enabled = True
+        self.properties.path = os.path.join(self.tmp_dir, 'journal.sqlite3')
+        self.journal = RequestJournal()
+        self.journal.configure(self.properties)
+
+    def tearDown(self):
+        self.journal.configure(None)
+        shutil.rmtree(self.tmp_dir)
+
+    def __associated_topology(self):
+        associated_topology = AssociatedTopology()
+        associated_topology.add_entry('InfrastructureStack', '1', 'Openstack')
+        return associated_topology
+
+    def test_disabled_until_configured(self):
+        journal = RequestJournal()
+        self.assertFalse(journal.enabled)
+        journal.record_accepted('location', 'Create::1::1', 'Create', '1', 1, 2)
+        self.assertIsNone(journal.get_finished('location', 'Create::1::1'))
+
+    def test_disabled_when_path_cannot_be_opened(self):
+        self.properties.path = os.path.join(self.tmp_dir, 'missing', 'journal.sqlite3')
+        self.journal.configure(self.properties)
+        self.assertFalse(self.journal.enabled)
+
+    def test_record_accepted(self):
+        before = metrics.LIFECYCLE_TIME_TO_ACCEPT.labels(request_type='Create').snapshot()
+        self.journal.record_accepted('location', 'Create::1::1', 'Create', '1', 100.0, 100.5)
+        entry = self.journal.get('location', 'Create::1::1')
+        self.assertEqual(entry['request_type'], 'Create')
+        self.assertEqual(entry['stack_id'], '1')
+        self.assertEqual(entry['submitted_at'], 100.0)
+        self.assertEqual(entry['accepted_at'], 100.5)
+        self.assertIsNone(entry['completed_at'])
+        after = metrics.LIFECYCLE_TIME_TO_ACCEPT.labels(request_type='Create').snapshot()
+        self.assertEqual(after[1], before[1] + 1)
+        self.assertAlmostEqual(after[2] - before[2], 0.5)
+
+    def test_in_progress_not_finished(self):
+        self.journal.record_accepted('location', 'Create::1::1', 'Create', '1', time.time(), time.time())
+        self.journal.record_execution('location', 'Create::1::1', 'Create', '1', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        entry = self.journal.get('location', 'Create::1::1')
+        self.assertEqual(entry['last_status'], STATUS_IN_PROGRESS)
+        self.assertIsNotNone(entry['last_observed_at'])
+        self.assertIsNone(self.journal.get_finished('location', 'Create::1::1'))
+
+    def test_finished_execution_returned(self):
+        self.journal.record_accepted('location', 'Create::1::1', 'Create', '1', time.time(), time.time())
+        execution = LifecycleExecution('Create::1::1', STATUS_COMPLETE, outputs={'ip': '10.0.0.1', 'ports': [1, 2]}, associated_topology=self.__associated_topology())
+        self.journal.record_execution('location', 'Create::1::1', 'Create', '1', execution)
+        finished = self.journal.get_finished('location', 'Create::1::1')
+        self.assertEqual(finished.request_id, 'Create::1::1')
+        self.assertEqual(finished.status, STATUS_COMPLETE)
+        self.assertIsNone(finished.failure_details)
+        self.assertEqual(finished.outputs, {'ip': '10.0.0.1', 'ports': [1, 2]})
+        self.assertEqual(finished.associated_topology.to_dict(), {'InfrastructureStack': {'id': '1', 'type': 'Openstack'}})
+
+    def test_failed_execution_returned(self):
+        execution = LifecycleExecution('Delete::1::1', STATUS_FAILED, failure_details=FailureDetails(FAILURE_CODE_INFRASTRUCTURE_ERROR, 'Delete failed'))
+        self.journal.record_execution('location', 'Delete::1::1', 'Delete', '1', execution)
+        finished = self.journal.get_finished('location', 'Delete::1::1')
+        self.assertEqual(finished.status, STATUS_FAILED)
+        self.assertEqual(finished.failure_details.failure_code, FAILURE_CODE_INFRASTRUCTURE_ERROR)
+        self.assertEqual(finished.failure_details.description, 'Delete failed')
+        self.assertIsNone(finished.outputs)
+        self.assertIsNone(finished.associated_topology)
+
+    def test_requests_keyed_by_location(self):
+        self.journal.record_execution('locationA', 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        self.assertIsNone(self.journal.get_finished('locationB', 'Delete::1::1'))
+        self.journal.record_execution(None, 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        self.assertIsNotNone(self.journal.get_finished(None, 'Delete::1::1'))
+
+    def test_time_to_complete_observed_once(self):
+        submitted_at = time.time() - 30
+        self.journal.record_accepted('location', 'Create::1::1', 'Create', '1', submitted_at, submitted_at + 1)
+        before = metrics.LIFECYCLE_TIME_TO_COMPLETE.labels(request_type='Create', status=STATUS_COMPLETE).snapshot()
+        self.journal.record_execution('location', 'Create::1::1', 'Create', '1', LifecycleExecution('Create::1::1', STATUS_COMPLETE))
+        first_completed_at = self.journal.get('location', 'Create::1::1')['completed_at']
+        self.journal.record_execution('location', 'Create::1::1', 'Create', '1', LifecycleExecution('Create::1::1', STATUS_COMPLETE))
+        after = metrics.LIFECYCLE_TIME_TO_COMPLETE.labels(request_type='Create', status=STATUS_COMPLETE).snapshot()
+        self.assertEqual(after[1], before[1] + 1)
+        self.assertAlmostEqual(after[2] - before[2], 30, delta=1)
+        self.assertEqual(self.journal.get('location', 'Create::1::1')['completed_at'], first_completed_at)
+
+    def test_time_to_complete_not_observed_without_submit_time(self):
+        before = metrics.LIFECYCLE_TIME_TO_COMPLETE.labels(request_type='Adopt', status=STATUS_COMPLETE).snapshot()
+        self.journal.record_execution('location', 'Adopt::1::1', 'Adopt', '1', LifecycleExecution('Adopt::1::1', STATUS_COMPLETE))
+        self.assertEqual(metrics.LIFECYCLE_TIME_TO_COMPLETE.labels(request_type='Adopt', status=STATUS_COMPLETE).snapshot()[1], before[1])
+        self.assertIsNotNone(self.journal.get_finished('location', 'Adopt::1::1'))
+
+    def test_shared_between_journals(self):
+        # As it would be by worker processes
+        other_journal = RequestJournal()
+        other_journal.configure(self.properties)
+        self.journal.record_execution('location', 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        self.assertEqual(other_journal.get_finished('location', 'Delete::1::1').status, STATUS_COMPLETE)
+
+    def test_used_from_many_threads(self):
+        def record(index):
+            request_id = 'Create::{0}::1'.format(index)
+            self.journal.record_accepted('location', request_id, 'Create', str(index), time.time(), time.time())
+            self.journal.record_execution('location', request_id, 'Create', str(index), LifecycleExecution(request_id, STATUS_COMPLETE))
+        threads = [threading.Thread(target=record, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        for index in range(10):
+            self.assertIsNotNone(self.journal.get_finished('location', 'Create::{0}::1'.format(index)))
+
+    def test_purge(self):
+        self.journal.record_execution('location', 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        self.journal.max_age = 60
+        with patch('osvimdriver.service.journal.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.journal.purge(), 1)
+        self.assertIsNone(self.journal.get('location', 'Delete::1::1'))
+
+    def test_errors_ignored(self):
+        before = metrics.JOURNAL_ERRORS.labels(operation='record_execution').get()
+        self.journal.record_execution('location', 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        # Writes by this thread's connection now fail
+        self.journal._RequestJournal__connection().execute('PRAGMA query_only=ON')
+        self.journal.record_execution('location', 'Delete::2::1', 'Delete', '2', LifecycleExecution('Delete::2::1', STATUS_COMPLETE))
+        self.assertEqual(metrics.JOURNAL_ERRORS.labels(operation='record_execution').get(), before + 1)
+        self.assertIsNone(self.journal.get_finished('location', 'Delete::2::1'))
+
+    def test_read_errors_ignored(self):
+        before = metrics.JOURNAL_ERRORS.labels(operation='get').get()
+        self.journal.record_execution('location', 'Delete::1::1', 'Delete', '1', LifecycleExecution('Delete::1::1', STATUS_COMPLETE))
+        self.journal._RequestJournal__connection().execute('DROP TABLE lifecycle_requests')
+        self.assertIsNone(self.journal.get('location', 'Delete::1::1'))
+        self.assertEqual(metrics.JOURNAL_ERRORS.labels(operation='get').get(), before + 1)
+
+
+class TestJournalConfigurator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        request_journal.configure(None)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_configure(self):
+        properties = JournalProperties()
+        properties.enabled = True
+        properties.path = os.path.join(self.tmp_dir, 'journal.sqlite3')
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        JournalConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(JournalProperties)
+        self.assertTrue(request_journal.enabled)
+        self.assertTrue(os.path.exists(properties.path))
+
+    def test_configure_disabled(self):
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = JournalProperties()
+        JournalConfigurator().configure(configuration, MagicMock())
+        self.assertFalse(request_journal.enabled)
@@ -0,0 +1,118 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.metrics import MetricsRegistry, Counter, Gauge, Histogram, MULTIPROCESS_DIR_ENV
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_register_duplicate_fails(self):
+        registry = MetricsRegistry()
+        Counter('test_total', 'A test counter', registry=registry)
+        with self.assertRaises(ValueError) as context:
+            Counter('test_total', 'A test counter', registry=registry)
+        self.assertEqual(str(context.exception), 'Metric with name \'test_total\' already registered')
+
+    def test_render_counter(self):
+        registry = MetricsRegistry()
+        counter = Counter('test_total', 'A test counter', ['location'], registry=registry)
+        counter.labels(location='dl1').inc()
+        counter.labels(location='dl1').inc(2)
+        counter.labels(location='dl2').inc()
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_total A test counter',
+            '# TYPE test_total counter',
+            'test_total{location="dl1"} 3.0',
+            'test_total{location="dl2"} 1.0'
+        ]) + '\n')
+
+    def test_counter_cannot_decrease(self):
+        counter = Counter('test_total', 'A test counter')
+        with self.assertRaises(ValueError):
+            counter.labels().inc(-1)
+
+    def test_labels_must_match(self):
+        counter = Counter('test_total', 'A test counter', ['location'])
+        with self.assertRaises(ValueError) as context:
+            counter.labels(service='heat')
+        self.assertEqual(str(context.exception), 'Metric \'test_total\' expects labels [\'location\'] but was given [\'service\']')
+
+    def test_render_gauge(self):
+        registry = MetricsRegistry()
+        gauge = Gauge('test_size', 'A test gauge', ['cache'], registry=registry)
+        gauge.labels(cache='a').set(5)
+        gauge.labels(cache='b').inc(8)
+        gauge.labels(cache='b').dec()
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_size A test gauge',
+            '# TYPE test_size gauge',
+            'test_size{cache="a"} 5.0',
+            'test_size{cache="b"} 7.0'
+        ]) + '\n')
+
+    def test_render_refreshes_gauges(self):
+        registry = MetricsRegistry()
+        gauge = Gauge('test_size', 'A test gauge', registry=registry)
+        sizes = [3, 4]
+        registry.add_refresher(lambda: gauge.labels().set(sizes.pop(0)))
+        def failing_refresher():
+            raise ValueError('Failed')
+        # Doesn't stop the metrics being rendered
+        registry.add_refresher(failing_refresher)
+        self.assertIn('test_size 3.0', registry.render())
+        self.assertIn('test_size 4.0', registry.render())
+
+    def test_gauge_track_in_progress(self):
+        gauge = Gauge('test_in_progress', 'A test gauge')
+        with gauge.labels().track_in_progress():
+            self.assertEqual(gauge.labels().get(), 1)
+        self.assertEqual(gauge.labels().get(), 0)
+
+    def test_render_histogram(self):
+        registry = MetricsRegistry()
+        histogram = Histogram('test_seconds', 'A test histogram', ['operation'], registry=registry, buckets=(0.1, 1.0))
+        histogram.labels(operation='get').observe(0.05)
+        histogram.labels(operation='get').observe(0.5)
+        histogram.labels(operation='get').observe(5)
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_seconds A test histogram',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{le="0.1",operation="get"} 1.0',
+            'test_seconds_bucket{le="1.0",operation="get"} 2.0',
+            'test_seconds_bucket{le="+Inf",operation="get"} 3.0',
+            'test_seconds_count{operation="get"} 3.0',
+            'test_seconds_sum{operation="get"} 5.55'
+        ]) + '\n')
+        self.assertEqual(histogram.labels(operation='get').snapshot(), ([1, 2], 3, 5.55))
+
+    def test_render_escapes_label_values(self):
+        registry = MetricsRegistry()
+        counter = Counter('test_total', 'A test counter', ['location'], registry=registry)
+        counter.labels(location='my "dl"').inc()
+        self.assertIn('test_total{location="my \\"dl\\""} 1.0', registry.render())
+
+
+class TestMultiprocessMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __run_worker(self, script):
+        env = dict(os.environ)
+        env[MULTIPROCESS_DIR_ENV] = self.tmp_dir
+        subprocess.run([sys.executable, '-c', 'import osvimdriver.service.metrics as metrics; ' + script], env=env, check=True)
+
+    def test_render_aggregates_all_processes(self):
+        self.__run_worker('metrics.ADMISSION_REJECTED.labels(pool=\'translation\').inc()')
+        self.__run_worker('metrics.ADMISSION_REJECTED.labels(pool=\'translation\').inc(2)')
+        with patch.dict(os.environ, {MULTIPROCESS_DIR_ENV: self.tmp_dir}):
+            rendered = metrics.registry.render()
+        self.assertIn('ovd_admission_rejected_total{pool="translation"} 3.0', rendered)
@@ -0,0 +1,180 @@
+import unittest
+import threading
+import time
+from unittest.mock import MagicMock
+from heatclient import exc as heatexc
+from osvimdriver.service.osadmin import OpenstackAdminService, OpenstackAdminApiService, OpenstackAdminProperties, PingResponse, CacheNotFoundError, PING_RESPONSE_CODEC
+from osvimdriver.service.circuitbreaker import circuit_breakers, CircuitBreakerProperties
+from osvimdriver.service.cache import caches
+
+
+class TestOpenstackAdminService(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_location_translator = MagicMock()
+        self.mock_location = self.mock_location_translator.from_deployment_location.return_value
+        self.mock_session = self.mock_location.get_session.return_value
+        self.mock_heat_driver = self.mock_location.heat_driver
+        self.admin_properties = OpenstackAdminProperties()
+        self.service = OpenstackAdminService(self.mock_location_translator, self.admin_properties)
+        self.deployment_location = {'name': 'Test', 'properties': {'os_api_url': 'http://localhost'}}
+
+    def test_ping_uses_build_info(self):
+        response = self.service.ping(self.deployment_location)
+        self.assertTrue(response.success)
+        self.assertFalse(response.cached)
+        self.mock_session.get_token.assert_called_once()
+        self.mock_heat_driver.get_build_info.assert_called_once()
+        self.mock_heat_driver.get_stacks.assert_not_called()
+        self.assertIn('authenticate', response.stages)
+        self.assertIn('heat', response.stages)
+        self.mock_location.close.assert_called_once()
+
+    def test_ping_without_auth(self):
+        self.mock_session.auth = None
+        response = self.service.ping(self.deployment_location)
+        self.assertTrue(response.success)
+        self.mock_session.get_token.assert_not_called()
+        self.assertNotIn('authenticate', response.stages)
+
+    def test_ping_falls_back_to_limited_stack_list(self):
+        self.mock_heat_driver.get_build_info.side_effect = heatexc.HTTPForbidden('Forbidden')
+        self.mock_heat_driver.get_stacks.return_value = iter([])
+        response = self.service.ping(self.deployment_location)
+        self.assertTrue(response.success)
+        self.mock_heat_driver.get_stacks.assert_called_once_with(limit=1)
+
+    def test_ping_failure(self):
+        self.mock_session.get_token.side_effect = Exception('Unauthorized')
+        response = self.service.ping(self.deployment_location)
+        self.assertFalse(response.success)
+        self.assertEqual(response.description, 'Unauthorized')
+        self.assertIn('authenticate', response.stages)
+        self.assertNotIn('heat', response.stages)
+        self.mock_location.close.assert_called_once()
+
+    def test_ping_result_cached(self):
+        first_response = self.service.ping(self.deployment_location)
+        second_response = self.service.ping({'properties': {'os_api_url': 'http://localhost'}, 'name': 'Test'})
+        self.assertFalse(first_response.cached)
+        self.assertTrue(second_response.cached)
+        self.assertEqual(second_response.success, first_response.success)
+        self.mock_heat_driver.get_build_info.assert_called_once()
+
+    def test_ping_failure_not_cached(self):
+        self.mock_heat_driver.get_build_info.side_effect = Exception('Unavailable')
+        self.assertFalse(self.service.ping(self.deployment_location).success)
+        # The location has recovered
+        self.mock_heat_driver.get_build_info.side_effect = None
+        response = self.service.ping(self.deployment_location)
+        self.assertTrue(response.success)
+        self.assertFalse(response.cached)
+
+    def test_ping_cache_keyed_by_properties(self):
+        self.service.ping(self.deployment_location)
+        response = self.service.ping({'name': 'Test', 'properties': {'os_api_url': 'http://otherhost'}})
+        self.assertFalse(response.cached)
+        self.assertEqual(self.mock_heat_driver.get_build_info.call_count, 2)
+
+    def test_ping_cache_disabled(self):
+        self.admin_properties.ping_cache_ttl = 0
+        service = OpenstackAdminService(self.mock_location_translator, self.admin_properties)
+        service.ping(self.deployment_location)
+        response = service.ping(self.deployment_location)
+        self.assertFalse(response.cached)
+
+    def test_ping_many_runs_concurrently_with_bounded_pool(self):
+        self.admin_properties.ping_batch_max_workers = 2
+        lock = threading.Lock()
+        active = {'current': 0, 'max': 0}
+        def slow_build_info():
+            with lock:
+                active['current'] += 1
+                active['max'] = max(active['max'], active['current'])
+            time.sleep(0.05)
+            with lock:
+                active['current'] -= 1
+        self.mock_heat_driver.get_build_info.side_effect = slow_build_info
+        deployment_locations = [{'name': 'Test{0}'.format(i), 'properties': {}} for i in range(5)]
+        responses = self.service.ping_many(deployment_locations)
+        self.assertEqual(len(responses), 5)
+        self.assertTrue(all(response.success for response in responses))
+        self.assertEqual(active['max'], 2)
+
+    def test_ping_many_empty(self):
+        self.assertEqual(self.service.ping_many([]), [])
+
+
+class TestOpenstackAdminApiService(unittest.TestCase):
+
+    def test_ping(self):
+        mock_service = MagicMock()
+        mock_service.ping.return_value = PingResponse(True, 'Reached Heat client successfully', stages={'heat': 0.1})
+        api_service = OpenstackAdminApiService(service=mock_service)
+        response, code = api_service.ping(body={'deploymentLocation': {'name': 'Test'}})
+        self.assertEqual(code, 200)
+        self.assertEqual(response, {'success': True, 'description': 'Reached Heat client successfully', 'stages': {'heat': 0.1}, 'cached': False})
+
+    def test_ping_batch(self):
+        mock_service = MagicMock()
+        mock_service.ping_many.return_value = [PingResponse(True, 'Reached Heat client successfully'), PingResponse(False, 'Unauthorized')]
+        api_service = OpenstackAdminApiService(service=mock_service)
+        response, code = api_service.ping_batch(body={'deploymentLocations': [{'name': 'A'}, {'name': 'B'}]})
+        self.assertEqual(code, 200)
+        self.assertEqual(response['results'][0]['name'], 'A')
+        self.assertTrue(response['results'][0]['success'])
+        self.assertEqual(response['results'][1]['name'], 'B')
+        self.assertEqual(response['results'][1]['description'], 'Unauthorized')
+
+    def test_list_breakers(self):
+        circuit_breakers.configure(CircuitBreakerProperties())
+        try:
+            breaker = circuit_breakers.get_breaker('Test')
+            breaker.record_error(heatexc.HTTPServiceUnavailable('Unavailable'))
+            api_service = OpenstackAdminApiService(service=MagicMock())
+            response, code = api_service.list_breakers()
+            self.assertEqual(code, 200)
+            self.assertEqual(response, {'breakers': [
+                {'deploymentLocation': 'Test', 'state': 'CLOSED', 'consecutiveFailures': 1, 'lastError': 'HTTPServiceUnavailable: ERROR: Unavailable', 'retryInSeconds': None}
+            ]})
+        finally:
+            circuit_breakers.configure(None)
+
+    def test_list_caches(self):
+        cache = caches.create('test-admin', 10)
+        cache.put('A', 1)
+        api_service = OpenstackAdminApiService(service=MagicMock())
+        response, code = api_service.list_caches()
+        self.assertEqual(code, 200)
+        self.assertIn({'name': 'test-admin', 'backend': 'memory', 'size': 1, 'ttl': 10}, response['caches'])
+
+    def test_flush_cache(self):
+        cache = caches.create('test-admin', 10)
+        cache.put('A', 1)
+        api_service = OpenstackAdminApiService(service=MagicMock())
+        response, code = api_service.flush_cache(name='test-admin')
+        self.assertEqual(code, 200)
+        self.assertEqual(response, {'flushed': ['test-admin']})
+        self.assertIsNone(cache.get('A'))
+
+    def test_flush_unknown_cache(self):
+        api_service = OpenstackAdminApiService(service=MagicMock())
+        with self.assertRaises(CacheNotFoundError):
+            api_service.flush_cache(name='unknown')
+
+    def test_flush_caches(self):
+        cache = caches.create('test-admin', 10)
+        cache.put('A', 1)
+        api_service = OpenstackAdminApiService(service=MagicMock())
+        response, code = api_service.flush_caches()
+        self.assertEqual(code, 200)
+        self.assertIn('test-admin', response['flushed'])
+        self.assertIsNone(cache.get('A'))
+
+
+class TestPingResponse(unittest.TestCase):
+
+    def test_codec(self):
+        ping_response = PingResponse(True, 'Reached Heat client successfully', stages={'heat': 0.1})
+        decoded = PING_RESPONSE_CODEC.decode(PING_RESPONSE_CODEC.encode(ping_response))
+        self.assertEqual(decoded.to_dict(), ping_response.to_dict())
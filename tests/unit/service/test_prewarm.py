@@ -0,0 +1,84 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from osvimdriver.service.prewarm import Prewarmer, PrewarmProperties, PrewarmConfigurator, prewarmer
+
+
+class TestPrewarmer(unittest.TestCase):
+
+    def setUp(self):
+        self.translator = MagicMock()
+        self.location = self.translator.from_deployment_location.return_value
+        self.session = self.location.get_session.return_value
+        self.session.get_endpoint.side_effect = lambda service_type, interface: 'http://{0}:8000/v1'.format(service_type)
+        self.prewarmer = Prewarmer(location_translator=self.translator)
+
+    def tearDown(self):
+        self.prewarmer.stop()
+
+    def __configure(self, deployment_locations, keepalive_interval=0):
+        properties = PrewarmProperties()
+        properties.enabled = True
+        properties.deployment_locations = deployment_locations
+        properties.keepalive_interval = keepalive_interval
+        self.prewarmer.configure(properties)
+
+    def test_warm(self):
+        deployment_location = {'name': 'testdl', 'properties': {}}
+        self.assertTrue(self.prewarmer.warm(deployment_location))
+        self.translator.from_deployment_location.assert_called_once_with(deployment_location)
+        self.session.get_token.assert_called_once()
+        self.session.request.assert_any_call('http://orchestration:8000/v1', 'HEAD', raise_exc=False)
+        self.session.request.assert_any_call('http://network:8000/v1', 'HEAD', raise_exc=False)
+        self.location.close.assert_called_once()
+
+    def test_warm_without_auth(self):
+        self.session.auth = None
+        self.assertTrue(self.prewarmer.warm({'name': 'testdl', 'properties': {}}))
+        self.session.get_token.assert_not_called()
+        self.session.request.assert_not_called()
+
+    def test_warm_failure_not_raised(self):
+        self.session.get_token.side_effect = ValueError('Keystone unavailable')
+        self.assertFalse(self.prewarmer.warm({'name': 'testdl', 'properties': {}}))
+        self.location.close.assert_called_once()
+
+    def test_invalid_location_not_raised(self):
+        self.translator.from_deployment_location.side_effect = ValueError('Deployment Location managed by the Openstack VIM Driver must have a name')
+        self.assertFalse(self.prewarmer.warm({}))
+
+    def test_start_warms_in_background(self):
+        warmed = threading.Event()
+        self.session.get_token.side_effect = lambda: warmed.set()
+        self.__configure([{'name': 'testdl', 'properties': {}}])
+        self.prewarmer.start()
+        self.assertTrue(warmed.wait(5))
+
+    def test_keepalive(self):
+        warmed = threading.Semaphore(0)
+        self.session.get_token.side_effect = lambda: warmed.release()
+        self.__configure([{'name': 'testdl', 'properties': {}}], keepalive_interval=0.01)
+        self.prewarmer.start()
+        for _ in range(3):
+            self.assertTrue(warmed.acquire(timeout=5))
+
+    def test_start_without_locations(self):
+        self.__configure([])
+        self.prewarmer.start()
+        self.assertIsNone(self.prewarmer._Prewarmer__thread)
+
+
+class TestPrewarmConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        prewarmer.configure(None)
+
+    def test_configure_disabled(self):
+        properties = PrewarmProperties()
+        properties.deployment_locations = [{'name': 'testdl', 'properties': {}}]
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        PrewarmConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(PrewarmProperties)
+        self.assertEqual(prewarmer.deployment_locations, [])
+        self.assertIsNone(prewarmer._Prewarmer__thread)
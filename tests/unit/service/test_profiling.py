@@ -0,0 +1,181 @@
+import unittest
+import json
+import os
+import pstats
+import tempfile
+import shutil
+import time
+from unittest.mock import patch
+from osvimdriver.service.profiling import (Profiler, ProfilingProperties, ProfilingError, RequestTimings, record_stage,
+                                           MODE_CPROFILE, MODE_SAMPLING, SESSION_STATUS_RUNNING, SESSION_STATUS_COMPLETE, SESSION_STATUS_FAILED)
+import osvimdriver.service.metrics as metrics
+
+
+def busy(seconds):
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        sum(range(1000))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.properties = ProfilingProperties()
+        self.properties.output_dir = self.tmp_dir
+        self.properties.sampling_interval = 0.001
+        self.profiler = Profiler(self.properties)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_start_validates_mode(self):
+        with self.assertRaises(ValueError):
+            self.profiler.start('not-a-mode', requests=1)
+
+    def test_start_requires_requests_or_seconds(self):
+        with self.assertRaises(ValueError):
+            self.profiler.start(MODE_CPROFILE)
+
+    def test_start_validates_limits(self):
+        with self.assertRaises(ValueError):
+            self.profiler.start(MODE_CPROFILE, requests=self.properties.max_requests + 1)
+        with self.assertRaises(ValueError):
+            self.profiler.start(MODE_CPROFILE, seconds=0)
+
+    def test_start_only_one_session(self):
+        self.profiler.start(MODE_CPROFILE, requests=1)
+        with self.assertRaises(ProfilingError):
+            self.profiler.start(MODE_CPROFILE, requests=1)
+
+    def test_cprofile_next_n_requests(self):
+        session = self.profiler.start(MODE_CPROFILE, requests=2)
+        with self.profiler.profile_request('execute_lifecycle'):
+            busy(0.01)
+        self.assertEqual(session.status, SESSION_STATUS_RUNNING)
+        with self.profiler.profile_request('execute_lifecycle'):
+            busy(0.01)
+        self.assertEqual(session.status, SESSION_STATUS_COMPLETE)
+        self.assertEqual(session.requests_profiled, 2)
+        self.assertTrue(session.file_path.endswith('.pstats'))
+        stats = pstats.Stats(session.file_path)
+        self.assertIn('busy', [func[2] for func in stats.stats.keys()])
+        # Requests after the session has completed are not profiled
+        with self.profiler.profile_request('execute_lifecycle'):
+            pass
+        self.assertEqual(session.requests_profiled, 2)
+        self.assertIs(self.profiler.get_session(session.id), session)
+        self.assertEqual(self.profiler.get_sessions(), [session])
+
+    def test_cprofile_with_no_requests_fails(self):
+        session = self.profiler.start(MODE_CPROFILE, seconds=0.05)
+        time.sleep(0.2)
+        self.assertEqual(session.status, SESSION_STATUS_FAILED)
+        self.assertIsNotNone(session.error)
+        # Another session can be started
+        self.profiler.start(MODE_CPROFILE, requests=1)
+
+    def test_requests_session_ends_after_max_seconds(self):
+        self.properties.max_seconds = 0.1
+        session = self.profiler.start(MODE_CPROFILE, requests=5)
+        with self.profiler.profile_request('execute_lifecycle'):
+            busy(0.01)
+        time.sleep(0.3)
+        # Fewer requests were handled by this process than asked for, so the profile is of those that were
+        self.assertEqual(session.status, SESSION_STATUS_COMPLETE)
+        self.assertEqual(session.requests_profiled, 1)
+        self.assertIn('busy', [func[2] for func in pstats.Stats(session.file_path).stats.keys()])
+        session = self.profiler.start(MODE_SAMPLING, requests=5)
+        time.sleep(0.3)
+        self.assertEqual(session.status, SESSION_STATUS_FAILED)
+        self.profiler.start(MODE_CPROFILE, requests=1)
+
+    def test_sampling_for_seconds(self):
+        session = self.profiler.start(MODE_SAMPLING, seconds=0.3)
+        with self.profiler.profile_request('execute_lifecycle'):
+            busy(0.1)
+        time.sleep(0.4)
+        self.assertEqual(session.status, SESSION_STATUS_COMPLETE)
+        self.assertTrue(session.file_path.endswith('.speedscope.json'))
+        with open(session.file_path, 'r') as f:
+            profile = json.load(f)
+        self.assertEqual(profile['profiles'][0]['type'], 'sampled')
+        self.assertGreater(len(profile['profiles'][0]['samples']), 0)
+        frame_names = [frame['name'] for frame in profile['shared']['frames']]
+        self.assertIn('busy', frame_names)
+
+    def __profile_one_request(self, profiler):
+        session = profiler.start(MODE_CPROFILE, requests=1)
+        with profiler.profile_request('execute_lifecycle'):
+            busy(0.01)
+        return session
+
+    def test_sessions_shared_with_other_processes(self):
+        session = self.__profile_one_request(self.profiler)
+        # Another worker process, sharing the output_dir
+        other_profiler = Profiler(self.properties)
+        self.assertEqual([other_session.to_dict() for other_session in other_profiler.get_sessions()], [session.to_dict()])
+        other_session = other_profiler.get_session(session.id)
+        self.assertEqual(other_session.status, SESSION_STATUS_COMPLETE)
+        self.assertEqual(other_profiler.get_profile_path(other_session), session.file_path)
+
+    def test_get_session_not_found(self):
+        self.assertIsNone(self.profiler.get_session('a8f6b1e4-1c1d-4c53-8d0f-3a4b4c9e2f10'))
+        self.assertIsNone(self.profiler.get_session('../ovd_config'))
+
+    def test_finished_sessions_expire(self):
+        self.properties.session_retention = 60
+        session = self.__profile_one_request(self.profiler)
+        with patch('osvimdriver.service.profiling.time.time', return_value=time.time() + 61):
+            self.assertEqual(self.profiler.get_sessions(), [])
+        self.assertIsNone(self.profiler.get_session(session.id))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_sessions_capped(self):
+        self.properties.max_sessions = 2
+        first = self.__profile_one_request(self.profiler)
+        second = self.__profile_one_request(self.profiler)
+        third = self.__profile_one_request(self.profiler)
+        self.assertEqual(self.profiler.get_sessions(), [second, third])
+        self.assertFalse(os.path.exists(first.file_path))
+
+    def test_session_to_dict(self):
+        session = self.profiler.start(MODE_CPROFILE, requests=1)
+        session_dict = session.to_dict()
+        self.assertEqual(session_dict['id'], session.id)
+        self.assertEqual(session_dict['mode'], MODE_CPROFILE)
+        self.assertEqual(session_dict['format'], 'pstats')
+        self.assertEqual(session_dict['requests'], 1)
+        self.assertEqual(session_dict['status'], SESSION_STATUS_RUNNING)
+
+    def test_slow_request_logged_with_breakdown(self):
+        self.properties.slow_request_threshold = 0.01
+        with self.assertLogs('osvimdriver.service.profiling', level='WARNING') as logs:
+            with self.profiler.profile_request('execute_lifecycle', description='Create'):
+                with metrics.lifecycle_stage('create', 'translate'):
+                    busy(0.02)
+                record_stage('heat.create_stack', 0.5)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow request: execute_lifecycle (Create)', logs.output[0])
+        self.assertIn('translate=', logs.output[0])
+        self.assertIn('heat.create_stack=0.500s', logs.output[0])
+
+    def test_fast_request_not_logged(self):
+        self.properties.slow_request_threshold = 10
+        with patch('osvimdriver.service.profiling.logger') as mock_logger:
+            with self.profiler.profile_request('execute_lifecycle'):
+                pass
+            mock_logger.warning.assert_not_called()
+
+
+class TestRequestTimings(unittest.TestCase):
+
+    def test_record_stage_outside_request_ignored(self):
+        record_stage('translate', 1.0)
+
+    def test_breakdown(self):
+        request_timings = RequestTimings('execute_lifecycle')
+        request_timings.record('translate', 1.0)
+        request_timings.record('create', 0.25)
+        request_timings.finish()
+        self.assertEqual(request_timings.breakdown(), 'translate=1.000s, create=0.250s')
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+import osvimdriver.service.metrics as metrics
+from osvimdriver.service.ratelimit import EndpointRateLimiter, RateLimiterRegistry, RateLimitProperties, RateLimitExceededError, RateLimitConfigurator, rate_limiters
+
+
+class TestEndpointRateLimiter(unittest.TestCase):
+
+    def test_allows_burst_without_waiting(self):
+        limiter = EndpointRateLimiter('heat', 'test-burst-dl', requests_per_second=1, burst=5, max_concurrency=0, max_wait=1)
+        start = time.monotonic()
+        for _ in range(5):
+            with limiter.limit():
+                pass
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_waits_for_token(self):
+        limiter = EndpointRateLimiter('heat', 'test-token-dl', requests_per_second=20, burst=1, max_concurrency=0, max_wait=1)
+        with limiter.limit():
+            pass
+        start = time.monotonic()
+        with limiter.limit():
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+        _, count, total = metrics.OPENSTACK_RATE_LIMIT_WAIT.labels(service='heat', location='test-token-dl').snapshot()
+        self.assertEqual(count, 2)
+        self.assertGreaterEqual(total, 0.03)
+
+    def test_sustained_rate(self):
+        limiter = EndpointRateLimiter('heat', 'test-rate-dl', requests_per_second=50, burst=1, max_concurrency=0, max_wait=5)
+        start = time.monotonic()
+        for _ in range(11):
+            with limiter.limit():
+                pass
+        # First request uses the initial token, the remaining 10 wait 1/50th of a second each
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_rejects_after_max_wait(self):
+        limiter = EndpointRateLimiter('heat', 'test-reject-dl', requests_per_second=0.1, burst=1, max_concurrency=0, max_wait=0.05)
+        with limiter.limit():
+            pass
+        with self.assertRaises(RateLimitExceededError) as context:
+            with limiter.limit():
+                pass
+        self.assertIsInstance(context.exception, TemporaryResourceDriverError)
+        self.assertIn('test-reject-dl', str(context.exception))
+        self.assertEqual(metrics.OPENSTACK_RATE_LIMIT_REJECTED.labels(service='heat', location='test-reject-dl').get(), 1)
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_caps_concurrency(self):
+        limiter = EndpointRateLimiter('neutron', 'test-concurrency-dl', requests_per_second=0, max_concurrency=3, max_wait=5)
+        lock = threading.Lock()
+        observed = {'current': 0, 'max': 0, 'max_waiting': 0}
+        def run(_):
+            with limiter.limit():
+                with lock:
+                    observed['current'] += 1
+                    observed['max'] = max(observed['max'], observed['current'])
+                    observed['max_waiting'] = max(observed['max_waiting'], limiter.waiting)
+                time.sleep(0.01)
+                with lock:
+                    observed['current'] -= 1
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            list(executor.map(run, range(36)))
+        self.assertEqual(observed['max'], 3)
+        self.assertGreater(observed['max_waiting'], 0)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(metrics.OPENSTACK_RATE_LIMIT_QUEUE_DEPTH.labels(service='neutron', location='test-concurrency-dl').get(), 0)
+
+    def test_releases_slot_on_error(self):
+        limiter = EndpointRateLimiter('heat', 'test-error-dl', requests_per_second=0, max_concurrency=1, max_wait=0.1)
+        with self.assertRaises(ValueError):
+            with limiter.limit():
+                raise ValueError('Failed')
+        with limiter.limit():
+            self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class TestEndpointRateLimiterAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def test_caps_concurrency(self):
+        limiter = EndpointRateLimiter('heat', 'test-async-concurrency-dl', requests_per_second=0, max_concurrency=2, max_wait=5)
+        observed = {'current': 0, 'max': 0}
+        async def run():
+            async with limiter.async_limit():
+                observed['current'] += 1
+                observed['max'] = max(observed['max'], observed['current'])
+                await asyncio.sleep(0.01)
+                observed['current'] -= 1
+        await asyncio.gather(*[run() for _ in range(8)])
+        self.assertEqual(observed['max'], 2)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.waiting, 0)
+
+    async def test_rejects_after_max_wait(self):
+        limiter = EndpointRateLimiter('heat', 'test-async-reject-dl', requests_per_second=0, max_concurrency=1, max_wait=0.05)
+        async with limiter.async_limit():
+            with self.assertRaises(RateLimitExceededError):
+                async with limiter.async_limit():
+                    pass
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class TestRateLimiterRegistry(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        registry = RateLimiterRegistry()
+        self.assertIsNone(registry.get_limiter('heat', 'dl'))
+        registry.configure(RateLimitProperties())
+        self.assertIsNone(registry.get_limiter('heat', 'dl'))
+
+    def test_one_limiter_per_endpoint(self):
+        properties = RateLimitProperties()
+        properties.enabled = True
+        registry = RateLimiterRegistry()
+        registry.configure(properties)
+        heat_limiter = registry.get_limiter('heat', 'dl')
+        self.assertIs(registry.get_limiter('heat', 'dl'), heat_limiter)
+        self.assertIsNot(registry.get_limiter('neutron', 'dl'), heat_limiter)
+        self.assertIsNot(registry.get_limiter('heat', 'other-dl'), heat_limiter)
+        self.assertEqual(heat_limiter.requests_per_second, 10)
+        self.assertEqual(heat_limiter.burst, 20)
+        self.assertEqual(heat_limiter.max_concurrency, 10)
+        self.assertEqual(heat_limiter.max_wait, 30)
+
+    def test_service_overrides(self):
+        properties = RateLimitProperties()
+        properties.enabled = True
+        properties.services = {'heat': {'requests_per_second': 2, 'max_concurrency': 1}}
+        registry = RateLimiterRegistry()
+        registry.configure(properties)
+        heat_limiter = registry.get_limiter('heat', 'dl')
+        self.assertEqual(heat_limiter.requests_per_second, 2)
+        self.assertEqual(heat_limiter.max_concurrency, 1)
+        self.assertEqual(heat_limiter.burst, 20)
+        self.assertEqual(registry.get_limiter('neutron', 'dl').requests_per_second, 10)
+
+    def test_unknown_service_override(self):
+        properties = RateLimitProperties()
+        properties.enabled = True
+        properties.services = {'heat': {'rate': 2}}
+        registry = RateLimiterRegistry()
+        registry.configure(properties)
+        with self.assertRaises(ValueError) as context:
+            registry.get_limiter('heat', 'dl')
+        self.assertEqual(str(context.exception), 'Unknown rate_limit setting \'rate\' for service \'heat\'')
+
+
+class TestRateLimitConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        rate_limiters.configure(None)
+
+    def test_configure(self):
+        properties = RateLimitProperties()
+        properties.enabled = True
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        RateLimitConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(RateLimitProperties)
+        self.assertIs(rate_limiters.properties, properties)
+        self.assertIsNotNone(rate_limiters.get_limiter('heat', 'dl'))
@@ -1,9 +1,11 @@
+import hashlib
+import threading
 import unittest
 import uuid
 import tempfile
 import shutil
 import os
-from unittest.mock import patch, MagicMock, ANY
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 from ignition.service.resourcedriver import InfrastructureNotFoundError, InvalidDriverFilesError, InvalidRequestError, ResourceDriverError
 from ignition.model.references import FindReferenceResponse, FindReferenceResult
 from ignition.model.associated_topology import AssociatedTopology
@@ -15,6 +17,14 @@ from osvimdriver.tosca.discover import DiscoveryResult, NotDiscoveredError
 from osvimdriver.openstack.heat.driver import StackNotFoundError
 from tests.unit.testutils.constants import TOSCA_TEMPLATES_PATH, TOSCA_HELLO_WORLD_FILE
 from ignition.utils.propvaluemap import PropValueMap
+import osvimdriver.service.metrics as metrics
+import osvimdriver.service.tracing as tracing
+from osvimdriver.service.timeouts import timeout_policy, current_deadline
+from osvimdriver.service.admission import admission_control, AdmissionProperties, AdmissionRejectedError
+from osvimdriver.service.statuscache import lifecycle_status_cache, StatusCacheProperties
+from osvimdriver.service.asynccreate import create_jobs, AsyncCreateProperties, AsyncCreateRejectedError, new_operation_id, JOB_CREATED, JOB_FAILED
+from osvimdriver.service.journal import request_journal, JournalProperties
+from tests.unit.service.test_statuscache import wait_for
 
 class TestPropertiesMerger(unittest.TestCase):
 
@@ -113,9 +123,11 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.adopt_config = AdoptProperties()
         self.mock_heat_input_utils = MagicMock()
         self.mock_heat_input_utils.filter_used_properties.return_value = {'propA': 'valueA'}
+        self.mock_heat_input_utils.filter_stack_parameters.return_value = {'propA': 'valueA'}
         self.mock_heat_input_utils.filter_password_from_dictionary.return_value =  self.heat_template
         self.mock_heat_driver = MagicMock()
         self.mock_os_location = MagicMock(heat_driver=self.mock_heat_driver)
+        self.mock_os_location.prepare_heat_driver.return_value = self.mock_heat_driver
         self.mock_os_location.get_heat_input_util.return_value = self.mock_heat_input_utils
         self.mock_location_translator = MagicMock()
         self.mock_location_translator.from_deployment_location.return_value = self.mock_os_location
@@ -201,7 +213,7 @@ class TestResourceDriverHandler(unittest.TestCase):
         result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
         mock_stack_name_creator_inst = mock_stack_name_creator.return_value
         mock_stack_name_creator_inst.create.assert_called_once_with('123', 'TestResource')
-        self.mock_heat_driver.create_stack.assert_called_once_with(mock_stack_name_creator_inst.create.return_value, self.heat_template, {'propA': 'valueA'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(mock_stack_name_creator_inst.create.return_value, self.heat_template, {'propA': 'valueA'}, tags=ANY)
 
     def test_create_infrastructure_with_stack_id_input(self):
         driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
@@ -230,7 +242,7 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.assertIsInstance(result, LifecycleExecuteResponse)
         self.assert_internal_resource(result.associated_topology, '1')
         self.mock_location_translator.from_deployment_location.assert_called_once_with(self.deployment_location)
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, tags=ANY)
         self.mock_heat_driver.get_stack.assert_not_called()
 
     def test_create_infrastructure_with_stack_id_empty(self):
@@ -241,7 +253,7 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.assertIsInstance(result, LifecycleExecuteResponse)
         self.assert_internal_resource(result.associated_topology, '1')
         self.mock_location_translator.from_deployment_location.assert_called_once_with(self.deployment_location)
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, tags=ANY)
         self.mock_heat_driver.get_stack.assert_not_called()
 
     def test_create_infrastructure(self):
@@ -251,7 +263,7 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.assertIsInstance(result, LifecycleExecuteResponse)
         self.assert_internal_resource(result.associated_topology, '1')
         self.mock_location_translator.from_deployment_location.assert_called_once_with(self.deployment_location)
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, tags=ANY)
 
     def test_create_infrastructure_includes_heat_files(self):
         files_path = os.path.join(self.heat_driver_files.root_path, 'files')
@@ -264,7 +276,7 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.mock_heat_driver.create_stack.return_value = '1','request1234'
         driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
         _ = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, files={
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, tags=ANY, files={
             os.path.join('subdir', 'fileA.yaml'): 'fileA: test',
             'fileB.yaml': 'fileB: test',
         })
@@ -281,7 +293,7 @@ class TestResourceDriverHandler(unittest.TestCase):
             'system_resourceId': {'type': 'string', 'value': '123'},
             'system_resourceName': {'type': 'string', 'value': 'TestResource'}
         }))
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'system_resourceId': '123'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'system_resourceId': '123'}, tags=ANY)
 
     def test_create_infrastructure_with_tosca(self):
         self.mock_heat_driver.create_stack.return_value = '1','request1234'
@@ -291,7 +303,175 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.assert_internal_resource(result.associated_topology, '1')
         self.mock_heat_translator.generate_heat_template.assert_called_once_with(self.tosca_template, template_path=self.tosca_template_path)
         self.mock_location_translator.from_deployment_location.assert_called_once_with(self.deployment_location)
-        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.mock_heat_translator.generate_heat_template.return_value, {'propA': 'valueA'})
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.mock_heat_translator.generate_heat_template.return_value, {'propA': 'valueA'}, tags=ANY)
+
+    def test_create_infrastructure_with_tosca_rejected_when_busy(self):
+        properties = AdmissionProperties()
+        properties.max_concurrent_translations = 1
+        properties.max_queued_translations = 0
+        admission_control.configure(properties)
+        try:
+            driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+            with admission_control.translation():
+                with self.assertRaises(AdmissionRejectedError):
+                    driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+            self.mock_heat_translator.generate_heat_template.assert_not_called()
+            self.mock_heat_driver.create_stack.assert_not_called()
+            # Heat templates are not translated so are not limited
+            self.mock_heat_driver.create_stack.return_value = '1','request1234'
+            with admission_control.translation():
+                driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+            self.mock_heat_driver.create_stack.assert_called_once()
+        finally:
+            admission_control.configure(None)
+
+    def test_create_infrastructure_with_tosca_records_stage_durations(self):
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        before = {stage: metrics.LIFECYCLE_STAGE_DURATION.labels(lifecycle='create', stage=stage).snapshot()[1] for stage in ['read_files', 'translate', 'filter_inputs', 'create']}
+        driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        for stage, count_before in before.items():
+            _, count, _ = metrics.LIFECYCLE_STAGE_DURATION.labels(lifecycle='create', stage=stage).snapshot()
+            self.assertEqual(count, count_before + 1)
+
+    def test_create_infrastructure_records_span(self):
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        exporter = tracing.InMemorySpanExporter()
+        original_exporter = tracing.tracer.exporter
+        tracing.tracer.exporter = exporter
+        try:
+            driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        finally:
+            tracing.tracer.exporter = original_exporter
+        spans = exporter.get_finished_spans()
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0].name, 'execute_lifecycle')
+        self.assertEqual(spans[0].attributes, {'lifecycle.name': 'Create', 'deployment_location.name': 'mock_location'})
+
+    def __enable_async_create(self, max_queued=50, max_pending=600):
+        properties = AsyncCreateProperties()
+        properties.enabled = True
+        properties.max_queued = max_queued
+        properties.max_pending = max_pending
+        create_jobs.configure(properties)
+        self.addCleanup(create_jobs.configure, None)
+
+    def test_async_create_infrastructure(self):
+        self.__enable_async_create()
+        self.mock_heat_driver.create_stack.return_value = '1','Create::1::request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        self.assertIsInstance(result, LifecycleExecuteResponse)
+        self.assert_request_id(result.request_id, 'AsyncCreate', 'TestResource.123')
+        self.assertIsNone(result.associated_topology)
+        job = create_jobs.get(result.request_id)
+        wait_for(lambda: job.state == JOB_CREATED)
+        self.assertEqual(job.stack_id, '1')
+        self.mock_heat_translator.generate_heat_template.assert_called_once_with(self.tosca_template, template_path=self.tosca_template_path)
+        self.mock_heat_driver.create_stack.assert_called_once_with('TestResource.123', self.mock_heat_translator.generate_heat_template.return_value, {'propA': 'valueA'}, tags=ANY)
+        # Cleaned up by the background create, once it no longer needs them
+        self.assertFalse(os.path.exists(self.tosca_driver_files.root_path))
+        self.mock_os_location.close.assert_called_once()
+
+    def test_async_create_returns_before_translation(self):
+        self.__enable_async_create()
+        release = threading.Event()
+        def generate_heat_template(*args, **kwargs):
+            release.wait(5)
+            return 'heat_template'
+        self.mock_heat_translator.generate_heat_template.side_effect = generate_heat_template
+        self.mock_heat_driver.create_stack.return_value = '1','Create::1::request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        execution = driver.get_lifecycle_execution(result.request_id, self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        self.mock_heat_driver.get_stack.assert_not_called()
+        self.mock_os_location.close.assert_not_called()
+        release.set()
+        wait_for(lambda: create_jobs.get(result.request_id).state == JOB_CREATED)
+        self.mock_os_location.close.assert_called_once()
+
+    def test_async_create_failure_reported_by_lifecycle_execution(self):
+        self.__enable_async_create()
+        self.mock_heat_translator.generate_heat_template.side_effect = ToscaValidationError('Validation error')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        wait_for(lambda: create_jobs.get(result.request_id).state == JOB_FAILED)
+        execution = driver.get_lifecycle_execution(result.request_id, self.deployment_location)
+        self.assertEqual(execution.status, 'FAILED')
+        self.assertEqual(execution.failure_details.failure_code, 'INFRASTRUCTURE_ERROR')
+        self.assertEqual(execution.failure_details.description, 'Validation error')
+        self.mock_heat_driver.create_stack.assert_not_called()
+        self.assertFalse(os.path.exists(self.tosca_driver_files.root_path))
+        self.mock_os_location.close.assert_called_once()
+
+    def test_async_create_rejected_when_busy(self):
+        self.__enable_async_create(max_queued=0)
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(AsyncCreateRejectedError):
+            driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.mock_heat_driver.create_stack.assert_not_called()
+        self.assertFalse(os.path.exists(self.heat_driver_files.root_path))
+        self.mock_os_location.close.assert_called_once()
+
+    def test_async_create_with_stack_id_input_is_synchronous(self):
+        self.__enable_async_create()
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        self.resource_properties['stack_id'] = {'type': 'string', 'value': 'MY_STACK_ID'}
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assertIsNone(result.request_id)
+        self.assert_internal_resource(result.associated_topology, 'MY_STACK_ID')
+        self.mock_heat_driver.get_stack.assert_called_once_with('MY_STACK_ID')
+
+    def test_get_lifecycle_execution_async_create_complete(self):
+        self.__enable_async_create()
+        self.mock_heat_driver.create_stack.return_value = '1','Create::1::request1234'
+        self.mock_heat_driver.get_stack.return_value = {
+            'id': '1',
+            'stack_status': 'CREATE_COMPLETE',
+            'outputs': [
+                {'output_key': 'outputA', 'output_value': 'valueA'}
+            ]
+        }
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        wait_for(lambda: create_jobs.get(result.request_id).state == JOB_CREATED)
+        execution = driver.get_lifecycle_execution(result.request_id, self.deployment_location)
+        self.assertEqual(execution.status, 'COMPLETE')
+        self.assertEqual(execution.outputs, {'outputA': 'valueA'})
+        self.assert_internal_resource(execution.associated_topology, '1')
+        self.mock_heat_driver.get_stack.assert_called_once_with('1', result.request_id)
+
+    def test_get_lifecycle_execution_async_create_from_other_worker(self):
+        self.__enable_async_create()
+        self.mock_heat_driver.get_stack.return_value = {
+            'id': '1',
+            'stack_status': 'CREATE_IN_PROGRESS'
+        }
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        request_id = 'AsyncCreate::TestResource.123::' + new_operation_id()
+        execution = driver.get_lifecycle_execution(request_id, self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        self.assert_internal_resource(execution.associated_topology, '1')
+        self.mock_heat_driver.get_stack.assert_called_once_with('TestResource.123', request_id)
+
+    def test_get_lifecycle_execution_async_create_stack_not_created_yet(self):
+        self.__enable_async_create()
+        self.mock_heat_driver.get_stack.side_effect = StackNotFoundError('Not found')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        execution = driver.get_lifecycle_execution('AsyncCreate::TestResource.123::' + new_operation_id(), self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        self.assertIsNone(execution.associated_topology)
+
+    def test_get_lifecycle_execution_async_create_stack_never_created(self):
+        self.__enable_async_create(max_pending=0)
+        self.mock_heat_driver.get_stack.side_effect = StackNotFoundError('Not found')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        execution = driver.get_lifecycle_execution('AsyncCreate::TestResource.123::' + new_operation_id(), self.deployment_location)
+        self.assertEqual(execution.status, 'FAILED')
+        self.assertEqual(execution.failure_details.failure_code, 'INFRASTRUCTURE_ERROR')
+        self.assertEqual(execution.failure_details.description, 'Stack \'TestResource.123\' was not created within 0 seconds of the request being accepted')
 
     def test_create_infrastructure_with_invalid_tosca_template_throws_error(self):
         self.mock_heat_translator.generate_heat_template.side_effect = ToscaValidationError('Validation error')
@@ -300,6 +480,156 @@ class TestResourceDriverHandler(unittest.TestCase):
             driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, {'template-type': 'TOSCA'}, AssociatedTopology(), self.deployment_location)
         self.assertEqual(str(context.exception), 'Validation error')
 
+    def test_create_infrastructure_authenticates_while_translating(self):
+        translating = threading.Event()
+        authenticating = threading.Event()
+        def generate_heat_template(*args, **kwargs):
+            translating.set()
+            # Only set if authentication runs at the same time as translation
+            self.assertTrue(authenticating.wait(5))
+            return 'heat_template'
+        def prepare_heat_driver():
+            authenticating.set()
+            self.assertTrue(translating.wait(5))
+            return self.mock_heat_driver
+        self.mock_heat_translator.generate_heat_template.side_effect = generate_heat_template
+        self.mock_os_location.prepare_heat_driver.side_effect = prepare_heat_driver
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        before = {stage: metrics.LIFECYCLE_STAGE_DURATION.labels(lifecycle='create', stage=stage).snapshot()[1] for stage in ['authenticate', 'await_authentication']}
+        result = driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_os_location.prepare_heat_driver.assert_called_once()
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, 'heat_template', {'propA': 'valueA'}, tags=ANY)
+        for stage, count_before in before.items():
+            _, count, _ = metrics.LIFECYCLE_STAGE_DURATION.labels(lifecycle='create', stage=stage).snapshot()
+            self.assertEqual(count, count_before + 1)
+
+    def test_create_infrastructure_authentication_error_raised(self):
+        self.mock_os_location.prepare_heat_driver.side_effect = ValueError('Keystone unavailable')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(ValueError) as context:
+            driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assertEqual(str(context.exception), 'Keystone unavailable')
+        self.mock_heat_driver.create_stack.assert_not_called()
+
+    def test_create_infrastructure_template_error_raised_before_authentication_error(self):
+        self.mock_heat_translator.generate_heat_template.side_effect = ToscaValidationError('Validation error')
+        self.mock_os_location.prepare_heat_driver.side_effect = ValueError('Keystone unavailable')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(InvalidDriverFilesError):
+            driver.execute_lifecycle('Create', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, AssociatedTopology(), self.deployment_location)
+        self.mock_os_location.close.assert_called_once()
+
+    def test_create_infrastructure_without_overlapping_authentication(self):
+        self.resource_driver_config.overlap_authentication = False
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_os_location.prepare_heat_driver.assert_not_called()
+        self.mock_heat_driver.create_stack.assert_called_once_with(ANY, self.heat_template, {'propA': 'valueA'}, tags=ANY)
+
+    def __template_tag(self, template):
+        return 'ovd-template-' + hashlib.sha256(template.encode('utf-8')).hexdigest()[:32]
+
+    def test_create_infrastructure_tags_stack(self):
+        self.mock_heat_driver.find_stacks.return_value = []
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.mock_heat_driver.create_stack.assert_called_once_with('TestResource.123', self.heat_template, {'propA': 'valueA'}, tags=['ovd-resource-123', self.__template_tag(self.heat_template)])
+        self.mock_heat_driver.find_stacks.assert_any_call(stack_name='TestResource.123')
+        self.mock_heat_driver.find_stacks.assert_called_with(tags=['ovd-resource-123'])
+
+    def test_create_infrastructure_returns_existing_stack_with_same_name(self):
+        self.mock_heat_driver.find_stacks.return_value = [{'id': '9', 'stack_name': 'TestResource.123', 'stack_status': 'CREATE_IN_PROGRESS', 'tags': ['ovd-resource-123', self.__template_tag(self.heat_template)]}]
+        before = metrics.DUPLICATE_CREATES.labels(source='existing').get()
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '9')
+        self.assert_request_id(result.request_id, 'Create', '9')
+        self.mock_heat_driver.create_stack.assert_not_called()
+        self.mock_heat_driver.find_stacks.assert_called_once_with(stack_name='TestResource.123')
+        self.assertEqual(metrics.DUPLICATE_CREATES.labels(source='existing').get(), before + 1)
+
+    def test_create_infrastructure_returns_existing_stack_with_resource_tag(self):
+        self.mock_heat_driver.find_stacks.side_effect = [[], [{'id': '9', 'stack_name': 'OldName.123', 'stack_status': 'CREATE_COMPLETE', 'tags': ['ovd-resource-123']}]]
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '9')
+        self.mock_heat_driver.create_stack.assert_not_called()
+        self.mock_heat_driver.find_stacks.assert_called_with(tags=['ovd-resource-123'])
+
+    def test_create_infrastructure_ignores_deleted_or_different_template_stacks(self):
+        self.mock_heat_driver.find_stacks.return_value = [
+            {'id': '8', 'stack_status': 'DELETE_COMPLETE', 'tags': ['ovd-resource-123', self.__template_tag(self.heat_template)]},
+            {'id': '9', 'stack_status': 'CREATE_COMPLETE', 'tags': ['ovd-resource-123', self.__template_tag('another_template')]}
+        ]
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.create_stack.assert_called_once()
+
+    def test_create_infrastructure_ignores_same_name_stack_of_other_resource(self):
+        self.mock_heat_driver.find_stacks.return_value = [
+            {'id': '8', 'stack_name': 'TestResource.123', 'stack_status': 'CREATE_COMPLETE', 'tags': None},
+            {'id': '9', 'stack_name': 'TestResource.123', 'stack_status': 'CREATE_COMPLETE', 'tags': ['ovd-resource-456', self.__template_tag(self.heat_template)]}
+        ]
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        # Left to Heat, which rejects the name if it's taken
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.create_stack.assert_called_once()
+
+    def test_create_infrastructure_without_resource_id_not_detected_as_duplicate(self):
+        system_properties = PropValueMap({'resourceName': {'type': 'string', 'value': 'TestResource'}})
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.find_stacks.assert_not_called()
+        self.mock_heat_driver.create_stack.assert_called_once()
+
+    def test_create_infrastructure_without_detecting_duplicates(self):
+        self.resource_driver_config.detect_duplicate_stacks = False
+        self.mock_heat_driver.create_stack.return_value = '1','request1234'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.find_stacks.assert_not_called()
+        self.mock_heat_driver.create_stack.assert_called_once()
+
+    def test_concurrent_duplicate_creates_coalesced(self):
+        self.mock_heat_driver.find_stacks.return_value = []
+        release = threading.Event()
+        def create_stack(*args, **kwargs):
+            release.wait(5)
+            return '1', 'Create::1::op'
+        self.mock_heat_driver.create_stack.side_effect = create_stack
+        before = metrics.DUPLICATE_CREATES.labels(source='coalesced').get()
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        results = []
+        def create():
+            results.append(driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location))
+        first = threading.Thread(target=create)
+        first.start()
+        wait_for(lambda: self.mock_heat_driver.create_stack.call_count == 1)
+        second = threading.Thread(target=create)
+        second.start()
+        creates_in_flight = driver._ResourceDriverHandler__creates_in_flight
+        wait_for(lambda: creates_in_flight.waiters((self.mock_os_location.name, 'TestResource.123')) == 1)
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.create_stack.assert_called_once()
+        self.assertEqual(metrics.DUPLICATE_CREATES.labels(source='coalesced').get(), before + 1)
+
     def test_create_infrastructure_with_invalid_template_type_throws_error(self):
         request_properties = {'template-type': 'YAML'}
         driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
@@ -353,11 +683,80 @@ class TestResourceDriverHandler(unittest.TestCase):
         result = driver.execute_lifecycle('Delete', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
         self.assert_request_id(result.request_id, 'Delete', '1')
     
+    def __updated_stack(self, tags=None):
+        return {'id': '1', 'stack_name': 'TestResource.123', 'stack_status': 'CREATE_COMPLETE', 'updated_time': None, 'tags': tags, 'parameters': {'propA': 'oldA'}}
+
+    def test_upgrade_infrastructure_changed_template(self):
+        self.mock_heat_driver.get_stack.return_value = self.__updated_stack(tags=['ovd-resource-123', 'ovd-template-old', 'user-tag'])
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Upgrade', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
+        self.assertIsInstance(result, LifecycleExecuteResponse)
+        self.assert_request_id(result.request_id, 'Update', '1')
+        self.assert_internal_resource(result.associated_topology, '1')
+        self.mock_heat_driver.update_stack.assert_called_once_with('1', self.heat_template, {'propA': 'valueA'}, files=ANY,
+                                                                   tags=['user-tag', 'ovd-resource-123', self.__template_tag(self.heat_template)], driver_request_id=result.request_id)
+        self.mock_heat_driver.create_stack.assert_not_called()
+        self.mock_heat_driver.delete_stack.assert_not_called()
+        self.mock_os_location.close.assert_called_once()
+
+    def test_reconfigure_infrastructure_same_template_patches_parameters(self):
+        self.mock_heat_driver.get_stack.return_value = self.__updated_stack(tags=['ovd-resource-123', self.__template_tag(self.heat_template)])
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        result = driver.execute_lifecycle('Reconfigure', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
+        self.assert_request_id(result.request_id, 'Update', '1')
+        self.mock_heat_driver.update_stack.assert_called_once_with('1', input_properties={'propA': 'valueA'}, existing=True, driver_request_id=result.request_id)
+        self.mock_heat_input_utils.filter_stack_parameters.assert_called_once_with({'propA': 'oldA'}, ANY)
+
+    def test_reconfigure_infrastructure_same_tosca_template_not_translated(self):
+        self.mock_heat_driver.get_stack.return_value = self.__updated_stack(tags=['ovd-resource-123', self.__template_tag(self.tosca_template)])
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with patch('osvimdriver.service.resourcedriver.admission_control') as mock_admission_control:
+            result = driver.execute_lifecycle('Reconfigure', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, self.created_associated_topology, self.deployment_location)
+        self.mock_heat_translator.generate_heat_template.assert_not_called()
+        mock_admission_control.translation.assert_not_called()
+        self.mock_heat_driver.update_stack.assert_called_once_with('1', input_properties={'propA': 'valueA'}, existing=True, driver_request_id=result.request_id)
+
+    def test_reconfigure_infrastructure_patch_disabled(self):
+        self.resource_driver_config.patch_parameter_updates = False
+        self.mock_heat_driver.get_stack.return_value = self.__updated_stack(tags=['ovd-resource-123', self.__template_tag(self.heat_template)])
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.execute_lifecycle('Reconfigure', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
+        self.mock_heat_driver.update_stack.assert_called_once_with('1', self.heat_template, {'propA': 'valueA'}, files=ANY, tags=ANY, driver_request_id=ANY)
+
+    def test_upgrade_infrastructure_with_tosca(self):
+        self.mock_heat_driver.get_stack.return_value = self.__updated_stack()
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.execute_lifecycle('Upgrade', self.tosca_driver_files, self.system_properties, self.resource_properties, self.tosca_request_properties, self.created_associated_topology, self.deployment_location)
+        self.mock_heat_translator.generate_heat_template.assert_called_once_with(self.tosca_template, template_path=self.tosca_template_path)
+        self.mock_heat_driver.update_stack.assert_called_once_with('1', self.mock_heat_translator.generate_heat_template.return_value, {'propA': 'valueA'},
+                                                                   files=None, tags=['ovd-resource-123', self.__template_tag(self.tosca_template)], driver_request_id=ANY)
+
+    def test_upgrade_infrastructure_without_stack(self):
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(InvalidRequestError) as context:
+            driver.execute_lifecycle('Upgrade', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        self.assertEqual(str(context.exception), 'You must supply the stack to Upgrade in associated_topology')
+        self.mock_heat_driver.update_stack.assert_not_called()
+
+    def test_upgrade_infrastructure_stack_not_found(self):
+        self.mock_heat_driver.get_stack.side_effect = StackNotFoundError('Not found')
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(InfrastructureNotFoundError):
+            driver.execute_lifecycle('Upgrade', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
+        self.mock_heat_driver.update_stack.assert_not_called()
+
+    def test_upgrade_deleted_infrastructure(self):
+        self.mock_heat_driver.get_stack.return_value = {'id': '1', 'stack_status': 'DELETE_COMPLETE'}
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        with self.assertRaises(InvalidRequestError) as context:
+            driver.execute_lifecycle('Upgrade', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
+        self.assertEqual(str(context.exception), 'The stack \'1\' has been deleted')
+
     def test_execute_lifecycle_on_unsupported_lifecycle_raises_error(self):
         driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
         with self.assertRaises(InvalidRequestError) as context:
             driver.execute_lifecycle('Start', self.heat_driver_files, self.system_properties, self.resource_properties, {}, self.created_associated_topology, self.deployment_location)
-        self.assertEqual(str(context.exception), 'Openstack driver only supports Create, Adopt and Delete transitions, not Start')
+        self.assertEqual(str(context.exception), 'Openstack driver only supports Create, Adopt, Upgrade, Reconfigure and Delete transitions, not Start')
 
     def test_get_lifecycle_execution_for_delete_stack_not_found(self):
         driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
@@ -380,6 +779,113 @@ class TestResourceDriverHandler(unittest.TestCase):
         self.mock_location_translator.from_deployment_location.assert_called_once_with(self.deployment_location)
         self.mock_heat_driver.get_stack.assert_called_once_with('1',execution.request_id)
 
+    @patch.object(timeout_policy, 'request_deadline', 60)
+    def test_get_lifecycle_execution_has_deadline(self):
+        deadlines = []
+        def get_stack(stack_id, request_id):
+            deadlines.append(current_deadline())
+            return {'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'}
+        self.mock_heat_driver.get_stack.side_effect = get_stack
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        self.assertEqual(deadlines[0].seconds, 60)
+        self.assertEqual(deadlines[0].description, 'get_lifecycle_execution')
+        self.assertIsNone(current_deadline())
+
+    def __enable_status_cache(self):
+        properties = StatusCacheProperties()
+        properties.enabled = True
+        lifecycle_status_cache.configure(properties)
+        self.addCleanup(lifecycle_status_cache.configure, None)
+
+    def __mock_async_heat_driver(self, stacks):
+        async_heat_driver_patcher = patch('osvimdriver.service.statuscache.AsyncHeatDriver')
+        async_heat_driver = async_heat_driver_patcher.start().return_value
+        self.addCleanup(async_heat_driver_patcher.stop)
+        async_heat_driver.get_many_stacks = AsyncMock(return_value=stacks)
+        return async_heat_driver
+
+    def test_get_lifecycle_execution_returns_cached_status_and_refreshes(self):
+        self.__enable_status_cache()
+        self.mock_heat_driver.get_stack.side_effect = [
+            {'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'},
+            {'id': '1', 'stack_status': 'CREATE_COMPLETE', 'outputs': [{'output_key': 'outputA', 'output_value': 'valueA'}]}
+        ]
+        async_heat_driver = self.__mock_async_heat_driver({'1': {'id': '1', 'stack_status': 'CREATE_COMPLETE', 'outputs': [{'output_key': 'outputA', 'output_value': 'valueA'}]}})
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        execution = driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        # Returned from the cache, with the stack read again in the background
+        execution = driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        wait_for(lambda: async_heat_driver.get_many_stacks.call_count == 1)
+        self.assertEqual(async_heat_driver.get_many_stacks.call_args[0][0], ['1'])
+        self.mock_os_location.create_async_session.assert_called_once()
+        # The stack has completed, which is only returned from a read made by the poll
+        wait_for(lambda: lifecycle_status_cache.get(('mock_location', 'Create::1::request123')) is None)
+        execution = driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        self.assertEqual(execution.status, 'COMPLETE')
+        self.assertEqual(execution.outputs, {'outputA': 'valueA'})
+        self.assertEqual(self.mock_heat_driver.get_stack.call_count, 2)
+
+    def test_get_lifecycle_execution_refresh_of_deleted_stack(self):
+        self.__enable_status_cache()
+        self.mock_heat_driver.get_stack.return_value = {'id': '1', 'stack_status': 'DELETE_IN_PROGRESS'}
+        self.__mock_async_heat_driver({'1': StackNotFoundError('Not found')})
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.get_lifecycle_execution('Delete::1::request123', self.deployment_location)
+        execution = driver.get_lifecycle_execution('Delete::1::request123', self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        # Deleted, so the cached status is discarded
+        wait_for(lambda: lifecycle_status_cache.get(('mock_location', 'Delete::1::request123')) is None)
+
+    def test_get_lifecycle_execution_cached_status_per_request(self):
+        self.__enable_status_cache()
+        self.mock_heat_driver.get_stack.side_effect = [
+            {'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'},
+            {'id': '1', 'stack_status': 'DELETE_IN_PROGRESS'}
+        ]
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        execution = driver.get_lifecycle_execution('Delete::1::request456', self.deployment_location)
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        self.assertEqual(self.mock_heat_driver.get_stack.call_count, 2)
+
+    def __enable_journal(self):
+        journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journal_dir)
+        properties = JournalProperties()
+        properties.enabled = True
+        properties.path = os.path.join(journal_dir, 'journal.sqlite3')
+        request_journal.configure(properties)
+        self.addCleanup(request_journal.configure, None)
+
+    def test_execute_lifecycle_recorded_in_journal(self):
+        self.__enable_journal()
+        self.mock_heat_driver.find_stacks.return_value = []
+        self.mock_heat_driver.create_stack.return_value = '1', 'Create::1::request123'
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        driver.execute_lifecycle('Create', self.heat_driver_files, self.system_properties, self.resource_properties, {}, AssociatedTopology(), self.deployment_location)
+        entry = request_journal.get('mock_location', 'Create::1::request123')
+        self.assertEqual(entry['request_type'], 'Create')
+        self.assertEqual(entry['stack_id'], '1')
+        self.assertLessEqual(entry['submitted_at'], entry['accepted_at'])
+
+    def test_get_lifecycle_execution_finished_returned_from_journal(self):
+        self.__enable_journal()
+        self.mock_heat_driver.get_stack.side_effect = [
+            {'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'},
+            {'id': '1', 'stack_status': 'CREATE_COMPLETE', 'outputs': [{'output_key': 'outputA', 'output_value': 'valueA'}]}
+        ]
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        self.assertEqual(driver.get_lifecycle_execution('Create::1::request123', self.deployment_location).status, 'IN_PROGRESS')
+        self.assertEqual(request_journal.get('mock_location', 'Create::1::request123')['last_status'], 'IN_PROGRESS')
+        self.assertEqual(driver.get_lifecycle_execution('Create::1::request123', self.deployment_location).status, 'COMPLETE')
+        execution = driver.get_lifecycle_execution('Create::1::request123', self.deployment_location)
+        self.assertEqual(execution.status, 'COMPLETE')
+        self.assertEqual(execution.outputs, {'outputA': 'valueA'})
+        self.assertEqual(self.mock_heat_driver.get_stack.call_count, 2)
+
     def test_get_lifecycle_execution_create_in_progress(self):
         self.mock_heat_driver.get_stack.return_value = {
             'id': '1',
@@ -688,4 +1194,59 @@ class TestResourceDriverHandler(unittest.TestCase):
 
      
 
-      
\ No newline at end of file
+      
+
+    def __update_request_id(self, updated_time=None, operation_id=None):
+        operation_id = operation_id if operation_id is not None else new_operation_id()
+        return 'Update::1::{0}.{1}'.format(operation_id, hashlib.sha256(str(updated_time).encode('utf-8')).hexdigest()[:16])
+
+    def __get_update_execution(self, request_id, stack):
+        self.mock_heat_driver.get_stack.return_value = stack
+        driver = ResourceDriverHandler(self.mock_location_translator, resource_driver_config=self.resource_driver_config, heat_translator_service=self.mock_heat_translator, tosca_discovery_service=self.mock_tosca_discover_service)
+        return driver.get_lifecycle_execution(request_id, self.deployment_location)
+
+    def test_get_lifecycle_execution_update_not_started(self):
+        request_id = self.__update_request_id(updated_time='2024-01-01T00:00:00Z')
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'UPDATE_COMPLETE', 'updated_time': '2024-01-01T00:00:00Z'})
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+
+    def test_get_lifecycle_execution_update_never_started(self):
+        # Accepted at the start of the UUID epoch
+        request_id = self.__update_request_id(operation_id=str(uuid.UUID(int=1, version=1)))
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'CREATE_COMPLETE', 'updated_time': None})
+        self.assertEqual(execution.status, 'FAILED')
+        self.assertEqual(execution.failure_details.description, 'Update of stack \'1\' was not started by Heat within 60 seconds')
+
+    def test_get_lifecycle_execution_update_in_progress(self):
+        request_id = self.__update_request_id()
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'UPDATE_IN_PROGRESS', 'updated_time': '2024-01-01T00:00:00Z'})
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+
+    def test_get_lifecycle_execution_update_complete(self):
+        request_id = self.__update_request_id()
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'UPDATE_COMPLETE', 'updated_time': '2024-01-01T00:00:00Z',
+                                                             'outputs': [{'output_key': 'outputA', 'output_value': 'valueA'}]})
+        self.assertEqual(execution.request_id, request_id)
+        self.assertEqual(execution.status, 'COMPLETE')
+        self.assertEqual(execution.failure_details, None)
+        self.assertEqual(execution.outputs, {'outputA': 'valueA'})
+
+    def test_get_lifecycle_execution_update_failed(self):
+        request_id = self.__update_request_id()
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'UPDATE_FAILED', 'updated_time': '2024-01-01T00:00:00Z', 'stack_status_reason': 'For the test'})
+        self.assertEqual(execution.status, 'FAILED')
+        self.assertEqual(execution.failure_details.failure_code, 'INFRASTRUCTURE_ERROR')
+        self.assertEqual(execution.failure_details.description, 'For the test')
+
+    def test_get_lifecycle_execution_update_rolled_back(self):
+        request_id = self.__update_request_id()
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'ROLLBACK_IN_PROGRESS', 'updated_time': '2024-01-01T00:00:00Z'})
+        self.assertEqual(execution.status, 'IN_PROGRESS')
+        execution = self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'ROLLBACK_COMPLETE', 'updated_time': '2024-01-01T00:00:00Z', 'stack_status_reason': 'Resource failed'})
+        self.assertEqual(execution.status, 'FAILED')
+        self.assertEqual(execution.failure_details.description, 'Update failed and was rolled back (ROLLBACK_COMPLETE): Resource failed')
+
+    def test_get_lifecycle_execution_update_indeterminate_status(self):
+        request_id = self.__update_request_id()
+        with self.assertRaises(ResourceDriverError):
+            self.__get_update_execution(request_id, {'id': '1', 'stack_status': 'DELETE_IN_PROGRESS', 'updated_time': '2024-01-01T00:00:00Z'})
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from ignition.service.resourcedriver import InvalidDriverFilesError
+from ignition.model.associated_topology import AssociatedTopology
+from ignition.service.logging import logging_context
+from ignition.utils.file import DirectoryTree
+from ignition.utils.propvaluemap import PropValueMap
+from osvimdriver.service.resourcedriver import ResourceDriverHandler, AdditionalResourceDriverProperties, build_request_id, CREATE_REQUEST_PREFIX
+from osvimdriver.service.tosca import ToscaParserService, ToscaHeatTranslatorService
+from osvimdriver.openstack.environment import OpenstackDeploymentLocationTranslator
+from osvimdriver.openstack.heat.driver import StackNotFoundError
+from tests.unit.testutils.constants import TOSCA_TEMPLATES_PATH, TOSCA_HELLO_WORLD_FILE
+import tests.unit.openstack.certs as certs
+
+tosca_templates_dir = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, TOSCA_TEMPLATES_PATH)
+
+HEAT_TEMPLATE = '''
+heat_template_version: 2013-05-23
+parameters:
+  system_resourceName:
+    type: string
+outputs:
+  name:
+    value: {get_param: system_resourceName}
+'''
+
+INVALID_TOSCA_TEMPLATE = '''
+tosca_definitions_version: tosca_simple_yaml_1_0
+topology_template:
+  node_templates:
+    server:
+      type: tosca.nodes.DoesNotExist
+'''
+
+
+class FakeHeatDriver():
+    """
+    In-memory Heat shared by all request threads, which checks that no two requests create the same stack and yields
+    the GIL between steps so the threads interleave
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stacks = {}
+
+    def create_stack(self, stack_name, heat_template, heat_inputs=None, **kwargs):
+        time.sleep(0.001)
+        stack_id = 'id-' + stack_name
+        with self.lock:
+            if stack_id in self.stacks:
+                raise AssertionError('Stack {0} created twice'.format(stack_name))
+            self.stacks[stack_id] = {'id': stack_id, 'stack_name': stack_name, 'stack_status': 'CREATE_COMPLETE', 'tags': kwargs.get('tags', None), 'outputs': [{'output_key': 'name', 'output_value': heat_inputs.get('system_resourceName')}]}
+        return stack_id, build_request_id(CREATE_REQUEST_PREFIX, stack_id)
+
+    def find_stacks(self, stack_name=None, tags=None):
+        time.sleep(0.001)
+        with self.lock:
+            return [stack for stack in self.stacks.values() if (stack_name is None or stack['stack_name'] == stack_name)
+                    and all(tag in (stack['tags'] or []) for tag in (tags or []))]
+
+    def get_stack(self, stack_id, request_id=None):
+        time.sleep(0.001)
+        with self.lock:
+            stack = self.stacks.get(stack_id, None)
+        if stack is None:
+            raise StackNotFoundError('Stack {0} not found'.format(stack_id))
+        return stack
+
+    def delete_stack(self, stack_id, request_id=None):
+        time.sleep(0.001)
+        with self.lock:
+            if stack_id not in self.stacks:
+                raise StackNotFoundError('Stack {0} not found'.format(stack_id))
+            del self.stacks[stack_id]
+
+
+class TestResourceDriverHandlerConcurrency(unittest.TestCase):
+    """
+    Runs many lifecycle requests at once through a single ResourceDriverHandler, as a threaded Gunicorn worker would
+    """
+
+    def setUp(self):
+        self.fake_heat_driver = FakeHeatDriver()
+        self.heat_driver_patcher = patch('osvimdriver.openstack.environment.HeatDriver', return_value=self.fake_heat_driver)
+        self.heat_driver_patcher.start()
+        self.session_patcher = patch('osvimdriver.openstack.environment.keystonesession.Session')
+        self.session_patcher.start()
+        tosca_parser_service = ToscaParserService()
+        self.driver = ResourceDriverHandler(OpenstackDeploymentLocationTranslator(), resource_driver_config=AdditionalResourceDriverProperties(),
+                                            heat_translator_service=ToscaHeatTranslatorService(tosca_parser_service=tosca_parser_service),
+                                            tosca_discovery_service=MagicMock())
+        with open(os.path.join(os.path.dirname(os.path.abspath(certs.__file__)), 'ca.cert'), 'r') as f:
+            ca_cert = f.read()
+        self.deployment_location = {'name': 'stress', 'properties': {'os_api_url': 'http://localhost', 'os_auth_enabled': False, 'os_cacert': ca_cert}}
+        with open(os.path.join(tosca_templates_dir, TOSCA_HELLO_WORLD_FILE), 'r') as f:
+            self.valid_tosca_template = f.read()
+        self.tmp_dirs = []
+
+    def tearDown(self):
+        self.heat_driver_patcher.stop()
+        self.session_patcher.stop()
+        for tmp_dir in self.tmp_dirs:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+
+    def __driver_files(self, file_name, content):
+        tmp_dir = tempfile.mkdtemp()
+        self.tmp_dirs.append(tmp_dir)
+        with open(os.path.join(tmp_dir, file_name), 'w') as f:
+            f.write(content)
+        return DirectoryTree(tmp_dir)
+
+    def __system_properties(self, index):
+        return PropValueMap({'resourceId': str(index), 'resourceName': 'resource{0}'.format(index)})
+
+    def __heat_lifecycle(self, index):
+        logging_context.set_from_dict({'tracectx.transactionid': 'tx{0}'.format(index)})
+        try:
+            create_response = self.driver.execute_lifecycle('Create', self.__driver_files('heat.yaml', HEAT_TEMPLATE), self.__system_properties(index),
+                                                            PropValueMap({}), {}, AssociatedTopology(), self.deployment_location)
+            execution = self.driver.get_lifecycle_execution(create_response.request_id, self.deployment_location)
+            delete_response = self.driver.execute_lifecycle('Delete', self.__driver_files('heat.yaml', HEAT_TEMPLATE), self.__system_properties(index),
+                                                            PropValueMap({}), {}, create_response.associated_topology, self.deployment_location)
+            delete_execution = self.driver.get_lifecycle_execution(delete_response.request_id, self.deployment_location)
+            return {
+                'stack_id': create_response.associated_topology.get('InfrastructureStack').element_id,
+                'status': execution.status,
+                'outputs': execution.outputs,
+                'delete_status': delete_execution.status,
+                'transaction_id': logging_context.get('tracectx.transactionid')
+            }
+        finally:
+            logging_context.clear()
+
+    def __tosca_create(self, index, template):
+        try:
+            response = self.driver.execute_lifecycle('Create', self.__driver_files('tosca.yaml', template), self.__system_properties(index),
+                                                     PropValueMap({}), {'template-type': 'TOSCA'}, AssociatedTopology(), self.deployment_location)
+            return response.associated_topology.get('InfrastructureStack').element_id
+        except InvalidDriverFilesError as e:
+            return e
+
+    def test_concurrent_heat_lifecycles(self):
+        request_count = 200
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(self.__heat_lifecycle, range(request_count)))
+        for index, result in enumerate(results):
+            self.assertEqual(result['stack_id'], 'id-resource{0}.{1}'.format(index, index))
+            self.assertEqual(result['status'], 'COMPLETE')
+            self.assertEqual(result['outputs'], {'name': 'resource{0}'.format(index)})
+            self.assertEqual(result['delete_status'], 'COMPLETE')
+            self.assertEqual(result['transaction_id'], 'tx{0}'.format(index))
+        self.assertEqual(self.fake_heat_driver.stacks, {})
+
+    def test_concurrent_tosca_creates_report_only_their_own_validation_errors(self):
+        templates = [self.valid_tosca_template if index % 2 == 0 else INVALID_TOSCA_TEMPLATE for index in range(16)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.__tosca_create, range(len(templates)), templates))
+        for index, result in enumerate(results):
+            if index % 2 == 0:
+                self.assertEqual(result, 'id-resource{0}.{1}'.format(index, index))
+            else:
+                self.assertIsInstance(result, InvalidDriverFilesError)
+                self.assertIn('tosca.nodes.DoesNotExist', str(result))
+
+    def test_concurrent_duplicate_creates_create_one_stack_each(self):
+        # Each resource's Create is sent 4 times at once, as if redelivered
+        indexes = [index for index in range(16) for _ in range(4)]
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(self.__tosca_create, indexes, [self.valid_tosca_template] * len(indexes)))
+        for index, result in zip(indexes, results):
+            self.assertEqual(result, 'id-resource{0}.{1}'.format(index, index))
+        self.assertEqual(len(self.fake_heat_driver.stacks), 16)
@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock
+from heatclient import exc as heatexc
+from osvimdriver.service.retry import RetryPolicy, RetryProperties, RetryConfigurator, retry_policy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_no_retries_by_default(self):
+        policy = RetryPolicy()
+        self.assertIsNone(policy.next_delay(1, heatexc.HTTPServiceUnavailable('Unavailable')))
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=3, random_func=lambda: 1.0)
+        error = heatexc.HTTPServiceUnavailable('Unavailable')
+        self.assertEqual(policy.next_delay(1, error), 0.5)
+        self.assertEqual(policy.next_delay(2, error), 1.0)
+        self.assertEqual(policy.next_delay(3, error), 2.0)
+        self.assertEqual(policy.next_delay(4, error), 3)
+        self.assertIsNone(policy.next_delay(5, error))
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10, random_func=lambda: 0.25)
+        self.assertEqual(policy.next_delay(2, heatexc.HTTPServiceUnavailable('Unavailable')), 0.5)
+
+    def test_does_not_retry_client_errors(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertIsNone(policy.next_delay(1, heatexc.HTTPNotFound('Not found')))
+        self.assertIsNone(policy.next_delay(1, ValueError('Failed')))
+
+    def test_configure(self):
+        properties = RetryProperties()
+        properties.max_attempts = 4
+        properties.base_delay = 1
+        properties.max_delay = 8
+        policy = RetryPolicy()
+        policy.configure(properties)
+        self.assertEqual(policy.max_attempts, 4)
+        self.assertEqual(policy.base_delay, 1)
+        self.assertEqual(policy.max_delay, 8)
+
+    def test_configure_disabled(self):
+        properties = RetryProperties()
+        properties.enabled = False
+        policy = RetryPolicy(max_attempts=3)
+        policy.configure(properties)
+        self.assertEqual(policy.max_attempts, 1)
+
+
+class TestRetryConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        retry_policy.max_attempts = 1
+
+    def test_configure(self):
+        properties = RetryProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        RetryConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(RetryProperties)
+        self.assertEqual(retry_policy.max_attempts, 3)
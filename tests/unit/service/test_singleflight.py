@@ -0,0 +1,72 @@
+import threading
+import unittest
+from osvimdriver.service.singleflight import SingleFlight
+from tests.unit.service.test_statuscache import wait_for
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __blocking_func(self, result=None, error=None):
+        def func():
+            self.calls += 1
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return result
+        return func
+
+    def __do_in_thread(self, key, func, outcomes):
+        def run():
+            try:
+                outcomes.append(self.single_flight.do(key, func))
+            except Exception as e:
+                outcomes.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_do_returns_result(self):
+        self.assertEqual(self.single_flight.do('A', lambda: 'resultA'), ('resultA', False))
+
+    def test_concurrent_calls_share_result(self):
+        outcomes = []
+        leader = self.__do_in_thread('A', self.__blocking_func(result='resultA'), outcomes)
+        wait_for(lambda: self.calls == 1)
+        followers = [self.__do_in_thread('A', self.__blocking_func(result='resultB'), outcomes) for _ in range(2)]
+        wait_for(lambda: self.single_flight.waiters('A') == 2)
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(outcomes, key=lambda outcome: outcome[1]), [('resultA', False), ('resultA', True), ('resultA', True)])
+
+    def test_concurrent_calls_share_error(self):
+        outcomes = []
+        error = ValueError('failed')
+        leader = self.__do_in_thread('A', self.__blocking_func(error=error), outcomes)
+        wait_for(lambda: self.calls == 1)
+        follower = self.__do_in_thread('A', self.__blocking_func(result='resultB'), outcomes)
+        wait_for(lambda: self.single_flight.waiters('A') == 1)
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(outcomes, [error, error])
+
+    def test_calls_with_other_keys_not_shared(self):
+        outcomes = []
+        leader = self.__do_in_thread('A', self.__blocking_func(result='resultA'), outcomes)
+        wait_for(lambda: self.calls == 1)
+        self.assertEqual(self.single_flight.do('B', lambda: 'resultB'), ('resultB', False))
+        self.release.set()
+        leader.join(5)
+
+    def test_calls_after_finished_run_again(self):
+        self.single_flight.do('A', lambda: 'resultA')
+        self.assertEqual(self.single_flight.do('A', lambda: 'resultB'), ('resultB', False))
+        self.assertEqual(self.single_flight.waiters('A'), 0)
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+from ignition.model.associated_topology import AssociatedTopology
+from ignition.model.lifecycle import LifecycleExecution, STATUS_IN_PROGRESS, STATUS_COMPLETE
+from osvimdriver.service.cache import caches, CacheProperties
+from osvimdriver.service.statuscache import LifecycleStatusCache, StackStatusRead, StatusCacheProperties, StatusCacheConfigurator, lifecycle_status_cache
+
+
+def wait_for(condition, timeout=5):
+    expires_at = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= expires_at:
+            raise AssertionError('Condition not met within {0} seconds'.format(timeout))
+        time.sleep(0.01)
+
+
+class TestLifecycleStatusCache(unittest.TestCase):
+
+    def setUp(self):
+        async_heat_driver_patcher = patch('osvimdriver.service.statuscache.AsyncHeatDriver')
+        self.heat_driver = async_heat_driver_patcher.start().return_value
+        self.addCleanup(async_heat_driver_patcher.stop)
+        self.heat_driver.get_many_stacks = AsyncMock(side_effect=lambda stack_ids, max_concurrency: {stack_id: {'id': stack_id} for stack_id in stack_ids})
+        self.cache = LifecycleStatusCache()
+        self.properties = StatusCacheProperties()
+        self.properties.enabled = True
+        self.cache.configure(self.properties)
+
+    def tearDown(self):
+        self.cache.configure(None)
+
+    def test_disabled_until_configured(self):
+        cache = LifecycleStatusCache()
+        self.assertFalse(cache.enabled)
+        cache.put('key', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        self.assertIsNone(cache.get('key'))
+        cache.refresh('key', MagicMock())
+
+    def test_holds_in_progress_executions(self):
+        execution = LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS)
+        self.cache.put('key', execution)
+        self.assertIs(self.cache.get('key'), execution)
+
+    def test_shared_backend(self):
+        tmp_dir = tempfile.mkdtemp()
+        cache_properties = CacheProperties()
+        cache_properties.backend = 'sqlite'
+        cache_properties.sqlite_path = os.path.join(tmp_dir, 'cache.sqlite3')
+        caches.configure(cache_properties)
+        try:
+            self.cache.configure(self.properties)
+            # As it would be by another worker process
+            other_cache = LifecycleStatusCache()
+            other_cache.configure(self.properties)
+            associated_topology = AssociatedTopology()
+            associated_topology.add_entry('InfrastructureStack', '1', 'Openstack')
+            self.cache.put(('location', 'Create::1::1'), LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS, outputs={'ip': '10.0.0.1'},
+                                                                            associated_topology=associated_topology))
+            execution = other_cache.get(('location', 'Create::1::1'))
+            self.assertEqual(execution.request_id, 'Create::1::1')
+            self.assertEqual(execution.status, STATUS_IN_PROGRESS)
+            self.assertEqual(execution.outputs, {'ip': '10.0.0.1'})
+            self.assertEqual(execution.associated_topology.to_dict(), {'InfrastructureStack': {'id': '1', 'type': 'Openstack'}})
+            other_cache.configure(None)
+        finally:
+            caches.configure(None)
+            shutil.rmtree(tmp_dir)
+
+    def test_never_holds_finished_executions(self):
+        self.cache.put('key', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        self.cache.put('key', LifecycleExecution('Create::1::1', STATUS_COMPLETE))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_entries_expire_after_max_staleness(self):
+        self.properties.max_staleness = 0.05
+        self.cache.configure(self.properties)
+        self.cache.put('key', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+
+    def __read(self, stack_id='1', location_name='location', complete=None):
+        return StackStatusRead(location_name, stack_id, MagicMock(), complete or MagicMock(return_value=LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS)))
+
+    def test_refresh_updates_entry(self):
+        self.cache.put('key', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        refreshed = LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS)
+        self.heat_driver.get_many_stacks.side_effect = None
+        self.heat_driver.get_many_stacks.return_value = {'1': {'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'}}
+        read = self.__read(complete=MagicMock(return_value=refreshed))
+        self.cache.refresh('key', read)
+        wait_for(lambda: self.cache.get('key') is refreshed)
+        read.complete.assert_called_once_with({'id': '1', 'stack_status': 'CREATE_IN_PROGRESS'})
+        read.open_location.return_value.close.assert_called_once()
+
+    def test_refresh_to_finished_removes_entry(self):
+        self.cache.put('key', LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS))
+        self.cache.refresh('key', self.__read(complete=MagicMock(return_value=LifecycleExecution('Create::1::1', STATUS_COMPLETE))))
+        wait_for(lambda: self.cache.get('key') is None)
+
+    def test_failed_read_given_to_complete(self):
+        error = ValueError('Heat unavailable')
+        self.heat_driver.get_many_stacks.side_effect = error
+        read = self.__read()
+        self.cache.refresh('key', read)
+        wait_for(lambda: read.complete.call_count == 1)
+        read.complete.assert_called_once_with(error)
+
+    def test_failed_refresh_keeps_entry(self):
+        execution = LifecycleExecution('Create::1::1', STATUS_IN_PROGRESS)
+        self.cache.put('key', execution)
+        read = self.__read(complete=MagicMock(side_effect=ValueError('Heat unavailable')))
+        self.cache.refresh('key', read)
+        wait_for(lambda: read.complete.call_count == 1)
+        self.assertIs(self.cache.get('key'), execution)
+
+    def test_one_refresh_per_key_at_once(self):
+        release = threading.Event()
+        read = self.__read()
+        read.open_location.side_effect = lambda: release.wait() and MagicMock()
+        self.cache.refresh('key', read)
+        self.cache.refresh('key', read)
+        wait_for(lambda: read.open_location.call_count == 1)
+        release.set()
+        wait_for(lambda: read.complete.call_count == 1)
+        time.sleep(0.05)
+        self.assertEqual(read.open_location.call_count, 1)
+        self.cache.refresh('key', read)
+        wait_for(lambda: read.complete.call_count == 2)
+
+    def test_reads_of_location_batched(self):
+        release = threading.Event()
+        first_read = self.__read(stack_id='1')
+        first_read.open_location.side_effect = lambda: release.wait() and MagicMock() and MagicMock()
+        self.cache.refresh('key1', first_read)
+        wait_for(lambda: first_read.open_location.call_count == 1)
+        # Queued while the first is in flight, then read together
+        reads = [self.__read(stack_id='2'), self.__read(stack_id='3'), self.__read(stack_id='3')]
+        for index, read in enumerate(reads):
+            self.cache.refresh('key{0}'.format(index + 2), read)
+        other_location_read = self.__read(stack_id='4', location_name='other_location')
+        self.cache.refresh('key5', other_location_read)
+        # Not held up by the location in flight
+        wait_for(lambda: other_location_read.complete.call_count == 1)
+        release.set()
+        wait_for(lambda: all(read.complete.call_count == 1 for read in reads))
+        stack_ids = [call_args[0][0] for call_args in self.heat_driver.get_many_stacks.call_args_list]
+        self.assertEqual(sorted(stack_ids), [['1'], ['2', '3'], ['4']])
+        self.assertEqual(reads[0].open_location.call_count, 1)
+        self.assertEqual(reads[1].open_location.call_count, 0)
+
+
+class TestStatusCacheConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        lifecycle_status_cache.configure(None)
+
+    def test_configure(self):
+        properties = StatusCacheProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        StatusCacheConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(StatusCacheProperties)
+        self.assertFalse(lifecycle_status_cache.enabled)
+        properties.enabled = True
+        StatusCacheConfigurator().configure(configuration, MagicMock())
+        self.assertTrue(lifecycle_status_cache.enabled)
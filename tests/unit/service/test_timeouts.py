@@ -0,0 +1,149 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+from ignition.service.resourcedriver import TemporaryResourceDriverError
+from osvimdriver.service.timeouts import (TimeoutPolicy, TimeoutProperties, TimeoutConfigurator, Deadline, DeadlineExceededError,
+                                          apply_timeouts, current_deadline, current_timeout, timeout_policy)
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_remaining(self):
+        deadline = Deadline(30)
+        self.assertGreater(deadline.remaining(), 29)
+        self.assertFalse(deadline.expired)
+        deadline.check('get_stack')
+
+    def test_expired(self):
+        deadline = Deadline(0.01, description='get_lifecycle_execution')
+        time.sleep(0.02)
+        self.assertTrue(deadline.expired)
+        self.assertEqual(deadline.remaining(), 0)
+        with self.assertRaises(DeadlineExceededError) as context:
+            deadline.check('get_stack')
+        self.assertIsInstance(context.exception, TemporaryResourceDriverError)
+        self.assertIn('get_lifecycle_execution', str(context.exception))
+        self.assertIn('get_stack', str(context.exception))
+
+
+class TestTimeoutPolicy(unittest.TestCase):
+
+    def __configured_policy(self, **kwargs):
+        properties = TimeoutProperties()
+        for key, value in kwargs.items():
+            setattr(properties, key, value)
+        policy = TimeoutPolicy()
+        policy.configure(properties)
+        return policy
+
+    def test_no_timeouts_by_default(self):
+        policy = TimeoutPolicy()
+        self.assertIsNone(policy.timeout_for('get_stack'))
+        self.assertIsNone(policy.default_timeout())
+        with policy.request_deadline_for('execute_lifecycle') as deadline:
+            self.assertIsNone(deadline)
+            self.assertIsNone(current_deadline())
+
+    def test_timeout_for(self):
+        policy = self.__configured_policy(connect=5, read=30, operations={'create_stack': {'read': 120}, 'authenticate': {'connect': 2, 'read': 10}})
+        self.assertEqual(policy.timeout_for('get_stack'), (5, 30))
+        self.assertEqual(policy.timeout_for('create_stack'), (5, 120))
+        self.assertEqual(policy.timeout_for('authenticate'), (2, 10))
+        self.assertEqual(policy.default_timeout(), (5, 30))
+
+    def test_timeout_cut_short_by_deadline(self):
+        policy = self.__configured_policy(connect=5, read=30)
+        timeout = policy.timeout_for('get_stack', Deadline(8))
+        self.assertEqual(timeout[0], 5)
+        self.assertLessEqual(timeout[1], 8)
+        self.assertGreater(timeout[1], 7)
+
+    def test_timeout_from_deadline_when_disabled(self):
+        policy = self.__configured_policy(enabled=False)
+        self.assertIsNone(policy.timeout_for('get_stack'))
+        connect, read = policy.timeout_for('get_stack', Deadline(8))
+        self.assertGreater(connect, 7)
+        self.assertGreater(read, 7)
+
+    def test_timeout_for_expired_deadline(self):
+        policy = self.__configured_policy()
+        deadline = Deadline(0)
+        with self.assertRaises(DeadlineExceededError):
+            policy.timeout_for('get_stack', deadline)
+
+    def test_configure_unknown_setting(self):
+        with self.assertRaises(ValueError) as context:
+            self.__configured_policy(operations={'create_stack': {'total': 120}})
+        self.assertEqual(str(context.exception), 'Unknown timeouts setting \'total\' for operation \'create_stack\'')
+
+    def test_request_deadline_for(self):
+        policy = self.__configured_policy(request_deadline=60)
+        with policy.request_deadline_for('execute_lifecycle (Create)') as deadline:
+            self.assertIs(current_deadline(), deadline)
+            self.assertEqual(deadline.seconds, 60)
+            self.assertEqual(deadline.description, 'execute_lifecycle (Create)')
+        self.assertIsNone(current_deadline())
+
+    def test_request_deadline_disabled(self):
+        policy = self.__configured_policy(request_deadline=0)
+        with policy.request_deadline_for('execute_lifecycle (Create)') as deadline:
+            self.assertIsNone(deadline)
+
+    def test_operation_timeout(self):
+        policy = TimeoutPolicy()
+        with policy.operation_timeout((5, 30)):
+            self.assertEqual(current_timeout(), (5, 30))
+            with policy.operation_timeout((2, 10)):
+                self.assertEqual(current_timeout(), (2, 10))
+            self.assertEqual(current_timeout(), (5, 30))
+        self.assertIsNone(current_timeout())
+
+
+class TestApplyTimeouts(unittest.TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.request = self.session.request
+        apply_timeouts(self.session)
+
+    def tearDown(self):
+        timeout_policy.connect = None
+        timeout_policy.read = None
+
+    def test_applies_current_timeout(self):
+        with timeout_policy.operation_timeout((5, 30)):
+            self.session.request('http://heat/stacks', 'GET', headers={})
+        self.request.assert_called_once_with('http://heat/stacks', 'GET', headers={}, timeout=(5, 30))
+
+    def test_applies_default_timeout(self):
+        timeout_policy.connect = 10
+        timeout_policy.read = 60
+        self.session.request('http://keystone/v3/auth/tokens', 'POST')
+        self.request.assert_called_once_with('http://keystone/v3/auth/tokens', 'POST', timeout=(10, 60))
+
+    def test_keeps_timeout_given(self):
+        with timeout_policy.operation_timeout((5, 30)):
+            self.session.request('http://heat/stacks', 'GET', timeout=1)
+        self.request.assert_called_once_with('http://heat/stacks', 'GET', timeout=1)
+
+    def test_no_timeout(self):
+        self.session.request('http://heat/stacks', 'GET')
+        self.request.assert_called_once_with('http://heat/stacks', 'GET')
+
+
+class TestTimeoutConfigurator(unittest.TestCase):
+
+    def tearDown(self):
+        timeout_policy.configure(TimeoutProperties())
+        timeout_policy.connect = None
+        timeout_policy.read = None
+        timeout_policy.request_deadline = 0
+
+    def test_configure(self):
+        properties = TimeoutProperties()
+        configuration = MagicMock()
+        configuration.property_groups.get_property_group.return_value = properties
+        TimeoutConfigurator().configure(configuration, MagicMock())
+        configuration.property_groups.get_property_group.assert_called_once_with(TimeoutProperties)
+        self.assertEqual(timeout_policy.timeout_for('get_stack'), (10, 60))
+        self.assertEqual(timeout_policy.request_deadline, 120)
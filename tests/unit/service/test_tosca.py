@@ -106,3 +106,21 @@ class TestToscaTopologyDiscoveryService(unittest.TestCase):
         mock_tosca_parser.parse_tosca_str.assert_called_once_with(tosca_template, {'network_name': 'abc'})
         mock_search_engine_init.assert_called_once_with(mock_tosca_parser.parse_tosca_str.return_value, mock_openstack_location)
         mock_search_engine_init.return_value.discover.assert_called_once()
+
+
+class TestLazyToscaModules(unittest.TestCase):
+
+    def test_lazy_attributes_resolve(self):
+        import osvimdriver.service.tosca as tosca_module
+        from translator.hot.tosca_translator import TOSCATranslator
+        self.assertIs(tosca_module.ToscaTemplate, ToscaTemplate)
+        self.assertIs(tosca_module.TOSCATranslator, TOSCATranslator)
+
+    def test_unknown_attribute_raises_attribute_error(self):
+        import osvimdriver.service.tosca as tosca_module
+        with self.assertRaises(AttributeError):
+            tosca_module.NotAnAttribute
+
+    def test_warm_up(self):
+        import osvimdriver.service.tosca as tosca_module
+        tosca_module.warm_up()
@@ -0,0 +1,162 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import flask
+from unittest.mock import MagicMock
+from osvimdriver.service.tracing import (Tracer, SpanContext, InMemorySpanExporter, FileSpanExporter, LoggingSpanExporter, TracingProperties,
+                                         build_exporter, extract_request_context, STATUS_ERROR, SPAN_KIND_CLIENT)
+from osvimdriver.openstack.calls import OpenstackCallHandler
+import osvimdriver.service.tracing as tracing
+
+
+class TestSpanContext(unittest.TestCase):
+
+    def test_from_traceparent(self):
+        context = SpanContext.from_traceparent('00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01')
+        self.assertEqual(context.trace_id, '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(context.span_id, 'b7ad6b7169203331')
+        self.assertTrue(context.sampled)
+
+    def test_from_traceparent_not_sampled(self):
+        context = SpanContext.from_traceparent('00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00')
+        self.assertFalse(context.sampled)
+
+    def test_from_traceparent_invalid(self):
+        self.assertIsNone(SpanContext.from_traceparent(None))
+        self.assertIsNone(SpanContext.from_traceparent('not-a-traceparent'))
+        self.assertIsNone(SpanContext.from_traceparent('00-00000000000000000000000000000000-b7ad6b7169203331-01'))
+        self.assertIsNone(SpanContext.from_traceparent('ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'))
+
+    def test_to_traceparent(self):
+        context = SpanContext('0af7651916cd43dd8448eb211c80319c', 'b7ad6b7169203331')
+        self.assertEqual(context.to_traceparent(), '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01')
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        self.tracer = Tracer(self.exporter)
+
+    def test_disabled_tracer_does_not_create_spans(self):
+        tracer = Tracer()
+        with tracer.start_span('test') as span:
+            self.assertIsNone(span)
+
+    def test_nested_spans_share_trace(self):
+        with self.tracer.start_span('parent') as parent:
+            with self.tracer.start_span('child', attributes={'key': 'value'}) as child:
+                pass
+        spans = self.exporter.get_finished_spans()
+        self.assertEqual([span.name for span in spans], ['child', 'parent'])
+        self.assertEqual(child.context.trace_id, parent.context.trace_id)
+        self.assertEqual(child.parent_span_id, parent.context.span_id)
+        self.assertIsNone(parent.parent_span_id)
+        self.assertEqual(child.attributes, {'key': 'value'})
+        self.assertIsNotNone(child.end_time_unix_nano)
+        self.assertIsNone(self.tracer.get_current_span())
+
+    def test_span_with_parent_context(self):
+        parent_context = SpanContext.from_traceparent('00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01')
+        with self.tracer.start_span('test', parent_context=parent_context) as span:
+            pass
+        self.assertEqual(span.context.trace_id, '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(span.parent_span_id, 'b7ad6b7169203331')
+
+    def test_span_not_exported_when_not_sampled(self):
+        parent_context = SpanContext.from_traceparent('00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00')
+        with self.tracer.start_span('test', parent_context=parent_context):
+            pass
+        self.assertEqual(len(self.exporter.get_finished_spans()), 0)
+
+    def test_span_records_exception(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.start_span('test'):
+                raise ValueError('Failed')
+        span = self.exporter.get_finished_spans()[0]
+        self.assertEqual(span.status, STATUS_ERROR)
+        self.assertEqual(span.status_description, 'Failed')
+        self.assertEqual(span.events[0]['attributes'], {'exception.type': 'ValueError', 'exception.message': 'Failed'})
+
+    def test_span_to_dict(self):
+        with self.tracer.start_span('test', kind=SPAN_KIND_CLIENT) as span:
+            pass
+        span_dict = span.to_dict()
+        self.assertEqual(span_dict['name'], 'test')
+        self.assertEqual(span_dict['kind'], 'SPAN_KIND_CLIENT')
+        self.assertEqual(span_dict['traceId'], span.context.trace_id)
+        self.assertEqual(span_dict['spanId'], span.context.span_id)
+        self.assertNotIn('parentSpanId', span_dict)
+        self.assertEqual(span_dict['status'], {'code': 'STATUS_CODE_UNSET'})
+
+    def test_openstack_call_handler_creates_client_spans(self):
+        original_exporter = tracing.tracer.exporter
+        tracing.tracer.exporter = self.exporter
+        try:
+            handler = OpenstackCallHandler('heat', 'dl1')
+            with tracing.tracer.start_span('execute_lifecycle') as parent:
+                handler.call('get_stack', MagicMock())
+        finally:
+            tracing.tracer.exporter = original_exporter
+        client_span = self.exporter.get_finished_spans()[0]
+        self.assertEqual(client_span.name, 'heat.get_stack')
+        self.assertEqual(client_span.kind, SPAN_KIND_CLIENT)
+        self.assertEqual(client_span.parent_span_id, parent.context.span_id)
+        self.assertEqual(client_span.attributes, {'openstack.service': 'heat', 'openstack.operation': 'get_stack', 'openstack.location': 'dl1'})
+
+
+class TestExporters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_file_exporter(self):
+        file_path = os.path.join(self.tmp_dir, 'traces.jsonl')
+        tracer = Tracer(FileSpanExporter(file_path))
+        with tracer.start_span('first'):
+            pass
+        with tracer.start_span('second'):
+            pass
+        with open(file_path, 'r') as f:
+            lines = f.readlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['first', 'second'])
+
+    def test_build_exporter(self):
+        properties = TracingProperties()
+        properties.exporter = 'none'
+        self.assertIsNone(build_exporter(properties))
+        properties.exporter = 'logging'
+        self.assertIsInstance(build_exporter(properties), LoggingSpanExporter)
+        properties.exporter = 'memory'
+        self.assertIsInstance(build_exporter(properties), InMemorySpanExporter)
+        properties.exporter = 'file'
+        properties.file_path = os.path.join(self.tmp_dir, 'traces.jsonl')
+        exporter = build_exporter(properties)
+        self.assertIsInstance(exporter, FileSpanExporter)
+        self.assertEqual(exporter.file_path, properties.file_path)
+        properties.exporter = 'osvimdriver.service.tracing:InMemorySpanExporter'
+        self.assertIsInstance(build_exporter(properties), InMemorySpanExporter)
+
+    def test_build_exporter_unknown(self):
+        properties = TracingProperties()
+        properties.exporter = 'zipkin'
+        with self.assertRaises(ValueError):
+            build_exporter(properties)
+
+
+class TestExtractRequestContext(unittest.TestCase):
+
+    def test_extract_without_request(self):
+        self.assertIsNone(extract_request_context())
+
+    def test_extract_from_headers(self):
+        app = flask.Flask(__name__)
+        with app.test_request_context(headers={'traceparent': '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'}):
+            context = extract_request_context()
+        self.assertEqual(context.trace_id, '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(context.span_id, 'b7ad6b7169203331')
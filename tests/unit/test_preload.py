@@ -0,0 +1,31 @@
+import unittest
+import os
+from unittest.mock import patch
+from osvimdriver.preload import preload_enabled, preload, PRELOAD_ENABLED_ENV
+
+
+class TestPreload(unittest.TestCase):
+
+    def test_preload_enabled(self):
+        with patch.dict(os.environ, {PRELOAD_ENABLED_ENV: 'True'}):
+            self.assertTrue(preload_enabled())
+        with patch.dict(os.environ, {PRELOAD_ENABLED_ENV: 'false'}):
+            self.assertFalse(preload_enabled())
+
+    def test_preload_disabled_by_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(preload_enabled())
+
+    @patch('osvimdriver.preload.gc')
+    @patch('osvimdriver.service.tosca.warm_up')
+    def test_preload_warms_up_and_freezes_gc(self, mock_warm_up, mock_gc):
+        preload()
+        mock_warm_up.assert_called_once()
+        mock_gc.freeze.assert_called_once()
+
+    @patch('osvimdriver.preload.gc')
+    @patch('osvimdriver.service.tosca.warm_up')
+    def test_preload_continues_on_warm_up_failure(self, mock_warm_up, mock_gc):
+        mock_warm_up.side_effect = ValueError('Failed')
+        preload()
+        mock_gc.freeze.assert_called_once()
@@ -0,0 +1,105 @@
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+
+
+class FakeRespServer():
+    """
+    In process server of the few Redis commands used by the driver (AUTH, SELECT, PING, GET, SET with PX, DEL and SCAN), for testing
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}
+        self.commands = []
+        self.connections = []
+        self.__lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                server.connections.append(self.request)
+                try:
+                    self.__serve(server.password is None)
+                except OSError:
+                    # Closed by stop
+                    pass
+
+            def __serve(self, authenticated):
+                while True:
+                    args = self.__read_command()
+                    if args is None:
+                        return
+                    name = args[0].decode('utf-8').upper()
+                    server.commands.append(name)
+                    if name == 'AUTH':
+                        authenticated = args[-1].decode('utf-8') == server.password
+                        self.wfile.write(b'+OK\r\n' if authenticated else b'-WRONGPASS invalid password\r\n')
+                    elif not authenticated:
+                        self.wfile.write(b'-NOAUTH Authentication required.\r\n')
+                    else:
+                        self.wfile.write(server._execute(name, args[1:]))
+
+            def __read_command(self):
+                line = self.rfile.readline()
+                if not line.startswith(b'*'):
+                    return None
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int(self.rfile.readline()[1:-2])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.__server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.__server.daemon_threads = True
+        self.port = self.__server.server_address[1]
+        self.url = 'redis://127.0.0.1:{0}/0'.format(self.port)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        # Including those already accepted, as a restarted server would
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _execute(self, name, args):
+        with self.__lock:
+            self.__expire()
+            if name in ['PING', 'SELECT']:
+                return b'+OK\r\n'
+            if name == 'GET':
+                entry = self.data.get(args[0])
+                return self.__bulk(entry[0] if entry is not None else None)
+            if name == 'SET':
+                expires_at = None
+                if len(args) == 4 and args[2].upper() == b'PX':
+                    expires_at = time.monotonic() + int(args[3]) / 1000
+                self.data[args[0]] = (args[1], expires_at)
+                return b'+OK\r\n'
+            if name == 'DEL':
+                removed = len([key for key in args if self.data.pop(key, None) is not None])
+                return ':{0}\r\n'.format(removed).encode('ascii')
+            if name == 'SCAN':
+                pattern = args[args.index(b'MATCH') + 1].decode('utf-8') if b'MATCH' in args else '*'
+                keys = [key for key in self.data if fnmatch.fnmatchcase(key.decode('utf-8'), pattern)]
+                return b'*2\r\n' + self.__bulk(b'0') + '*{0}\r\n'.format(len(keys)).encode('ascii') + b''.join(self.__bulk(key) for key in keys)
+            return '-ERR unknown command \'{0}\'\r\n'.format(name).encode('utf-8')
+
+    def __expire(self):
+        now = time.monotonic()
+        for key in [key for key, (value, expires_at) in self.data.items() if expires_at is not None and now >= expires_at]:
+            del self.data[key]
+
+    def __bulk(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        return '${0}\r\n'.format(len(value)).encode('ascii') + value + b'\r\n'
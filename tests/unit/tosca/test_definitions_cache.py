@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import MagicMock
+import osvimdriver.tosca.definitions as tosca_definitions
+from osvimdriver.tosca.definitions_cache import _build_caching_loader, clear_definitions_cache
+
+
+class TestDefinitionsCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_definitions_cache()
+        self.mock_loader = MagicMock()
+        self.mock_loader.side_effect = lambda path, a_file=True: {'node_types': {'A': {}}}
+        self.caching_loader = _build_caching_loader(self.mock_loader)
+
+    def tearDown(self):
+        clear_definitions_cache()
+
+    def test_packaged_definitions_loaded_once(self):
+        first = self.caching_loader(tosca_definitions.ETSI_COMMON_TYPES_FILE, True)
+        second = self.caching_loader(tosca_definitions.ETSI_COMMON_TYPES_FILE, True)
+        self.mock_loader.assert_called_once_with(tosca_definitions.ETSI_COMMON_TYPES_FILE, True)
+        self.assertEqual(first, second)
+
+    def test_cached_definitions_are_copies(self):
+        first = self.caching_loader(tosca_definitions.ETSI_COMMON_TYPES_FILE, True)
+        first['node_types']['B'] = {}
+        second = self.caching_loader(tosca_definitions.ETSI_COMMON_TYPES_FILE, True)
+        self.assertNotIn('B', second['node_types'])
+
+    def test_other_files_not_cached(self):
+        self.caching_loader('/tmp/my_types.yaml', True)
+        self.caching_loader('/tmp/my_types.yaml', True)
+        self.assertEqual(self.mock_loader.call_count, 2)
+
+    def test_urls_not_cached(self):
+        self.caching_loader('http://example.com/types.yaml', False)
+        self.caching_loader('http://example.com/types.yaml', False)
+        self.assertEqual(self.mock_loader.call_count, 2)
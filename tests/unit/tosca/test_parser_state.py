@@ -0,0 +1,46 @@
+import threading
+import unittest
+from toscaparser.common.exception import ExceptionCollector, ValidationError
+from osvimdriver.tosca.parser_state import install_thread_safe_parser
+
+
+class TestParserState(unittest.TestCase):
+
+    def setUp(self):
+        install_thread_safe_parser()
+
+    def tearDown(self):
+        ExceptionCollector.stop()
+        ExceptionCollector.clear()
+
+    def test_append_raises_when_not_collecting(self):
+        ExceptionCollector.stop()
+        with self.assertRaises(ValidationError):
+            ExceptionCollector.appendException(ValidationError(message='Invalid'))
+
+    def test_collects_exceptions(self):
+        ExceptionCollector.start()
+        ExceptionCollector.appendException(ValidationError(message='Invalid'))
+        ExceptionCollector.appendException(ValidationError(message='Invalid'))
+        self.assertTrue(ExceptionCollector.exceptionsCaught())
+        self.assertEqual(len(ExceptionCollector.getExceptions()), 1)
+        self.assertEqual(ExceptionCollector.getExceptionsReport(full=False), ['ValidationError: Invalid'])
+        ExceptionCollector.clear()
+        self.assertFalse(ExceptionCollector.exceptionsCaught())
+
+    def test_threads_collect_own_exceptions(self):
+        appended = threading.Barrier(2)
+        reports = {}
+        def parse(name):
+            ExceptionCollector.start()
+            ExceptionCollector.appendException(ValidationError(message=name))
+            appended.wait()
+            reports[name] = ExceptionCollector.getExceptionsReport(full=False)
+            ExceptionCollector.stop()
+        threads = [threading.Thread(target=parse, args=(name,)) for name in ['A', 'B']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(reports, {'A': ['ValidationError: A'], 'B': ['ValidationError: B']})
+        self.assertFalse(ExceptionCollector.exceptionsCaught())
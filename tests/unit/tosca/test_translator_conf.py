@@ -0,0 +1,20 @@
+import unittest
+import os
+from osvimdriver.tosca.translator_conf import configure_translator_conf, build_translator_conf, translations_path, TRANSLATOR_CONF_ENV
+
+
+class TestTranslatorConf(unittest.TestCase):
+
+    def test_build_translator_conf_includes_absolute_translations_path(self):
+        content = build_translator_conf()
+        self.assertIn('custom_types_location=osvimdriver/tosca/translations,{0}'.format(translations_path), content)
+
+    def test_configure_translator_conf_does_not_write_to_cwd(self):
+        conf_path = configure_translator_conf()
+        self.assertNotEqual(os.path.dirname(conf_path), os.getcwd())
+        self.assertEqual(os.environ[TRANSLATOR_CONF_ENV], conf_path)
+        with open(conf_path, 'r') as f:
+            self.assertEqual(f.read(), build_translator_conf())
+
+    def test_configure_translator_conf_only_writes_once(self):
+        self.assertEqual(configure_translator_conf(), configure_translator_conf())